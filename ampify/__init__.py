@@ -0,0 +1 @@
+# AMPify — SFMC SQL generator internals used by app.py
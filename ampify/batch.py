@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+from ampify.core import (
+    build_messages, cached_answer, complete_sections, lint_and_repair, rewrite_automation_sql,
+    upstream_sfmc_sql, validate,
+)
+from ampify.history import get_history
+from ampify.knowledge import COMPLETION_ESTIMATE, estimate_tokens
+from ampify.metrics import observe_generation, observe_reject, source_of
+
+# ─────────────────────────────────────────
+# HEADLESS BATCH GENERATION
+#   python -m ampify.batch requests.jsonl --out out/ --concurrency 8 --tpm 30000
+# --incremental adds the watermark-based daily queries (ampify.incremental),
+# --partition-rows the shard queries for very large DEs (ampify.partition)
+# Input rows: {"id": ..., "request": ..., "de_names": "A\nB" or ["A", "B"]}
+# (ampify.planner also reads an optional "sql" column with a query already written)
+# CSV uses the same columns; de_names may be separated by "|" or newlines.
+# ─────────────────────────────────────────
+PROGRESS_FILE = "_progress.jsonl"
+
+
+def read_rows(path):
+    rows = []
+    ids = set()
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            records = list(csv.DictReader(f))
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+    for n, rec in enumerate(records, 1):
+        des = rec.get("de_names") or ""
+        if isinstance(des, list):
+            des = "\n".join(des)
+        rows.append({
+            "id": unique_id(str(rec.get("id") or n), n, ids),
+            "request": (rec.get("request") or "").strip(),
+            "de_names": des.replace("|", "\n"),
+            "sql": (rec.get("sql") or "").strip(),
+        })
+    return rows
+
+
+def safe_id(value):
+    return re.sub(r"[^\w.-]+", "_", value).strip("._") or "row"
+
+
+def unique_id(value, n, taken):
+    # Output directory name for a row: ids that had to be cleaned up get a
+    # short hash of the original ("a/b" and "a b" both clean to "a_b"), and
+    # a repeated id gets its row number
+    found = safe_id(value)
+    if found != value:
+        found += "-" + hashlib.sha1(value.encode("utf-8")).hexdigest()[:6]
+    if found in taken:
+        found += f"-{n}"
+    taken.add(found)
+    return found
+
+
+def load_done(out_dir):
+    done = set()
+    path = os.path.join(out_dir, PROGRESS_FILE)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue        # torn last line from a crash
+                if entry.get("status") in ("ok", "rejected"):
+                    done.add(entry["id"])
+    return done
+
+
+def write_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def row_tokens(row):
+    messages = build_messages(row["request"], row["de_names"])
+    return sum(estimate_tokens(m["content"]) for m in messages) + COMPLETION_ESTIMATE
+
+
+# ─────────────────────────────────────────
+# TOKENS-PER-MINUTE LIMITER — token bucket refilled continuously
+# ─────────────────────────────────────────
+class TokenBucket:
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+# ─────────────────────────────────────────
+# RUNNER
+# ─────────────────────────────────────────
+def generate_row(row, rewrite=True, raw=None, info=None):
+    # raw and info from a cached_answer() the caller already ran; without
+    # them the cache is checked here
+    started = time.perf_counter()
+    ok, msg = validate(row["request"], row["de_names"])
+    if not ok:
+        observe_reject(row["request"], msg)
+        return {"status": "rejected", "error": msg}
+    if info is None:
+        info = {}
+        raw = cached_answer(row["request"], row["de_names"], info)
+    if raw is None:
+        raw = "".join(upstream_sfmc_sql(row["request"], row["de_names"], info))
+    qs, as_, exp = complete_sections(row["request"], row["de_names"], raw, info)
+    qs, as_, lint_qs, lint_as = lint_and_repair(row["request"], row["de_names"], qs, as_, exp, info)
+    if rewrite:
+        as_, lint_as = rewrite_automation_sql(as_, lint_as, info)
+    observe_generation(info, qs, as_, exp, time.perf_counter() - started)
+    if not qs or not as_:
+        return {"status": "error", "error": "model response had no SQL sections"}
+    get_history().add(row["request"], row["de_names"], qs, as_, exp, source_of(info), info.get("model", ""))
+    return {
+        "status": "ok", "qs": qs, "as": as_, "exp": exp,
+        "source": source_of(info),
+        "violations": [v.rule for v in lint_qs + lint_as if v.severity == "error"],
+    }
+
+
+async def run_batch(rows, out_dir, concurrency=4, tpm=30000, incremental=False, partition_rows=None,
+                    log=print):
+    # ampify.incremental and ampify.partition read this module's helpers, so they are imported late
+    from ampify.incremental import incremental_queries, write_queries
+    from ampify.partition import partition_queries, write_partition
+
+    os.makedirs(out_dir, exist_ok=True)
+    done = load_done(out_dir)
+    pending = [row for row in rows if row["id"] not in done]
+    log(f"{len(rows)} rows, {len(rows) - len(pending)} already done, {len(pending)} to run")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(tpm)
+    progress = open(os.path.join(out_dir, PROGRESS_FILE), "a", encoding="utf-8")
+    counts = {"ok": 0, "rejected": 0, "error": 0}
+
+    async def one(row):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                # Local patterns and cache hits cost no tokens; the lookup
+                # reads SQLite, so it runs off the event loop, once per row
+                info = {}
+                raw = await asyncio.to_thread(cached_answer, row["request"], row["de_names"], info)
+                if raw is None:
+                    await bucket.acquire(row_tokens(row))
+                result = await asyncio.to_thread(generate_row, row, True, raw, info)
+            except Exception as e:          # one bad row must not stop the batch
+                result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+
+            if result["status"] == "ok":
+                row_dir = os.path.join(out_dir, row["id"])
+                os.makedirs(row_dir, exist_ok=True)
+                write_atomic(os.path.join(row_dir, "query_studio.sql"), result["qs"] + "\n")
+                write_atomic(os.path.join(row_dir, "automation_studio.sql"), result["as"] + "\n")
+                write_atomic(os.path.join(row_dir, "explanation.txt"), result["exp"] + "\n")
+                if incremental:
+                    inc, reason = incremental_queries(result["as"])
+                    if inc is None:
+                        result["incremental"] = reason
+                    else:
+                        write_queries(inc, row_dir)
+                        result["incremental"] = "ok"
+                if partition_rows:
+                    part, reason = partition_queries(result["as"], rows=partition_rows)
+                    if part is None:
+                        result["shards"] = reason
+                    else:
+                        write_partition(part, os.path.join(row_dir, "shards"))
+                        result["shards"] = part.shards
+            entry = {
+                "id": row["id"], "status": result["status"],
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+            for k in ("source", "violations", "error", "incremental", "shards"):
+                if result.get(k):
+                    entry[k] = result[k]
+            # Files first, then the progress line — a crash never marks a row done early
+            progress.write(json.dumps(entry) + "\n")
+            progress.flush()
+            counts[result["status"]] += 1
+            log(f"[{sum(counts.values())}/{len(pending)}] {row['id']}: {result['status']}"
+                + (f" — {result['error']}" if result.get("error") else ""))
+
+    try:
+        await asyncio.gather(*(one(row) for row in pending))
+    finally:
+        progress.close()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate SFMC SQL for a file of requests.")
+    parser.add_argument("input", help="JSONL or CSV with request / de_names / id columns")
+    parser.add_argument("--out", default="ampify_out", help="output directory")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--tpm", type=int, default=30000, help="tokens-per-minute budget")
+    parser.add_argument("--incremental", action="store_true",
+                        help="also write the backfill / delta / expire / watermark queries where possible")
+    parser.add_argument("--partition-rows", type=int,
+                        help="rows in the largest DE; writes shard queries when one query would be too slow")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    counts = asyncio.run(run_batch(read_rows(args.input), args.out, args.concurrency, args.tpm,
+                                     args.incremental, args.partition_rows))
+    print(f"done in {time.perf_counter() - started:.1f}s — "
+          f"{counts['ok']} ok, {counts['rejected']} rejected, {counts['error']} errors")
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,494 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from ampify.cache import ResponseCache, use_cache
+from ampify.catalog import Catalog, use_catalog
+from ampify.history import History, use_history
+from ampify.knowledge import estimate_tokens
+from ampify.mock_groq import load_corpus, start_server
+from ampify.similarity import SimilarCache, use_similar_cache
+from ampify.simulator import use_simulator
+
+# ─────────────────────────────────────────
+# END-TO-END BENCHMARK
+# Replays the recorded corpus through the real pipeline against the local
+# mock Groq server and reports per-stage latency percentiles.
+#   python -m ampify.benchmark                      # compare with baseline
+#   python -m ampify.benchmark --save-baseline      # record a new baseline
+#   python -m ampify.benchmark --latency 0.8 --tps 120 --repeat 5 --no-render
+# ─────────────────────────────────────────
+BENCH_DIR = os.path.join(os.path.dirname(__file__), "golden", "bench")
+CORPUS_PATH = os.path.join(BENCH_DIR, "corpus.jsonl")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+STAGES = ("validate", "prompt", "ttft", "network", "parse", "lint", "render", "total")
+PERCENTILES = (50, 95, 99)
+# A stage regresses when it is this much slower than the baseline; p95 over a
+# few dozen samples is noisy, so it gets more headroom than the median
+TOLERANCE = {"p50": 0.25, "p95": 0.50}
+TOKEN_TOLERANCE = 0.10
+SLACK_MS = 5.0
+
+
+def percentile(values, p):
+    # Nearest-rank, so every reported number is a real observation
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-p * len(ordered) // 100))
+    return ordered[int(rank) - 1]
+
+
+def ms(start):
+    return (time.perf_counter() - start) * 1000
+
+
+# ─────────────────────────────────────────
+# STAGES
+# ─────────────────────────────────────────
+def run_request(row, renderer=None):
+    # -> (timings in ms, stats); cache and local patterns are bypassed so
+    # every request pays the full network + parse cost
+    from ampify.core import (
+        build_messages, get_client, lint_and_repair, parse_response,
+        rewrite_automation_sql, validate,
+    )
+    from ampify.transform import add_query_studio
+
+    t = {}
+    begin = time.perf_counter()
+
+    start = time.perf_counter()
+    ok, _ = validate(row["request"], row.get("de_names", ""))
+    t["validate"] = ms(start)
+
+    start = time.perf_counter()
+    messages = build_messages(row["request"], row.get("de_names", ""))
+    t["prompt"] = ms(start)
+
+    start = time.perf_counter()
+    stream = get_client().stream(messages, temperature=0.1)
+    raw = ""
+    usage = None
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            if not raw:
+                t["ttft"] = ms(start)
+            raw += chunk.choices[0].delta.content
+        x_groq = getattr(chunk, "x_groq", None)
+        if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+            usage = x_groq.usage
+    t["network"] = ms(start)
+    t.setdefault("ttft", t["network"])
+
+    start = time.perf_counter()
+    qs, as_, exp = parse_response(add_query_studio(raw))
+    t["parse"] = ms(start)
+
+    start = time.perf_counter()
+    qs, as_, lint_qs, lint_as = lint_and_repair(row["request"], row.get("de_names", ""),
+                                                qs, as_, exp)
+    as_, lint_as = rewrite_automation_sql(as_, lint_as)
+    t["lint"] = ms(start)
+
+    if renderer is not None:
+        start = time.perf_counter()
+        renderer(qs, as_, exp, lint_qs, lint_as)
+        t["render"] = ms(start)
+
+    t["total"] = ms(begin)
+    stats = {
+        "valid": ok,
+        "parse_failed": not (as_ and exp),
+        "prompt_tokens": usage.prompt_tokens if usage else sum(
+            estimate_tokens(m["content"]) for m in messages),
+        "completion_tokens": usage.completion_tokens if usage else estimate_tokens(raw),
+    }
+    return t, stats
+
+
+def make_renderer():
+    # One AppTest instance is reused so each render is a warm rerun of the
+    # result view, like a user interaction after generation
+    from streamlit.testing.v1 import AppTest
+
+    # Setting session_state between runs warns about the missing ScriptRunContext;
+    # disabled rather than raised in level, which AppTest resets on each run
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").disabled = True
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.run()
+
+    def render(qs, as_, exp, lint_qs, lint_as):
+        at.session_state["qs"] = qs
+        at.session_state["asm"] = as_
+        at.session_state["exp"] = exp
+        at.session_state["lint_qs"] = lint_qs
+        at.session_state["lint_as"] = lint_as
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return render
+
+
+# ─────────────────────────────────────────
+# UI INTERACTIONS
+# Drives a real `streamlit run` over its websocket the way the browser does
+# and records, per interaction, the server time until the script run ends,
+# the bytes sent to the browser and the number of messages.
+#   python -m ampify.benchmark --ui
+# ─────────────────────────────────────────
+INTERACTIONS = ("load", "edit", "generate", "volume", "download", "new_query")
+UI_LABELS = {
+    "request": "req",
+    "generate": "⚡ Generate SFMC SQL",
+    "volume": "Sends per day",
+    "download": "⬇️  Download automation_studio.sql",
+    "new_query": "🔄  New Query",
+}
+UI_TOLERANCE = {"ms": 0.50, "bytes": 0.10}
+UI_SLACK = {"ms": 25.0, "bytes": 512}
+
+
+class UISession:
+    # One browser tab: widget values are resent on every rerun, like the frontend
+
+    def __init__(self, url):
+        self.url = url
+        self.ws = None
+        self.widgets = {}           # label -> (widget id, fragment id, element)
+        self.values = {}            # widget id -> (WidgetState field, value)
+        self.auto_reruns = {}       # fragment id -> seconds, fragments with run_every
+
+    def __enter__(self):
+        from websockets.sync.client import connect
+
+        self.ws = connect(self.url, subprotocols=["streamlit"], max_size=None).__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self.ws.close()
+
+    def rerun(self, trigger=None, fragment="", auto=False):
+        # -> (ms, bytes, messages) until the last script run finishes; a
+        # callback that reruns another fragment produces a second run
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        for wid, (field, value) in dict(self.values, **(trigger or {})).items():
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = wid
+            setattr(state, field, value)
+        msg.rerun_script.fragment_id = fragment
+        msg.rerun_script.is_auto_rerun = auto
+        size = count = 0
+        start = time.perf_counter()
+        self.ws.send(msg.SerializeToString())
+        while True:
+            data = self.ws.recv(timeout=120)
+            size += len(data)
+            count += 1
+            fm = ForwardMsg()
+            fm.ParseFromString(data)
+            kind = fm.WhichOneof("type")
+            # A full run forgets the fragments it does not register again
+            if kind == "new_session" and not fm.new_session.fragment_ids_this_run:
+                self.auto_reruns = {}
+            elif kind == "auto_rerun":
+                self.auto_reruns[fm.auto_rerun.fragment_id] = fm.auto_rerun.interval
+            elif kind == "stop_auto_rerun":
+                for fid in fm.stop_auto_rerun.fragment_ids:
+                    self.auto_reruns.pop(fid, None)
+            if kind == "delta" and fm.delta.WhichOneof("type") == "new_element":
+                element = fm.delta.new_element
+                widget = getattr(element, element.WhichOneof("type"))
+                if getattr(widget, "id", ""):
+                    self.widgets[widget.label] = (widget.id, fm.delta.fragment_id, widget)
+            if kind == "script_finished" and fm.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return ms(start), size, count
+
+    def set(self, label, field, value):
+        wid, fragment, _ = self.widgets[label]
+        self.values[wid] = (field, value)
+        return self.rerun(fragment=fragment)
+
+    def click(self, label):
+        wid, fragment, widget = self.widgets[label]
+        if getattr(widget, "ignore_rerun", False):
+            return 0.0, 0, 0        # the browser does not contact the server
+        return self.rerun({wid: ("trigger_value", True)}, fragment)
+
+    def settle(self, first, timeout=120):
+        # Reruns the run_every fragments on their interval, as the browser
+        # does, until a full run no longer shows any, e.g. the generation job
+        # panel; -> first's numbers plus the polls, timed from first's start
+        start = time.perf_counter() - first[0] / 1000
+        size, count = first[1], first[2]
+        while self.auto_reruns:
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError("the page kept polling")
+            fragment, interval = next(iter(self.auto_reruns.items()))
+            time.sleep(interval)
+            _, more_size, more_count = self.rerun(fragment=fragment, auto=True)
+            size += more_size
+            count += more_count
+        return ms(start), size, count
+
+
+def start_app(url, state_dir):
+    # -> (process, websocket url) of a headless Streamlit server on a free port
+    # that keeps its cache, history and catalog in state_dir
+    import socket
+    import subprocess
+    import urllib.request
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(os.environ, GROQ_BASE_URL=url, GROQ_API_KEY="bench-key",
+               AMPIFY_CACHE_PATH=os.path.join(state_dir, "cache.sqlite3"),
+               AMPIFY_HISTORY_PATH=os.path.join(state_dir, "history.sqlite3"),
+               AMPIFY_CATALOG_PATH=os.path.join(state_dir, "catalog.sqlite3"),
+               AMPIFY_SIM_PATH=os.path.join(state_dir, "sim.sqlite3"), AMPIFY_SIMULATOR="0", AMPIFY_LOG="0")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(150):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return proc, f"ws://127.0.0.1:{port}/_stcore/stream"
+        except OSError:
+            if proc.poll() is not None:
+                break
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("streamlit did not start")
+
+
+def run_ui(corpus, latency, tps, repeat=3, log=print):
+    # Every repeat is a fresh session that walks through all interactions;
+    # each uses a different corpus row so generate always reaches the mock
+    server, url = start_server(corpus, latency=latency, tps=tps)
+    state_dir = tempfile.mkdtemp(prefix="ampify_bench_ui_")
+    proc, ws_url = start_app(url, state_dir)
+    samples = {name: [] for name in INTERACTIONS}
+    try:
+        with UISession(ws_url) as warm:     # first run compiles the script and imports ampify
+            warm.rerun()
+        for n in range(repeat):
+            with UISession(ws_url) as session:
+                samples["load"].append(session.rerun())
+                samples["edit"].append(session.set(UI_LABELS["request"], "string_value",
+                                                   corpus[n % len(corpus)]["request"]))
+                # Generation runs as a job; the page polls it until the result shows
+                samples["generate"].append(session.settle(session.click(UI_LABELS["generate"])))
+                samples["volume"].append(session.set(UI_LABELS["volume"], "int_value", 2_000_000))
+                samples["download"].append(session.click(UI_LABELS["download"]))
+                samples["new_query"].append(session.click(UI_LABELS["new_query"]))
+            log(f"ui pass {n + 1}/{repeat} done")
+    finally:
+        proc.terminate()
+        proc.wait()
+        server.shutdown()
+        shutil.rmtree(state_dir, ignore_errors=True)
+    return {
+        name: {
+            "ms": round(percentile([s[0] for s in values], 50), 1),
+            "bytes": percentile([s[1] for s in values], 50),
+            "messages": percentile([s[2] for s in values], 50),
+        }
+        for name, values in samples.items()
+    }
+
+
+def compare_ui(ui, baseline):
+    regressions = []
+    for name, current in ui.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        for metric, tolerance in UI_TOLERANCE.items():
+            if current[metric] > before[metric] * (1 + tolerance) + UI_SLACK[metric]:
+                regressions.append(f"ui {name}: {metric} {current[metric]:,.1f} vs baseline "
+                                   f"{before[metric]:,.1f}")
+    return regressions
+
+
+def format_ui_report(ui, baseline=None):
+    lines = [f"{'interaction':<12}{'ms':>9}{'bytes':>10}{'msgs':>6}"
+             + (f"{'base ms':>10}{'base bytes':>12}" if baseline else "")]
+    for name in INTERACTIONS:
+        row = ui.get(name)
+        if not row:
+            continue
+        line = f"{name:<12}{row['ms']:>9.1f}{row['bytes']:>10,}{row['messages']:>6}"
+        before = (baseline or {}).get(name)
+        if before:
+            line += f"{before['ms']:>10.1f}{before['bytes']:>12,}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+# ─────────────────────────────────────────
+# RUN + REPORT
+# ─────────────────────────────────────────
+def run(corpus, latency, tps, repeat=3, render=True, log=print):
+    server, url = start_server(corpus, latency=latency, tps=tps)
+    os.environ["GROQ_BASE_URL"] = url
+    # Nothing here dry-runs, so the rendered page must not build the data
+    # views in the background while it is being timed
+    os.environ["AMPIFY_SIMULATOR"] = "0"
+    # Cache, history, catalog and data views of the run live in a temp dir,
+    # never in the working directory or the real ones
+    state_dir = tempfile.mkdtemp(prefix="ampify_bench_")
+    cache_path = os.path.join(state_dir, "cache.sqlite3")
+    use_cache(ResponseCache(cache_path))
+    use_similar_cache(SimilarCache(cache_path))
+    use_history(History(os.path.join(state_dir, "history.sqlite3")))
+    use_catalog(Catalog(os.path.join(state_dir, "catalog.sqlite3")))
+    use_simulator(os.path.join(state_dir, "sim.sqlite3"))
+    from ampify.core import configure
+    configure("bench-key")
+    try:
+        renderer = make_renderer() if render else None
+        timings = {stage: [] for stage in STAGES}
+        tokens = {"prompt": [], "completion": []}
+        failures = []
+        for n in range(repeat):
+            for row in corpus:
+                t, stats = run_request(row, renderer)
+                for stage, value in t.items():
+                    timings[stage].append(value)
+                tokens["prompt"].append(stats["prompt_tokens"])
+                tokens["completion"].append(stats["completion_tokens"])
+                if stats["parse_failed"] and n == 0:
+                    failures.append(row["id"])
+            log(f"pass {n + 1}/{repeat} done")
+    finally:
+        server.shutdown()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    return {
+        "config": {"latency": latency, "tps": tps, "requests": len(corpus), "repeat": repeat},
+        "stages": {
+            stage: {f"p{p}": round(percentile(values, p), 2) for p in PERCENTILES}
+            for stage, values in timings.items() if values
+        },
+        "tokens": {k: round(sum(v) / len(v), 1) if v else 0 for k, v in tokens.items()},
+        "parse_failure_rate": round(len(failures) / len(corpus), 3) if corpus else 0,
+        "parse_failures": failures,
+    }
+
+
+def compare(report, baseline):
+    # -> list of regression messages (empty when within tolerance)
+    regressions = []
+    for stage, current in report["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before:
+            continue
+        for p, tolerance in TOLERANCE.items():
+            if current[p] > before[p] * (1 + tolerance) + SLACK_MS:
+                regressions.append(f"{stage}: {p} {current[p]:.1f} ms vs baseline {before[p]:.1f} ms")
+    for kind, mean in report["tokens"].items():
+        before = baseline.get("tokens", {}).get(kind)
+        if before and mean > before * (1 + TOKEN_TOLERANCE):
+            regressions.append(f"{kind} tokens: mean {mean:.0f} vs baseline {before:.0f}")
+    if report["parse_failure_rate"] > baseline.get("parse_failure_rate", 0):
+        regressions.append(f"parse failures: {report['parse_failure_rate']:.1%} vs baseline "
+                           f"{baseline.get('parse_failure_rate', 0):.1%}")
+    return regressions
+
+
+def format_report(report, baseline=None):
+    lines = [f"{'stage':<10}" + "".join(f"{'p' + str(p):>10}" for p in PERCENTILES)
+             + (f"{'base p95':>11}" if baseline else "")]
+    for stage in STAGES:
+        row = report["stages"].get(stage)
+        if not row:
+            continue
+        line = f"{stage:<10}" + "".join(f"{row['p' + str(p)]:>10.2f}" for p in PERCENTILES)
+        before = (baseline or {}).get("stages", {}).get(stage)
+        if before:
+            line += f"{before['p95']:>11.2f}"
+        lines.append(line)
+    lines.append(f"tokens    prompt {report['tokens']['prompt']:.0f}  "
+                 f"completion {report['tokens']['completion']:.0f}  (mean per request)")
+    lines.append(f"parse     {report['parse_failure_rate']:.1%} failed "
+                 f"{', '.join(report['parse_failures'])}".rstrip())
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the generation pipeline against a mock Groq server.")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock seconds to first token")
+    parser.add_argument("--tps", type=float, default=2000.0, help="mock completion tokens per second")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-render", action="store_true", help="skip the Streamlit render stage")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print the raw report")
+    parser.add_argument("--ui", action="store_true",
+                        help="time page interactions on a real Streamlit server instead")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    log = lambda msg: print(msg, file=sys.stderr)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.ui:
+        ui = run_ui(corpus, args.latency, args.tps, args.repeat, log=log)
+        if args.save_baseline:
+            # The UI numbers live next to the pipeline numbers in one file
+            with open(args.baseline, "w", encoding="utf-8") as f:
+                json.dump(dict(baseline or {}, ui=ui), f, indent=2)
+                f.write("\n")
+            print(format_ui_report(ui))
+            print(f"baseline saved to {args.baseline}")
+            return 0
+        before = (baseline or {}).get("ui")
+        print(json.dumps(ui, indent=2) if args.json else format_ui_report(ui, before))
+        regressions = compare_ui(ui, before or {})
+        for msg in regressions:
+            print(f"REGRESSION {msg}")
+        return 1 if regressions else 0
+
+    report = run(corpus, args.latency, args.tps, args.repeat, not args.no_render, log=log)
+
+    if args.save_baseline:
+        if baseline and "ui" in baseline:
+            report["ui"] = baseline["ui"]
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(format_report(report))
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    print(json.dumps(report, indent=2) if args.json else format_report(report, baseline))
+    if baseline is None:
+        return 0
+    if baseline.get("config", {}).get("latency") != args.latency or \
+            baseline.get("config", {}).get("tps") != args.tps:
+        print("warning: mock latency/tps differ from the baseline — network stages are not comparable")
+    regressions = compare(report, baseline)
+    for msg in regressions:
+        print(f"REGRESSION {msg}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
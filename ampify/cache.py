@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# ─────────────────────────────────────────
+# SETTINGS — override with env vars
+# ─────────────────────────────────────────
+CACHE_PATH = os.getenv("AMPIFY_CACHE_PATH", ".ampify_cache.sqlite3")
+CACHE_TTL = int(os.getenv("AMPIFY_CACHE_TTL", str(7 * 24 * 3600)))      # seconds
+CACHE_MAX_ROWS = int(os.getenv("AMPIFY_CACHE_MAX_ROWS", "5000"))         # disk tier
+CACHE_MEMORY_SIZE = int(os.getenv("AMPIFY_CACHE_MEMORY_SIZE", "256"))    # LRU tier
+# Memory hits refresh the disk row's `accessed` in batches: every this many
+# hits or seconds, and before any eviction
+TOUCH_BATCH = 64
+TOUCH_INTERVAL = 30.0
+
+
+# ─────────────────────────────────────────
+# KEYS
+# ─────────────────────────────────────────
+# Comparison operators and signed numbers are kept — "> 500" and "< 500"
+# are different requests
+TOKEN = re.compile(r"<>|[<>!]=|[<>=]|(?<![\w.])-?\d+(?:\.\d+)?(?!\w)|\w+")
+
+
+def fold(word):
+    # CamelCase and snake_case words name DEs and fields, which are
+    # case-sensitive in SFMC; everything else is folded
+    if "_" in word or re.search(r"[a-z][A-Z]", word):
+        return word
+    return word.lower()
+
+
+def normalize_request(text):
+    # Fold case, punctuation and whitespace so trivial edits share one entry
+    return " ".join("!=" if t == "<>" else fold(t) for t in TOKEN.findall(text))
+
+
+def normalize_de_names(custom_de_names):
+    # DE names are case-sensitive in SFMC — only strip and de-duplicate
+    names = []
+    for line in (custom_de_names or "").splitlines():
+        name = line.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def make_cache_key(user_request, custom_de_names, model, system_prompt):
+    payload = json.dumps([
+        normalize_request(user_request),
+        normalize_de_names(custom_de_names),
+        model,
+        hashlib.sha256(system_prompt.encode("utf-8")).hexdigest(),
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ─────────────────────────────────────────
+# TWO-TIER CACHE — in-process LRU + SQLite
+# ─────────────────────────────────────────
+class ResponseCache:
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL,
+                 max_rows=CACHE_MAX_ROWS, memory_size=CACHE_MEMORY_SIZE):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.memory_size = memory_size
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                      "writes": 0, "evictions": 0}
+        self._memory = OrderedDict()
+        self._touched = {}              # key -> last memory hit not yet on disk
+        self._flushed = time.time()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "created REAL NOT NULL, accessed REAL NOT NULL)"
+                )
+                self._db.execute(
+                    "CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)"
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                # Read-only or locked filesystem — keep serving from memory
+                self._db = None
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    # So disk LRU eviction never drops the hottest entries
+                    self._touched[key] = now
+                    if len(self._touched) >= TOUCH_BATCH or now - self._flushed >= TOUCH_INTERVAL:
+                        self._flush_touched(now)
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, created FROM responses WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row and now - row[1] <= self.ttl:
+                        self._db.execute(
+                            "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+                        )
+                        self._db.commit()
+                        self._remember(key, row[0], row[1])
+                        self.stats["disk_hits"] += 1
+                        return row[0]
+                except sqlite3.Error:
+                    pass
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self.stats["writes"] += 1
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) "
+                    "VALUES (?, ?, ?, ?)", (key, value, now, now)
+                )
+                self._evict(now)
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self, now):
+        self._flushed = now
+        if not self._touched or self._db is None:
+            self._touched.clear()
+            return
+        try:
+            self._db.executemany("UPDATE responses SET accessed = ? WHERE key = ?",
+                                 [(at, key) for key, at in self._touched.items()])
+            self._db.commit()
+        except sqlite3.Error:
+            pass
+        self._touched.clear()
+
+    def _evict(self, now):
+        # TTL first, then least-recently-used rows beyond the size cap
+        self._flush_touched(now)
+        expired = self._db.execute(
+            "DELETE FROM responses WHERE created < ?", (now - self.ttl,)
+        ).rowcount
+        overflow = self._db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,)
+        ).rowcount
+        self.stats["evictions"] += max(expired, 0) + max(overflow, 0)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    # Module-level so the LRU tier survives Streamlit reruns
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
+
+
+def use_cache(cache):
+    # Swap the process-wide cache, e.g. so benchmark runs against the mock
+    # server never write into the real one
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
+
+
+# ─────────────────────────────────────────
+# KEY CHECKS — (request a, request b, should share a key)
+# ─────────────────────────────────────────
+KEY_CHECKS = [
+    ("Members with LoyaltyPoints > 500", "Members with LoyaltyPoints < 500", False),
+    ("Members with LoyaltyPoints >= 500", "Members with LoyaltyPoints > 500", False),
+    ("Members with LoyaltyPoints = 500", "Members with LoyaltyPoints != 500", False),
+    ("Members with LoyaltyPoints <> 500", "Members with LoyaltyPoints != 500", True),
+    ("Accounts with Balance < -5", "Accounts with Balance < 5", False),
+    ("Rows where Score > 0.5", "Rows where Score > 5", False),
+    ("Members with LoyaltyPoints > 500", "members with loyaltypoints > 500", False),
+    ("Rows where Loyalty_Points > 500", "Rows where loyalty_points > 500", False),
+    ("Openers in the last 30 days who never clicked", "openers in the LAST 30 days, who never clicked!", True),
+    ("Subscribers who got 10+ emails", "subscribers who got 10 emails", True),
+]
+
+
+def check_keys(log=print):
+    failures = 0
+    for a, b, same in KEY_CHECKS:
+        ok = (make_cache_key(a, "", "", "") == make_cache_key(b, "", "", "")) == same
+        failures += not ok
+        log(f"{'ok  ' if ok else 'FAIL'} {'same' if same else 'diff'}  {a!r} / {b!r}")
+    return failures
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Response cache keys.")
+    parser.add_argument("--check", action="store_true", help="check which requests share a cache key")
+    parser.add_argument("request", nargs="*", help="print the normalized form of a request")
+    args = parser.parse_args(argv)
+    for request in args.request:
+        print(normalize_request(request))
+    if args.check:
+        failures = check_keys()
+        print(f"{len(KEY_CHECKS) - failures}/{len(KEY_CHECKS)} key checks passed")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
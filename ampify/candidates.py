@@ -0,0 +1,316 @@
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from ampify.core import (
+    PARTIAL, REGENERATE, SINGLE_GENERATION, build_messages, cache_key, cached_answer,
+    get_client, lint_sql, parse_sections, record_call, remember,
+)
+from ampify.knowledge import COMPLETION_ESTIMATE, estimate_tokens
+from ampify.linter import ERROR
+from ampify.resilient import GroqUnavailable
+from ampify.similarity import stem
+from ampify.singleflight import get_dispatcher
+from ampify.transform import add_query_studio
+
+# ─────────────────────────────────────────
+# PARALLEL CANDIDATES
+# A multi-view tracking report or journey query often comes back unusable,
+# and regenerating it by hand pays the full latency each time. Instead K
+# generations run at once with different temperatures and prompt nudges;
+# each is checked locally as soon as it finishes (all sections present, no
+# rule or column errors) and the first that passes is returned while the
+# others are cancelled mid-stream:
+#   python -m ampify.candidates "Opens and clicks per journey in the last 30 days"
+#   python -m ampify.candidates --bench --k 3 --slow-rate 0.2
+# ─────────────────────────────────────────
+CANDIDATES = int(os.getenv("AMPIFY_CANDIDATES", "3"))
+# off, auto (complex requests only) or always; off by default, since a race
+# spends about K times the tokens of a single generation
+CANDIDATE_MODE = os.getenv("AMPIFY_CANDIDATE_MODE", "off")
+# Prompt plus completion tokens one request may spend across its candidates
+CANDIDATE_TOKENS = int(os.getenv("AMPIFY_CANDIDATE_TOKENS", "12000"))
+
+# Candidate 0 is the regular request; the others vary temperature and nudge the prompt
+VARIANTS = [
+    (0.1, ""),
+    (0.5, "Check every column against the data view or DE it is read from before writing it."),
+    (0.8, "Keep the query as simple as the request allows — fewer joins and no extra columns."),
+    (0.3, "Write the joins first, then the filters, then the SELECT list."),
+]
+
+Candidate = namedtuple("Candidate", "index temperature raw problems tokens seconds")
+
+# Stemmed event words -> the data view they read; two or more views, or a
+# journey, make a request complex
+EVENTS = {stem(word): view for word, view in (
+    ("sent", "_sent"), ("send", "_sent"), ("open", "_open"), ("opened", "_open"),
+    ("click", "_click"), ("clicked", "_click"), ("bounce", "_bounce"), ("bounced", "_bounce"),
+    ("unsubscribe", "_unsubscribe"), ("unsubscribed", "_unsubscribe"), ("unsub", "_unsubscribe"),
+    ("complaint", "_complaint"), ("journey", "_journey"), ("journeys", "_journey"),
+)}
+WORD_RE = re.compile(r"_?[a-z]+")
+
+
+def is_complex(user_request):
+    views = {word if word.startswith("_") else EVENTS.get(stem(word))
+             for word in WORD_RE.findall(user_request.lower())}
+    views.discard(None)
+    return any(view.startswith("_journey") for view in views) or len(views) >= 2
+
+
+def wanted(user_request):
+    return CANDIDATE_MODE == "always" or (CANDIDATE_MODE == "auto" and is_complex(user_request))
+
+
+def check(raw):
+    # -> problems that make a candidate unusable; [] means it passes
+    sections, found = parse_sections(add_query_studio(raw) if SINGLE_GENERATION else raw)
+    problems = [f"{name.upper()} {problem}" for name, problem in found.items()
+                if problem in REGENERATE and not (PARTIAL and name == "exp")]
+    if problems:
+        return problems
+    for mode in ("qs", "as"):
+        problems += [v.rule for v in lint_sql(sections[mode], mode) if v.severity == ERROR]
+    return problems
+
+
+def variant_messages(messages, index):
+    note = VARIANTS[index % len(VARIANTS)][1]
+    if not note:
+        return messages
+    return messages[:-1] + [dict(messages[-1], content=messages[-1]["content"] + "\n" + note)]
+
+
+# ─────────────────────────────────────────
+# RACE
+# ─────────────────────────────────────────
+class Budget:
+    # Tokens left for one request; candidates stop streaming when it runs out
+
+    def __init__(self, tokens):
+        self.left = tokens
+        self._lock = threading.Lock()
+
+    def spend(self, tokens):
+        with self._lock:
+            self.left -= tokens
+            return self.left >= 0
+
+
+def attempt(index, messages, prompt_tokens, budget, cancel, info):
+    # One candidate, streamed so it can be dropped the moment another wins
+    # -> Candidate; problems is ["cancelled"] or ["budget"] when it was stopped
+    temperature = VARIANTS[index % len(VARIANTS)][0]
+    started = time.perf_counter()
+    raw, usage, ttft, stopped = "", None, None, None
+    stream = get_client().stream(variant_messages(messages, index), info, temperature=temperature)
+    try:
+        for chunk in stream:
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                usage = x_groq.usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if cancel.is_set():
+                stopped = "cancelled"
+                break
+            if not delta:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - started
+            raw += delta
+            if not budget.spend(estimate_tokens(delta)):
+                stopped = "budget"
+                break
+    except GroqUnavailable as e:
+        stopped = f"failed: {e}"
+    finally:
+        stream.close()
+    record_call(info, started, usage, ttft)
+    tokens = (usage.prompt_tokens + usage.completion_tokens) if usage else prompt_tokens + estimate_tokens(raw)
+    return Candidate(index, temperature, raw, [stopped] if stopped else check(raw),
+                     tokens, time.perf_counter() - started)
+
+
+def race(user_request, custom_de_names="", k=CANDIDATES, budget=CANDIDATE_TOKENS, info=None, stop=None):
+    # -> (winner Candidate or None, [every candidate that finished]); the
+    # winner's call metadata is copied into info. stop() returning True
+    # cancels every candidate
+    info = {} if info is None else info
+    messages = build_messages(user_request, custom_de_names, info)
+    prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+    # Only as many candidates as the budget can pay for in full
+    k = max(1, min(k, budget // (prompt_tokens + COMPLETION_ESTIMATE)))
+    completion = budget - k * prompt_tokens
+    tokens = Budget(completion)
+    cancel = threading.Event()
+    results = queue.Queue()
+    metas = [{} for _ in range(k)]
+
+    def run(index):
+        try:
+            results.put(attempt(index, messages, prompt_tokens, tokens, cancel, metas[index]))
+        except Exception as e:          # reported like a failed candidate
+            results.put(Candidate(index, VARIANTS[index % len(VARIANTS)][0], "", [f"failed: {e}"],
+                                  0, 0.0))
+
+    started = time.perf_counter()
+    for index in range(k):
+        threading.Thread(target=run, args=(index,), daemon=True, name=f"ampify-candidate-{index}").start()
+    finished, winner = [], None
+    while len(finished) < k:
+        try:
+            candidate = results.get(timeout=0.25)
+        except queue.Empty:
+            if stop is not None and stop():
+                cancel.set()
+                break
+            continue
+        finished.append(candidate)
+        if not candidate.problems:
+            winner = candidate
+            cancel.set()
+            break
+    if winner is None and not cancel.is_set():
+        # Nothing passed: the one with the fewest problems, to be completed and repaired
+        usable = [c for c in finished if c.raw]
+        winner = min(usable, key=lambda c: (len(c.problems), c.index)) if usable else None
+    if winner is not None:
+        info.update(metas[winner.index])
+    # Cancelled candidates stop at their next chunk; what they streamed is in the budget
+    info["candidates"] = {
+        "k": k, "winner": winner.index if winner else None,
+        "valid": bool(winner and not winner.problems),
+        "finished": len(finished), "cancelled": k - len(finished),
+        "tokens": k * prompt_tokens + completion - tokens.left,
+        "seconds": round(time.perf_counter() - started, 3),
+        "problems": {c.index: c.problems for c in finished if c.problems},
+    }
+    return winner, finished
+
+
+def race_sfmc_sql(user_request, custom_de_names="", info=None, k=CANDIDATES, budget=CANDIDATE_TOKENS,
+                  cancel=None):
+    # Like generate_sfmc_sql, with K candidates per Groq call; identical
+    # requests racing at the same time share one race. Setting `cancel`
+    # returns "" and stops the race when no other session is waiting on it
+    raw = cached_answer(user_request, custom_de_names, info)
+    if raw is not None:
+        return raw
+    info = {} if info is None else info
+    key = cache_key(user_request, custom_de_names)
+
+    def work(flight):
+        winner, _ = race(user_request, custom_de_names, k, budget, flight.meta,
+                         stop=lambda: flight.abandoned)
+        if winner is None:
+            raise GroqUnavailable("no candidate answered")
+        answer = add_query_studio(winner.raw) if SINGLE_GENERATION else winner.raw
+        if not winner.problems and not flight.meta.get("path", {}).get("fallback"):
+            remember(user_request, custom_de_names, answer, key)
+        flight.push(answer)
+
+    flight, joined = get_dispatcher().submit(key + "#race", info.get("session"), work)
+    if joined:
+        info["coalesced"] = True
+    try:
+        return "".join(flight.follow(cancel))
+    finally:
+        get_dispatcher().leave(flight)
+        if not joined:
+            info.update(flight.meta)
+
+
+# ─────────────────────────────────────────
+# BENCH — regenerate until valid, one after another, against the race
+# ─────────────────────────────────────────
+def serial(user_request, custom_de_names="", k=CANDIDATES):
+    # What a user does by hand: generate, and again while the answer is unusable
+    messages = build_messages(user_request, custom_de_names)
+    prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+    tried = []
+    for index in range(k):
+        tried.append(attempt(index, messages, prompt_tokens, Budget(1 << 30), threading.Event(), {}))
+        if not tried[-1].problems:
+            break
+    return tried
+
+
+def bench(corpus, k, latency, tps, faults, log=print):
+    from ampify.mock_groq import start_server
+
+    server, url = start_server(corpus, latency=latency, tps=tps, faults=faults)
+    os.environ["GROQ_BASE_URL"] = url
+    from ampify.core import configure
+    configure("bench-key")
+    report = {"serial": [], "race": []}
+    try:
+        for row in corpus:
+            started = time.perf_counter()
+            tried = serial(row["request"], row.get("de_names", ""), k)
+            report["serial"].append((time.perf_counter() - started, not tried[-1].problems,
+                                     sum(c.tokens for c in tried)))
+            info = {}
+            started = time.perf_counter()
+            winner, _ = race(row["request"], row.get("de_names", ""), k, 1 << 30, info)
+            report["race"].append((time.perf_counter() - started, bool(winner and not winner.problems),
+                                   info["candidates"]["tokens"]))
+            log(f"{row['id']:<24} serial {report['serial'][-1][0]:5.2f}s  race {report['race'][-1][0]:5.2f}s"
+                f"  {'valid' if report['race'][-1][1] else 'invalid'}")
+    finally:
+        server.shutdown()
+    summary = {}
+    for mode, runs in report.items():
+        seconds = sorted(r[0] for r in runs)
+        summary[mode] = {"p50_s": seconds[len(seconds) // 2], "p95_s": seconds[int(len(seconds) * 0.95) - 1],
+                         "valid": sum(r[1] for r in runs), "tokens": sum(r[2] for r in runs) / len(runs)}
+    return summary
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Race K candidate generations, first valid wins.")
+    parser.add_argument("request", nargs="?")
+    parser.add_argument("--de-names", default="")
+    parser.add_argument("--k", type=int, default=CANDIDATES)
+    parser.add_argument("--budget", type=int, default=CANDIDATE_TOKENS, help="tokens for all candidates")
+    parser.add_argument("--bench", action="store_true",
+                        help="serial regenerate-until-valid against the race on the mock, per corpus request")
+    parser.add_argument("--latency", type=float, default=0.4)
+    parser.add_argument("--tps", type=float, default=250.0)
+    parser.add_argument("--slow-rate", type=float, default=0.2, help="share of mock calls that stall")
+    parser.add_argument("--slow", type=float, default=3.0, help="seconds a stalled call waits")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        from ampify.benchmark import CORPUS_PATH
+        from ampify.mock_groq import load_corpus
+
+        summary = bench(load_corpus(CORPUS_PATH), args.k, args.latency, args.tps,
+                        {"slow_rate": args.slow_rate, "slow": args.slow, "seed": 7})
+        for mode, s in summary.items():
+            print(f"{mode:<7} p50 {s['p50_s']:5.2f}s · p95 {s['p95_s']:5.2f}s · "
+                  f"{s['valid']} valid · {s['tokens']:,.0f} tokens per request")
+        return 0
+    if not args.request:
+        parser.error("give a request or --bench")
+    info = {}
+    winner, finished = race(args.request, args.de_names, args.k, args.budget, info)
+    for c in sorted(finished, key=lambda c: c.index):
+        print(f"candidate {c.index} (temperature {c.temperature}) {c.seconds:5.2f}s "
+              f"{c.tokens:>6} tokens  {', '.join(c.problems) or 'valid'}")
+    summary = info["candidates"]
+    print(f"{summary['cancelled']} cancelled · {summary['tokens']:,} tokens · {summary['seconds']:.2f}s")
+    if winner is None:
+        return 1
+    print(add_query_studio(winner.raw) if SINGLE_GENERATION else winner.raw)
+    return 0 if not winner.problems else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,421 @@
+import csv
+import difflib
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from ampify.cache import normalize_de_names
+from ampify.linter import ERROR, RULES, Violation, describe
+from ampify.tokenizer import column_refs, depths, table_refs, tokenize
+
+# ─────────────────────────────────────────
+# DATA EXTENSION CATALOG
+# DE definitions imported from Contact Builder / Email Studio exports, kept
+# in SQLite and indexed by lower-cased DE and field name. Only the DEs a
+# request names are put in the prompt, and every alias.column the generated
+# SQL reads from a catalogued DE is checked against its fields — exact case,
+# as SFMC_RULES requires:
+#   python -m ampify.catalog --import exports/*.csv
+#   python -m ampify.catalog --check query.sql
+#   python -m ampify.catalog --scale 5000
+# ─────────────────────────────────────────
+CATALOG_PATH = os.getenv("AMPIFY_CATALOG_PATH", ".ampify_catalog.sqlite3")
+SCHEMA_MEMORY = int(os.getenv("AMPIFY_CATALOG_MEMORY", "256"))     # DE schemas kept in memory
+PROMPT_FIELDS = int(os.getenv("AMPIFY_CATALOG_PROMPT_FIELDS", "60"))   # per DE
+
+Field = namedtuple("Field", "name type length key nullable")
+Schema = namedtuple("Schema", "name fields")
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS des ("
+    "lname TEXT PRIMARY KEY, name TEXT NOT NULL, source TEXT NOT NULL, imported REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS fields ("
+    "de TEXT NOT NULL, ordinal INTEGER NOT NULL, name TEXT NOT NULL, lname TEXT NOT NULL, "
+    "type TEXT NOT NULL, length TEXT NOT NULL, key INTEGER NOT NULL, nullable INTEGER NOT NULL, "
+    "PRIMARY KEY (de, ordinal))",
+    # Which DEs have a field — for --search and the field counts
+    "CREATE INDEX IF NOT EXISTS fields_lname ON fields(lname)",
+]
+
+# Export headers seen in the wild -> our column
+HEADERS = {
+    "de": ("data extension", "dataextension", "data extension name", "de", "de name", "dename",
+           "dataextensionname", "customerkey", "external key"),
+    "name": ("field", "field name", "fieldname", "name", "column"),
+    "type": ("type", "data type", "datatype", "field type", "fieldtype"),
+    "length": ("length", "maxlength", "max length", "scale"),
+    "key": ("primary key", "primarykey", "is primary key", "isprimarykey", "pk"),
+    "nullable": ("nullable", "isnullable", "is nullable"),
+    "required": ("required", "isrequired", "is required"),
+}
+TRUE = {"1", "true", "yes", "y", "x", "pk"}
+
+
+def _flag(value):
+    return str(value).strip().lower() in TRUE
+
+
+def _cell(row, at, want, default=""):
+    k = at[want]
+    return row[k].strip() if k is not None and k < len(row) else default
+
+
+def _column(headers, want):
+    # index of the export column holding `want`, or None
+    lowered = [h.strip().lower().lstrip("\ufeff") for h in headers]
+    return next((lowered.index(alias) for alias in HEADERS[want] if alias in lowered), None)
+
+
+# ─────────────────────────────────────────
+# PARSING EXPORTS
+# ─────────────────────────────────────────
+def parse_csv(text, default_de=""):
+    # -> ({de: [Field]}, "") or ({}, reason); one row per field, the DE from a
+    # "Data Extension" column or from the file name
+    rows = list(csv.reader(io.StringIO(text)))
+    if not rows:
+        return {}, "empty file"
+    at = {want: _column(rows[0], want) for want in HEADERS}
+    if at["name"] is None:
+        return {}, "no field name column (Name, Field Name)"
+    if at["de"] is None and not default_de:
+        return {}, "no Data Extension column and no DE name"
+    des = OrderedDict()
+    for row in rows[1:]:
+        field = _cell(row, at, "name")
+        if not field:
+            continue
+        if at["nullable"] is not None:
+            nullable = _flag(_cell(row, at, "nullable"))
+        else:
+            nullable = not _flag(_cell(row, at, "required"))
+        des.setdefault(_cell(row, at, "de") or default_de, []).append(Field(
+            field, _cell(row, at, "type") or "Text", _cell(row, at, "length"),
+            _flag(_cell(row, at, "key")), nullable))
+    return des, "" if des else "no fields"
+
+
+def _json_fields(items):
+    fields = []
+    for item in items:
+        get = {k.lower(): v for k, v in item.items()}.get
+        field = get("name") or get("fieldname") or get("field")
+        if not field:
+            continue
+        nullable = get("isnullable", get("nullable"))
+        if nullable is None:
+            nullable = not _flag(get("isrequired", get("required", False)))
+        fields.append(Field(str(field), str(get("type") or get("fieldtype") or get("datatype") or "Text"),
+                            str(get("maxlength") or get("length") or ""),
+                            _flag(get("isprimarykey", get("primarykey", get("pk", False)))),
+                            nullable if isinstance(nullable, bool) else _flag(nullable)))
+    return fields
+
+
+def parse_json(text, default_de=""):
+    # -> ({de: [Field]}, "") or ({}, reason); a DE {"name", "fields"}, a list
+    # of them, {"items": [...]} (REST), {de: [fields]} or a bare field list
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        return {}, f"not JSON: {e}"
+    if isinstance(data, dict) and "items" in data:
+        data = data["items"]
+    if isinstance(data, dict) and "fields" in data:
+        data = [data]
+    des = OrderedDict()
+    if isinstance(data, dict):
+        for de, items in data.items():
+            if isinstance(items, list):
+                des[de] = _json_fields(items)
+    elif isinstance(data, list) and data and all("fields" in d for d in data if isinstance(d, dict)):
+        for d in data:
+            de = d.get("name") or d.get("Name") or d.get("customerKey") or d.get("key")
+            if de:
+                des[str(de)] = _json_fields(d.get("fields") or [])
+    elif isinstance(data, list) and default_de:
+        des[default_de] = _json_fields(data)
+    des = OrderedDict((de, fields) for de, fields in des.items() if fields)
+    return des, "" if des else "no DE definitions found"
+
+
+def parse_export(text, filename):
+    base = os.path.splitext(os.path.basename(filename))[0]
+    if filename.lower().endswith(".json") or text.lstrip()[:1] in ("{", "["):
+        return parse_json(text, base)
+    return parse_csv(text, base)
+
+
+# ─────────────────────────────────────────
+# CATALOG
+# ─────────────────────────────────────────
+class Catalog:
+
+    def __init__(self, path=CATALOG_PATH, memory_size=SCHEMA_MEMORY):
+        self.memory_size = memory_size
+        self._memory = OrderedDict()        # lname -> Schema, LRU
+        self._names = {}                    # lname -> name, every DE
+        self._lock = threading.Lock()
+        try:
+            self._db = sqlite3.connect(path or ":memory:", timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            for statement in SCHEMA:
+                self._db.execute(statement)
+            self._db.commit()
+        except sqlite3.Error:
+            # Read-only filesystem — imports last for this process only
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+            for statement in SCHEMA:
+                self._db.execute(statement)
+        self._names = dict(self._db.execute("SELECT lname, name FROM des"))
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, de, fields, source=""):
+        # Replaces an earlier definition of the same DE
+        lname = de.lower()
+        with self._lock:
+            self._db.execute("DELETE FROM fields WHERE de = ?", (lname,))
+            self._db.execute("INSERT OR REPLACE INTO des (lname, name, source, imported) VALUES (?, ?, ?, ?)",
+                             (lname, de, source, time.time()))
+            self._db.executemany(
+                "INSERT INTO fields (de, ordinal, name, lname, type, length, key, nullable) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(lname, i, f.name, f.name.lower(), f.type, f.length, int(f.key), int(f.nullable))
+                 for i, f in enumerate(fields)])
+            self._db.commit()
+            self._names[lname] = de
+            self._memory.pop(lname, None)
+
+    def import_text(self, text, filename):
+        # -> ([(de, field count)], "") or ([], reason)
+        des, reason = parse_export(text, filename)
+        for de, fields in des.items():
+            self.add(de, fields, os.path.basename(filename))
+        return [(de, len(fields)) for de, fields in des.items()], reason
+
+    def import_file(self, path):
+        with open(path, encoding="utf-8-sig") as f:
+            return self.import_text(f.read(), path)
+
+    def get(self, de):
+        # -> Schema or None; DE names match in any case, field names exactly
+        lname = de.split(".")[-1].strip("[]").lower()
+        with self._lock:
+            if lname in self._memory:
+                self._memory.move_to_end(lname)
+                return self._memory[lname]
+            if lname not in self._names:
+                return None
+            rows = self._db.execute("SELECT name, type, length, key, nullable FROM fields "
+                                    "WHERE de = ? ORDER BY ordinal", (lname,)).fetchall()
+            schema = Schema(self._names[lname], [Field(n, t, ln, bool(k), bool(nl)) for n, t, ln, k, nl in rows])
+            self._memory[lname] = schema
+            if len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+            return schema
+
+    def referenced(self, user_request="", custom_de_names=""):
+        # -> [Schema] for the DEs listed in Step 2 or named in the request
+        names = normalize_de_names(custom_de_names)
+        names += [w for w in re.findall(r"[A-Za-z_][\w]*", user_request) if w.lower() in self._names]
+        out = []
+        for de in dict.fromkeys(n.lower() for n in names):
+            schema = self.get(de)
+            if schema is not None:
+                out.append(schema)
+        return out
+
+    def search(self, field, limit=50):
+        # -> [(de, field)] whose field name starts with `field`, any case
+        low = field.lower()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT d.name, f.name FROM fields f JOIN des d ON d.lname = f.de "
+                "WHERE f.lname >= ? AND f.lname < ? ORDER BY f.lname, d.name LIMIT ?",
+                (low, low + "\uffff", limit)).fetchall()
+        return rows
+
+    def stats(self):
+        with self._lock:
+            fields = self._db.execute("SELECT COUNT(*) FROM fields").fetchone()[0]
+        return {"des": len(self._names), "fields": fields}
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_catalog():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Catalog()
+        return _default
+
+
+def use_catalog(catalog):
+    global _default
+    with _default_lock:
+        _default = catalog
+
+
+# ─────────────────────────────────────────
+# PROMPT + COLUMN CHECK
+# ─────────────────────────────────────────
+def describe_field(field):
+    text = f"{field.name} {field.type}" + (f"({field.length})" if field.length else "")
+    return text + (" PK" if field.key else "")
+
+
+def prompt_block(user_request, custom_de_names="", catalog=None):
+    # Fields of the referenced DEs for the system prompt, or ""
+    schemas = (catalog or get_catalog()).referenced(user_request, custom_de_names)
+    if not schemas:
+        return ""
+    lines = ["DATA EXTENSION FIELDS (use exactly these names and this case — no other columns exist):"]
+    for schema in schemas:
+        fields = ", ".join(describe_field(f) for f in schema.fields[:PROMPT_FIELDS])
+        more = len(schema.fields) - PROMPT_FIELDS
+        lines.append(f"- {schema.name}: {fields}" + (f" (+{more} more)" if more > 0 else ""))
+    return "\n".join(lines)
+
+
+def suggest(column, fields, n=3):
+    # Near misses: the same name in another case, else close spellings and
+    # fields that contain it (Tier -> LoyaltyTier)
+    low = column.lower()
+    exact = [f for f in fields if f.lower() == low]
+    if exact:
+        return exact
+    by_lower = {f.lower(): f for f in fields}
+    close = [by_lower[c] for c in difflib.get_close_matches(low, list(by_lower), n=n, cutoff=0.6)]
+    contains = [f for f in fields if len(low) >= 3 and (low in f.lower() or f.lower() in low)]
+    return list(dict.fromkeys(close + contains))[:n]
+
+
+def check_columns(sql, catalog=None):
+    # -> [Violation] for alias.column references to catalogued DEs where the
+    # DE has no field with exactly that name
+    catalog = catalog or get_catalog()
+    if not sql or not len(catalog):
+        return []
+    tokens = tokenize(sql)
+    levels = depths(tokens)
+    schemas = {}
+    for ref in table_refs(tokens, levels):
+        schema = catalog.get(ref.table) if ref.table else None
+        if schema is not None:
+            schemas[(ref.alias or ref.table.split(".")[-1].strip("[]")).lower()] = schema
+    found = []
+    for alias, column, at in column_refs(tokens):
+        schema = schemas.get(alias.lower())
+        if schema is None:
+            continue
+        fields = [f.name for f in schema.fields]
+        if column in fields:
+            continue
+        hints = suggest(column, fields)
+        detail = f"{alias}.{column} — {schema.name} has " + (
+            " or ".join(hints) if hints else "no such field")
+        found.append(Violation("SFMC017", ERROR, f"{RULES['SFMC017']} ({detail})",
+                               (tokens[at].start, tokens[at + 2].end)))
+    return found
+
+
+# ─────────────────────────────────────────
+# SCALE CHECK — lookups with thousands of DEs
+# ─────────────────────────────────────────
+def bench_catalog(n, fields=40, queries=2000, log=print):
+    import random
+
+    catalog = Catalog("")
+    rng = random.Random(3)
+    words = ["Email", "First", "Last", "Name", "Date", "Key", "Status", "Country", "Order", "Total",
+             "Points", "Tier", "Store", "Product", "Category", "Phone", "City", "Opt", "In", "Source"]
+    started = time.perf_counter()
+    for i in range(n):
+        columns = ["SubscriberKey"] + list(dict.fromkeys(
+            "".join(rng.sample(words, 2)) for _ in range(fields)))
+        catalog.add(f"DE_{i}_{rng.choice(words)}",
+                    [Field(c, "Text", "100", c == "SubscriberKey", c != "SubscriberKey") for c in columns])
+    stats = catalog.stats()
+    log(f"imported {stats['des']:,} DEs, {stats['fields']:,} fields in {time.perf_counter() - started:.1f}s")
+    names = list(catalog._names.values())
+    timings = {"prompt": [], "check": []}
+    for _ in range(queries):
+        a, b = rng.sample(names, 2)
+        start = time.perf_counter()
+        prompt_block(f"Subscribers in {a} who are not in {b}", "", catalog)
+        timings["prompt"].append((time.perf_counter() - start) * 1e6)
+        sql = (f"SELECT d.SubscriberKey, d.EmailFirst, x.statusName FROM {a} d "
+               f"LEFT JOIN {b} x ON x.SubscriberKey = d.SubscriberKey WHERE x.SubscriberKey IS NULL")
+        start = time.perf_counter()
+        check_columns(sql, catalog)
+        timings["check"].append((time.perf_counter() - start) * 1e6)
+    report = {"des": stats["des"], "fields": stats["fields"]}
+    for label, values in timings.items():
+        values.sort()
+        report[label] = (values[len(values) // 2], values[int(len(values) * 0.99) - 1])
+    return report
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Data Extension schema catalog.")
+    parser.add_argument("--import", dest="files", nargs="+", default=[], help="CSV or JSON DE exports")
+    parser.add_argument("--show", help="print a DE's fields")
+    parser.add_argument("--search", help="DEs with a field starting with this")
+    parser.add_argument("--check", help="check the columns a SQL file reads from catalogued DEs")
+    parser.add_argument("--scale", type=int, default=0, help="lookup and check time with this many DEs")
+    parser.add_argument("--path", default=CATALOG_PATH)
+    args = parser.parse_args(argv)
+
+    if args.scale:
+        report = bench_catalog(args.scale)
+        for label in ("prompt", "check"):
+            p50, p99 = report[label]
+            print(f"  {label:<7} p50 {p50:6.0f} µs · p99 {p99:6.0f} µs")
+        return 0
+    catalog = Catalog(args.path)
+    failed = False
+    for path in args.files:
+        imported, reason = catalog.import_file(path)
+        if not imported:
+            print(f"{path}: {reason}")
+            failed = True
+        for de, count in imported:
+            print(f"{path}: {de} ({count} fields)")
+    if args.show:
+        schema = catalog.get(args.show)
+        if schema is None:
+            print(f"{args.show} is not in the catalog")
+            return 1
+        for f in schema.fields:
+            print(f"  {describe_field(f)}{'' if f.nullable else ' NOT NULL'}")
+    if args.search:
+        for de, field in catalog.search(args.search):
+            print(f"  {de}.{field}")
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            sql = f.read()
+        violations = check_columns(sql, catalog)
+        for v in violations:
+            print(describe(sql, v))
+        failed |= bool(violations)
+    if not (args.files or args.show or args.search or args.check):
+        stats = catalog.stats()
+        print(f"{stats['des']:,} DEs, {stats['fields']:,} fields in {args.path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import json
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+
+from ampify.cache import normalize_de_names
+from ampify.dataviews import DATA_VIEWS
+from ampify.similarity import stem
+
+# ─────────────────────────────────────────
+# REQUEST CLASSIFIER
+# Decides before any API call whether a request is about SFMC data:
+#   sfmc        data views, subscribers, sends, DEs — goes to the model
+#   ambiguous   no clear signal either way (plain SQL) — goes to the model
+#   off_topic   code, recipes, weather, stories — rejected locally
+# Words are stemmed and looked up in one weight table; phrases, DE-style
+# names and time windows are matched by regexes compiled at import. The
+# score is the sum of the weights of the distinct words and phrases found:
+#   python -m ampify.classifier --eval
+#   python -m ampify.classifier "Write a python script to parse a CSV"
+# ─────────────────────────────────────────
+ACCEPT = float(os.getenv("AMPIFY_CLASSIFIER_ACCEPT", "2"))      # score at or above: sfmc
+REJECT = float(os.getenv("AMPIFY_CLASSIFIER_REJECT", "-2"))     # score at or below: off_topic
+BIAS = -1.0                 # a request has to name something SFMC-like to be accepted
+
+SFMC, AMBIGUOUS, OFF_TOPIC = "sfmc", "ambiguous", "off_topic"
+
+Verdict = namedtuple("Verdict", "label score evidence")
+
+# Stemmed words -> weight
+CODE = ("python javascript java react typescript kotlin rust golang php ruby html css node "
+        "nodej django flask kubernet docker bash powershell c++")
+WEIGHTS = {}
+for words, weight in (
+    # SFMC objects and tracking events
+    ("sfmc journey subscriberkey subscriberid jobid listid batchid emailaddress emailname "
+     "de sendable suppression suppress smtp unsubscrib unsub bounc bouncer complaint "
+     "opener clicker open click sent send sends subscriber subscribers automation "
+     "triggered sendlog dataview unengag reengag", 3),
+    # Audiences and campaigns
+    ("contact customer member recipient email emails campaign segment newsletter list "
+     "webinar registrant attendees engag inactive active lapsed churn welcome renewal loyalty purchases order signup "
+     "opt optin optout preference consent domain fatigue sunset birthday abandon cart "
+     "lead vip held status exclud enrollment", 1.5),
+    # Asking for data
+    ("who whose without never not dedupe deduplicat duplicate count number per report summary "
+     "latest first recent past last days week weeks month months yesterday "
+     "rate unique table record row rows column select join sql query", 0.5),
+    # Languages and frameworks — also course, product and list names, so on
+    # their own they never reject a request
+    (CODE, -1.5),
+    # Chat and everything else
+    ("recipe weather forecast movi film story poem haiku limerick song lyric joke essay translat bake cook calori workout "
+     "horoscope chess guitar homework physic math integral planet trip vacation president "
+     "symptom pizza menu vegan dinner stock stocks crypto letter linkedin tire book football soccer "
+     "basketball sport mom dad wife husband kids", -4),
+    ("script function program code class compon interfac websit server app install debug "
+     "error exception compil meaning explain teach plan ideas recommend summariz plot draft party", -1.5),
+):
+    for word in words.split():
+        WEIGHTS[stem(word)] = weight
+
+CODE_STEMS = {stem(word) for word in CODE.split()}
+
+# Phrases and shapes the word table cannot see
+PATTERNS = [(re.compile(p, re.I), w) for p, w in (
+    (r"\bdata ?extensions?\b", 4),
+    (r"\b(query|automation|email) studio\b", 4),
+    (r"\bmarketing cloud\b", 4),
+    (r"\b(all|master) subscribers\b", 3),
+    (r"\b_(" + "|".join(v[1:] for v in DATA_VIEWS) + r")\b", 5),
+    (r"\b(last|past|next|previous) (\d+|one|two|three|six|few) (days?|weeks?|months?|hours?)\b", 1.5),
+    (r"\b(this|last) (week|month|quarter|year)\b", 1),
+    (r"\bwrite (me )?(a|an|some) (short )?(story|poem|song|essay|haiku|limerick|letter|post)\b", -6),
+    (r"\b(tell|give) me (a|some) (joke|recipe|ideas?)\b", -6),
+    (r"\bhow (do|can) i (install|bake|cook|learn|change|center)\b", -4),
+    (r"\b(what|who) (is|are|won) (the )?(capital|president|meaning|symptoms|best)\b", -4),
+    (r"\bwhat time is it\b", -4),
+    (r"\bwhat(?:'s| is) a good (name|gift|book|movie|place|way to)\b", -4),
+    (r"\btell me about (the )?(history|life|origins?|story) of\b", -4),
+    (r"\b(write|create|generate|build|fix|debug) (me )?(a |an |this |my )?"
+     r"(python|javascript|java|c\+\+|rust|go|typescript|bash|node\.js|react|django|html)\b", -6),
+)]
+# CamelCase or snake_case names (JavaUsers, Python_Course_Signups) are DEs,
+# never the words inside them
+NAME_RE = re.compile(r"\b(?:[A-Z][a-z0-9]+[A-Z]\w*|[A-Za-z]\w*_\w+)\b")
+NAME_WEIGHT = 2.0
+# Title-case phrases after a lowercase word ("the Guitar Masterclass list")
+# name a course, product or list
+TITLE_RE = re.compile(r"(?<=[a-z0-9,] )[A-Z][a-z]+(?: [A-Z][a-z]+)+")
+WORD_RE = re.compile(r"[a-z0-9+#]+")
+
+
+def classify(request, de_names=""):
+    # -> Verdict(label, score, evidence); evidence is [(term, weight)]
+    names = {name for name in NAME_RE.findall(request) if stem(name.lower()) not in WEIGHTS}
+    names |= set(normalize_de_names(de_names))
+    evidence = [(name, NAME_WEIGHT) for name in sorted(names) if name in request]
+    text = request
+    for name in names:
+        text = text.replace(name, " ")
+    # ...so the off-topic words inside them count for nothing
+    for phrase in TITLE_RE.findall(text):
+        if any(WEIGHTS.get(stem(word), 0) < 0 for word in phrase.lower().split()):
+            evidence.append((phrase, 0.0))
+            text = text.replace(phrase, " ")
+    for pattern, weight in PATTERNS:
+        found = pattern.search(text)
+        if found:
+            evidence.append((found.group(0).lower(), weight))
+    seen = set()
+    for word in WORD_RE.findall(text.lower()):
+        key = stem(word)
+        if key in WEIGHTS and key not in seen:
+            seen.add(key)
+            evidence.append((word, WEIGHTS[key]))
+    score = BIAS + sum(weight for _, weight in evidence)
+    if de_names.strip():
+        score += NAME_WEIGHT
+    label = SFMC if score >= ACCEPT else OFF_TOPIC if score <= REJECT else AMBIGUOUS
+    # "Product is Python Course": language names alone are values, only a
+    # code-request shape or another off-topic word rejects
+    if label == OFF_TOPIC and all(weight >= 0 or stem(term) in CODE_STEMS for term, weight in evidence):
+        label = AMBIGUOUS
+    return Verdict(label, score, evidence)
+
+
+# ─────────────────────────────────────────
+# EVALUATION — labeled requests in golden/classifier.jsonl
+#   sfmc and ambiguous must reach the model, off_topic must be rejected
+# ─────────────────────────────────────────
+EVAL_PATH = os.path.join(os.path.dirname(__file__), "golden", "classifier.jsonl")
+# The substring list validate() used before the classifier, for comparison
+# The eval fails on any false reject, or on more false accepts than this
+FALSE_ACCEPT_TOLERANCE = 0.02
+LEGACY_OFF = ["python", "javascript", "react", "recipe", "weather", "movie", "java ", "c++", "write a story"]
+
+
+def evaluate(cases, log=print):
+    counts = {"off_topic": 0, "in_domain": 0, "false_accept": 0, "false_reject": 0, "ambiguous": 0,
+              "avoided": 0, "legacy_avoided": 0, "legacy_false_reject": 0}
+    timings = []
+    for case in cases:
+        start = time.perf_counter()
+        verdict = classify(case["request"], case.get("de_names", ""))
+        timings.append((time.perf_counter() - start) * 1e6)
+        rejected = verdict.label == OFF_TOPIC
+        legacy = any(k in case["request"].lower() for k in LEGACY_OFF)
+        counts["ambiguous"] += verdict.label == AMBIGUOUS
+        if case["label"] == OFF_TOPIC:
+            counts["off_topic"] += 1
+            counts["avoided"] += rejected
+            counts["false_accept"] += not rejected
+            counts["legacy_avoided"] += legacy
+            ok = rejected
+        else:
+            counts["in_domain"] += 1
+            counts["false_reject"] += rejected
+            counts["legacy_false_reject"] += legacy
+            ok = not rejected
+        log(f"{'ok  ' if ok else 'FAIL'} {verdict.label:<9} {verdict.score:5.1f}  {case['request']}")
+    timings.sort()
+    return {
+        "false_accept_rate": round(counts["false_accept"] / max(counts["off_topic"], 1), 3),
+        "false_reject_rate": round(counts["false_reject"] / max(counts["in_domain"], 1), 3),
+        "p50_us": round(timings[len(timings) // 2], 1), "p99_us": round(timings[int(len(timings) * 0.99) - 1], 1),
+        **counts,
+    }
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Classify requests before they reach the model.")
+    parser.add_argument("request", nargs="?", help="show the verdict and the terms behind it")
+    parser.add_argument("--de-names", default="")
+    parser.add_argument("--eval", action="store_true", help="false-accept and false-reject rates on the labeled set")
+    parser.add_argument("--quiet", action="store_true", help="only the summary")
+    args = parser.parse_args(argv)
+
+    if args.request:
+        verdict = classify(args.request, args.de_names)
+        print(f"{verdict.label} ({verdict.score:.1f})")
+        for term, weight in verdict.evidence:
+            print(f"  {weight:+5.1f}  {term}")
+        return 0
+    with open(EVAL_PATH, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    report = evaluate(cases, log=(lambda *a: None) if args.quiet else print)
+    print(f"false accept {report['false_accept_rate']:.1%} ({report['false_accept']}/{report['off_topic']}) · "
+          f"false reject {report['false_reject_rate']:.1%} ({report['false_reject']}/{report['in_domain']}) · "
+          f"{report['ambiguous']} ambiguous")
+    print(f"model calls avoided {report['avoided']}/{report['off_topic']} "
+          f"(substring list: {report['legacy_avoided']}, with {report['legacy_false_reject']} false rejects) · "
+          f"p50 {report['p50_us']:.0f} µs · p99 {report['p99_us']:.0f} µs")
+    # A false reject loses a real request; a false accept only costs a model call
+    return 1 if report["false_reject"] or report["false_accept_rate"] > FALSE_ACCEPT_TOLERANCE else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,591 @@
+import hashlib
+import os
+import re
+import time
+
+from groq import Groq
+
+from ampify.cache import get_cache, make_cache_key
+from ampify.catalog import check_columns, prompt_block
+from ampify.classifier import OFF_TOPIC, classify
+from ampify.knowledge import assemble_prompt, estimate_tokens
+from ampify.linter import ERROR, describe, has_errors, lint
+from ampify.patterns import local_answer
+from ampify.resilient import FALLBACK_MODELS, GroqUnavailable, ResilientClient
+from ampify.rewriter import optimize
+from ampify.similarity import SIMILAR, get_similar_cache
+from ampify.singleflight import get_dispatcher
+from ampify.transform import add_query_studio, derive_query_studio
+
+# ─────────────────────────────────────────
+# GROQ CLIENT — created lazily so importing this module has no side effects
+# ─────────────────────────────────────────
+MODEL = "llama-3.3-70b-versatile"
+# Send only the SFMC_RULES chunks relevant to each request
+RETRIEVAL = os.getenv("AMPIFY_RETRIEVAL", "1") == "1"
+# Ask only for the Automation Studio SQL; the Query Studio version is derived locally
+SINGLE_GENERATION = os.getenv("AMPIFY_SINGLE_GENERATION", "1") == "1"
+# Run the rule-based optimizer over the Automation Studio SQL
+REWRITE = os.getenv("AMPIFY_REWRITE", "1") == "1"
+# Re-request only the sections a truncated or malformed answer is missing
+PARTIAL = os.getenv("AMPIFY_PARTIAL", "1") == "1"
+
+_client = None
+_client_key = None
+
+
+def configure(api_key):
+    # Called by app.py with the Streamlit secret; CLIs fall back to GROQ_API_KEY
+    global _client, _client_key
+    if api_key != _client_key or _client is None:
+        # Retries live in ResilientClient, so the SDK's own are turned off
+        _client = ResilientClient(Groq(api_key=api_key, max_retries=0), [MODEL] + FALLBACK_MODELS)
+        _client_key = api_key
+
+
+def get_client():
+    if _client is None:
+        configure(os.getenv("GROQ_API_KEY", ""))
+    return _client
+
+
+# ─────────────────────────────────────────
+# SFMC KNOWLEDGE BASE
+# ─────────────────────────────────────────
+SFMC_RULES = """
+You are an expert Salesforce Marketing Cloud (SFMC) SQL specialist.
+ONLY answer SFMC SQL queries. For anything else say:
+"AMPify only handles SFMC SQL queries."
+
+UNIVERSAL RULES — never break these:
+- NEVER SELECT * — always name every column
+- NEVER use #temp tables, @variables, stored procedures
+- NEVER use DDL (CREATE, DROP, ALTER, TRUNCATE)
+- NEVER write INSERT INTO, UPDATE, DELETE
+- NEVER use LIMIT — use TOP N
+- NEVER use NOW() or CURRENT_DATE — use GETDATE()
+- NEVER use TRUE/FALSE — use 1 or 0
+- Field names are case-sensitive — match exactly
+- Data views hold ONLY last 6 months of data
+
+QUERY STUDIO:
+- Always add TOP 100 — read-only preview, nothing saved to DE
+- No UNION/UNION ALL, no correlated subqueries, no ORDER BY without TOP
+
+AUTOMATION STUDIO:
+- No row limit — results auto-written to target DE
+- Just SELECT — no INSERT INTO needed
+- Supports CTEs, subqueries, UNION ALL
+- Comment: -- Target DE: [name]
+- Actions: Append | Update | Overwrite
+
+ENT. PREFIX: Required from child BU only. _Job is BU-specific (no subscriber data).
+
+CRITICAL JOIN PATTERN — always use all 4 keys:
+    ON  a.JobID = b.JobID AND a.ListID = b.ListID
+    AND a.BatchID = b.BatchID AND a.SubscriberID = b.SubscriberID
+    AND b.IsUnique = 1   ← always in JOIN, NEVER in WHERE
+
+DATA VIEWS:
+_Sent           : SubscriberKey, SubscriberID, JobID, ListID, BatchID, EventDate
+_Open           : AccountID, SubscriberKey, SubscriberID, JobID, ListID, BatchID, EventDate, Domain, IsUnique
+_Click          : AccountID, SubscriberKey, SubscriberID, JobID, ListID, BatchID, EventDate, URL, LinkName, IsUnique
+_Bounce         : AccountID, SubscriberKey, SubscriberID, JobID, ListID, BatchID, EventDate, BounceCategory, BounceSubcategory, SMTPBounceReason, Domain, IsUnique
+_Unsubscribe    : AccountID, SubscriberKey, SubscriberID, JobID, ListID, BatchID, EventDate, IsUnique
+_Complaint      : AccountID, SubscriberKey, SubscriberID, JobID, ListID, BatchID, EventDate
+_Job            : JobID, EmailID, EmailName, EmailSubject, FromName, FromEmail, DeliveredTime, SchedTime, CreatedDate
+_Subscribers    : SubscriberKey, SubscriberID, EmailAddress, Status, DateCreated, DateUnsubscribed
+ENT._EnterpriseAttribute : _SubscriberID + profile attributes — join on SubscriberID = _SubscriberID
+_ListSubscribers : SubscriberKey, SubscriberID, ListID, Status, DateUnsubscribed
+_JourneyActivity : VersionID, ActivityID, ActivityName, ActivityType, SubscriberKey, EventDate
+_BusinessUnitUnsubscribes : SubscriberKey, DateUnsubscribed, BusinessUnitID
+
+DATE: GETDATE() | DATEADD(day,-30,GETDATE()) | DATEDIFF(day,Field,GETDATE()) | CONVERT(DATE,Field) | CONVERT(VARCHAR,Field,101)
+STRING: Field1+' '+Field2 | LEN() | UPPER() | LOWER() | SUBSTRING() | REPLACE() | ISNULL() | COALESCE()
+
+PROVEN PATTERNS TO REUSE:
+1. Unengaged (no opens or clicks):
+SELECT DISTINCT s.SubscriberKey, j.EmailName
+FROM _Sent s INNER JOIN _Job j ON s.JobID=j.JobID
+LEFT JOIN _Open o ON s.JobID=o.JobID AND s.ListID=o.ListID AND s.BatchID=o.BatchID AND s.SubscriberID=o.SubscriberID AND o.IsUnique=1
+LEFT JOIN _Click c ON s.JobID=c.JobID AND s.ListID=c.ListID AND s.BatchID=c.BatchID AND s.SubscriberID=c.SubscriberID AND c.IsUnique=1
+WHERE s.EventDate>=DATEADD(day,-30,GETDATE()) AND o.SubscriberID IS NULL AND c.SubscriberID IS NULL
+
+2. Full tracking:
+SELECT s.SubscriberKey,j.EmailName,s.EventDate AS SentDate,o.EventDate AS OpenDate,
+c.EventDate AS ClickDate,b.EventDate AS BounceDate,b.BounceCategory,u.EventDate AS UnsubscribeDate
+FROM _Sent s INNER JOIN _Job j ON s.JobID=j.JobID
+LEFT JOIN _Open o ON s.JobID=o.JobID AND s.ListID=o.ListID AND s.BatchID=o.BatchID AND s.SubscriberID=o.SubscriberID AND o.IsUnique=1
+LEFT JOIN _Click c ON s.JobID=c.JobID AND s.ListID=c.ListID AND s.BatchID=c.BatchID AND s.SubscriberID=c.SubscriberID AND c.IsUnique=1
+LEFT JOIN _Bounce b ON s.JobID=b.JobID AND s.ListID=b.ListID AND s.BatchID=b.BatchID AND s.SubscriberID=b.SubscriberID AND b.IsUnique=1
+LEFT JOIN _Unsubscribe u ON s.JobID=u.JobID AND s.ListID=u.ListID AND s.BatchID=u.BatchID AND s.SubscriberID=u.SubscriberID AND u.IsUnique=1
+
+3. Suppression: SELECT m.SubscriberKey,m.EmailAddress FROM MasterDE m LEFT JOIN SuppressionDE s ON m.EmailAddress=s.EmailAddress WHERE s.EmailAddress IS NULL
+4. Active openers never clicked: SELECT DISTINCT o.SubscriberKey FROM _Open o INNER JOIN _Subscribers sub ON o.SubscriberKey=sub.SubscriberKey LEFT JOIN _Click c ON o.JobID=c.JobID AND o.ListID=c.ListID AND o.BatchID=c.BatchID AND o.SubscriberID=c.SubscriberID AND c.IsUnique=1 WHERE o.EventDate>=DATEADD(day,-30,GETDATE()) AND o.IsUnique=1 AND c.SubscriberID IS NULL AND sub.Status='Active'
+
+PLACEHOLDER DE NAMES: CustomerMaster | EmailEngagement | GlobalSuppression | RenewalCandidates | TrackingLog | JourneyEntrants
+"""
+
+# Similar answers are only reused under the same model, rules and output format
+RULES_VERSION = hashlib.sha256(
+    f"{MODEL}|{SINGLE_GENERATION}|{SFMC_RULES}".encode("utf-8")
+).hexdigest()[:16]
+
+
+# ─────────────────────────────────────────
+# FUNCTIONS
+# ─────────────────────────────────────────
+def describe_des(custom_de_names):
+    if custom_de_names.strip():
+        return f"User's Data Extension names:\n{custom_de_names}"
+    return "No DE names given — suggest appropriate placeholder names."
+
+
+def build_prompt(user_request, custom_de_names=""):
+    de_context = describe_des(custom_de_names)
+    if SINGLE_GENERATION:
+        return f"""
+User Request: {user_request}
+{de_context}
+
+Generate the Automation Studio SQL only — the Query Studio preview is derived from it.
+Use EXACTLY this format — nothing outside the markers:
+
+---AS_START---
+-- 🚀 AUTOMATION STUDIO VERSION | Production | Full Dataset
+-- Target DE: [suggest name]
+[full production sql, correct 4-key joins, IsUnique=1 in JOIN not WHERE]
+---AS_END---
+---EXP_START---
+[2-3 plain English sentences: what it does, key logic, any warnings]
+---EXP_END---
+"""
+    return f"""
+User Request: {user_request}
+{de_context}
+
+Generate TWO SQL versions. Use EXACTLY this format — nothing outside the markers:
+
+---QS_START---
+-- ⚡ QUERY STUDIO VERSION | Test Only | Max 100 Rows
+[clean sql with TOP 100, all Query Studio rules applied]
+---QS_END---
+---AS_START---
+-- 🚀 AUTOMATION STUDIO VERSION | Production | Full Dataset
+-- Target DE: [suggest name]
+[full production sql, correct 4-key joins, IsUnique=1 in JOIN not WHERE]
+---AS_END---
+---EXP_START---
+[2-3 plain English sentences: what it does, key logic, any warnings]
+---EXP_END---
+"""
+
+
+def system_prompt(user_request, custom_de_names="", info=None):
+    # The catalogued fields of the DEs in play go in the system prompt, so a
+    # schema import also changes the cache key
+    fields = prompt_block(user_request, custom_de_names)
+    if not RETRIEVAL:
+        return SFMC_RULES + (f"\n{fields}\n" if fields else "")
+    prompt, stats = assemble_prompt(SFMC_RULES, user_request, custom_de_names)
+    if fields:
+        prompt += f"\n{fields}\n"
+        stats["catalog_tokens"] = estimate_tokens(fields)
+    if info is not None:
+        info["prompt"] = stats
+    return prompt
+
+
+def build_messages(user_request, custom_de_names="", info=None):
+    return [
+        {"role": "system", "content": system_prompt(user_request, custom_de_names, info)},
+        {"role": "user", "content": build_prompt(user_request, custom_de_names)}
+    ]
+
+
+def is_complete(raw):
+    # Only cache well-formed answers — refusals and truncations should be retried
+    return "---QS_START---" in raw and "---AS_END---" in raw
+
+
+def cache_key(user_request, custom_de_names=""):
+    # Keyed on the system prompt actually sent, so rule edits invalidate entries
+    return make_cache_key(user_request, custom_de_names, MODEL,
+                          system_prompt(user_request, custom_de_names))
+
+
+def answer_locally(user_request, custom_de_names="", info=None):
+    # Common requests are rendered from the proven patterns without calling Groq
+    local = local_answer(user_request, custom_de_names)
+    if local is None:
+        return None
+    qs, as_, exp, match = local
+    if info is not None:
+        info["source"] = "local"
+        info["intent"] = match.intent
+    return format_response(qs, as_, exp)
+
+
+def cached_answer(user_request, custom_de_names="", info=None):
+    # Everything that can be answered without an API call: local patterns,
+    # then the response cache (temperature 0.1 makes repeats effectively identical),
+    # then a paraphrase of an earlier request with its slots rewritten
+    raw = answer_locally(user_request, custom_de_names, info)
+    if raw is not None:
+        return raw
+    cached = get_cache().get(cache_key(user_request, custom_de_names))
+    if info is not None:
+        info["cache"] = "hit" if cached is not None else "miss"
+    if cached is not None or not SIMILAR:
+        return cached
+    similar = get_similar_cache().lookup(user_request, custom_de_names, RULES_VERSION)
+    if similar is None:
+        return None
+    if info is not None:
+        info["cache"] = "similar"
+        info["similarity"] = round(similar[1], 3)
+    return similar[0]
+
+
+def remember(user_request, custom_de_names, raw, key=None):
+    # A complete answer goes into the response cache and the similarity index
+    get_cache().set(key or cache_key(user_request, custom_de_names), raw)
+    if SIMILAR:
+        get_similar_cache().remember(user_request, custom_de_names, raw, RULES_VERSION)
+
+
+def record_call(info, started, usage=None, ttft=None):
+    # Groq call metadata for ampify.metrics — model, wall time, TTFT, tokens
+    if info is None:
+        return
+    info["model"] = info.get("path", {}).get("model") or MODEL
+    info["groq_s"] = round(time.perf_counter() - started, 3)
+    if ttft is not None:
+        info["ttft_s"] = round(ttft, 3)
+    if usage is not None:
+        info["usage"] = {"prompt_tokens": usage.prompt_tokens,
+                         "completion_tokens": usage.completion_tokens}
+
+
+def upstream(user_request, custom_de_names, key):
+    # The work for one single-flight Groq call: every chunk is pushed to the
+    # flight, which fans it out to all sessions waiting on the same key
+    def work(flight):
+        info = flight.meta
+        started = time.perf_counter()
+        stream = get_client().stream(
+            build_messages(user_request, custom_de_names, info),
+            info,
+            temperature=0.1
+        )
+        raw = ""
+        derived = not SINGLE_GENERATION
+        ttft = usage = None
+        for chunk in stream:
+            if flight.abandoned:
+                # Nobody is reading any more — stop paying for tokens
+                stream.close()
+                break
+            # Groq reports usage on the last chunk under x_groq
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                usage = x_groq.usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - started
+            seen = len(raw)
+            raw += delta
+            at = -1 if derived else raw.find("---AS_END---", max(seen - len("---AS_END---"), 0))
+            if at < 0:
+                flight.push(delta)
+                continue
+            # Splice the derived QS section in right after ---AS_END--- so the UI
+            # shows the Query Studio tab before the explanation has streamed
+            at += len("---AS_END---")
+            merged = add_query_studio(raw[:at])
+            flight.push(raw[seen:at] + merged[at:] + raw[at:])
+            raw = merged + raw[at:]
+            derived = True
+        record_call(info, started, usage, ttft)
+        # Answers from a fallback model are shown but not cached under the primary's key
+        if is_complete(raw) and not info["path"]["fallback"]:
+            remember(user_request, custom_de_names, raw, key)
+    return work
+
+
+def stream_sfmc_sql(user_request, custom_de_names="", info=None, cancel=None):
+    # Yields text as Groq produces it; identical concurrent requests share
+    # one call (info["session"] scopes the queue fairness and rate limits).
+    # Setting the `cancel` event stops the stream, and the Groq call too when
+    # no other session is following it
+    raw = cached_answer(user_request, custom_de_names, info)
+    if raw is not None:
+        yield raw
+        return
+    yield from upstream_sfmc_sql(user_request, custom_de_names, info, cancel)
+
+
+def upstream_sfmc_sql(user_request, custom_de_names="", info=None, cancel=None):
+    # stream_sfmc_sql without the cache lookup, for callers that already did it
+    info = {} if info is None else info
+    key = cache_key(user_request, custom_de_names)
+    flight, joined = get_dispatcher().submit(
+        key, info.get("session"), upstream(user_request, custom_de_names, key)
+    )
+    if joined:
+        info["coalesced"] = True
+    try:
+        yield from flight.follow(cancel)
+    finally:
+        get_dispatcher().leave(flight)
+        # Call metadata belongs to the session that started the flight
+        if not joined:
+            info.update(flight.meta)
+
+
+def generate_sfmc_sql(user_request, custom_de_names="", info=None):
+    return "".join(stream_sfmc_sql(user_request, custom_de_names, info))
+
+
+# ─────────────────────────────────────────
+# SECTIONS — parsing and partial regeneration
+# ─────────────────────────────────────────
+SECTIONS = ("qs", "as", "exp")
+MARKER_RE = re.compile(r"-{3,}\s*(QS|AS|EXP)_(START|END)\s*-{3,}")
+FENCE_RE = re.compile(r"^```[\w-]*[ \t]*\n?|\n?```[ \t]*$")
+# Problems that need the section written again; "fenced" and "unclosed"
+# (the next section started without an END marker) are fixed locally
+REGENERATE = {"missing", "unterminated", "empty"}
+# Output budget for one re-requested section, against ~900 for a full answer
+SECTION_TOKENS = {"qs": 600, "as": 700, "exp": 160}
+SECTION_FORMAT = {
+    "qs": ("Query Studio", "-- ⚡ QUERY STUDIO VERSION | Test Only | Max 100 Rows\n"
+                           "[clean sql with TOP 100, all Query Studio rules applied]"),
+    "as": ("Automation Studio", "-- 🚀 AUTOMATION STUDIO VERSION | Production | Full Dataset\n"
+                                "-- Target DE: [suggest name]\n"
+                                "[full production sql, correct 4-key joins, IsUnique=1 in JOIN not WHERE]"),
+    "exp": ("explanation", "[2-3 plain English sentences: what it does, key logic, any warnings]"),
+}
+
+
+def parse_sections(raw):
+    # -> ({section: text}, {section: problem}) — problem is "missing",
+    # "unterminated" (cut off), "empty", "unclosed" or "fenced"
+    raw = raw or ""
+    marks = [(m.group(1).lower(), m.group(2), m.start(), m.end()) for m in MARKER_RE.finditer(raw)]
+    sections = {name: "" for name in SECTIONS}
+    problems = {}
+    for name in SECTIONS:
+        start = next((m for m in marks if m[0] == name and m[1] == "START"), None)
+        if start is None:
+            problems[name] = "missing"
+            continue
+        end = next((m for m in marks if m[2] >= start[3] and (m[0] != name or m[1] == "END")), None)
+        text = raw[start[3]:end[2] if end else len(raw)].strip()
+        if "```" in text:
+            text = FENCE_RE.sub("", text).strip()
+            problems[name] = "fenced"
+        if end is None:
+            # An explanation that ends on a full sentence only lost its END marker
+            finished = name == "exp" and text[-1:] in ".!?"
+            problems[name] = "unclosed" if finished else "unterminated"
+        elif not text:
+            problems[name] = "empty"
+        elif end[0] != name:
+            problems[name] = "unclosed"
+        sections[name] = text
+    return sections, problems
+
+
+def parse_response(raw):
+    sections, _ = parse_sections(raw)
+    return sections["qs"], sections["as"], sections["exp"]
+
+
+def section_messages(section, user_request, custom_de_names, sections):
+    # The request plus the sections already written, asking for one section
+    label, template = SECTION_FORMAT[section]
+    tag = section.upper()
+    written = "\n".join(f"---{name.upper()}_START---\n{text}\n---{name.upper()}_END---"
+                        for name, text in sections.items() if text and name != section)
+    prompt = f"""
+User Request: {user_request}
+{describe_des(custom_de_names)}
+
+Already written for this request:
+{written or "(nothing yet)"}
+
+Write ONLY the {label} section, consistent with what is already written.
+Use EXACTLY this format — nothing outside the markers:
+
+---{tag}_START---
+{template}
+---{tag}_END---
+"""
+    # The explanation needs no SFMC rules
+    system = ("You explain SFMC SQL queries in plain English." if section == "exp"
+              else system_prompt(user_request, custom_de_names))
+    return [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+
+
+def regenerate_section(section, user_request, custom_de_names, sections):
+    # -> (text, {"tokens", "completion_tokens", "seconds"}); "" when the
+    # model is unavailable
+    started = time.perf_counter()
+    try:
+        resp = get_client().create(
+            section_messages(section, user_request, custom_de_names, sections),
+            {}, temperature=0.1, max_tokens=SECTION_TOKENS[section])
+    except GroqUnavailable:
+        return "", {"tokens": 0, "completion_tokens": 0, "seconds": time.perf_counter() - started}
+    raw = resp.choices[0].message.content or ""
+    found, problems = parse_sections(raw)
+    text = found[section]
+    if problems.get(section) == "missing" and "---" not in raw:
+        text = FENCE_RE.sub("", raw.strip()).strip()       # answered without markers
+    usage = getattr(resp, "usage", None)
+    return text, {"tokens": (usage.prompt_tokens + usage.completion_tokens) if usage else 0,
+                  "completion_tokens": usage.completion_tokens if usage else 0,
+                  "seconds": time.perf_counter() - started}
+
+
+def complete_sections(user_request, custom_de_names, raw, info=None):
+    # -> (qs, as_, exp) with only the missing or cut-off sections requested
+    # again. info["sections"] records the problems found; info["partial"] the
+    # tokens and seconds spent and those a full retry would have cost
+    info = {} if info is None else info
+    sections, problems = parse_sections(raw)
+    if SINGLE_GENERATION and problems.get("qs") in REGENERATE and problems.get("as") not in REGENERATE:
+        # QS is derived from AS locally — nothing to ask for
+        sections["qs"], _ = derive_query_studio(sections["as"])
+        problems["qs"] = "derived"
+    if problems:
+        info["sections"] = problems
+    todo = [name for name in ("as", "qs", "exp") if problems.get(name) in REGENERATE]
+    # Nothing usable at all (a refusal, an empty answer) is not patched section by section
+    if not todo or not PARTIAL or not any(sections.values()):
+        return sections["qs"], sections["as"], sections["exp"]
+    spent = {"tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+    done = []
+    for name in todo:
+        if name == "qs" and SINGLE_GENERATION:
+            if sections["as"]:
+                sections["qs"], _ = derive_query_studio(sections["as"])
+                done.append(name)
+            continue
+        text, cost = regenerate_section(name, user_request, custom_de_names,
+                                        {k: v for k, v in sections.items() if problems.get(k) not in REGENERATE or k in done})
+        for k in spent:
+            spent[k] += cost[k]
+        if text:
+            sections[name] = text
+            done.append(name)
+    # A full retry resends the whole prompt and streams the whole answer: what
+    # the first call wrote plus what was missing, at the first call's pace
+    usage = info.get("usage")
+    full_tokens = full_seconds = 0
+    if usage and usage["completion_tokens"]:
+        written = usage["completion_tokens"] + spent["completion_tokens"]
+        full_tokens = usage["prompt_tokens"] + written
+        full_seconds = (info.get("groq_s") or 0.0) * written / usage["completion_tokens"]
+    info["partial"] = {
+        "sections": done, "tokens": spent["tokens"], "seconds": round(spent["seconds"], 3),
+        "saved_tokens": max(full_tokens - spent["tokens"], 0) if full_tokens else None,
+        "saved_s": round(max(full_seconds - spent["seconds"], 0), 3) if full_seconds else None,
+    }
+    if len(done) == len(todo) and not info.get("path", {}).get("fallback"):
+        remember(user_request, custom_de_names, format_response(sections["qs"], sections["as"], sections["exp"]))
+    return sections["qs"], sections["as"], sections["exp"]
+
+
+def format_response(qs, as_, exp):
+    # Inverse of parse_response
+    return (
+        f"---QS_START---\n{qs}\n---QS_END---\n"
+        f"---AS_START---\n{as_}\n---AS_END---\n"
+        f"---EXP_START---\n{exp}\n---EXP_END---\n"
+    )
+
+
+def repair_sql(mode, sql, violations):
+    # Targeted fix — only sent when the local linter found errors
+    label = "Query Studio" if mode == "qs" else "Automation Studio"
+    problems = "\n".join(f"- {describe(sql, v)}" for v in violations if v.severity == ERROR)
+    prompt = f"""
+Fix ONLY these SFMC SQL rule violations in the {label} query below.
+Keep the logic, columns and comments otherwise identical.
+
+Violations:
+{problems}
+
+SQL:
+{sql}
+
+Return only the corrected SQL between ---SQL_START--- and ---SQL_END---.
+"""
+    try:
+        resp = get_client().create([
+            {"role": "system", "content": system_prompt(sql)},
+            {"role": "user", "content": prompt}
+        ], temperature=0)
+    except GroqUnavailable:
+        return ""           # keep the unrepaired SQL rather than fail the answer
+    raw = resp.choices[0].message.content
+    if "---SQL_START---" in raw:
+        raw = raw.split("---SQL_START---")[1].split("---SQL_END---")[0]
+    return raw.replace("```sql", "").replace("```", "").strip()
+
+
+def lint_sql(sql, mode="as"):
+    # SFMC rules plus the field names of catalogued DEs
+    return sorted(lint(sql, mode) + check_columns(sql), key=lambda v: v.span)
+
+
+def lint_and_repair(user_request, custom_de_names, qs, as_, exp, info=None):
+    # Lint both versions; repair only the sections with errors, keep the fix
+    # if it is actually cleaner, and cache the repaired answer
+    results = {"qs": [qs, lint_sql(qs, "qs")], "as": [as_, lint_sql(as_, "as")]}
+    repaired = []
+    for mode, (sql, violations) in results.items():
+        if not sql or not has_errors(violations):
+            continue
+        fixed = repair_sql(mode, sql, violations)
+        fixed_violations = lint_sql(fixed, mode)
+        errors = sum(v.severity == ERROR for v in violations)
+        if fixed and sum(v.severity == ERROR for v in fixed_violations) < errors:
+            results[mode] = [fixed, fixed_violations]
+            repaired.append(mode)
+    if repaired:
+        remember(user_request, custom_de_names,
+                 format_response(results["qs"][0], results["as"][0], exp))
+    if info is not None:
+        info["repaired"] = repaired
+    return results["qs"][0], results["as"][0], results["qs"][1], results["as"][1]
+
+
+def rewrite_automation_sql(as_, lint_as, info=None):
+    # Keep the optimized query only if it lints no worse than the original
+    if not REWRITE or not as_:
+        return as_, lint_as
+    optimized, applied = optimize(as_)
+    if not applied:
+        return as_, lint_as
+    violations = lint_sql(optimized, "as")
+    errors = sum(v.severity == ERROR for v in lint_as)
+    if sum(v.severity == ERROR for v in violations) > errors:
+        return as_, lint_as
+    if info is not None:
+        info["rewrites"] = applied
+        info["original_as"] = as_
+    return optimized, violations
+
+
+def validate(req, custom_de_names=""):
+    if len(req.strip()) < 15:
+        return False, "Please describe your query in more detail."
+    # Off-topic requests are turned away here, before any Groq call
+    if classify(req, custom_de_names).label == OFF_TOPIC:
+        return False, "AMPify only handles SFMC SQL queries."
+    return True, ""
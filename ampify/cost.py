@@ -0,0 +1,283 @@
+import math
+import os
+from collections import namedtuple
+from datetime import datetime
+
+from ampify.dataviews import JOIN_KEYS, TRACKING_VIEWS, dataview
+from ampify.tokenizer import (
+    column_refs, conjuncts, depths, line_of, name, table_refs, tokenize, where_end, word,
+)
+
+# ─────────────────────────────────────────
+# STATIC COST ANALYZER
+# Estimates the rows an Automation Studio query reads from each data view
+# under a volume profile and flags the clauses that make it slow, to
+# predict whether it will hit the 30-minute query activity timeout.
+# ─────────────────────────────────────────
+TIMEOUT_MINUTES = 30
+
+# Account volume profile — every knob can be set with AMPIFY_VOLUME_<NAME>
+VOLUME = {
+    "sends_per_day": 250000,
+    "subscribers": 2000000,
+    "retention_days": 180,      # data views keep ~6 months
+    "jobs_per_day": 20,
+    "open_rate": 0.2,           # unique opens per send
+    "click_rate": 0.03,         # unique clicks per send
+    "bounce_rate": 0.02,
+    "unsub_rate": 0.002,
+    "complaint_rate": 0.0005,
+    "journey_rate": 0.5,        # journey activity rows per send
+    "de_rows": 1000000,         # rows assumed for a DE of unknown size
+    "rows_per_minute": 6000000,  # rows a query activity gets through per minute
+}
+for _k, _v in VOLUME.items():
+    VOLUME[_k] = type(_v)(os.getenv(f"AMPIFY_VOLUME_{_k.upper()}", _v))
+
+# Non-unique rows per unique event (re-opens, repeat clicks)
+REPEATS = {"_Open": 1.6, "_Click": 1.4}
+DAYS_PER = {"year": 365, "yy": 365, "yyyy": 365, "quarter": 91, "qq": 91, "q": 91,
+            "month": 30, "mm": 30, "m": 30, "week": 7, "wk": 7, "ww": 7,
+            "day": 1, "dd": 1, "d": 1, "hour": 1 / 24, "hh": 1 / 24,
+            "minute": 1 / 1440, "mi": 1 / 1440, "n": 1 / 1440}
+# Longest period for a start-of-period bound, DATEADD(month, DATEDIFF(month, 0, GETDATE()), 0)
+PERIOD_DAYS = {"year": 366, "yy": 366, "yyyy": 366, "quarter": 92, "qq": 92, "q": 92,
+               "month": 31, "mm": 31, "m": 31}
+# Calls that take columns but are not scalar functions of them
+NOT_FUNCTIONS = {"", "IN", "EXISTS", "AND", "OR", "NOT", "ON", "WHERE", "WHEN", "THEN",
+                 "ELSE", "BETWEEN", "SELECT", "AS", "OVER"}
+COMPARISONS = {"=", "<", ">", "<=", ">=", "<>", "!="}
+
+# rows: estimated rows read; bound: "EventDate", "join" (seeks from a bounded
+# driver on the send keys) or None (full retention)
+Scan = namedtuple("Scan", "view alias rows days bound")
+# extra_rows: work the finding adds on top of the plain scans
+Finding = namedtuple("Finding", "kind message span extra_rows")
+CostReport = namedtuple("CostReport", "score level minutes rows scans findings")
+
+
+def daily_rows(view, volume):
+    sends = volume["sends_per_day"]
+    rates = {
+        "_Sent": 1.0, "_Open": volume["open_rate"], "_Click": volume["click_rate"],
+        "_Bounce": volume["bounce_rate"], "_Unsubscribe": volume["unsub_rate"],
+        "_Complaint": volume["complaint_rate"], "_JourneyActivity": volume["journey_rate"],
+    }
+    if view == "_Job":
+        return volume["jobs_per_day"]
+    return sends * rates.get(view, 0) * REPEATS.get(view, 1)
+
+
+def table_rows(view, volume):
+    # Rows in a view or DE that has no EventDate to bound it
+    if view in ("_Subscribers", "_EnterpriseAttribute"):
+        return volume["subscribers"]
+    if view == "_ListSubscribers":
+        return volume["subscribers"] * 2
+    if view == "_BusinessUnitUnsubscribes":
+        return volume["subscribers"] * 0.05
+    if view is None:
+        return volume["de_rows"]
+    return daily_rows(view, volume) * volume["retention_days"]
+
+
+# ─────────────────────────────────────────
+# PREDICATES
+# ─────────────────────────────────────────
+def _wrapping_function(tokens, levels, words, at, start):
+    # Name of the function call around tokens[at] inside the conjunct, if any
+    k = at - 1
+    depth = levels[at]
+    while k >= start:
+        if tokens[k].text == "(" and levels[k] < depth:
+            fn = words[k - 1] if k > start else ""
+            if fn not in NOT_FUNCTIONS:
+                return fn
+            depth = levels[k]
+        k -= 1
+    return None
+
+
+def _window_days(tokens, words, start, end, now):
+    # Days covered by a lower bound like DATEADD(day, -30, GETDATE()),
+    # GETDATE() - 30, the start of this month or a literal date
+    for k in range(start, end):
+        if words[k] == "DATEADD" and k + 4 < end:
+            part = words[k + 2].lower()
+            j = k + 4
+            if words[j] == "DATEDIFF" and part in DAYS_PER:
+                # Start of the current period: up to one whole period
+                return float(PERIOD_DAYS.get(part, DAYS_PER[part]))
+            negative = tokens[j].text == "-"
+            if negative:
+                j += 1
+            if part in DAYS_PER and tokens[j].kind == "number":
+                return float(tokens[j].text) * DAYS_PER[part]
+        if words[k] == "DATEDIFF" and k + 2 < end and words[k + 2].lower() in DAYS_PER:
+            numbers = [t for t in tokens[k:end] if t.kind == "number"]
+            if numbers:
+                return float(numbers[-1].text) * DAYS_PER[words[k + 2].lower()]
+        if words[k] == "GETDATE" and k + 4 < end and tokens[k + 3].text == "-" \
+                and tokens[k + 4].kind == "number":
+            return float(tokens[k + 4].text)
+        if tokens[k].kind == "string":
+            try:
+                when = datetime.fromisoformat(tokens[k].text.strip("'")[:19])
+            except ValueError:
+                continue
+            return max((now - when).total_seconds() / 86400, 0)
+    return None
+
+
+def _is_lower_bound(tokens, words, start, end, at):
+    # col >= x, col > x, x <= col, x < col, col BETWEEN x AND y
+    for k in range(start, end):
+        op = tokens[k].text
+        if words[k] == "BETWEEN":
+            return True
+        if op in COMPARISONS:
+            column_left = at < k
+            return (op in (">", ">=") and column_left) or (op in ("<", "<=") and not column_left)
+    return False
+
+
+def analyze(sql, volume=None, now=None):
+    volume = dict(VOLUME, **(volume or {}))
+    now = now or datetime.now()
+    retention = volume["retention_days"]
+    tokens = tokenize(sql)
+    if not tokens:
+        return CostReport(0, "low", 0.0, 0, [], [])
+    levels = depths(tokens)
+    words = [word(tok) for tok in tokens]
+    refs = table_refs(tokens, levels)
+    views = {ref.alias: dataview(ref.table) for ref in refs if ref.alias}
+    findings = []
+
+    def span(a, b):
+        return (tokens[a].start, tokens[b - 1].end)
+
+    # Condition ranges: every WHERE, plus each JOIN's ON
+    conditions = []
+    for i in range(len(tokens)):
+        if words[i] == "WHERE":
+            conditions.append((i + 1, where_end(tokens, levels, words, i), levels[i]))
+    for ref in refs:
+        if ref.on_end > ref.on_start:
+            conditions.append((ref.on_start, ref.on_end, ref.depth))
+
+    bounds = {}                     # alias -> days
+    for start, end, depth in conditions:
+        scope = [r for r in refs if r.depth == depth and views.get(r.alias) in TRACKING_VIEWS]
+        for a, b in conjuncts(tokens, levels, words, start, end):
+            # Only this SELECT's predicates — skip the inside of nested subqueries
+            if any(words[k] == "SELECT" for k in range(a, b)):
+                continue
+            cols = [(alias, col, k + 2) for alias, col, k in column_refs(tokens, a, b)]
+            if len(scope) == 1:
+                cols += [(scope[0].alias, name(tokens[k]), k) for k in range(a, b)
+                         if words[k] == "EVENTDATE" and (k == 0 or tokens[k - 1].text != ".")]
+            for alias, col, at in cols:
+                fn = _wrapping_function(tokens, levels, words, at, a)
+                view = views.get(alias)
+                if fn:
+                    text = sql[tokens[a].start:tokens[b - 1].end]
+                    rows = table_rows(view, volume) if view in TRACKING_VIEWS else 0
+                    findings.append(Finding(
+                        "non-sargable",
+                        f"{fn}() wraps {alias}.{col} — the filter cannot use an index "
+                        f"and every row is evaluated: {text}",
+                        span(a, b), rows * 0.5))
+                if col.lower() == "eventdate" and view in TRACKING_VIEWS:
+                    days = _window_days(tokens, words, a, b, now)
+                    if days is not None and fn:
+                        bounds[alias] = retention       # a window, but every row is read
+                    elif days is not None and _is_lower_bound(tokens, words, a, b, at):
+                        bounds[alias] = min(bounds.get(alias, retention), days)
+            for k in range(a, b):
+                if words[k] == "LIKE" and k + 1 < b and tokens[k + 1].text.startswith("'%"):
+                    findings.append(Finding(
+                        "non-sargable", "LIKE with a leading % scans every row",
+                        span(k, k + 2), 0))
+
+    # Rows read per view — a tracking view without its own bound is still cheap
+    # when it is joined on the send keys to a bounded driver
+    scans = []
+    driver_days = {}
+    for ref in refs:
+        if ref.join == "FROM" and ref.alias in bounds:
+            driver_days[ref.depth] = bounds[ref.alias]
+    for ref in refs:
+        view = views.get(ref.alias)
+        if ref.table is None:
+            continue
+        if view not in TRACKING_VIEWS and view != "_JourneyActivity":
+            scans.append(Scan(view or ref.table, ref.alias, table_rows(view, volume), None, None))
+            continue
+        # A joined view is keyed by its ON; a correlated subquery (NOT EXISTS)
+        # by its own WHERE against the enclosing query
+        start, end, outer = ref.on_start, ref.on_end, ref.depth
+        if ref.join == "FROM":
+            start = end = ref.table_end
+            if ref.depth > 0 and end < len(tokens) and words[end] == "WHERE":
+                start, end = end + 1, where_end(tokens, levels, words, end)
+            outer = ref.depth - 1
+        on_cols = {c.lower() for a, c, _ in column_refs(tokens, start, end) if a == ref.alias}
+        keyed = {"jobid", "subscriberid"} <= on_cols
+        if ref.alias in bounds:
+            days, bound = bounds[ref.alias], "EventDate"
+        elif keyed and outer in driver_days:
+            days, bound = driver_days[outer], "join"
+        else:
+            days, bound = retention, None
+            label = ref.table if ref.alias == ref.table.split(".")[-1] else f"{ref.table} {ref.alias}"
+            findings.append(Finding(
+                "unbounded",
+                f"{label} has no EventDate bound — scans all "
+                f"{retention} days of data",
+                span(ref.start, ref.table_end), 0))
+        scans.append(Scan(view, ref.alias, daily_rows(view, volume) * days, days, bound))
+
+    # Joins between event views on SubscriberKey alone fan out
+    rows_by_alias = {s.alias: s.rows for s in scans}
+    for ref in refs:
+        if views.get(ref.alias) not in TRACKING_VIEWS or ref.join == "FROM":
+            continue
+        on = column_refs(tokens, ref.on_start, ref.on_end)
+        partners = {a for a, _, _ in on if a != ref.alias and views.get(a) in TRACKING_VIEWS}
+        mine = {c.lower() for a, c, _ in on if a == ref.alias}
+        if partners and "subscriberkey" in mine and not {k.lower() for k in JOIN_KEYS} & mine:
+            partner = sorted(partners)[0]
+            fanout = rows_by_alias.get(ref.alias, 0) / max(volume["subscribers"], 1)
+            extra = rows_by_alias.get(partner, 0) * max(fanout, 1)
+            findings.append(Finding(
+                "fan-out",
+                f"{ref.alias} joined to {partner} on SubscriberKey alone — every send matches "
+                f"every event of that subscriber (~×{max(fanout, 1):.1f} rows)",
+                span(ref.start, max(ref.on_end, ref.table_end)), extra))
+
+    # DISTINCT has to sort/hash the whole joined row set
+    for i in range(len(tokens) - 1):
+        if words[i] == "SELECT" and words[i + 1] == "DISTINCT":
+            joins = [r for r in refs if r.depth == levels[i] and r.start > i and r.join != "FROM"]
+            left = sum(r.join == "LEFT" for r in joins)
+            if len(joins) >= 3 or left >= 2:
+                joined = sum(s.rows for s in scans
+                             if s.alias in {r.alias for r in refs if r.depth == levels[i]})
+                findings.append(Finding(
+                    "distinct",
+                    f"DISTINCT over a {len(joins) + 1}-way join ({left} LEFT) sorts "
+                    f"~{joined:,.0f} joined rows",
+                    span(i, i + 2), joined * 0.5 * math.log2(max(len(joins), 2))))
+
+    rows = sum(s.rows for s in scans) + sum(f.extra_rows for f in findings)
+    minutes = rows / volume["rows_per_minute"]
+    score = min(100, round(100 * minutes / TIMEOUT_MINUTES))
+    level = "high" if score >= 70 else "medium" if score >= 35 else "low"
+    findings.sort(key=lambda f: f.span)
+    return CostReport(score, level, minutes, rows, scans, findings)
+
+
+def describe(sql, finding):
+    # "L4 unbounded: _Sent s has no EventDate bound — ..."
+    return f"L{line_of(sql, finding.span[0])} {finding.kind}: {finding.message}"
@@ -0,0 +1,43 @@
+# ─────────────────────────────────────────
+# SFMC SYSTEM DATA VIEWS — mirrors the DATA VIEWS block in SFMC_RULES
+# ─────────────────────────────────────────
+DATA_VIEWS = {
+    "_Sent": ["AccountID", "SubscriberKey", "SubscriberID", "JobID", "ListID",
+              "BatchID", "EventDate"],
+    "_Open": ["AccountID", "SubscriberKey", "SubscriberID", "JobID", "ListID",
+              "BatchID", "EventDate", "Domain", "IsUnique"],
+    "_Click": ["AccountID", "SubscriberKey", "SubscriberID", "JobID", "ListID",
+               "BatchID", "EventDate", "URL", "LinkName", "IsUnique"],
+    "_Bounce": ["AccountID", "SubscriberKey", "SubscriberID", "JobID", "ListID",
+                "BatchID", "EventDate", "BounceCategory", "BounceSubcategory",
+                "SMTPBounceReason", "Domain", "IsUnique"],
+    "_Unsubscribe": ["AccountID", "SubscriberKey", "SubscriberID", "JobID",
+                     "ListID", "BatchID", "EventDate", "IsUnique"],
+    "_Complaint": ["AccountID", "SubscriberKey", "SubscriberID", "JobID",
+                   "ListID", "BatchID", "EventDate"],
+    "_Job": ["JobID", "EmailID", "EmailName", "EmailSubject", "FromName",
+             "FromEmail", "DeliveredTime", "SchedTime", "CreatedDate"],
+    "_Subscribers": ["SubscriberKey", "SubscriberID", "EmailAddress", "Status",
+                     "DateCreated", "DateUnsubscribed"],
+    "_EnterpriseAttribute": ["_SubscriberID"],
+    "_ListSubscribers": ["SubscriberKey", "SubscriberID", "ListID", "Status",
+                         "DateUnsubscribed"],
+    "_JourneyActivity": ["VersionID", "ActivityID", "ActivityName", "ActivityType",
+                         "SubscriberKey", "EventDate"],
+    "_BusinessUnitUnsubscribes": ["SubscriberKey", "DateUnsubscribed",
+                                  "BusinessUnitID"],
+}
+
+# Send-level event views — joined to each other on all four keys
+TRACKING_VIEWS = {"_Sent", "_Open", "_Click", "_Bounce", "_Unsubscribe", "_Complaint"}
+JOIN_KEYS = ("JobID", "ListID", "BatchID", "SubscriberID")
+
+_LOOKUP = {view.lower(): view for view in DATA_VIEWS}
+
+
+def dataview(table):
+    # Canonical data view name for a table reference, or None for DEs
+    if not table:
+        return None
+    bare = table.split(".")[-1]
+    return _LOOKUP.get(bare.lower())
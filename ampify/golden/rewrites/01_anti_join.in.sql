@@ -0,0 +1,6 @@
+-- Target DE: OpenersNoClick
+SELECT DISTINCT o.SubscriberKey
+FROM _Open o
+INNER JOIN _Subscribers sub ON o.SubscriberKey = sub.SubscriberKey
+LEFT JOIN _Click c ON o.JobID = c.JobID AND o.ListID = c.ListID AND o.BatchID = c.BatchID AND o.SubscriberID = c.SubscriberID AND c.IsUnique = 1
+WHERE o.EventDate >= DATEADD(day, -30, GETDATE()) AND o.IsUnique = 1 AND c.SubscriberID IS NULL AND sub.Status = 'Active'
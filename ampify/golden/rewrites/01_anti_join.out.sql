@@ -0,0 +1,5 @@
+-- Target DE: OpenersNoClick
+SELECT DISTINCT o.SubscriberKey
+FROM _Open o
+INNER JOIN _Subscribers sub ON o.SubscriberKey = sub.SubscriberKey
+WHERE o.EventDate >= DATEADD(day, -30, GETDATE()) AND o.IsUnique = 1 AND NOT EXISTS (SELECT 1 FROM _Click c WHERE o.JobID = c.JobID AND o.ListID = c.ListID AND o.BatchID = c.BatchID AND o.SubscriberID = c.SubscriberID AND c.IsUnique = 1) AND sub.Status = 'Active'
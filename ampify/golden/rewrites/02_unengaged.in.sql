@@ -0,0 +1,6 @@
+-- Target DE: Unengaged_30d
+SELECT DISTINCT s.SubscriberKey, j.EmailName
+FROM _Sent s INNER JOIN _Job j ON s.JobID = j.JobID
+LEFT JOIN _Open o ON s.JobID = o.JobID AND s.ListID = o.ListID AND s.BatchID = o.BatchID AND s.SubscriberID = o.SubscriberID AND o.IsUnique = 1
+LEFT JOIN _Click c ON s.JobID = c.JobID AND s.ListID = c.ListID AND s.BatchID = c.BatchID AND s.SubscriberID = c.SubscriberID AND c.IsUnique = 1
+WHERE s.EventDate >= DATEADD(day, -30, GETDATE()) AND o.SubscriberID IS NULL AND c.SubscriberID IS NULL
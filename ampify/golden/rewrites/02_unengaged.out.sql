@@ -0,0 +1,4 @@
+-- Target DE: Unengaged_30d
+SELECT DISTINCT s.SubscriberKey, j.EmailName
+FROM _Sent s INNER JOIN _Job j ON s.JobID = j.JobID
+WHERE s.EventDate >= DATEADD(day, -30, GETDATE()) AND NOT EXISTS (SELECT 1 FROM _Open o WHERE s.JobID = o.JobID AND s.ListID = o.ListID AND s.BatchID = o.BatchID AND s.SubscriberID = o.SubscriberID AND o.IsUnique = 1) AND NOT EXISTS (SELECT 1 FROM _Click c WHERE s.JobID = c.JobID AND s.ListID = c.ListID AND s.BatchID = c.BatchID AND s.SubscriberID = c.SubscriberID AND c.IsUnique = 1)
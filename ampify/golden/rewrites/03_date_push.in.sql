@@ -0,0 +1,8 @@
+-- Target DE: TrackingLog
+SELECT s.SubscriberKey, j.EmailName, s.EventDate AS SentDate, o.EventDate AS OpenDate,
+c.EventDate AS ClickDate, b.EventDate AS BounceDate, b.BounceCategory
+FROM _Sent s INNER JOIN _Job j ON s.JobID = j.JobID
+LEFT JOIN _Open o ON s.JobID = o.JobID AND s.ListID = o.ListID AND s.BatchID = o.BatchID AND s.SubscriberID = o.SubscriberID AND o.IsUnique = 1
+LEFT JOIN _Click c ON s.JobID = c.JobID AND s.ListID = c.ListID AND s.BatchID = c.BatchID AND s.SubscriberID = c.SubscriberID AND c.IsUnique = 1
+LEFT JOIN _Bounce b ON s.JobID = b.JobID AND s.ListID = b.ListID AND s.BatchID = b.BatchID AND s.SubscriberID = b.SubscriberID AND b.IsUnique = 1
+WHERE s.EventDate >= DATEADD(day, -7, GETDATE())
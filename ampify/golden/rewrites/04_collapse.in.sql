@@ -0,0 +1,7 @@
+-- Target DE: EngagementSummary
+SELECT sub.SubscriberKey, sub.EmailAddress,
+    (SELECT COUNT(*) FROM _Open o WHERE o.SubscriberKey = sub.SubscriberKey AND o.IsUnique = 1) AS Opens,
+    (SELECT MAX(o2.EventDate) FROM _Open o2 WHERE o2.SubscriberKey = sub.SubscriberKey AND o2.IsUnique = 1) AS LastOpen,
+    (SELECT COUNT(*) FROM _Click c WHERE c.SubscriberKey = sub.SubscriberKey) AS Clicks
+FROM _Subscribers sub
+WHERE sub.Status = 'Active'
@@ -0,0 +1,14 @@
+-- Target DE: EngagementSummary
+WITH OpenAgg AS (
+    SELECT o.SubscriberKey, COUNT(*) AS Opens, MAX(o.EventDate) AS LastOpen
+    FROM _Open o
+    WHERE o.IsUnique = 1
+    GROUP BY o.SubscriberKey
+)
+SELECT sub.SubscriberKey, sub.EmailAddress,
+    ISNULL(OpenAgg.Opens, 0) AS Opens,
+    OpenAgg.LastOpen AS LastOpen,
+    (SELECT COUNT(*) FROM _Click c WHERE c.SubscriberKey = sub.SubscriberKey) AS Clicks
+FROM _Subscribers sub
+LEFT JOIN OpenAgg ON OpenAgg.SubscriberKey = sub.SubscriberKey
+WHERE sub.Status = 'Active'
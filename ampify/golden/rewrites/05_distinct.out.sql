@@ -0,0 +1,5 @@
+-- Target DE: ActiveProfiles
+SELECT sub.SubscriberKey, sub.EmailAddress, e.FirstName
+FROM _Subscribers sub
+INNER JOIN ENT._EnterpriseAttribute e ON e._SubscriberID = sub.SubscriberID
+WHERE sub.Status = 'Active'
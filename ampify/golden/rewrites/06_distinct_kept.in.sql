@@ -0,0 +1,5 @@
+-- Target DE: Clickers
+SELECT DISTINCT s.SubscriberKey, s.JobID
+FROM _Sent s
+INNER JOIN _Click c ON s.JobID = c.JobID AND s.ListID = c.ListID AND s.BatchID = c.BatchID AND s.SubscriberID = c.SubscriberID
+WHERE s.EventDate >= DATEADD(day, -14, GETDATE())
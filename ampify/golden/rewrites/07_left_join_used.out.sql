@@ -0,0 +1,5 @@
+-- Target DE: OpenDomains
+SELECT s.SubscriberKey, o.Domain
+FROM _Sent s
+LEFT JOIN _Open o ON s.JobID = o.JobID AND s.ListID = o.ListID AND s.BatchID = o.BatchID AND s.SubscriberID = o.SubscriberID AND o.IsUnique = 1
+WHERE s.EventDate >= DATEADD(day, -3, GETDATE()) AND o.EventDate IS NULL
@@ -0,0 +1,282 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from ampify.cache import normalize_de_names, normalize_request
+from ampify.dataviews import dataview
+from ampify.tokenizer import table_refs, tokenize
+
+# ─────────────────────────────────────────
+# QUERY HISTORY
+# Every generation is kept in SQLite with an FTS5 index over the request,
+# the Automation Studio SQL, the explanation and the data views / DEs the
+# query reads. Pages are read newest first by rowid, so a search touches
+# only the rows it returns:
+#   python -m ampify.history --search "bounce" --object _Job
+#   python -m ampify.history --scale 100000
+# ─────────────────────────────────────────
+HISTORY_PATH = os.getenv("AMPIFY_HISTORY_PATH", ".ampify_history.sqlite3")
+HISTORY = os.getenv("AMPIFY_HISTORY", "1") == "1"
+HISTORY_MAX_ROWS = int(os.getenv("AMPIFY_HISTORY_MAX_ROWS", "0"))     # 0 = keep everything
+PAGE_SIZE = int(os.getenv("AMPIFY_HISTORY_PAGE", "20"))
+
+# Summary rows for the list; the SQL is only read when an entry is opened
+Summary = namedtuple("Summary", "id created request objects source uses")
+Entry = namedtuple("Entry", "id created request de_names qs asm exp source model objects uses")
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS generations ("
+    "id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, created REAL NOT NULL, "
+    "request TEXT NOT NULL, de_names TEXT NOT NULL, qs TEXT NOT NULL, asm TEXT NOT NULL, "
+    "exp TEXT NOT NULL, source TEXT NOT NULL, model TEXT NOT NULL, objects TEXT NOT NULL, "
+    "uses INTEGER NOT NULL DEFAULT 0)",
+    # "_" is part of a word, so _Sent and My_DE stay single tokens
+    "CREATE VIRTUAL TABLE IF NOT EXISTS generations_fts USING fts5("
+    "request, asm, exp, objects, content='generations', content_rowid='id', "
+    "tokenize=\"unicode61 tokenchars '_'\", prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS generations_ai AFTER INSERT ON generations BEGIN "
+    "INSERT INTO generations_fts (rowid, request, asm, exp, objects) "
+    "VALUES (new.id, new.request, new.asm, new.exp, new.objects); END",
+    "CREATE TRIGGER IF NOT EXISTS generations_ad AFTER DELETE ON generations BEGIN "
+    "INSERT INTO generations_fts (generations_fts, rowid, request, asm, exp, objects) "
+    "VALUES ('delete', old.id, old.request, old.asm, old.exp, old.objects); END",
+]
+SUMMARY_COLUMNS = "id, created, request, objects, source, uses"
+
+
+def objects_of(sql, de_names=""):
+    # Data views and DEs a query reads, plus the DEs named with the request
+    names = []
+    for ref in table_refs(tokenize(sql or "")):
+        if ref.table:
+            bare = ref.table.split(".")[-1].strip("[]")
+            names.append(dataview(bare) or bare)
+    names += normalize_de_names(de_names)
+    return " ".join(dict.fromkeys(names))
+
+
+def match_query(text="", obj=""):
+    # Every word of `text` as a prefix, and `obj` as a whole name in objects
+    terms = [f'"{word}"*' for word in re.findall(r"\w+", text)]
+    if obj.strip():
+        terms.append('objects : "' + obj.strip().replace('"', '""') + '"')
+    return " ".join(terms)
+
+
+class History:
+
+    def __init__(self, path=HISTORY_PATH, max_rows=HISTORY_MAX_ROWS):
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                for statement in SCHEMA:
+                    self._db.execute(statement)
+                self._db.commit()
+            except sqlite3.Error:
+                # Read-only filesystem or no FTS5 — history is off
+                self._db = None
+
+    @property
+    def enabled(self):
+        return self._db is not None
+
+    def add(self, request, de_names, qs, asm, exp, source="", model="", created=None):
+        # -> id; the same answer to the same request moves to the top
+        if self._db is None or not asm:
+            return None
+        key = hashlib.sha256(json.dumps([
+            normalize_request(request), normalize_de_names(de_names), asm]).encode("utf-8")).hexdigest()
+        with self._lock:
+            try:
+                old = self._db.execute("SELECT uses FROM generations WHERE key = ?", (key,)).fetchone()
+                if old:
+                    self._db.execute("DELETE FROM generations WHERE key = ?", (key,))
+                cursor = self._db.execute(
+                    "INSERT INTO generations (key, created, request, de_names, qs, asm, exp, source, "
+                    "model, objects, uses) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, created or time.time(), request, de_names or "", qs or "", asm, exp or "",
+                     source or "", model or "", objects_of(asm, de_names), old[0] if old else 0))
+                if self.max_rows:
+                    self._db.execute(
+                        "DELETE FROM generations WHERE id <= ("
+                        "SELECT id FROM generations ORDER BY id DESC LIMIT 1 OFFSET ?)", (self.max_rows,))
+                self._db.commit()
+                return cursor.lastrowid
+            except sqlite3.Error:
+                self._db.rollback()
+                return None
+
+    def search(self, text="", obj="", before=None, limit=PAGE_SIZE):
+        # -> [Summary], newest first; pass the last id as `before` for the next page
+        if self._db is None:
+            return []
+        before = before or (1 << 62)
+        match = match_query(text, obj)
+        with self._lock:
+            try:
+                if not match:
+                    rows = self._db.execute(
+                        f"SELECT {SUMMARY_COLUMNS} FROM generations WHERE id < ? "
+                        "ORDER BY id DESC LIMIT ?", (before, limit)).fetchall()
+                    return [Summary(*row) for row in rows]
+                ids = [row[0] for row in self._db.execute(
+                    "SELECT rowid FROM generations_fts WHERE generations_fts MATCH ? AND rowid < ? "
+                    "ORDER BY rowid DESC LIMIT ?", (match, before, limit))]
+                if not ids:
+                    return []
+                rows = self._db.execute(
+                    f"SELECT {SUMMARY_COLUMNS} FROM generations WHERE id IN ({', '.join('?' * len(ids))}) "
+                    "ORDER BY id DESC", ids).fetchall()
+            except sqlite3.OperationalError:
+                return []       # a search the FTS5 syntax rejects finds nothing
+        return [Summary(*row) for row in rows]
+
+    def get(self, entry_id):
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, created, request, de_names, qs, asm, exp, source, model, objects, uses "
+                "FROM generations WHERE id = ?", (entry_id,)).fetchone()
+        return Entry(*row) if row else None
+
+    def touch(self, entry_id):
+        # Counts a reuse
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute("UPDATE generations SET uses = uses + 1 WHERE id = ?", (entry_id,))
+            self._db.commit()
+
+    def count(self):
+        if self._db is None:
+            return 0
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_history():
+    # One connection per process, shared by every session
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = History(HISTORY_PATH if HISTORY else "")
+        return _default
+
+
+def use_history(history):
+    global _default
+    with _default_lock:
+        _default = history
+
+
+# ─────────────────────────────────────────
+# SCALE CHECK — search latency with many saved generations
+# ─────────────────────────────────────────
+def bench_search(n, path, queries=500, log=print):
+    from ampify.benchmark import CORPUS_PATH
+    from ampify.mock_groq import load_corpus
+    from ampify.similarity import synthetic_requests
+
+    import resource
+
+    history = History(path)
+    answers = [row["completion"].split("---AS_START---")[-1].split("---AS_END---")[0].strip()
+               for row in load_corpus(CORPUS_PATH) if "---AS_START---" in row["completion"]]
+    rng = random.Random(5)
+    saved = history.count()
+    if saved < n:
+        started = time.perf_counter()
+        with history._lock:
+            for request in synthetic_requests(n)[saved:]:
+                de = rng.choice(["", f"DE_{rng.randint(1, 500)}"])
+                asm = rng.choice(answers).replace("Target DE: ", f"Target DE: {de or 'List'}_")
+                history._db.execute(
+                    "INSERT INTO generations (key, created, request, de_names, qs, asm, exp, source, "
+                    "model, objects, uses) VALUES (?, ?, ?, ?, '', ?, '', 'bench', '', ?, 0)",
+                    (hashlib.sha256(request.encode()).hexdigest() + str(rng.random()), time.time(),
+                     request, de, asm, objects_of(asm, de)))
+            history._db.commit()
+        log(f"saved {n:,} generations in {time.perf_counter() - started:.1f}s")
+    words = [w for request in synthetic_requests(200) for w in request.split()[1:]]
+    probes = {
+        "latest page": [("", "")] * queries,
+        "word": [(rng.choice(words), "") for _ in range(queries)],
+        "two words": [(f"{rng.choice(words)} {rng.choice(words)}", "") for _ in range(queries)],
+        "data view": [("", rng.choice(["_Open", "_Click", "_Bounce", "_Job", "_Subscribers"]))
+                      for _ in range(queries)],
+        "DE name": [("", f"DE_{rng.randint(1, 500)}") for _ in range(queries)],
+    }
+    report = {"entries": history.count(), "timings": {}}
+    for label, searches in probes.items():
+        timings = []
+        for text, obj in searches:
+            start = time.perf_counter()
+            page = history.search(text, obj)
+            if page:
+                history.search(text, obj, before=page[-1].id)       # and the next page
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        report["timings"][label] = (timings[len(timings) // 2], timings[int(len(timings) * 0.99) - 1])
+    report["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    history.close()
+    return report
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search the saved generations.")
+    parser.add_argument("--search", default="", help="words in the request, SQL or explanation")
+    parser.add_argument("--object", default="", help="data view or DE name the query reads")
+    parser.add_argument("--limit", type=int, default=PAGE_SIZE)
+    parser.add_argument("--show", type=int, help="print one saved generation")
+    parser.add_argument("--scale", type=int, default=0, help="search latency with this many saved generations")
+    parser.add_argument("--path", default=HISTORY_PATH)
+    args = parser.parse_args(argv)
+
+    if args.scale:
+        import tempfile
+
+        path = os.path.join(tempfile.gettempdir(), f"ampify_history_bench_{args.scale}.sqlite3")
+        report = bench_search(args.scale, path)
+        print(f"{report['entries']:,} saved generations · peak RSS {report['max_rss_mb']:.0f} MB")
+        for label, (p50, p99) in report["timings"].items():
+            print(f"  {label:<12} p50 {p50:6.2f} ms · p99 {p99:6.2f} ms (two pages)")
+        return 0
+    history = History(args.path)
+    if args.show:
+        entry = history.get(args.show)
+        if entry is None:
+            print(f"no generation {args.show}")
+            return 1
+        print(f"-- {entry.request}\n{entry.asm}\n\n{entry.exp}")
+        return 0
+    for s in history.search(args.search, args.object, limit=args.limit):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(s.created))
+        print(f"{s.id:>7}  {when}  {s.request[:70]:<70}  {s.objects}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,445 @@
+import argparse
+import glob
+import json
+import os
+import sys
+from collections import Counter, namedtuple
+from datetime import timedelta
+
+from ampify.cost import analyze
+from ampify.dataviews import JOIN_KEYS, TRACKING_VIEWS
+from ampify.planner import target_de
+from ampify.rewriter import AFTER_SEND, GOLDEN_DIR, ONE_PER_SEND, UNIQUE_KEYS, Query
+from ampify.tokenizer import name, splice, where_end
+from ampify.transform import HEADER_RE
+
+# ─────────────────────────────────────────
+# INCREMENTAL AUTOMATIONS
+# A daily query that rebuilds a 30-day list with Overwrite rescans the whole
+# window every night. For queries whose rows only ever depend on events
+# that already happened, the same DE can be kept current from the new events:
+#   backfill   run once, Overwrite — the query as it is, plus its key columns
+#   delta      daily, Update on the key — only events since the watermark
+#   expire     daily, Overwrite — rows whose event left the window are dropped
+#   advance    daily, Update on QueryName — stores the newest loaded EventDate
+# Replaying the steps day by day on the simulator must end with exactly the
+# rows of a full recompute:
+#   python -m ampify.incremental query.sql --verify
+# ─────────────────────────────────────────
+WATERMARK_DE = os.getenv("AMPIFY_WATERMARK_DE", "Ampify_Watermark")
+LOOKBACK_HOURS = int(os.getenv("AMPIFY_INCREMENTAL_LOOKBACK", "24"))    # re-read for late rows
+VERIFY_DAYS = 7
+DEFAULT_TARGET = "YourTargetDE"
+
+EVENT_VIEWS = TRACKING_VIEWS | {"_JourneyActivity"}
+# Dimensions a row is joined to when it loads — later changes are not picked up
+MUTABLE = {"_Subscribers", "_ListSubscribers", "_EnterpriseAttribute", "_BusinessUnitUnsubscribes"}
+NOW_FUNCTIONS = {"GETDATE", "GETUTCDATE", "SYSDATETIME", "CURRENT_TIMESTAMP"}
+LAST_EVENT = "LastEventDate"
+
+Item = namedtuple("Item", "start end expr source output")
+Incremental = namedtuple("Incremental", "target key watermark columns backfill delta expire advance notes")
+
+
+# ─────────────────────────────────────────
+# ELIGIBILITY
+# ─────────────────────────────────────────
+def _select_items(q, start, end):
+    # -> [Item] for the outer select list, or None when an item has no name
+    t, w = q.tokens, q.words
+    bounds, begin = [], start
+    for k in range(start, end):
+        if t[k].text == "," and q.levels[k] == 0:
+            bounds.append((begin, k))
+            begin = k + 1
+    bounds.append((begin, end))
+    items = []
+    for a, b in bounds:
+        e, output = b, None
+        if b - a > 2 and w[b - 2] == "AS" and t[b - 1].kind == "ident":
+            e, output = b - 2, name(t[b - 1])
+        elif b - a > 1 and t[b - 1].kind == "ident" and (
+                t[b - 2].kind in ("ident", "number", "string") or t[b - 2].text == ")"):
+            e, output = b - 1, name(t[b - 1])       # alias without AS
+        source = None
+        if e - a == 3 and t[a + 1].text == "." and t[a].kind == "ident" and t[a + 2].kind == "ident":
+            source = (name(t[a]), name(t[a + 2]))
+            output = output or source[1]
+        elif e - a == 1 and t[a].kind == "ident":
+            output = output or name(t[a])
+        if not output:
+            return None
+        items.append(Item(a, b, q.text(a, e), source, output))
+    return items
+
+
+def _to_one(q, ref):
+    # The join matches at most one row per event
+    view = q.views.get(ref.alias)
+    mine = set()
+    for a, b in q.on_parts(ref):
+        pair = q.equality(a, b)
+        if pair:
+            mine |= {col.lower() for alias, col in pair if alias == ref.alias}
+    if view == "_Sent":
+        return {k.lower() for k in JOIN_KEYS} <= mine
+    return any(all(c.lower() in mine for c in key) for key in UNIQUE_KEYS.get(view, []))
+
+
+def _window(q, d):
+    # -> (lower-bound conjunct, upper-bound conjuncts) on the driver's EventDate
+    t, w = q.tokens, q.words
+    lower, upper = None, []
+    for a, b in q.where_parts():
+        if b - a > 4 and name(t[a]) == d and t[a + 1].text == "." \
+                and name(t[a + 2]).lower() == "eventdate" and not q.aliases(a + 4, b) \
+                and "SELECT" not in w[a:b] and "OR" not in w[a:b]:
+            if t[a + 3].text in (">=", ">") and lower is None:
+                lower = (a, b)
+            elif t[a + 3].text in ("<", "<="):
+                upper.append((a, b))
+    return lower, upper
+
+
+def _unsupported(q):
+    # -> reason the rows can change after their event, or ""
+    if not q.ok():
+        return "only a single SELECT can be loaded incrementally"
+    d = q.driver.alias
+    view = q.views.get(d)
+    if view not in EVENT_VIEWS:
+        return "the query must read from a tracking data view (_Sent, _Open, _Click, ...)"
+    t, w = q.tokens, q.words
+    top = [k for k in range(len(t)) if q.levels[k] == 0]
+    if q.group or any(w[k] == "HAVING" for k in top) or any(
+            w[k] in ("COUNT", "MAX", "MIN", "SUM", "AVG") and k + 1 < len(t) and t[k + 1].text == "("
+            for k in range(q.select, q.driver.start)):
+        return "aggregates over the whole window have to be recomputed in full"
+    if any(w[k] == "TOP" for k in top) or any(w[k] == "ORDER" for k in top):
+        return "TOP / ORDER BY pick rows from the whole window"
+    for ref in q.refs:
+        if ref is q.driver:
+            continue
+        joined = q.views.get(ref.alias)
+        if joined in EVENT_VIEWS:
+            if ref.depth or not (joined == "_Sent" and view in AFTER_SEND):
+                return f"{joined} rows can arrive after the {view} event, which changes rows already loaded"
+            if not _to_one(q, ref):
+                return "_Sent must be joined on all four send keys"
+        elif ref.depth == 0:
+            if ref.join not in ("INNER", "LEFT"):
+                return f"{ref.join} JOIN is not supported"
+            if joined in UNIQUE_KEYS or joined in MUTABLE:
+                if not _to_one(q, ref):
+                    return f"the join to {joined} can return several rows per event"
+    lower, upper = _window(q, d)
+    if lower is None:
+        return f"no {d}.EventDate lower bound in the WHERE clause to load from"
+    allowed = [lower] + upper
+    for k, tok in enumerate(t):
+        if w[k] in NOW_FUNCTIONS and not any(a <= k < b for a, b in allowed):
+            return f"{tok.text} outside the EventDate window makes rows depend on the run date"
+    return ""
+
+
+def _notes(q):
+    notes = []
+    for ref in q.refs:
+        joined = q.views.get(ref.alias)
+        if joined in MUTABLE or (joined is None and ref.table):
+            notes.append(f"{ref.table} can change after a row is loaded — rows keep the values "
+                         f"they had when their event was loaded")
+    return sorted(set(notes))
+
+
+# ─────────────────────────────────────────
+# QUERIES
+# ─────────────────────────────────────────
+def _primary_key(q, d):
+    view = q.views[d]
+    if view == "_JourneyActivity":
+        return ["VersionID", "ActivityID", "SubscriberKey", "EventDate"]
+    if view == "_Sent":
+        return list(JOIN_KEYS)
+    t = q.tokens
+    unique = any(b - a == 5 and name(t[a]) == d and name(t[a + 2]).lower() == "isunique"
+                 and t[a + 3].text == "=" and t[a + 4].text == "1" for a, b in q.where_parts())
+    if view in ONE_PER_SEND and unique:
+        return list(JOIN_KEYS)
+    return list(JOIN_KEYS) + ["EventDate"] + (["IsUnique"] if view != "_Complaint" and not unique else [])
+
+
+def _free_name(wanted, taken):
+    found, n = wanted, 1
+    while found.lower() in taken:
+        n += 1
+        found = f"{wanted}{n}"
+    taken.add(found.lower())
+    return found
+
+
+def _header(title, target, key, extra=()):
+    lines = [title, f"-- Target DE: {target} (Primary Key: {', '.join(key)})"]
+    return "\n".join(lines + [f"-- {line}" for line in extra]) + "\n"
+
+
+def incremental_queries(sql):
+    # -> (Incremental, "") or (None, reason)
+    q = Query(sql)
+    reason = _unsupported(q)
+    if reason:
+        return None, reason
+    t, w = q.tokens, q.words
+    d = q.driver.alias
+    view = q.views[d]
+    distinct = w[q.select + 1] == "DISTINCT"
+    first = q.select + (2 if distinct else 1)
+    if any(tok.text == "*" and (t[k - 1].text in (".", ",") or w[k - 1] in ("SELECT", "DISTINCT"))
+           for k, tok in enumerate(t) if k):
+        return None, "SELECT * — list the columns so the key can be added"
+    items = _select_items(q, first, q.driver.start)
+    if items is None:
+        return None, "every selected column needs a name (add AS ...)"
+    taken = set()
+    for item in items:
+        if item.output.lower() in taken:
+            return None, f"two columns are named {item.output}"
+        taken.add(item.output.lower())
+    joins = {ref.alias: ref.join for ref in q.outer}
+    lower, _ = _window(q, d)
+    a, b = lower
+    window_expr = q.text(a + 4, b)
+    last = t[q.driver.start - 1].end
+    end = where_end(t, q.levels, w, q.where)
+    edits = []
+
+    if distinct:
+        # Keys seen in the window: one row per distinct tuple with its latest event
+        if any(item.source is None for item in items):
+            return None, "SELECT DISTINCT over expressions — select plain columns"
+        if any(joins.get(item.source[0]) not in ("FROM", "INNER") for item in items):
+            return None, "SELECT DISTINCT over LEFT JOIN columns — key columns cannot be NULL"
+        watermark = _free_name(LAST_EVENT, taken)
+        key = [item.output for item in items]
+        edits.append((t[q.select + 1].start, t[first].start, ""))
+        edits.append((last, last, f", MAX({d}.EventDate) AS {watermark}"))
+        edits.append((t[end - 1].end, t[end - 1].end,
+                      "\nGROUP BY " + ", ".join(item.expr for item in items)))
+        columns = key + [watermark]
+    else:
+        # One row per event: the driver's key columns identify it
+        selected = {(alias, col.lower()): item.output for item in items if item.source
+                    for alias, col in [item.source]}
+        pk = _primary_key(q, d)
+        key, added = [], []
+        for col in pk:
+            output = selected.get((d, col.lower()))
+            if output is None:
+                output = _free_name(col, taken)
+                added.append(f"{d}.{col}" + (f" AS {output}" if output != col else ""))
+            key.append(output)
+        watermark = selected.get((d, "eventdate"))
+        if watermark is None and "EventDate" in pk:
+            watermark = key[pk.index("EventDate")]
+        columns = [item.output for item in items] + [c for c in key if c.lower() not in
+                                                     {item.output.lower() for item in items}]
+        if watermark is None:
+            watermark = _free_name(LAST_EVENT, taken)
+            added.append(f"{d}.EventDate AS {watermark}")
+            columns.append(watermark)
+        if added:
+            edits.append((last, last, ", " + ", ".join(added)))
+
+    target = target_de(sql) or DEFAULT_TARGET
+    body = HEADER_RE.sub("", splice(sql, edits)).strip()
+    guard = (f"{d}.EventDate >= (SELECT ISNULL(DATEADD(hour, -{LOOKBACK_HOURS}, MAX(w.{LAST_EVENT})), "
+             f"{window_expr}) FROM {WATERMARK_DE} w WHERE w.QueryName = '{target}')")
+    delta_edits = edits + [(t[b - 1].end, t[b - 1].end, f"\n  AND {guard}")]
+    delta_body = HEADER_RE.sub("", splice(sql, delta_edits)).strip()
+
+    days = next((s.days for s in analyze(sql).scans if s.alias == d and s.days), None)
+    reads = f"instead of {days:g} days" if days else "instead of the whole window"
+    backfill = _header("-- ⏪ BACKFILL | Run once, then the watermark query | Overwrite",
+                       target, key) + body
+    delta = _header("-- 🔁 INCREMENTAL | Daily step 1 | Update", target, key, [
+        f"Reads {view} since the watermark in {WATERMARK_DE}, less {LOOKBACK_HOURS}h "
+        f"for late-arriving rows, {reads}"]) + delta_body
+    expire = _header("-- 🧹 EXPIRE | Daily step 2 | Overwrite", target, key, [
+        "Keeps the rows whose event is still inside the window"]) + (
+        f"SELECT {', '.join(f't.{c}' for c in columns)}\nFROM {target} t\n"
+        f"WHERE t.{watermark} {t[a + 3].text} {window_expr}")
+    advance = _header("-- 📌 WATERMARK | Daily step 3 | Update", WATERMARK_DE, ["QueryName"], [
+        f"{WATERMARK_DE} columns: QueryName Text(100) primary key, {LAST_EVENT} Date"]) + (
+        f"SELECT '{target}' AS QueryName, MAX(t.{watermark}) AS {LAST_EVENT}\nFROM {target} t")
+    notes = [f"Primary key of {target}: {', '.join(key)}"]
+    if distinct:
+        notes.append(f"{watermark} is added so keys can be dropped once their last event leaves the window")
+    notes += _notes(q)
+    return Incremental(target, key, watermark, columns, backfill, delta, expire, advance, notes), ""
+
+
+def steps(inc):
+    # (file stem, label, sql) in the order they are set up
+    return [
+        ("0_backfill", "Backfill — run once", inc.backfill),
+        ("1_delta", "Daily 1 — new events, Update", inc.delta),
+        ("2_expire", "Daily 2 — drop expired rows, Overwrite", inc.expire),
+        ("3_watermark", "Daily 3 — advance the watermark, Update", inc.advance),
+    ]
+
+
+# ─────────────────────────────────────────
+# VERIFICATION — replay the automation day by day on the simulator
+# ─────────────────────────────────────────
+def _as_of(conn, views, now):
+    # Data views as they looked at `now`: events after it are not there yet
+    from ampify.simulator import DATE_FORMAT, register_functions
+
+    register_functions(conn, now)
+    for view in views:
+        conn.execute(f'DROP TABLE IF EXISTS temp."{view}"')
+        conn.execute(f'CREATE TEMP TABLE "{view}" AS SELECT * FROM main."{view}" WHERE EventDate <= ?',
+                     (now.strftime(DATE_FORMAT),))
+
+
+def _statement(sql):
+    from ampify.simulator import translate
+
+    return translate(sql).strip().rstrip(";")
+
+
+def _overwrite(conn, table, sql):
+    conn.execute(f'CREATE TEMP TABLE "_overwrite" AS {_statement(sql)}')
+    conn.execute(f'DELETE FROM "{table}"')
+    conn.execute(f'INSERT INTO "{table}" SELECT * FROM "_overwrite"')
+    conn.execute('DROP TABLE "_overwrite"')
+
+
+def _quoted(columns):
+    return ", ".join(f'"{c}"' for c in columns)
+
+
+def _update(conn, table, columns, sql):
+    # Update data action: insert new keys, replace the rows of existing ones
+    return conn.execute(f'INSERT OR REPLACE INTO "{table}" ({_quoted(columns)}) {_statement(sql)}').rowcount
+
+
+def verify(sql, days=VERIFY_DAYS, simulator=None):
+    # -> {"ok", "detail", "rows", "delta_rows", "full_rows"}
+    import sqlite3
+
+    from ampify.simulator import get_simulator
+
+    inc, reason = incremental_queries(sql)
+    if inc is None:
+        return {"ok": False, "detail": f"not incremental: {reason}"}
+    sim = simulator or get_simulator()
+    q = Query(sql)
+    views = sorted({q.views[r.alias] for r in q.refs if q.views.get(r.alias) in EVENT_VIEWS})
+    conn = sim.connect()
+    try:
+        sim._stage_des(conn, sql)
+        start = sim.now - timedelta(days=days)
+        _as_of(conn, views, start)
+        conn.execute(f'CREATE TEMP TABLE "{inc.target}" AS {_statement(inc.backfill)}')
+        conn.execute(f'CREATE UNIQUE INDEX temp."ix_target" ON "{inc.target}" '
+                     f'({_quoted(inc.key)})')
+        conn.execute(f'CREATE TEMP TABLE "{WATERMARK_DE}" (QueryName TEXT PRIMARY KEY, {LAST_EVENT} TEXT)')
+        _update(conn, WATERMARK_DE, ["QueryName", LAST_EVENT], inc.advance)
+        delta_rows = []
+        for day in range(1, days + 1):
+            _as_of(conn, views, min(start + timedelta(days=day), sim.now))
+            delta_rows.append(_update(conn, inc.target, inc.columns, inc.delta))
+            _overwrite(conn, inc.target, inc.expire)
+            _update(conn, WATERMARK_DE, ["QueryName", LAST_EVENT], inc.advance)
+        full = conn.execute(_statement(sql))
+        names = [c[0] for c in full.description]
+        expected = Counter(full.fetchall())
+        got = Counter(conn.execute(
+            f'SELECT {_quoted(names)} FROM "{inc.target}"').fetchall())
+    except sqlite3.IntegrityError as e:
+        return {"ok": False, "detail": f"primary key ({', '.join(inc.key)}) is not unique: {e}"}
+    except sqlite3.Error as e:
+        return {"ok": False, "detail": f"simulator error: {e}"}
+    finally:
+        conn.close()
+    rows = sum(expected.values())
+    ok = got == expected
+    detail = (f"{rows:,} rows after {days} daily runs, same as a full recompute" if ok else
+              f"{sum(got.values()):,} rows incrementally, {rows:,} in a full recompute "
+              f"({sum((expected - got).values())} missing, {sum((got - expected).values())} extra)")
+    return {"ok": ok, "detail": detail, "rows": rows, "delta_rows": delta_rows}
+
+
+# ─────────────────────────────────────────
+# CLI
+# ─────────────────────────────────────────
+def golden_queries():
+    # (name, sql) for the Automation Studio queries in the golden data
+    here = os.path.dirname(GOLDEN_DIR)
+    for path in sorted(glob.glob(os.path.join(GOLDEN_DIR, "*.in.sql"))):
+        with open(path, encoding="utf-8") as f:
+            yield "rewrites/" + os.path.basename(path)[:-len(".in.sql")], f.read()
+    with open(os.path.join(here, "bench", "corpus.jsonl"), encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            if "---AS_START---" in row["completion"]:
+                yield "bench/" + row["id"], row["completion"].split("---AS_START---")[1].split("---AS_END---")[0].strip()
+    with open(os.path.join(here, "plan", "campaign.jsonl"), encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            yield "plan/" + row["id"], row["sql"]
+
+
+def write_queries(inc, out_dir):
+    from ampify.batch import write_atomic
+
+    os.makedirs(out_dir, exist_ok=True)
+    for stem, _, text in steps(inc):
+        write_atomic(os.path.join(out_dir, f"incremental_{stem}.sql"), text + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Turn a daily Overwrite query into an incremental load.")
+    parser.add_argument("sql", nargs="?", help="Automation Studio query file")
+    parser.add_argument("--out", help="write the four queries to this directory")
+    parser.add_argument("--verify", action="store_true",
+                        help="replay the daily runs on the synthetic data views and compare with a full recompute")
+    parser.add_argument("--golden", action="store_true", help="check every query in the golden data")
+    parser.add_argument("--days", type=int, default=VERIFY_DAYS)
+    args = parser.parse_args(argv)
+
+    if args.golden:
+        failures = 0
+        for case, sql in golden_queries():
+            inc, reason = incremental_queries(sql)
+            if inc is None:
+                print(f"-    {case}: {reason}")
+                continue
+            result = verify(sql, args.days)
+            failures += not result["ok"]
+            print(f"{'ok  ' if result['ok'] else 'FAIL'} {case}: {result['detail']}")
+        return 1 if failures else 0
+    if not args.sql:
+        parser.error("give a SQL file or --golden")
+    with open(args.sql, encoding="utf-8") as f:
+        sql = f.read()
+    inc, reason = incremental_queries(sql)
+    if inc is None:
+        print(f"cannot load incrementally: {reason}")
+        return 1
+    for _, label, text in steps(inc):
+        print(f"-- ── {label}\n{text}\n")
+    for note in inc.notes:
+        print(f"-- {note}")
+    if args.out:
+        write_queries(inc, args.out)
+    if args.verify:
+        result = verify(sql, args.days)
+        print(f"{'ok' if result['ok'] else 'FAIL'}: {result['detail']}")
+        return 0 if result["ok"] else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from ampify.candidates import CANDIDATES, race_sfmc_sql, wanted
+from ampify.core import complete_sections, lint_and_repair, rewrite_automation_sql, stream_sfmc_sql
+from ampify.history import get_history
+from ampify.metrics import Gauge, observe_failure, observe_generation, observe_job, observe_overload, source_of
+from ampify.resilient import GroqUnavailable
+from ampify.simulator import dry_run
+from ampify.singleflight import WORKERS, Overloaded
+from ampify.streaming import MarkerStreamParser
+
+# ─────────────────────────────────────────
+# BACKGROUND GENERATION JOBS
+# Generate submits a job and returns at once; a bounded pool of workers runs
+# the pipeline (stream, complete, lint, repair, rewrite, dry run) while the
+# page polls the job. The job id is kept in the session and the URL, so a
+# refresh picks the same job up again, and a job can be cancelled at any
+# point — the Groq call stops too when no other session shares it.
+# ─────────────────────────────────────────
+# A job worker mostly waits on its dispatcher call, so by default there are
+# as many as there are dispatcher workers (AMPIFY_WORKERS)
+JOB_WORKERS = int(os.getenv("AMPIFY_JOB_WORKERS", str(WORKERS)))
+JOB_QUEUE_MAX = int(os.getenv("AMPIFY_JOB_QUEUE_MAX", "64"))
+JOB_KEEP = float(os.getenv("AMPIFY_JOB_KEEP", "900"))       # seconds a finished job waits to be collected
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = {DONE, FAILED, CANCELLED}
+
+
+class Job:
+
+    def __init__(self, session, work, request="", de_names=""):
+        self.id = uuid.uuid4().hex
+        self.session = session
+        self.work = work
+        self.request = request
+        self.de_names = de_names
+        self.state = QUEUED
+        self.stage = "Waiting for a worker"
+        self.sections = {}          # text per section so far, while streaming
+        self.result = None
+        self.error = None           # (title, detail)
+        self.created = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.cancel = threading.Event()
+
+    @property
+    def done(self):
+        return self.state in FINISHED
+
+
+class JobQueue:
+
+    def __init__(self, workers=JOB_WORKERS, queue_max=JOB_QUEUE_MAX, keep=JOB_KEEP):
+        self.workers = workers
+        self.queue_max = queue_max
+        self.keep = keep
+        self.jobs = OrderedDict()           # id -> Job, oldest first
+        self.queue = deque()
+        self.running = 0
+        self._threads = []
+        self._cond = threading.Condition()
+
+    def submit(self, session, work, request="", de_names=""):
+        # -> Job; a session's earlier job that is still running is cancelled
+        with self._cond:
+            self._expire()
+            if len(self.queue) >= self.queue_max:
+                raise Overloaded("The generation queue is full — please try again in a few seconds", 5)
+            if session is not None:
+                for job in list(self.jobs.values()):
+                    if job.session == session and not job.done:
+                        self._cancel(job)
+            job = Job(session, work, request, de_names)
+            self.jobs[job.id] = job
+            self.queue.append(job)
+            self._ensure_workers()
+            self._cond.notify()
+            return job
+
+    def get(self, job_id):
+        with self._cond:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is not None and not job.done:
+                self._cancel(job)
+            return job
+
+    def position(self, job):
+        # Jobs ahead of this one in the queue (0 once it is running)
+        with self._cond:
+            return self.queue.index(job) + 1 if job in self.queue else 0
+
+    def depth(self):
+        return len(self.queue)
+
+    def _cancel(self, job):
+        job.cancel.set()
+        if job.state == QUEUED:
+            self.queue.remove(job)
+            self._finish(job, CANCELLED)
+
+    def _finish(self, job, state):
+        job.state = state
+        job.finished = time.monotonic()
+        observe_job(job)
+
+    def _expire(self):
+        # Finished jobs nobody came back for
+        now = time.monotonic()
+        while self.jobs:
+            job = next(iter(self.jobs.values()))
+            if not job.done or now - job.finished < self.keep:
+                break
+            del self.jobs[job.id]
+
+    # ── workers ──
+    def _ensure_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, daemon=True,
+                                      name=f"ampify-job-{len(self._threads)}")
+            self._threads.append(thread)
+            thread.start()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self.queue:
+                    self._cond.wait()
+                job = self.queue.popleft()
+                job.state = RUNNING
+                job.started = time.monotonic()
+                self.running += 1
+            try:
+                job.result = job.work(job)
+            except Exception as e:          # shown on the page instead of a result
+                job.error = ("❌ Generation failed", f"{type(e).__name__}: {e}")
+            with self._cond:
+                self.running -= 1
+                self._finish(job, CANCELLED if job.cancel.is_set() else FAILED if job.error else DONE)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_jobs():
+    # One queue per process, shared by every session
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = JobQueue()
+        return _default
+
+
+def use_jobs(jobs):
+    global _default
+    with _default_lock:
+        _default = jobs
+
+
+Gauge("ampify_job_queue_depth", "Generation jobs waiting for a worker",
+      lambda: _default.depth() if _default else 0)
+Gauge("ampify_jobs_running", "Generation jobs a worker is running", lambda: _default.running if _default else 0)
+
+
+# ─────────────────────────────────────────
+# THE GENERATION PIPELINE — what a job runs
+# ─────────────────────────────────────────
+def generation(simulate=True, streaming=True):
+    # -> work(job) returning the result fields the output panel shows, or
+    # None with job.error set
+    def work(job):
+        started = time.perf_counter()
+        info = {"session": job.session}
+        try:
+            if wanted(job.request):
+                job.stage = f"Trying {CANDIDATES} candidates at once"
+                raw = race_sfmc_sql(job.request, job.de_names, info, cancel=job.cancel)
+            elif not streaming:
+                job.stage = "Generating SFMC SQL"
+                raw = "".join(stream_sfmc_sql(job.request, job.de_names, info, job.cancel))
+            else:
+                job.stage = "Generating SFMC SQL"
+                parser = MarkerStreamParser()
+                chunks = []
+                for chunk in stream_sfmc_sql(job.request, job.de_names, info, job.cancel):
+                    chunks.append(chunk)
+                    parser.feed(chunk)
+                    job.sections = dict(parser.sections)
+                info["qs_ready_s"] = parser.finished_at.get("qs")
+                raw = "".join(chunks)
+            if job.cancel.is_set():
+                return None
+            job.stage = "Completing the answer"
+            qs, asm, exp = complete_sections(job.request, job.de_names, raw, info)
+        except Overloaded as e:
+            observe_overload(e)
+            job.error = ("🚦 Too many requests", str(e))
+            return None
+        except GroqUnavailable as e:
+            observe_failure(info, e, time.perf_counter() - started)
+            job.error = ("⏳ Groq did not answer", f"{e}. Please try again in a moment.")
+            return None
+
+        if job.cancel.is_set():
+            return None
+        job.stage = "Checking SFMC rules"
+        qs, asm, lint_qs, lint_as = lint_and_repair(job.request, job.de_names, qs, asm, exp, info)
+        asm, lint_as = rewrite_automation_sql(asm, lint_as, info)
+        observe_generation(info, qs, asm, exp, time.perf_counter() - started)
+        # Only complete generations are saved, as in batch runs; the panel
+        # still shows what came back
+        if qs and asm:
+            get_history().add(job.request, job.de_names, qs, asm, exp, source_of(info), info.get("model", ""))
+        result = {
+            "qs": qs, "asm": asm, "exp": exp, "lint_qs": lint_qs, "lint_as": lint_as,
+            "prompt_stats": info.get("prompt"), "rewrites": info.get("rewrites", []),
+            "original_as": info.get("original_as"), "info": info,
+        }
+        if simulate and not job.cancel.is_set():
+            job.stage = "Dry-running against synthetic data views"
+            result["dry_run"] = dry_run(qs, asm)
+        return result
+    return work
@@ -0,0 +1,196 @@
+import math
+import os
+import re
+from collections import namedtuple
+
+from ampify.cache import normalize_de_names
+
+# ─────────────────────────────────────────
+# RETRIEVAL-BASED PROMPT ASSEMBLY
+# SFMC_RULES stays the single source of truth; it is split into chunks
+# (rule groups, one per data view, one per proven pattern) and only the
+# chunks relevant to a request are sent as the system prompt.
+# ─────────────────────────────────────────
+PROMPT_BUDGET = int(os.getenv("AMPIFY_PROMPT_BUDGET", "750"))     # tokens
+COMPLETION_ESTIMATE = 900       # tokens reserved per call before usage is known
+
+# group: chunks sharing a heading are emitted under it once
+Chunk = namedtuple("Chunk", "id group text terms always order")
+
+# Extra vocabulary so plain-English requests reach the right data view
+SYNONYMS = {
+    "_Sent": "send sends sent received receive got emailed mailed contacted fatigue frequency delivered",
+    "_Open": "open opens opened opener openers engaged engagement read",
+    "_Click": "click clicks clicked clicker clickers url link links engaged engagement",
+    "_Bounce": "bounce bounces bounced bouncer bouncers hard soft smtp undeliverable",
+    "_Unsubscribe": "unsub unsubs unsubscribe unsubscribes unsubscribed optout opt",
+    "_Complaint": "complaint complaints spam abuse",
+    "_Job": "campaign campaigns email emailname subject job jobs from sender",
+    "_Subscribers": "active status held subscriber emailaddress address created",
+    "ENT._EnterpriseAttribute": "profile attribute attributes enterprise ent",
+    "_ListSubscribers": "listid membership",
+    "_JourneyActivity": "journey journeys activity activities entrants interaction",
+    "_BusinessUnitUnsubscribes": "business unit bu unsubscribes unsubscribed",
+    "date": "day days week weeks month months year today yesterday since last past recent ago date dates between",
+    "string": "concat concatenate name names upper lower length substring replace null blank trim",
+    "ent": "ent enterprise child bu business unit parent",
+    "placeholders": "",
+}
+
+WORD_RE = re.compile(r"[a-z0-9_]+")
+
+# Plain-English words and SQL keywords that say nothing about relevance
+STOPWORDS = set("""
+a all an and any are as at be but by de did didn do email emails for from get
+in into is it last me my no not of on or our past s that the their them this to
+was were who with within select join left inner where null distinct top
+subscriber subscribers contact contacts
+""".split())
+
+
+def terms(text):
+    # Lower-case words plus crude stems so "clickers" meets "click"
+    out = set()
+    for w in WORD_RE.findall(text.lower()):
+        if w in STOPWORDS:
+            continue
+        out.add(w)
+        out.add(w.strip("_"))
+        for suffix in ("ers", "er", "ed", "ing", "es", "s"):
+            if len(w) > len(suffix) + 2 and w.endswith(suffix):
+                out.add(w[:-len(suffix)])
+                break
+    return out
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English + SQL
+    return (len(text) + 3) // 4
+
+
+# Heading prefix -> chunk id for the rule groups that are always sent
+ALWAYS = {
+    "UNIVERSAL RULES": "universal_rules",
+    "QUERY STUDIO": "query_studio",
+    "AUTOMATION STUDIO": "automation_studio",
+    "CRITICAL JOIN PATTERN": "join_pattern",
+}
+
+
+def split_rules(rules):
+    chunks = []
+
+    def add(cid, group, text, extra="", always=False, index_text=None):
+        found = terms((text if index_text is None else index_text) + " " + extra)
+        chunks.append(Chunk(cid, group, text, found, always, len(chunks)))
+
+    body, _, patterns = rules.strip().partition("PROVEN PATTERNS TO REUSE:")
+    patterns, _, placeholders = patterns.partition("PLACEHOLDER DE NAMES")
+
+    for n, block in enumerate(re.split(r"\n\s*\n", body.strip())):
+        head = block.lstrip().split("\n", 1)[0]
+        if head.startswith("DATA VIEWS"):
+            for line in block.split("\n")[1:]:
+                view = line.split(":", 1)[0].strip()
+                add(view, "DATA VIEWS:", line, SYNONYMS.get(view, ""))
+        elif head.startswith("DATE:"):
+            for line in block.split("\n"):
+                key = "date" if line.startswith("DATE") else "string"
+                add(key, None, line, SYNONYMS[key])
+        elif head.startswith("ENT. PREFIX"):
+            add("ent", None, block, SYNONYMS["ent"])
+        else:
+            cid = next((v for k, v in ALWAYS.items() if head.startswith(k)),
+                       "persona" if n == 0 else f"rules{n}")
+            add(cid, None, block, always=True)
+
+    for item in re.split(r"\n\s*(?=\d+\. )", patterns.strip()):
+        # Patterns are ranked by their title and the data views they read
+        title = item.split(":", 1)[0]
+        views = " ".join(re.findall(r"_[A-Za-z]+", item))
+        add(f"pattern{title.split('.', 1)[0]}", "PROVEN PATTERNS TO REUSE:", item.strip(),
+            index_text=f"{title} {views}")
+
+    if placeholders:
+        add("placeholders", None, "PLACEHOLDER DE NAMES" + placeholders.rstrip())
+    return chunks
+
+
+_index_cache = {}
+
+
+def get_index(rules):
+    # Chunks plus inverse document frequencies, built once per rules text
+    index = _index_cache.get(rules)
+    if index is None:
+        chunks = split_rules(rules)
+        df = {}
+        for chunk in chunks:
+            for t in chunk.terms:
+                df[t] = df.get(t, 0) + 1
+        idf = {t: math.log(1 + len(chunks) / n) for t, n in df.items()}
+        index = (chunks, idf)
+        _index_cache.clear()
+        _index_cache[rules] = index
+    return index
+
+
+def select_chunks(rules, user_request, custom_de_names="", budget=PROMPT_BUDGET):
+    chunks, idf = get_index(rules)
+    de_names = normalize_de_names(custom_de_names)
+    # CamelCase DE names count as words too: GlobalSuppression -> global suppression
+    de_words = re.sub(r"([a-z])([A-Z])", r"\1 \2", " ".join(de_names))
+    query = terms(f"{user_request} {' '.join(de_names)} {de_words}")
+
+    chosen = [c for c in chunks if c.always]
+    if not de_names:
+        chosen += [c for c in chunks if c.id == "placeholders"]
+    used = sum(estimate_tokens(c.text) for c in chosen)
+
+    scored = []
+    for chunk in chunks:
+        if chunk in chosen or chunk.id == "placeholders":
+            continue
+        score = sum(idf.get(t, 0) for t in query & chunk.terms)
+        if score > 0:
+            scored.append((score, chunk))
+    scored.sort(key=lambda pair: (-pair[0], pair[1].order))
+
+    # Data view schemas are small and the model cannot guess them — fill them first
+    picked = [chunk for _, chunk in scored if chunk.group == "DATA VIEWS:"]
+    if not de_names and not picked:
+        # Nothing matched a data view or a DE — let the model see all views
+        picked = [c for c in chunks if c.group == "DATA VIEWS:"]
+    picked += [chunk for _, chunk in scored if chunk.group != "DATA VIEWS:"]
+
+    for chunk in picked:
+        cost = estimate_tokens(chunk.text)
+        if used + cost <= budget:
+            chosen.append(chunk)
+            used += cost
+    return sorted(chosen, key=lambda c: c.order)
+
+
+def assemble_prompt(rules, user_request, custom_de_names="", budget=PROMPT_BUDGET):
+    # -> (system prompt, stats) with stats in estimated tokens
+    chunks = select_chunks(rules, user_request, custom_de_names, budget)
+    parts = []
+    group = None
+    for chunk in chunks:
+        if chunk.group is None or chunk.group != group:
+            parts.append("")
+            if chunk.group:
+                parts.append(chunk.group)
+        parts.append(chunk.text)
+        group = chunk.group
+    prompt = "\n".join(parts).strip() + "\n"
+
+    full = estimate_tokens(rules)
+    sent = estimate_tokens(prompt)
+    stats = {
+        "chunks": [c.id for c in chunks],
+        "prompt_tokens": sent,
+        "full_tokens": full,
+        "saved_tokens": max(full - sent, 0),
+    }
+    return prompt, stats
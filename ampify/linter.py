@@ -0,0 +1,164 @@
+from collections import namedtuple
+
+from ampify.dataviews import JOIN_KEYS, TRACKING_VIEWS, dataview
+from ampify.tokenizer import column_refs, depths, line_of, table_refs, tokenize, word
+
+# ─────────────────────────────────────────
+# SFMC SQL LINTER — checks generated SQL against SFMC_RULES locally
+# ─────────────────────────────────────────
+# span = (start, end) character offsets into the linted SQL
+Violation = namedtuple("Violation", "rule severity message span")
+
+ERROR, WARNING, INFO = "error", "warning", "info"
+
+RULES = {
+    "SFMC001": "SELECT * — name every column",
+    "SFMC002": "LIMIT is not supported — use TOP N",
+    "SFMC003": "NOW() / CURRENT_DATE are not supported — use GETDATE()",
+    "SFMC004": "TRUE/FALSE literals are not supported — use 1 or 0",
+    "SFMC005": "#temp tables are not supported",
+    "SFMC006": "@variables are not supported",
+    "SFMC007": "DDL is not allowed in a query activity",
+    "SFMC008": "INSERT/UPDATE/DELETE are not allowed — just SELECT",
+    "SFMC009": "Stored procedures and batches are not supported",
+    "SFMC010": "Data views must be joined on JobID, ListID, BatchID and SubscriberID",
+    "SFMC011": "IsUnique = 1 belongs in the JOIN condition, not in WHERE",
+    "SFMC012": "Joined engagement view has no IsUnique = 1 filter",
+    "SFMC013": "Query Studio SQL needs TOP 100 on the outer SELECT",
+    "SFMC014": "UNION / UNION ALL is not supported in Query Studio",
+    "SFMC015": "ORDER BY without TOP",
+    "SFMC016": "Automation Studio SQL has no -- Target DE comment",
+    # Checked against the DE catalog by ampify.catalog, not by lint()
+    "SFMC017": "Column is not a field of the DE — field names are case-sensitive",
+}
+
+DDL = {"CREATE", "DROP", "ALTER", "TRUNCATE"}
+DML = {"INSERT", "UPDATE", "DELETE", "MERGE"}
+PROCEDURAL = {"EXEC", "EXECUTE", "DECLARE", "SET", "GO", "BEGIN", "PROCEDURE"}
+UNIQUE_VIEWS = {"_Open", "_Click", "_Bounce", "_Unsubscribe"}
+
+
+def _span(tokens, i, j=None):
+    j = i if j is None else j
+    return (tokens[i].start, tokens[j].end)
+
+
+def lint(sql, mode="as"):
+    # mode: "qs" (Query Studio) or "as" (Automation Studio)
+    found = []
+
+    def add(rule, severity, span, detail=""):
+        found.append(Violation(rule, severity, RULES[rule] + (f" ({detail})" if detail else ""), span))
+
+    tokens = tokenize(sql)
+    if not tokens:
+        return found
+    levels = depths(tokens)
+    words = [word(tok) for tok in tokens]
+
+    # ── token-level rules ──
+    select_top = {}       # depth -> does the current SELECT at this depth have TOP
+    openers = []          # word before each open "(" — OVER(...) may ORDER BY freely
+    for i, tok in enumerate(tokens):
+        if tok.text == "(":
+            openers.append(words[i - 1] if i else "")
+        elif tok.text == ")" and openers:
+            openers.pop()
+        w = words[i]
+        prev = words[i - 1] if i else ""
+        nxt = tokens[i + 1].text if i + 1 < len(tokens) else ""
+        if tok.text == "*":
+            before = tokens[i - 1].text if i else ""
+            if (before == "." or prev in ("SELECT", "DISTINCT") or before == ","
+                    or (i >= 2 and words[i - 2] == "TOP")):
+                add("SFMC001", ERROR, _span(tokens, i - 1 if before == "." else i, i))
+        elif w == "LIMIT":
+            add("SFMC002", ERROR, _span(tokens, i))
+        elif (w == "NOW" and nxt == "(") or w == "CURRENT_DATE":
+            add("SFMC003", ERROR, _span(tokens, i))
+        elif w in ("TRUE", "FALSE"):
+            add("SFMC004", ERROR, _span(tokens, i))
+        elif tok.kind == "temp":
+            add("SFMC005", ERROR, _span(tokens, i))
+        elif tok.kind == "var":
+            add("SFMC006", ERROR, _span(tokens, i))
+        elif w in DDL:
+            add("SFMC007", ERROR, _span(tokens, i), w)
+        elif w in DML and prev != "AS":
+            add("SFMC008", ERROR, _span(tokens, i), w)
+        elif w in PROCEDURAL and prev not in ("AS", ".") and (i == 0 or tokens[i - 1].text != "."):
+            add("SFMC009", ERROR, _span(tokens, i), w)
+        elif w == "SELECT":
+            select_top[levels[i]] = nxt.upper() == "TOP" or (
+                nxt.upper() == "DISTINCT" and i + 2 < len(tokens)
+                and words[i + 2] == "TOP")
+            if mode == "qs" and levels[i] == 0 and not select_top[0]:
+                add("SFMC013", ERROR, _span(tokens, i))
+        elif w == "TOP" and mode == "qs" and levels[i] == 0:
+            if i + 1 < len(tokens) and tokens[i + 1].kind == "number" \
+                    and float(tokens[i + 1].text) > 100:
+                add("SFMC013", WARNING, _span(tokens, i, i + 1), f"TOP {tokens[i + 1].text}")
+        elif w == "UNION" and mode == "qs":
+            add("SFMC014", ERROR, _span(tokens, i, i + 1 if nxt.upper() == "ALL" else i))
+        elif w == "ORDER" and nxt.upper() == "BY":
+            if not select_top.get(levels[i]) and not (openers and openers[-1] == "OVER"):
+                # Fatal inside subqueries everywhere; in Query Studio also at the top
+                if levels[i] > 0 or mode == "qs":
+                    add("SFMC015", ERROR, _span(tokens, i, i + 1))
+
+    # ── join rules ──
+    refs = table_refs(tokens, levels)
+    views = {ref.alias: dataview(ref.table) for ref in refs if ref.alias}
+    joined = {ref.alias: ref for ref in refs if ref.join != "FROM" and ref.alias}
+    for ref in refs:
+        view = dataview(ref.table)
+        if ref.join == "FROM" or view not in TRACKING_VIEWS:
+            continue
+        on_cols = column_refs(tokens, ref.on_start, ref.on_end)
+        partners = {a for a, _, _ in on_cols
+                    if a != ref.alias and views.get(a) in TRACKING_VIEWS}
+        if partners:
+            mine = {c.lower() for a, c, _ in on_cols if a == ref.alias}
+            missing = [k for k in JOIN_KEYS if k.lower() not in mine]
+            if missing:
+                add("SFMC010", ERROR, _span(tokens, ref.start, max(ref.on_end - 1, ref.start)),
+                    f"{ref.alias} missing {', '.join(missing)}")
+        if view in UNIQUE_VIEWS and ref.join in ("LEFT", "INNER") and partners:
+            mine = {c.lower() for a, c, _ in on_cols if a == ref.alias}
+            if "isunique" not in mine:
+                add("SFMC012", WARNING, _span(tokens, ref.start, ref.table_end - 1), ref.alias)
+
+    # IsUnique on a joined view inside WHERE
+    i = 0
+    while i < len(tokens):
+        if words[i] == "WHERE":
+            depth = levels[i]
+            k = i + 1
+            while k < len(tokens) and levels[k] >= depth and not (
+                    levels[k] == depth and words[k] in
+                    ("GROUP", "HAVING", "ORDER", "UNION", "EXCEPT", "INTERSECT")):
+                k += 1
+            for alias, col, at in column_refs(tokens, i + 1, k):
+                ref = joined.get(alias)
+                if col.lower() == "isunique" and ref is not None:
+                    severity = ERROR if ref.join == "LEFT" else WARNING
+                    add("SFMC011", severity, _span(tokens, at, at + 2), alias)
+            i = k
+        else:
+            i += 1
+
+    if mode == "as" and "target de" not in sql.lower():
+        add("SFMC016", INFO, (0, 0))
+
+    found.sort(key=lambda v: v.span)
+    return found
+
+
+def has_errors(violations):
+    return any(v.severity == ERROR for v in violations)
+
+
+def describe(sql, violation):
+    # "L3 SFMC001 error: SELECT * — name every column"
+    line = line_of(sql, violation.span[0])
+    return f"L{line} {violation.rule} {violation.severity}: {violation.message}"
@@ -0,0 +1,323 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ampify.resilient import describe_path
+
+# ─────────────────────────────────────────
+# INSTRUMENTATION
+# Per-request JSON log lines plus an in-process registry of counters and
+# histograms, readable in Prometheus text format:
+#   AMPIFY_METRICS_PORT=9464 streamlit run app.py
+#   curl localhost:9464/metrics
+# ─────────────────────────────────────────
+METRICS_PORT = int(os.getenv("AMPIFY_METRICS_PORT", "0"))       # 0 = no endpoint
+LOG_PATH = os.getenv("AMPIFY_LOG_PATH", "")                     # "" = stderr
+LOGGING = os.getenv("AMPIFY_LOG", "1") == "1"
+# Per-rerun breakdown of Streamlit script time
+PROFILE = os.getenv("AMPIFY_PROFILE", "0") == "1"
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000)
+
+_lock = threading.Lock()
+_registry = {}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.values = {}
+        _registry[name] = self
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, key)} {value:g}")
+        return lines
+
+
+class Gauge:
+    # Value read when scraped, from a function of no arguments
+
+    def __init__(self, name, help, read):
+        self.name, self.help, self.read = name, help, read
+        _registry[name] = self
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.read():g}"]
+
+
+class Histogram:
+
+    def __init__(self, name, help, buckets, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}        # labels -> [bucket counts..., sum, count]
+        _registry[name] = self
+
+    def observe(self, value, *labels):
+        with _lock:
+            series = self.series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series):
+                le = _labels(self.labels + ("le",), key + (f"{bound:g}",))
+                lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {series[-2]:g}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+REQUESTS = Counter("ampify_requests_total", "Generations by answer source "
+                   "(local, cache, similar, coalesced, groq, history)", ["source"])
+OVERLOADED = Counter("ampify_overloaded_total", "Requests turned away by the queue or a session limit")
+REJECTS = Counter("ampify_validation_rejects_total", "Requests rejected before generation", ["reason"])
+PARSE_FAILURES = Counter("ampify_parse_failures_total", "Answers missing a section", ["section"])
+SECTIONS = Counter("ampify_section_problems_total", "Answer sections missing, cut off, empty, "
+                   "unclosed or fenced", ["section", "problem"])
+PARTIAL_SAVED_TOKENS = Counter("ampify_partial_saved_tokens_total",
+                               "Tokens a full retry would have cost beyond re-requesting single sections")
+PARTIAL_SAVED_SECONDS = Counter("ampify_partial_saved_seconds_total",
+                                "Generation seconds saved by re-requesting single sections")
+CANDIDATES = Counter("ampify_candidates_total", "Parallel candidates by outcome "
+                     "(won, rejected, cancelled)", ["outcome"])
+REPAIRS = Counter("ampify_repairs_total", "Sections sent back for a lint repair", ["section"])
+PATHS = Counter("ampify_client_path_total", "Groq calls by serving path "
+                "(primary, retry, hedge, fallback, failed)", ["path", "model"])
+TOKENS = Counter("ampify_tokens_total", "Groq tokens used", ["model", "kind"])
+GENERATION_SECONDS = Histogram("ampify_generation_seconds", "Wall time per request, validate to final SQL",
+                               SECONDS_BUCKETS, ["source"])
+TTFT_SECONDS = Histogram("ampify_ttft_seconds", "Time to the first streamed token", SECONDS_BUCKETS, ["model"])
+COMPLETION_TOKENS = Histogram("ampify_completion_tokens", "Completion tokens per Groq call",
+                              TOKEN_BUCKETS, ["model"])
+JOBS = Counter("ampify_jobs_total", "Background generation jobs by outcome "
+               "(done, failed, cancelled)", ["outcome"])
+JOB_WAIT_SECONDS = Histogram("ampify_job_wait_seconds", "Time a job waited in the queue for a worker",
+                             SECONDS_BUCKETS)
+JOB_RUN_SECONDS = Histogram("ampify_job_run_seconds", "Time a worker spent on a job", SECONDS_BUCKETS)
+SCRIPT_SECONDS = Histogram("ampify_script_seconds", "Streamlit script time per rerun section",
+                           SECONDS_BUCKETS, ["scope", "section"])
+
+
+def render():
+    with _lock:
+        lines = [line for metric in _registry.values() for line in metric.render()]
+    return "\n".join(lines) + "\n"
+
+
+# ─────────────────────────────────────────
+# STRUCTURED LOGS — one JSON object per line
+# ─────────────────────────────────────────
+_logger = logging.getLogger("ampify.metrics")
+
+
+def _setup_logger():
+    if _logger.handlers:
+        return
+    handler = logging.FileHandler(LOG_PATH, encoding="utf-8") if LOG_PATH else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    _logger.addHandler(handler)
+    _logger.setLevel(logging.INFO)
+    _logger.propagate = False
+
+
+def log_event(event, **fields):
+    if not LOGGING:
+        return
+    _setup_logger()
+    _logger.info(json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, default=str))
+
+
+# ─────────────────────────────────────────
+# RECORDERS — called by app.py and the batch runner
+# ─────────────────────────────────────────
+def source_of(info):
+    if info.get("source"):
+        return info["source"]
+    if info.get("cache") == "hit":
+        return "cache"
+    if info.get("cache") == "similar":
+        return "similar"
+    return "coalesced" if info.get("coalesced") else "groq"
+
+
+def observe_reject(request, reason):
+    REJECTS.inc(reason)
+    log_event("reject", reason=reason, request_chars=len(request))
+
+
+def observe_generation(info, qs, as_, exp, seconds):
+    # info is the dict threaded through core; the Groq fields are only set
+    # when a call was actually made
+    source = source_of(info)
+    model = info.get("model", "")
+    REQUESTS.inc(source)
+    GENERATION_SECONDS.observe(seconds, source)
+    usage = info.get("usage")
+    if usage:
+        TOKENS.inc(model, "prompt", amount=usage["prompt_tokens"])
+        TOKENS.inc(model, "completion", amount=usage["completion_tokens"])
+        COMPLETION_TOKENS.observe(usage["completion_tokens"], model)
+    if info.get("ttft_s") is not None:
+        TTFT_SECONDS.observe(info["ttft_s"], model)
+    parsed = {"qs": bool(qs), "as": bool(as_), "exp": bool(exp)}
+    for section, ok in parsed.items():
+        if not ok:
+            PARSE_FAILURES.inc(section)
+    for section, problem in info.get("sections", {}).items():
+        SECTIONS.inc(section, problem)
+    partial = info.get("partial")
+    if partial:
+        TOKENS.inc(model, "partial", amount=partial["tokens"])
+        PARTIAL_SAVED_TOKENS.inc(amount=partial["saved_tokens"] or 0)
+        PARTIAL_SAVED_SECONDS.inc(amount=partial["saved_s"] or 0)
+    race = info.get("candidates")
+    if race:
+        CANDIDATES.inc("won", amount=int(race["valid"]))
+        CANDIDATES.inc("rejected", amount=len(race["problems"]))
+        CANDIDATES.inc("cancelled", amount=race["cancelled"])
+    for section in info.get("repaired", []):
+        REPAIRS.inc(section)
+    path = info.get("path")
+    if path:
+        PATHS.inc(describe_path(path), path["model"] or "")
+    log_event(
+        "generation", source=source, model=model or None, seconds=round(seconds, 3),
+        groq_s=info.get("groq_s"), ttft_s=info.get("ttft_s"), usage=usage,
+        path=describe_path(path) if path else None,
+        attempts=path["attempts"] if path else None, hedged=path["hedged"] if path else None,
+        cache=info.get("cache"), similarity=info.get("similarity"), intent=info.get("intent"), parsed=parsed,
+        sections=info.get("sections"), partial=partial, candidates=race,
+        repaired=info.get("repaired", []), rewrites=len(info.get("rewrites", [])),
+    )
+
+
+def observe_reuse(entry):
+    # A saved generation reused from the history panel
+    REQUESTS.inc("history")
+    log_event("reuse", id=entry.id, source=entry.source, uses=entry.uses + 1)
+
+
+def observe_job(job):
+    # A background job that finished, failed, was cancelled or never collected
+    JOBS.inc(job.state)
+    if job.started is not None:
+        JOB_WAIT_SECONDS.observe(job.started - job.created)
+        JOB_RUN_SECONDS.observe((job.finished or job.started) - job.started)
+    log_event("job", id=job.id, state=job.state,
+              wait_s=round(job.started - job.created, 3) if job.started is not None else None,
+              run_s=round(job.finished - job.started, 3) if job.started is not None and job.finished else None,
+              error=job.error[1] if job.error else None)
+
+
+def observe_overload(error):
+    OVERLOADED.inc()
+    log_event("overloaded", error=str(error), retry_in=error.retry_in)
+
+
+def observe_failure(info, error, seconds):
+    # Every model and retry failed, or the deadline passed
+    path = info.get("path") or {}
+    PATHS.inc("failed", "")
+    log_event("generation_failed", error=str(error), seconds=round(seconds, 3),
+              attempts=path.get("attempts"), errors=path.get("errors"))
+
+
+# ─────────────────────────────────────────
+# METRICS ENDPOINT
+# ─────────────────────────────────────────
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+
+
+def start_metrics_server(port=METRICS_PORT):
+    # Idempotent — Streamlit reruns the script, the endpoint lives per process
+    global _server
+    with _lock:
+        if _server is not None or not port:
+            return _server
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+        except OSError as e:        # port taken, e.g. a second Streamlit process
+            log_event("metrics_server_error", port=port, error=str(e))
+            return None
+        _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    log_event("metrics_server", port=port)
+    return _server
+
+
+# ─────────────────────────────────────────
+# SCRIPT PROFILING — opt-in with AMPIFY_PROFILE=1
+# ─────────────────────────────────────────
+class ScriptProfile:
+    # Lap timer — each lap(name) charges the time since the previous lap to
+    # name, so app.py can mark sections without re-indenting them. scope is
+    # "app" for full reruns or the name of a fragment that reran on its own
+
+    def __init__(self, scope="app", enabled=PROFILE):
+        self.scope = scope
+        self.enabled = enabled
+        self.started = self.last = time.perf_counter()
+        self.sections = {}
+
+    def lap(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.sections[name] = self.sections.get(name, 0.0) + now - self.last
+        self.last = now
+
+    def finish(self):
+        # -> {section: seconds} plus "total"; logged and added to the histogram
+        if not self.enabled:
+            return {}
+        breakdown = dict(self.sections, total=time.perf_counter() - self.started)
+        for name, seconds in breakdown.items():
+            SCRIPT_SECONDS.observe(seconds, self.scope, name)
+        log_event("rerun", scope=self.scope, **{f"{name}_ms": round(seconds * 1000, 2) for name, seconds in breakdown.items()})
+        return breakdown
@@ -0,0 +1,199 @@
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ampify.cache import normalize_request
+from ampify.knowledge import estimate_tokens
+
+# ─────────────────────────────────────────
+# LOCAL GROQ-COMPATIBLE MOCK SERVER
+# Serves recorded completions on /openai/v1/chat/completions with a
+# configurable time-to-first-token and tokens/sec, streaming or not.
+#   python -m ampify.mock_groq --port 8765 --latency 0.4 --tps 250
+#   GROQ_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+# Faults can be injected to exercise the resilient client:
+#   python -m ampify.mock_groq --error-rate 0.3 --status 429 --retry-after 1
+#   python -m ampify.mock_groq --slow-rate 0.1 --slow 20 --down-model llama-3.3-70b-versatile
+# ─────────────────────────────────────────
+REQUEST_RE = re.compile(r"User Request:\s*(.+)")
+SECTION_RE = re.compile(r"Write ONLY the .*?---(QS|AS|EXP)_START---", re.S)
+CHARS_PER_CHUNK = 16
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class MockGroq:
+    # Completion lookup and timing; shared by every handler thread
+
+    def __init__(self, corpus, latency=0.3, tps=250.0, faults=None):
+        self.by_request = {normalize_request(row["request"]): row["completion"] for row in corpus}
+        self.default = corpus[0]["completion"] if corpus else ""
+        self.latency = latency
+        self.tps = tps
+        # error_rate / fail_first -> status (+ retry_after); slow_rate / slow_first
+        # -> slow extra seconds before the first token; down_models -> 503
+        self.faults = dict(faults or {})
+        self.random = random.Random(self.faults.get("seed", 0))
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def fault(self, n, model):
+        # -> ("error", status, retry_after) / ("slow", seconds) / None for request n
+        f = self.faults
+        if model in f.get("down_models", ()):
+            return ("error", 503, None)
+        with self._lock:
+            roll = self.random.random()
+        if n <= f.get("fail_first", 0) or roll < f.get("error_rate", 0):
+            return ("error", f.get("status", 429), f.get("retry_after"))
+        if n <= f.get("slow_first", 0) or roll > 1 - f.get("slow_rate", 0):
+            return ("slow", f.get("slow", 10.0))
+        return None
+
+    def completion(self, messages):
+        prompt = messages[-1]["content"]
+        if "Fix ONLY" in prompt:
+            # Repairs echo the SQL back unchanged
+            sql = prompt.split("SQL:", 1)[-1].split("Return only", 1)[0].strip()
+            return f"---SQL_START---\n{sql}\n---SQL_END---"
+        m = REQUEST_RE.search(prompt)
+        key = normalize_request(m.group(1)) if m else ""
+        completion = self.by_request.get(key, self.default)
+        only = SECTION_RE.search(prompt)
+        if only:
+            return self.section(completion, only.group(1))
+        return completion
+
+    def section(self, completion, tag):
+        # A re-requested section: the recorded one, closed if the recording was cut
+        start, end = f"---{tag}_START---", f"---{tag}_END---"
+        if start not in completion:
+            text = "This query selects the requested subscribers from the data views above."
+        else:
+            text = completion.split(start, 1)[1].split(end, 1)[0]
+            text = re.split(r"---\w+_START---", text)[0].strip()
+        return f"{start}\n{text}\n{end}"
+
+    def usage(self, messages, text):
+        prompt = sum(estimate_tokens(m["content"]) for m in messages)
+        completion = estimate_tokens(text)
+        return {"prompt_tokens": prompt, "completion_tokens": completion,
+                "total_tokens": prompt + completion}
+
+
+class Handler(BaseHTTPRequestHandler):
+    mock = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "not found"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        mock = self.mock
+        with mock._lock:
+            mock.requests += 1
+            n = mock.requests
+        fault = mock.fault(n, body["model"])
+        if fault and fault[0] == "error":
+            _, status, after = fault
+            self._json(status, {"error": {"message": f"injected {status}", "type": "mock_fault"}},
+                       {"retry-after": str(after)} if after is not None else None)
+            return
+        text = mock.completion(body["messages"])
+        usage = mock.usage(body["messages"], text)
+        per_chunk = CHARS_PER_CHUNK / 4 / mock.tps if mock.tps else 0
+        base = {"id": f"mock-{n}", "created": int(time.time()), "model": body["model"]}
+
+        time.sleep(mock.latency + (fault[1] if fault else 0))
+        if not body.get("stream"):
+            time.sleep(per_chunk * len(text) / CHARS_PER_CHUNK)
+            self._json(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": text},
+            }]))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for i in range(0, len(text), CHARS_PER_CHUNK):
+                chunk = dict(base, object="chat.completion.chunk", choices=[{
+                    "index": 0, "finish_reason": None,
+                    "delta": {"content": text[i:i + CHARS_PER_CHUNK]},
+                }])
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(per_chunk)
+            final = dict(base, object="chat.completion.chunk", x_groq={"usage": usage},
+                         choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass        # the client hung up, e.g. a cancelled job or the losing hedge
+
+
+def start_server(corpus, port=0, latency=0.3, tps=250.0, faults=None):
+    # -> (server, base_url); the server runs on a daemon thread
+    handler = type("MockHandler", (Handler,), {"mock": MockGroq(corpus, latency, tps, faults)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main(argv=None):
+    from ampify.benchmark import CORPUS_PATH
+
+    parser = argparse.ArgumentParser(description="Serve recorded completions like the Groq API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds to first token")
+    parser.add_argument("--tps", type=float, default=250.0, help="completion tokens per second")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--status", type=int, default=429, help="HTTP status of injected failures")
+    parser.add_argument("--retry-after", type=float, help="retry-after header on injected failures")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that stall")
+    parser.add_argument("--slow", type=float, default=10.0, help="extra seconds before the first token")
+    parser.add_argument("--down-model", action="append", default=[], help="model that always returns 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    faults = {"error_rate": args.error_rate, "status": args.status, "retry_after": args.retry_after,
+              "slow_rate": args.slow_rate, "slow": args.slow, "down_models": args.down_model,
+              "seed": args.seed}
+    server, url = start_server(load_corpus(args.corpus), args.port, args.latency, args.tps, faults)
+    print(f"mock Groq on {url} — set GROQ_BASE_URL={url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+# ─────────────────────────────────────────
+# STATIC PAGE HTML
+# Everything on the page that does not depend on the session is built here
+# once per process; app.py only hands the finished strings to st.markdown.
+# ─────────────────────────────────────────
+
+
+def render_items(items, bg, border_color, text_color, mono=False):
+    ff = "font-family:'JetBrains Mono',monospace;" if mono else ""
+    html = []
+    for item in items:
+        if isinstance(item, tuple):
+            name, desc = item
+            html.append(
+                f'<div style="background:{bg};border-left:3px solid {border_color};'
+                f'border-radius:0 7px 7px 0;padding:7px 12px;margin:3px 0;{ff}">'
+                f'<span style="font-weight:600;color:{text_color};font-size:0.78rem;">{name}</span>'
+                f'<span style="display:block;color:#5B7A90;font-size:0.71rem;margin-top:1px;">{desc}</span>'
+                f'</div>'
+            )
+        else:
+            html.append(
+                f'<div style="background:{bg};border-left:3px solid {border_color};'
+                f'border-radius:0 7px 7px 0;padding:7px 12px;margin:3px 0;'
+                f'color:{text_color};font-size:0.78rem;font-weight:500;{ff}">{item}</div>'
+            )
+    return "".join(html)
+
+
+def label_html(text):
+    return (
+        f'<div style="font-size:0.62rem;font-weight:800;letter-spacing:2.5px;'
+        f'text-transform:uppercase;color:#00B5E2;margin-bottom:4px;">{text}</div>'
+    )
+
+
+def title_html(text):
+    return f'<div style="font-size:0.94rem;font-weight:700;color:#0D2B45;margin-bottom:12px;">{text}</div>'
+
+
+def heading_html(text, top=14):
+    return (
+        f'<div style="font-size:0.78rem;font-weight:700;color:#0D2B45;'
+        f'margin:{top}px 0 6px;">{text}</div>'
+    )
+
+
+DIVIDER = '<div style="height:1.5px;background:#E2EFF5;margin:20px 0;"></div>'
+
+
+def spacer(px):
+    return f'<div style="height:{px}px;"></div>'
+
+
+# Minimal CSS — only target what Streamlit reliably allows
+CSS = """
+<style>
+@import url('https://fonts.googleapis.com/css2?family=DM+Sans:wght@400;500;600;700;800&family=JetBrains+Mono:wght@400;600&display=swap');
+
+.stApp { background: #F4FBFF !important; }
+#MainMenu, footer, header { visibility: hidden; }
+.block-container { padding-top: 0 !important; max-width: 100% !important; }
+
+/* Text area input styling */
+textarea {
+    background: #ffffff !important;
+    border: 1.5px solid #C8E6F5 !important;
+    border-radius: 10px !important;
+    color: #0D2B45 !important;
+    font-size: 0.88rem !important;
+    line-height: 1.65 !important;
+}
+textarea:focus {
+    border-color: #00B5E2 !important;
+    box-shadow: 0 0 0 3px rgba(0,181,226,0.1) !important;
+}
+
+/* Primary generate button */
+.stButton > button {
+    background: linear-gradient(135deg, #00B5E2, #007FAA) !important;
+    color: white !important;
+    border: none !important;
+    border-radius: 10px !important;
+    font-weight: 700 !important;
+    font-size: 0.92rem !important;
+    padding: 0.7rem 1.5rem !important;
+    box-shadow: 0 4px 14px rgba(0,181,226,0.35) !important;
+    width: 100% !important;
+    transition: transform 0.15s, box-shadow 0.15s !important;
+}
+.stButton > button:hover {
+    transform: translateY(-1px) !important;
+    box-shadow: 0 6px 20px rgba(0,181,226,0.45) !important;
+}
+
+/* Download button — secondary style */
+.stDownloadButton > button {
+    background: white !important;
+    color: #0D2B45 !important;
+    border: 1.5px solid #C8E6F5 !important;
+    border-radius: 10px !important;
+    font-weight: 600 !important;
+    font-size: 0.84rem !important;
+    width: 100% !important;
+    box-shadow: none !important;
+}
+.stDownloadButton > button:hover {
+    border-color: #00B5E2 !important;
+    background: #EEF9FF !important;
+    transform: none !important;
+    box-shadow: none !important;
+}
+
+/* Tab strip */
+.stTabs [data-baseweb="tab-list"] {
+    background: #E4F2F9 !important;
+    border-radius: 10px !important;
+    padding: 4px !important;
+    border: none !important;
+}
+.stTabs [data-baseweb="tab"] {
+    background: transparent !important;
+    border-radius: 7px !important;
+    color: #5B7A90 !important;
+    font-weight: 600 !important;
+    font-size: 0.84rem !important;
+    padding: 7px 18px !important;
+    border: none !important;
+}
+.stTabs [aria-selected="true"] {
+    background: white !important;
+    color: #0D2B45 !important;
+    box-shadow: 0 1px 5px rgba(0,0,0,0.08) !important;
+}
+.stTabs [data-baseweb="tab-panel"] { padding: 0 !important; }
+
+/* Hide all textarea labels Streamlit adds */
+.stTextArea label { display: none !important; }
+</style>
+"""
+
+# ── HERO ──
+HERO = """
+<div style="background:linear-gradient(135deg,#032D60 0%,#0A4080 55%,#0090B8 100%);
+            padding:44px 48px 40px;margin-bottom:28px;position:relative;overflow:hidden;">
+    <div style="position:absolute;right:48px;top:24px;font-size:8rem;
+                opacity:0.06;line-height:1;pointer-events:none;">☁</div>
+    <div style="font-size:0.63rem;font-weight:800;letter-spacing:3px;
+                text-transform:uppercase;color:#7DD3F0;margin-bottom:10px;">
+        Salesforce Marketing Cloud Developer Tool
+    </div>
+    <div style="font-size:2.8rem;font-weight:800;color:#fff;
+                letter-spacing:-1px;line-height:1.1;margin-bottom:10px;">
+        ⚡ AMP<span style="color:#00D4AA;">ify</span>
+    </div>
+    <div style="font-size:0.94rem;color:rgba(255,255,255,0.6);
+                font-weight:500;margin-bottom:22px;">
+        Describe your query in plain English. Get production-ready SFMC SQL instantly.
+    </div>
+    <div style="display:flex;flex-wrap:wrap;gap:8px;">
+        <span style="background:rgba(255,255,255,0.1);border:1px solid rgba(255,255,255,0.2);
+                     border-radius:100px;padding:4px 14px;font-size:0.73rem;
+                     font-weight:600;color:rgba(255,255,255,0.85);">☁️ All Data Views</span>
+        <span style="background:rgba(0,212,170,0.15);border:1px solid rgba(0,212,170,0.4);
+                     border-radius:100px;padding:4px 14px;font-size:0.73rem;
+                     font-weight:600;color:#00D4AA;">✅ Query Studio Safe</span>
+        <span style="background:rgba(255,107,53,0.15);border:1px solid rgba(255,107,53,0.4);
+                     border-radius:100px;padding:4px 14px;font-size:0.73rem;
+                     font-weight:600;color:#FF8057;">🚀 Automation Studio Ready</span>
+        <span style="background:rgba(255,255,255,0.1);border:1px solid rgba(255,255,255,0.2);
+                     border-radius:100px;padding:4px 14px;font-size:0.73rem;
+                     font-weight:600;color:rgba(255,255,255,0.85);">🌐 Any Industry</span>
+    </div>
+</div>
+"""
+
+# ── QUICK REFERENCE ──
+NEVER_USE = [
+    "No SELECT * — name all columns explicitly",
+    "No LIMIT — use TOP N instead",
+    "No NOW() — use GETDATE()",
+    "No TRUE/FALSE — use 1 or 0",
+    "No #temp tables or @variables",
+    "No stored procedures or DDL",
+    "No UNION / UNION ALL in Query Studio",
+    "No INSERT INTO in query activity — just SELECT",
+]
+JOIN_PATTERN = [
+    "ON  a.JobID        = b.JobID",
+    "AND a.ListID       = b.ListID",
+    "AND a.BatchID      = b.BatchID",
+    "AND a.SubscriberID = b.SubscriberID",
+    "AND b.IsUnique     = 1  ← in JOIN, not WHERE",
+]
+FUNCTIONS = [
+    "GETDATE()  →  current datetime",
+    "DATEADD(day, -30, GETDATE())",
+    "DATEDIFF(day, DateField, GETDATE())",
+    "ISNULL(Field, 'default')",
+    "CONVERT(DATE, DateField)",
+    "CONVERT(VARCHAR, DateField, 101)  →  MM/DD/YYYY",
+    "Field1 + ' ' + Field2  →  concatenation",
+    "LEN() | UPPER() | LOWER() | SUBSTRING()",
+]
+DATA_VIEWS = [
+    ("_Sent", "SubscriberKey, JobID, EventDate, ListID, BatchID"),
+    ("_Open", "IsUnique, Domain, EventDate — multiple rows per open"),
+    ("_Click", "URL, LinkName, IsUnique — multiple rows per click"),
+    ("_Bounce", "BounceCategory, SMTPBounceReason, Domain"),
+    ("_Unsubscribe", "EventDate, IsUnique"),
+    ("_Complaint", "Spam complaints — join _Job for email name"),
+    ("_Job", "EmailName, FromEmail, DeliveredTime — BU-specific"),
+    ("_Subscribers", "Status: Active / Bounced / Unsubscribed / Held"),
+    ("ENT._EnterpriseAttribute", "Profile attributes — join on _SubscriberID"),
+    ("_JourneyActivity", "ActivityName, ActivityType, EventDate"),
+    ("_BusinessUnitUnsubscribes", "BU-level unsubs — BusinessUnitID"),
+]
+
+REFERENCE = "".join([
+    label_html("SFMC SQL Quick Reference"),
+    spacer(4),
+    heading_html("❌ Never use in SFMC", top=10),
+    render_items(NEVER_USE, "#FFF4EF", "#FF6B35", "#7A2800"),
+    heading_html("🔗 Critical — 4-key join pattern"),
+    '<div style="background:#F0F9FF;border:1.5px solid #C8E6F5;border-radius:10px;padding:14px 16px;">'
+    '<div style="font-size:0.68rem;color:#5B7A90;font-weight:600;margin-bottom:8px;">'
+    'Always join data views on ALL FOUR keys — never SubscriberKey alone:</div>',
+    render_items(JOIN_PATTERN, "#EDFAF5", "#00D4AA", "#004D3A", mono=True),
+    "</div>",
+    heading_html("✅ Key SFMC functions"),
+    render_items(FUNCTIONS, "#EDFAF5", "#00D4AA", "#004D3A", mono=True),
+    heading_html("☁️ System data views"),
+    render_items(DATA_VIEWS, "#EEF6FF", "#00B5E2", "#0D2B45"),
+])
+
+DE_HINT = (
+    '<div style="font-size:0.8rem;color:#5B7A90;margin-bottom:8px;line-height:1.5;">'
+    'Leave blank — AMPify suggests placeholder DE names based on your query.<br>'
+    'Or enter your actual DE names, one per line — import their schemas below '
+    'and the SQL uses your exact field names.'
+    '</div>'
+)
+
+# ── OUTPUT PANEL ──
+QS_BANNER = """
+<div style="background:#EDFAF5;border:1px solid rgba(0,212,170,0.35);
+            border-radius:8px;padding:9px 14px;margin-bottom:10px;
+            font-size:0.8rem;font-weight:600;color:#004D3A;">
+    ✅ Safe to paste directly in Query Studio — Preview only, max 100 rows, no DE written
+</div>
+"""
+
+AS_BANNER = """
+<div style="background:#FFF4EF;border:1px solid rgba(255,107,53,0.3);
+            border-radius:8px;padding:9px 14px;margin-bottom:10px;
+            font-size:0.8rem;font-weight:600;color:#C04000;">
+    ⚠️ Production query — verify target DE exists and action type is correct before scheduling
+</div>
+"""
+
+# Empty state — clean, no noise
+EMPTY_STATE = """
+<div style="border:1.5px dashed #C8E6F5;border-radius:16px;
+            padding:60px 24px;text-align:center;background:#FAFEFF;margin-top:4px;">
+    <div style="font-size:2.6rem;opacity:0.2;margin-bottom:16px;">⚡</div>
+    <div style="font-size:1rem;font-weight:700;color:#8AAFC0;margin-bottom:8px;">
+        Ready to generate
+    </div>
+    <div style="font-size:0.84rem;color:#A8C4D0;line-height:1.75;margin-bottom:24px;">
+        Describe your query on the left.<br>
+        AMPify writes both Query Studio and<br>
+        Automation Studio versions instantly.
+    </div>
+    <div style="display:flex;flex-wrap:wrap;gap:8px;justify-content:center;">
+        <span style="background:#EEF6FF;border:1px solid #C8E6F5;border-radius:8px;
+                     padding:5px 12px;font-size:0.74rem;font-weight:600;color:#1B4F8A;">🔍 Engagement</span>
+        <span style="background:#EDFAF5;border:1px solid rgba(0,212,170,0.25);border-radius:8px;
+                     padding:5px 12px;font-size:0.74rem;font-weight:600;color:#004D3A;">🚫 Suppression</span>
+        <span style="background:#FFF4EF;border:1px solid rgba(255,107,53,0.2);border-radius:8px;
+                     padding:5px 12px;font-size:0.74rem;font-weight:600;color:#7A2800;">📊 Segmentation</span>
+        <span style="background:#EEF6FF;border:1px solid #C8E6F5;border-radius:8px;
+                     padding:5px 12px;font-size:0.74rem;font-weight:600;color:#1B4F8A;">🔄 Re-engagement</span>
+        <span style="background:#EDFAF5;border:1px solid rgba(0,212,170,0.25);border-radius:8px;
+                     padding:5px 12px;font-size:0.74rem;font-weight:600;color:#004D3A;">😴 Fatigue Control</span>
+        <span style="background:#FFF4EF;border:1px solid rgba(255,107,53,0.2);border-radius:8px;
+                     padding:5px 12px;font-size:0.74rem;font-weight:600;color:#7A2800;">📋 Full Tracking</span>
+    </div>
+</div>
+"""
+
+# ── FOOTER ──
+FOOTER = """
+<div style="text-align:center;color:#A8BFD0;font-size:0.74rem;padding:20px 24px 32px;">
+    ⚡ AMPify — Built for Salesforce Marketing Cloud Developers &nbsp;·&nbsp;
+    Always validate in Query Studio before production &nbsp;·&nbsp;
+    Not affiliated with Salesforce Inc.
+</div>
+"""
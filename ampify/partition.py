@@ -0,0 +1,265 @@
+import argparse
+import json
+import math
+import os
+import sys
+from collections import Counter, namedtuple
+
+from ampify.cost import TIMEOUT_MINUTES, VOLUME, analyze
+from ampify.dataviews import DATA_VIEWS
+from ampify.incremental import DEFAULT_TARGET, golden_queries
+from ampify.planner import target_de
+from ampify.rewriter import AGGREGATES, UNIQUE_KEYS, Query
+from ampify.tokenizer import column_refs, splice, where_end
+from ampify.transform import HEADER_RE
+
+# ─────────────────────────────────────────
+# SHARDED QUERIES FOR LARGE DEs
+# A query over a DE with tens of millions of rows can time out however it is
+# written. Split it into N queries on a stable hash of the driver's key,
+#   ABS(CHECKSUM(m.SubscriberKey) % N) = i        i = 0 .. N-1
+# that write to the same target DE, run side by side in one step:
+#   step 1   clear     Overwrite with no rows (Append only)
+#   step 2   shards    Append (or Update on the key), in parallel
+#   python -m ampify.partition query.sql --rows 40000000 --verify
+# ─────────────────────────────────────────
+SHARD_MINUTES = float(os.getenv("AMPIFY_SHARD_MINUTES", str(TIMEOUT_MINUTES / 3)))   # budget per shard
+MAX_SHARDS = int(os.getenv("AMPIFY_MAX_SHARDS", "16"))
+ACTIONS = ("Append", "Update")
+
+Shard = namedtuple("Shard", "name action sql")
+Partition = namedtuple("Partition", "target key shards action clear queries steps minutes")
+
+
+# ─────────────────────────────────────────
+# SHARD COUNT + KEY
+# ─────────────────────────────────────────
+def choose_shards(sql, rows=None, volume=None):
+    # -> (shards, estimated minutes for the whole query); rows: size of the
+    # largest DE the query reads
+    volume = dict(VOLUME, **(volume or {}))
+    if rows:
+        volume["de_rows"] = rows
+    minutes = analyze(sql, volume).minutes
+    return max(1, min(MAX_SHARDS, math.ceil(minutes / SHARD_MINUTES))), minutes
+
+
+def shard_key(q, key=None):
+    # -> "alias.Column" the shards are split on, or None
+    d = q.driver.alias
+    view = q.views.get(d)
+    if key:
+        return f"{d}.{key}"
+    columns = {c.lower(): c for c in DATA_VIEWS.get(view, [])}
+    if view is None or "subscriberkey" in columns:
+        return f"{d}.{columns.get('subscriberkey', 'SubscriberKey')}"
+    if view in UNIQUE_KEYS:
+        return f"{d}.{UNIQUE_KEYS[view][0][0]}"
+    return None
+
+
+def _refers(q, a, b, d, col):
+    return any(alias == d and c.lower() == col.lower() and q.levels[k] == q.levels[a]
+               for alias, c, k in column_refs(q.tokens, a, b))
+
+
+def _close(q, k):
+    # index of the ")" matching the "(" at tokens[k]
+    return next((j for j in range(k + 1, len(q.tokens))
+                 if q.tokens[j].text == ")" and q.levels[j] == q.levels[k]), len(q.tokens))
+
+
+def _aggregate(q, k):
+    # COUNT(...), SUM(...) ... that is not a window function
+    t, w = q.tokens, q.words
+    if w[k] not in AGGREGATES | {"AVG"} or k + 1 >= len(t) or t[k + 1].text != "(":
+        return False
+    close = _close(q, k + 1)
+    return not (close + 1 < len(t) and w[close + 1] == "OVER")
+
+
+def _unsupported(q, key):
+    # -> reason rows from different shards could combine, or ""
+    if not q.ok():
+        return "only a single SELECT can be split"
+    t, w = q.tokens, q.words
+    d, col = key.split(".", 1)
+    top = [k for k in range(len(t)) if q.levels[k] == 0]
+    if any(w[k] == "TOP" for k in top):
+        return "TOP picks rows from the whole result"
+    group = next((k for k in top if w[k] == "GROUP"), None)
+    if group is not None:
+        end = next((k for k in top if k > group and w[k] in ("HAVING", "ORDER")), len(t))
+        if not _refers(q, group + 2, end, d, col):
+            return f"GROUP BY must include {key} so every group stays in one shard"
+    elif any(_aggregate(q, k) for k in top if q.select < k < q.driver.start):
+        return "an aggregate over the whole result cannot be split"
+    if w[q.select + 1] == "DISTINCT" and not _refers(q, q.select + 2, q.driver.start, d, col):
+        return f"SELECT DISTINCT must include {key} so duplicates stay in one shard"
+    for k, word in enumerate(w):
+        if word == "OVER" and k + 1 < len(t) and t[k + 1].text == "(":
+            end = _close(q, k + 1)
+            if "PARTITION" not in w[k + 2:end] or not _refers(q, k + 2, end, d, col):
+                return f"window functions must be PARTITION BY {key}"
+    return ""
+
+
+# ─────────────────────────────────────────
+# QUERIES + LAYOUT
+# ─────────────────────────────────────────
+def _with_condition(q, condition):
+    # The query with `condition` added to its outer WHERE
+    t, w = q.tokens, q.words
+    if q.where is not None:
+        end = where_end(t, q.levels, w, q.where)
+        if any(w[k] == "OR" and q.levels[k] == 0 for k in range(q.where, end)):
+            return splice(q.sql, [(t[q.where + 1].start, t[q.where + 1].start, "("),
+                                  (t[end - 1].end, t[end - 1].end, f")\n  AND {condition}")])
+        return splice(q.sql, [(t[end - 1].end, t[end - 1].end, f"\n  AND {condition}")])
+    end = next((k for k in range(q.driver.start, len(t)) if q.levels[k] == 0
+                and (w[k] in ("GROUP", "HAVING", "ORDER") or t[k].text == ";")), len(t))
+    return splice(q.sql, [(t[end - 1].end, t[end - 1].end, f"\nWHERE {condition}")])
+
+
+def partition_queries(sql, shards=None, rows=None, key=None, action="Append", volume=None):
+    # -> (Partition, "") or (None, reason)
+    q = Query(sql)
+    if not q.ok():
+        return None, "only a single SELECT can be split"
+    found = shard_key(q, key)
+    if found is None:
+        return None, f"{q.views.get(q.driver.alias)} has no key to split on"
+    reason = _unsupported(q, found)
+    if reason:
+        return None, reason
+    n, minutes = choose_shards(sql, rows, volume)
+    n = shards or n
+    if n < 2:
+        return None, f"fits in one activity (est. {minutes:.1f} of {TIMEOUT_MINUTES} min)"
+    target = target_de(sql) or DEFAULT_TARGET
+    d, col = found.split(".", 1)
+    clear = None
+    if action == "Append":
+        clear = Shard(f"{target}_clear", "Overwrite", (
+            f"-- 🧹 CLEAR | Step 1 | Overwrite\n-- Target DE: {target}\n"
+            "-- Returns no rows, so the Overwrite empties the DE before the shards append\n"
+            + HEADER_RE.sub("", _with_condition(q, "1 = 0")).strip()))
+    step = 2 if clear else 1
+    queries = []
+    for i in range(n):
+        condition = f"ABS(CHECKSUM({found}) % {n}) = {i}"
+        header = (f"-- 🧩 SHARD {i + 1} of {n} | Step {step}, parallel | {action}"
+                  + (f" on {col}" if action == "Update" else "")
+                  + f"\n-- Target DE: {target}\n-- Rows where {condition}\n")
+        queries.append(Shard(f"{target}_shard{i + 1}of{n}", action,
+                             header + HEADER_RE.sub("", _with_condition(q, condition)).strip()))
+    steps = []
+    if clear:
+        steps.append({"step": 1, "parallel": [{"name": clear.name, "target": target, "action": "Overwrite"}]})
+    steps.append({"step": step, "parallel": [{"name": s.name, "target": target, "action": action}
+                                             for s in queries]})
+    return Partition(target, found, n, action, clear, queries, steps, minutes), ""
+
+
+def format_partition(part):
+    lines = [f"{part.shards} shards on ABS(CHECKSUM({part.key}) % {part.shards}) · est. "
+             f"{part.minutes:.1f} min in one query, ~{part.minutes / part.shards:.1f} per shard"]
+    for step in part.steps:
+        lines.append(f"Step {step['step']} (parallel): " + ", ".join(
+            f"{a['name']} [{a['action']}]" for a in step["parallel"]))
+    if part.action == "Update":
+        lines.append(f"Update keeps rows that dropped out of the result — {part.key.split('.', 1)[1]} "
+                     f"must be the target DE's primary key")
+    return "\n".join(lines)
+
+
+def write_partition(part, out_dir, verified=None):
+    from ampify.batch import safe_id, write_atomic
+
+    os.makedirs(out_dir, exist_ok=True)
+    files = {}
+    for shard in ([part.clear] if part.clear else []) + part.queries:
+        files[shard.name] = f"{safe_id(shard.name)}.sql"
+        write_atomic(os.path.join(out_dir, files[shard.name]), shard.sql + "\n")
+    steps = [dict(step, parallel=[dict(a, file=files[a["name"]]) for a in step["parallel"]])
+             for step in part.steps]
+    report = {"key": part.key, "shards": part.shards, "steps": steps,
+              "estimate_minutes": round(part.minutes, 1)}
+    if verified is not None:
+        report["verified"] = verified
+    write_atomic(os.path.join(out_dir, "layout.json"), json.dumps(report, indent=2) + "\n")
+
+
+# ─────────────────────────────────────────
+# VERIFICATION — the shards together return the full result, once
+# ─────────────────────────────────────────
+def verify(sql, part, simulator=None):
+    # -> {"ok", "detail", "rows": [rows per shard]}
+    from ampify.simulator import get_simulator
+
+    sim = simulator or get_simulator()
+    full = sim.run(sql)
+    if full["error"]:
+        return {"ok": False, "detail": f"simulator error: {full['error']}", "rows": []}
+    combined = Counter()
+    counts = []
+    for shard in part.queries:
+        result = sim.run(shard.sql)
+        if result["error"]:
+            return {"ok": False, "detail": f"{shard.name}: {result['error']}", "rows": counts}
+        combined.update(result["rows"])
+        counts.append(result["count"])
+    expected = Counter(full["rows"])
+    missing, extra = expected - combined, combined - expected
+    ok = not missing and not extra
+    detail = (f"{full['count']:,} rows = {' + '.join(f'{c:,}' for c in counts)}" if ok else
+              f"{sum(missing.values())} rows in no shard, {sum(extra.values())} in more than one")
+    return {"ok": ok, "detail": detail, "rows": counts}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split an Automation Studio query into parallel shards.")
+    parser.add_argument("sql", nargs="?", help="Automation Studio query file")
+    parser.add_argument("--rows", type=int, help="rows in the largest DE the query reads")
+    parser.add_argument("--shards", type=int, help="shard count (default: from --rows and the cost model)")
+    parser.add_argument("--key", help="driver column to split on (default SubscriberKey)")
+    parser.add_argument("--action", choices=ACTIONS, default="Append")
+    parser.add_argument("--out", help="write the shard queries and layout.json here")
+    parser.add_argument("--verify", action="store_true",
+                        help="check on the synthetic data views that the shards are disjoint and complete")
+    parser.add_argument("--golden", action="store_true",
+                        help="split every query in the golden data (4 shards unless --shards) and check it")
+    args = parser.parse_args(argv)
+
+    if args.golden:
+        failures = 0
+        for case, sql in golden_queries():
+            part, reason = partition_queries(sql, args.shards or 4, args.rows, args.key, args.action)
+            if part is None:
+                print(f"-    {case}: {reason}")
+                continue
+            result = verify(sql, part)
+            failures += not result["ok"]
+            print(f"{'ok  ' if result['ok'] else 'FAIL'} {case}: {result['detail']}")
+        return 1 if failures else 0
+    if not args.sql:
+        parser.error("give a SQL file or --golden")
+    with open(args.sql, encoding="utf-8") as f:
+        sql = f.read()
+    part, reason = partition_queries(sql, args.shards, args.rows, args.key, args.action)
+    if part is None:
+        print(f"not split: {reason}")
+        return 1
+    print(format_partition(part))
+    verified = None
+    if args.verify:
+        verified = verify(sql, part)
+        print(f"{'ok' if verified['ok'] else 'FAIL'}: {verified['detail']}")
+    if args.out:
+        write_partition(part, args.out, verified)
+        print(f"shards written to {args.out}/")
+    return 1 if verified and not verified["ok"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
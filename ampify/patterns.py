@@ -0,0 +1,341 @@
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+
+from ampify.cache import normalize_de_names, normalize_request
+
+# ─────────────────────────────────────────
+# LOCAL FAST PATH — the PROVEN PATTERNS from SFMC_RULES as
+# parameterised templates, picked by a small intent matcher
+# ─────────────────────────────────────────
+MIN_CONFIDENCE = float(os.getenv("AMPIFY_LOCAL_MIN_CONFIDENCE", "0.8"))
+RETENTION_DAYS = 180      # data views only hold 6 months
+
+Match = namedtuple("Match", "intent confidence params")
+
+QS_HEADER = "-- ⚡ QUERY STUDIO VERSION | Test Only | Max 100 Rows"
+AS_HEADER = "-- 🚀 AUTOMATION STUDIO VERSION | Production | Full Dataset"
+
+# Words every intent may use without lowering confidence
+COMMON_WORDS = set("""
+a all an and any are as at based build by contacts create de email emails for
+from get give i in into is it last list me my of on or our past previous query
+recent show sql subscriber subscribers that the their them these this those to
+unique users want was were which who with within write
+""".split())
+
+UNIT_DAYS = {"day": 1, "days": 1, "week": 7, "weeks": 7, "month": 30, "months": 30}
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+                "seven": 7, "ten": 10, "thirty": 30, "sixty": 60, "ninety": 90}
+
+
+# ─────────────────────────────────────────
+# SLOT EXTRACTION
+# ─────────────────────────────────────────
+def extract_window(text):
+    # -> (days, label, words used); days is None for "this month"
+    m = re.search(r"\b(?:last|past|previous|recent|within)\s+(\d+|[a-z]+)\s+(days?|weeks?|months?)\b", text)
+    if m and (m.group(1).isdigit() or m.group(1) in NUMBER_WORDS):
+        n = int(m.group(1)) if m.group(1).isdigit() else NUMBER_WORDS[m.group(1)]
+        days = n * UNIT_DAYS[m.group(2)]
+        return days, f"last {days} days", m.group(0).split()
+    m = re.search(r"\b(\d+)\s+(days?|weeks?|months?)\b", text)
+    if m:
+        days = int(m.group(1)) * UNIT_DAYS[m.group(2)]
+        return days, f"last {days} days", m.group(0).split()
+    if re.search(r"\bthis month\b", text):
+        return None, "current month", ["this", "month"]
+    m = re.search(r"\b(?:last|past|previous)\s+(week|month)\b", text)
+    if m:
+        days = UNIT_DAYS[m.group(1)]
+        return days, f"last {days} days", m.group(0).split()
+    if re.search(r"\byesterday\b", text):
+        return 1, "last day", ["yesterday"]
+    return 30, "last 30 days", []
+
+
+def since_expression(days):
+    if days is None:
+        return "DATEADD(month, DATEDIFF(month, 0, GETDATE()), 0)"
+    return f"DATEADD(day, -{min(days, RETENTION_DAYS)}, GETDATE())"
+
+
+def extract_threshold(text):
+    # "5+ emails", "5 or more sends", "more than 5 emails", "> 5", "at least 5", ">= 5"
+    m = re.search(r"(?:\b(?:more than|over)\s+|>\s*)(\d+)(?!\.\d)\b", text)
+    if m:
+        return int(m.group(1)) + 1, re.findall(r">|\w+", m.group(0))
+    m = re.search(r"(?:\b(?:at least|min(?:imum)?)\s+|>=\s*)(\d+)(?!\.\d)\b", text)
+    if m:
+        return int(m.group(1)), re.findall(r">=|\w+", m.group(0))
+    m = re.search(r"\b(\d+)\s*(?:\+|or more)\s*(?:emails?|sends?|messages?|times)?", text)
+    if m:
+        return int(m.group(1)), m.group(0).replace("+", " ").split()
+    return None, []
+
+
+def pick_des(custom_de_names, text):
+    # Split the user's DEs into (master, suppression) by name
+    names = normalize_de_names(custom_de_names)
+    mentioned = [n for n in names if n.lower() in text.lower()] or names
+    suppression = [n for n in mentioned if re.search(r"suppress|exclu|unsub|opt.?out|block", n, re.I)]
+    master = [n for n in mentioned if n not in suppression]
+    return (master[0] if master else None), (suppression[0] if suppression else None)
+
+
+# ─────────────────────────────────────────
+# INTENTS — cue regexes + the vocabulary each one explains
+# ─────────────────────────────────────────
+INTENTS = [
+    {
+        "name": "openers_never_clicked",
+        "cues": [r"\bopen(?:ed|ers?|s)?\b", r"\b(?:never|not|didn t|did not|no|without)\s+(?:\w+\s+)?click"],
+        "words": "active opened open opens openers opener but never not didn t did no without clicked click clicks clicking engaged",
+    },
+    {
+        "name": "unengaged",
+        "cues": [r"\bunengaged\b|\b(?:no|never|not|didn t|did not|without)\s+(?:\w+\s+)?open\w*\s+(?:or|nor|and)\s+(?:\w+\s+)?click"],
+        "words": "unengaged no never not didn t did without opens open opened or nor and clicks click clicked engagement sent received emails inactive",
+    },
+    {
+        "name": "bounce_suppression",
+        "cues": [r"\bbounc\w*"],
+        "words": "unique bouncers bounced bounce bounces hard soft suppression suppress exclusion list build",
+    },
+    {
+        "name": "send_fatigue",
+        "cues": [r"\b(?:fatigue|\d+\s*(?:\+|or more)|more than \d+|at least \d+)"],
+        "words": "got received sent emails sends messages or more than over at least fatigue check times",
+    },
+    {
+        "name": "full_tracking",
+        "cues": [r"\btracking\b|\bsent\b.*\bopens?\b.*\bclicks?\b.*\bbounces?\b"],
+        "words": "full tracking report sent sends opens clicks bounces unsubs unsubscribes complaints",
+    },
+    {
+        "name": "suppression",
+        "cues": [r"\b(?:not in|excluding|exclude|minus|suppress\w*)\b"],
+        "words": "not in excluding exclude minus suppression suppressed suppress list master customers",
+    },
+]
+
+
+def match_intent(user_request, custom_de_names=""):
+    text = normalize_request(user_request)
+    words = text.split()
+    # Normalizing drops the "+" of "10+ emails", so thresholds are read from
+    # the request as typed
+    raw = " ".join(user_request.lower().split())
+    best = None
+    for intent in INTENTS:
+        if not all(re.search(cue, text) or re.search(cue, raw) for cue in intent["cues"]):
+            continue
+        days, label, window_words = extract_window(text)
+        threshold, threshold_words = extract_threshold(raw)
+        params = {"days": days, "window": label, "since": since_expression(days)}
+
+        if intent["name"] == "send_fatigue":
+            if threshold is None:
+                threshold, threshold_words = 5, []
+            params["threshold"] = threshold
+        elif intent["name"] == "bounce_suppression":
+            params["category"] = ("Hard bounce" if "hard" in words else
+                                  "Soft bounce" if "soft" in words else None)
+        elif intent["name"] == "openers_never_clicked":
+            params["active_only"] = "active" in words
+        elif intent["name"] == "suppression":
+            master, suppression = pick_des(custom_de_names, user_request)
+            if not master or not suppression:
+                continue
+            params["master"], params["suppression"] = master, suppression
+
+        # Confidence drops for every content word the template cannot honour,
+        # numbers other than the window and threshold included. DE names only
+        # count as explained where the template uses them.
+        known = COMMON_WORDS | set(intent["words"].split()) | set(window_words) | set(threshold_words)
+        if intent["name"] == "suppression":
+            known |= {w for n in normalize_de_names(custom_de_names) for w in normalize_request(n).split()}
+        unexplained = [w for w in words if w not in known]
+        confidence = max(0.0, 0.95 - 0.2 * len(unexplained))
+        params["unexplained"] = unexplained
+        params["target"] = target_de_name(intent["name"], params)
+        if best is None or confidence > best.confidence:
+            best = Match(intent["name"], round(confidence, 2), params)
+    return best
+
+
+def target_de_name(intent, params):
+    suffix = f"{params['days']}d" if params.get("days") else "MTD"
+    return {
+        "openers_never_clicked": f"OpenersNoClick_{suffix}",
+        "unengaged": f"Unengaged_{suffix}",
+        "bounce_suppression": f"BounceSuppression_{suffix}",
+        "send_fatigue": f"SendFatigue_{suffix}",
+        "full_tracking": f"TrackingLog_{suffix}",
+        "suppression": "SuppressedAudience",
+    }[intent]
+
+
+# ─────────────────────────────────────────
+# TEMPLATES — {top} is "TOP 100 " for Query Studio, "" for Automation Studio
+# ─────────────────────────────────────────
+def _four_key(a, b):
+    return (f"{a}.JobID = {b}.JobID AND {a}.ListID = {b}.ListID\n"
+            f"    AND {a}.BatchID = {b}.BatchID AND {a}.SubscriberID = {b}.SubscriberID\n"
+            f"    AND {b}.IsUnique = 1")
+
+
+def _sql(intent, p, top):
+    if intent == "openers_never_clicked":
+        active = "\n  AND sub.Status = 'Active'" if p["active_only"] else ""
+        return (
+            f"SELECT DISTINCT {top}o.SubscriberKey, sub.EmailAddress\n"
+            f"FROM _Open o\n"
+            f"INNER JOIN _Subscribers sub ON o.SubscriberKey = sub.SubscriberKey\n"
+            f"LEFT JOIN _Click c\n    ON  {_four_key('o', 'c')}\n"
+            f"WHERE o.EventDate >= {p['since']}\n"
+            f"  AND o.IsUnique = 1\n"
+            f"  AND c.SubscriberID IS NULL{active}"
+        )
+    if intent == "unengaged":
+        return (
+            f"SELECT DISTINCT {top}s.SubscriberKey, j.EmailName\n"
+            f"FROM _Sent s\n"
+            f"INNER JOIN _Job j ON s.JobID = j.JobID\n"
+            f"LEFT JOIN _Open o\n    ON  {_four_key('s', 'o')}\n"
+            f"LEFT JOIN _Click c\n    ON  {_four_key('s', 'c')}\n"
+            f"WHERE s.EventDate >= {p['since']}\n"
+            f"  AND o.SubscriberID IS NULL\n"
+            f"  AND c.SubscriberID IS NULL"
+        )
+    if intent == "bounce_suppression":
+        category = f"\n  AND b.BounceCategory = '{p['category']}'" if p["category"] else ""
+        return (
+            f"SELECT {top}b.SubscriberKey, sub.EmailAddress,\n"
+            f"       MAX(b.EventDate) AS LastBounceDate, COUNT(b.JobID) AS BounceCount\n"
+            f"FROM _Bounce b\n"
+            f"INNER JOIN _Subscribers sub ON b.SubscriberKey = sub.SubscriberKey\n"
+            f"WHERE b.EventDate >= {p['since']}\n"
+            f"  AND b.IsUnique = 1{category}\n"
+            f"GROUP BY b.SubscriberKey, sub.EmailAddress"
+        )
+    if intent == "send_fatigue":
+        order = "\nORDER BY SendCount DESC" if top else ""
+        return (
+            f"SELECT {top}s.SubscriberKey, COUNT(s.JobID) AS SendCount,\n"
+            f"       MAX(s.EventDate) AS LastSentDate\n"
+            f"FROM _Sent s\n"
+            f"WHERE s.EventDate >= {p['since']}\n"
+            f"GROUP BY s.SubscriberKey\n"
+            f"HAVING COUNT(s.JobID) >= {p['threshold']}{order}"
+        )
+    if intent == "full_tracking":
+        return (
+            f"SELECT {top}s.SubscriberKey, j.EmailName, s.EventDate AS SentDate,\n"
+            f"       o.EventDate AS OpenDate, c.EventDate AS ClickDate,\n"
+            f"       b.EventDate AS BounceDate, b.BounceCategory,\n"
+            f"       u.EventDate AS UnsubscribeDate\n"
+            f"FROM _Sent s\n"
+            f"INNER JOIN _Job j ON s.JobID = j.JobID\n"
+            f"LEFT JOIN _Open o\n    ON  {_four_key('s', 'o')}\n"
+            f"LEFT JOIN _Click c\n    ON  {_four_key('s', 'c')}\n"
+            f"LEFT JOIN _Bounce b\n    ON  {_four_key('s', 'b')}\n"
+            f"LEFT JOIN _Unsubscribe u\n    ON  {_four_key('s', 'u')}\n"
+            f"WHERE s.EventDate >= {p['since']}"
+        )
+    if intent == "suppression":
+        return (
+            f"SELECT {top}m.SubscriberKey, m.EmailAddress\n"
+            f"FROM {p['master']} m\n"
+            f"LEFT JOIN {p['suppression']} x ON m.EmailAddress = x.EmailAddress\n"
+            f"WHERE x.EmailAddress IS NULL"
+        )
+    raise ValueError(f"Unknown intent: {intent}")
+
+
+EXPLANATIONS = {
+    "openers_never_clicked": "Finds {who}subscribers who opened an email in the {window} but did not click that same send. "
+                             "_Click is LEFT JOINed on all four keys with IsUnique = 1 in the JOIN, and rows with no click match are kept.",
+    "unengaged": "Finds subscribers who were sent an email in the {window} with no open and no click on that send. "
+                 "_Open and _Click are LEFT JOINed on all four keys with IsUnique = 1 in the JOIN.",
+    "bounce_suppression": "Builds a suppression list of subscribers with {kind}bounces in the {window}, one row per subscriber "
+                          "with their latest bounce date and bounce count. Use Overwrite so the list stays current.",
+    "send_fatigue": "Counts sends per subscriber in the {window} and keeps those who received {threshold} or more emails. "
+                    "Use it to exclude over-mailed subscribers from upcoming sends.",
+    "full_tracking": "Reports every send in the {window} with its open, click, bounce and unsubscribe dates. "
+                     "All event views are LEFT JOINed on the four keys with IsUnique = 1, so sends without events are kept.",
+    "suppression": "Returns everyone in {master} whose EmailAddress is not in {suppression}. "
+                   "Check both DEs use the EmailAddress field name before scheduling.",
+}
+
+
+def render(match):
+    p = match.params
+    qs = f"{QS_HEADER}\n{_sql(match.intent, p, 'TOP 100 ')}"
+    as_ = f"{AS_HEADER}\n-- Target DE: {p['target']}\n{_sql(match.intent, p, '')}"
+    exp = EXPLANATIONS[match.intent].format(
+        who="active " if p.get("active_only") else "",
+        kind=p["category"].split()[0].lower() + " " if p.get("category") else "",
+        **p
+    )
+    if p.get("days") and p["days"] > RETENTION_DAYS:
+        exp += " Data views only hold 6 months of data, so the window is capped at 180 days."
+    return qs, as_, exp
+
+
+def local_answer(user_request, custom_de_names="", min_confidence=MIN_CONFIDENCE):
+    # (qs, as_, exp, match) when a template covers the request, else None
+    match = match_intent(user_request, custom_de_names)
+    if match is None or match.confidence < min_confidence:
+        return None
+    qs, as_, exp = render(match)
+    return qs, as_, exp, match
+
+
+# ─────────────────────────────────────────
+# EVALUATION — golden/patterns.jsonl: the intent and slots each request
+# must get, or "intent": null when it has to go to the model
+#   python -m ampify.patterns --eval
+# ─────────────────────────────────────────
+EVAL_PATH = os.path.join(os.path.dirname(__file__), "golden", "patterns.jsonl")
+
+
+def evaluate(cases, log=print):
+    failures = 0
+    for case in cases:
+        match = match_intent(case["request"], case.get("de_names", ""))
+        if match is not None and match.confidence < MIN_CONFIDENCE:
+            match = None
+        got = match.intent if match else None
+        wrong = [k for k, v in case.get("params", {}).items() if match is None or match.params.get(k) != v]
+        ok = got == case["intent"] and not wrong
+        failures += not ok
+        detail = ", ".join(f"{k}={match.params.get(k)!r} (want {case['params'][k]!r})" for k in wrong) if match else ""
+        log(f"{'ok  ' if ok else 'FAIL'} {got or 'model':<22} {case['request']}" + (f"  — {detail}" if detail else ""))
+    return failures
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check the local templates' intent matcher.")
+    parser.add_argument("request", nargs="?", help="show the intent, confidence and slots")
+    parser.add_argument("--de-names", default="")
+    parser.add_argument("--eval", action="store_true", help="run the labeled cases")
+    args = parser.parse_args(argv)
+
+    if args.request:
+        match = match_intent(args.request, args.de_names)
+        print(f"{match.intent} ({match.confidence:.2f}) {match.params}" if match else "no template")
+        return 0
+    with open(EVAL_PATH, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    failures = evaluate(cases)
+    print(f"{len(cases) - failures}/{len(cases)} cases pass")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
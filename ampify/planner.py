@@ -0,0 +1,421 @@
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from ampify.batch import generate_row, read_rows, safe_id, write_atomic
+from ampify.cost import VOLUME, analyze
+from ampify.dataviews import DATA_VIEWS, JOIN_KEYS, TRACKING_VIEWS, dataview
+from ampify.rewriter import Query
+from ampify.tokenizer import column_refs, name, splice
+
+# ─────────────────────────────────────────
+# MULTI-QUERY AUTOMATION PLANNER
+# The segments of one campaign mostly read the same engagement base — a
+# tracking view over an EventDate window joined on the four send keys to
+# _Open, _Click, ... — and every query scans those data views again:
+#   python -m ampify.planner segments.jsonl --out plan/ --verify
+# Queries with the same base (driving view, window and joins) are pointed at
+# one staging DE that holds it. Step 1 of the automation runs the staging
+# queries and the queries that share nothing, in parallel; step 2 runs the
+# per-segment queries against the staging DEs.
+# ─────────────────────────────────────────
+STAGE_PREFIX = os.getenv("AMPIFY_STAGE_PREFIX", "Stage_")
+MIN_SHARED = int(os.getenv("AMPIFY_PLAN_MIN_SHARED", "2"))     # queries per staged base
+
+Join = namedtuple("Join", "join view table alias on prefix")
+# key: the base's signature; columns: alias -> columns the query reads
+Base = namedtuple("Base", "key view table alias window filters joins columns")
+Segment = namedtuple("Segment", "id request sql target base")
+Stage = namedtuple("Stage", "name sql base members rows")
+Plan = namedtuple("Plan", "stages steps sql estimate")
+
+TARGET_RE = re.compile(r"--\s*Target DE:\s*([\w.\[\]-]+)", re.I)
+
+
+# ─────────────────────────────────────────
+# SHARED BASES
+# ─────────────────────────────────────────
+def target_de(sql):
+    m = TARGET_RE.search(sql)
+    return m.group(1) if m else ""
+
+
+def _column(view, col):
+    # Canonical spelling of a data view column
+    for known in DATA_VIEWS.get(view, []):
+        if known.lower() == col.lower():
+            return known
+    return col
+
+
+def _normal(q, a, b, placeholders):
+    # Condition text with aliases replaced, so two queries' conditions compare
+    out = []
+    for k in range(a, b):
+        tok = q.tokens[k]
+        if tok.kind == "ident" and k + 1 < b and q.tokens[k + 1].text == "." \
+                and name(tok) in placeholders:
+            out.append(placeholders[name(tok)])
+        elif tok.kind == "ident":
+            out.append(name(tok).lower())
+        else:
+            out.append(tok.text)
+    return " ".join(out)
+
+
+def _engagement(q):
+    # -> (chain joins, window conjuncts, driver-only conjuncts) or None when
+    # the query has no base that could be staged
+    if not q.ok() or q.driver.depth or q.views.get(q.driver.alias) not in TRACKING_VIEWS:
+        return None
+    d = q.driver.alias
+    t, w = q.tokens, q.words
+    # SELECT * and alias.* would pick up the staging DE's columns
+    if any(tok.text == "*" and (t[k - 1].text in (".", ",") or w[k - 1] in ("SELECT", "DISTINCT"))
+           for k, tok in enumerate(t) if k):
+        return None
+    chain = []
+    for ref in q.outer:
+        if ref is q.driver:
+            continue
+        if ref.join not in ("INNER", "LEFT"):
+            return None
+        if q.views.get(ref.alias) not in TRACKING_VIEWS or "SELECT" in w[ref.on_start:ref.on_end] \
+                or q.aliases(ref.on_start, ref.on_end) - {d, ref.alias}:
+            continue
+        keys = set()
+        for a, b in q.on_parts(ref):
+            pair = q.equality(a, b)
+            if pair and {pair[0][0], pair[1][0]} == {d, ref.alias} \
+                    and pair[0][1].lower() == pair[1][1].lower():
+                keys.add(pair[0][1].lower())
+        if keys >= {k.lower() for k in JOIN_KEYS}:
+            chain.append(ref)
+    aliases = {d} | {ref.alias for ref in chain}
+    if any(ref.depth and ref.alias in aliases for ref in q.refs):
+        return None         # a subquery reuses one of the aliases
+    window, filters = [], []
+    for a, b in q.where_parts():
+        if "SELECT" in w[a:b] or q.aliases(a, b) != {d}:
+            continue
+        if b - a > 4 and name(t[a]) == d and t[a + 1].text == "." \
+                and name(t[a + 2]).lower() == "eventdate" and t[a + 3].text in (">=", ">") \
+                and not q.aliases(a + 4, b):
+            window.append((a, b))
+        else:
+            filters.append((a, b))
+    if not window:
+        return None
+    # Unqualified columns cannot be renamed safely
+    columns = {c.lower() for alias in aliases for c in DATA_VIEWS.get(q.views[alias], [])}
+    for k, tok in enumerate(t):
+        if tok.kind == "ident" and name(tok).lower() in columns \
+                and (k == 0 or (t[k - 1].text != "." and w[k - 1] != "AS")) \
+                and (k + 1 >= len(t) or t[k + 1].text not in (".", "(")):
+            return None
+    return chain, window, filters
+
+
+def find_base(sql):
+    # -> Base, or None when the query does not read a stageable base
+    q = Query(sql)
+    found = _engagement(q)
+    if found is None:
+        return None
+    chain, window, filters = found
+    d = q.driver.alias
+    signed = []
+    for ref in chain:
+        on = sorted(_normal(q, a, b, {d: "@d", ref.alias: "@j"}) for a, b in q.on_parts(ref))
+        signed.append(([ref.join, q.views[ref.alias], on], ref))
+    signed.sort(key=lambda item: item[0])
+    seen = Counter()
+    joins = []
+    for sig, ref in signed:
+        view = q.views[ref.alias]
+        seen[view] += 1
+        prefix = view.lstrip("_") + (str(seen[view]) if seen[view] > 1 else "")
+        joins.append(Join(ref.join, view, ref.table, ref.alias, q.text(ref.on_start, ref.on_end), prefix))
+    placeholders = {d: "@d"}
+    key = json.dumps([q.views[d], sorted(_normal(q, a, b, placeholders) for a, b in window),
+                      [sig for sig, _ in signed]])
+    skip = [(ref.on_start, ref.on_end) for ref in chain]
+    columns = {alias: set() for alias in [d] + [j.alias for j in joins]}
+    for alias, col, k in column_refs(q.tokens):
+        if alias in columns and not any(a <= k < b for a, b in skip):
+            columns[alias].add(_column(q.views[alias], col))
+    return Base(key, q.views[d], q.driver.table, d,
+                [q.text(a, b) for a, b in window],
+                {_normal(q, a, b, placeholders): q.text(a, b) for a, b in filters},
+                joins, columns)
+
+
+# ─────────────────────────────────────────
+# STAGING + SEGMENT QUERIES
+# ─────────────────────────────────────────
+def base_views(base):
+    # Driving view first, then the joined views in data view order
+    order = list(DATA_VIEWS)
+    return [base.view] + sorted((j.view for j in base.joins), key=order.index)
+
+
+def staging_sql(stage_name, members):
+    # The first member's base, with the columns any member reads and the
+    # driver-only filters every member applies
+    base = members[0].base
+    d = base.alias
+    driver_cols = set(JOIN_KEYS) | {"SubscriberKey"}
+    slot_cols = [set() for _ in base.joins]
+    for seg in members:
+        driver_cols |= seg.base.columns[seg.base.alias]
+        for i, join in enumerate(seg.base.joins):
+            slot_cols[i] |= seg.base.columns[join.alias]
+    order = {c: n for n, c in enumerate(DATA_VIEWS[base.view])}
+    select = [", ".join(f"{d}.{c}" for c in sorted(driver_cols, key=lambda c: (order.get(c, 99), c)))]
+    for join, cols in zip(base.joins, slot_cols):
+        order = {c: n for n, c in enumerate(DATA_VIEWS[join.view])}
+        if cols:
+            select.append(", ".join(f"{join.alias}.{c} AS {join.prefix}_{c}"
+                                    for c in sorted(cols, key=lambda c: (order.get(c, 99), c))))
+    shared = set(base.filters)
+    for seg in members[1:]:
+        shared &= set(seg.base.filters)
+    where = base.window + [base.filters[f] for f in sorted(shared)]
+    lines = [
+        "-- 🧱 STAGING QUERY | Step 1 | Overwrite",
+        f"-- Target DE: {stage_name}",
+        f"-- Read by: {', '.join(seg.id for seg in members)}",
+        "SELECT " + ",\n    ".join(select),
+        f"FROM {base.table} {d}",
+    ]
+    lines += [f"{j.join} JOIN {j.table} {j.alias} ON {j.on}" for j in base.joins]
+    lines.append("WHERE " + " AND ".join(where))
+    return "\n".join(lines)
+
+
+def segment_sql(seg, stage_name):
+    # Point the query at the staging DE: the driving view becomes the DE
+    # (same alias), the shared joins go, and their columns are renamed to
+    # the DE's prefixed columns. Its own filters all stay.
+    q = Query(seg.sql)
+    t = q.tokens
+    chain, _, _ = _engagement(q)
+    d = q.driver.alias
+    prefixes = {j.alias: j.prefix for j in seg.base.joins}
+    edits = []
+    k = q.driver.start + 2
+    while k + 1 < len(t) and t[k].text == ".":
+        k += 2
+    explicit = q.driver.table_end > k
+    edits.append((t[q.driver.start + 1].start, t[k - 1].end, stage_name if explicit else f"{stage_name} {d}"))
+    removed = []
+    for ref in chain:
+        edits.append((t[ref.start - 1].end, t[ref.on_end - 1].end, ""))
+        removed.append((ref.start, ref.on_end))
+    for alias, col, k in column_refs(t):
+        if alias in prefixes and not any(a <= k < b for a, b in removed):
+            col = _column(q.views[alias], col)
+            text = f"{d}.{prefixes[alias]}_{col}"
+            # A bare select item keeps its output column name
+            if q.select < k < q.driver.start and q.levels[k] == 0 \
+                    and (t[k - 1].text == "," or q.words[k - 1] in ("SELECT", "DISTINCT")) \
+                    and (t[k + 3].text == "," or k + 3 == q.driver.start):
+                text += f" AS {col}"
+            edits.append((t[k].start, t[k + 2].end, text))
+    views = ", ".join(base_views(seg.base))
+    edits.append((t[0].start, t[0].start, f"-- Step 2 | reads {stage_name} instead of {views}\n"))
+    return splice(seg.sql, edits)
+
+
+# ─────────────────────────────────────────
+# PLAN + ESTIMATE
+# ─────────────────────────────────────────
+def data_view_scans(sql, volume):
+    # -> (rows read from data views, number of data view scans)
+    scans = [s for s in analyze(sql, volume).scans if dataview(s.view)]
+    return sum(s.rows for s in scans), len(scans)
+
+
+def _stage_name(base, sql, volume, taken):
+    days = next((s.days for s in analyze(sql, volume).scans if s.alias == base.alias), None)
+    label = "".join(view.lstrip("_") for view in base_views(base))
+    stem = f"{STAGE_PREFIX}{label}" + (f"_{days:g}d" if days is not None else "")
+    found, n = stem, 1
+    while found.lower() in taken:
+        n += 1
+        found = f"{stem}_{n}"
+    taken.add(found.lower())
+    return found
+
+
+def build_plan(segments, volume=None):
+    volume = dict(VOLUME, **(volume or {}))
+    groups = {}
+    for seg in segments:
+        if seg.base is not None:
+            groups.setdefault(seg.base.key, []).append(seg)
+    taken = {seg.target.lower() for seg in segments if seg.target}
+    stages, sql = [], {}
+    for members in groups.values():
+        if len(members) < MIN_SHARED:
+            continue
+        stage_name = _stage_name(members[0].base, members[0].sql, volume, taken)
+        stage_sql = staging_sql(stage_name, members)
+        rows = next((s.rows for s in analyze(stage_sql, volume).scans if s.alias == members[0].base.alias), 0)
+        stages.append(Stage(stage_name, stage_sql, members[0].base, members, rows))
+        for seg in members:
+            sql[seg.id] = segment_sql(seg, stage_name)
+    staged = {seg.id for stage in stages for seg in stage.members}
+    independent = [seg for seg in segments if seg.id not in staged]
+    for seg in independent:
+        sql[seg.id] = seg.sql
+
+    steps = [{"step": 1, "parallel": [
+        {"name": stage.name, "target": stage.name, "reads": base_views(stage.base)}
+        for stage in stages] + [
+        {"name": seg.id, "target": seg.target, "reads": sorted({s.view for s in analyze(seg.sql, volume).scans})}
+        for seg in independent]}]
+    if stages:
+        steps.append({"step": 2, "parallel": [
+            {"name": seg.id, "target": seg.target, "reads": [stage.name]}
+            for stage in stages for seg in stage.members]})
+
+    before_rows = before_scans = after_rows = after_scans = 0
+    for seg in segments:
+        rows, scans = data_view_scans(seg.sql, volume)
+        before_rows += rows
+        before_scans += scans
+        rows, scans = data_view_scans(sql[seg.id], volume)
+        after_rows += rows
+        after_scans += scans
+    for stage in stages:
+        rows, scans = data_view_scans(stage.sql, volume)
+        after_rows += rows
+        after_scans += scans
+    written = sum(stage.rows for stage in stages)
+    read = sum(stage.rows * len(stage.members) for stage in stages)
+    estimate = {
+        "queries": len(segments), "staged_queries": len(staged), "stages": len(stages),
+        "data_view_scans": [before_scans, after_scans],
+        "data_view_rows": [round(before_rows), round(after_rows)],
+        "reduction": 1 - after_rows / before_rows if before_rows else 0.0,
+        "staging_rows_written": round(written), "staging_rows_read": round(read),
+    }
+    return Plan(stages, steps, sql, estimate)
+
+
+def verify(plan, simulator=None):
+    # Each per-segment query must return exactly the rows of the original
+    from ampify.simulator import get_simulator
+
+    sim = simulator or get_simulator()
+    results = []
+    for stage in plan.stages:
+        for seg in stage.members:
+            before = sim.run(seg.sql)
+            after = sim.run(plan.sql[seg.id], tables={stage.name: stage.sql})
+            if before["error"] or after["error"]:
+                ok, detail = False, before["error"] or after["error"]
+            elif [c.lower() for c in before["columns"]] != [c.lower() for c in after["columns"]]:
+                ok, detail = False, "column lists differ"
+            else:
+                ok = Counter(before["rows"]) == Counter(after["rows"])
+                detail = f"{before['count']:,} rows" if ok else \
+                    f"{before['count']:,} rows before, {after['count']:,} after"
+            results.append({"id": seg.id, "stage": stage.name, "ok": ok, "detail": detail})
+    return results
+
+
+# ─────────────────────────────────────────
+# CLI
+# ─────────────────────────────────────────
+def load_segments(rows, concurrency=4, log=print):
+    # Rows with a "sql" column are planned as written; the rest are generated
+    # first (without the rewriter, whose NOT EXISTS form hides the shared joins)
+    def one(row):
+        if row["sql"]:
+            return row["sql"], None
+        try:
+            result = generate_row(row, rewrite=False)
+        except Exception as e:          # one bad row must not stop the plan
+            return None, f"{type(e).__name__}: {e}"
+        return (result["as"], None) if result["status"] == "ok" else (None, result["error"])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outputs = list(pool.map(one, rows))
+    segments = []
+    for row, (sql, error) in zip(rows, outputs):
+        if sql is None:
+            log(f"{row['id']}: skipped — {error}")
+            continue
+        segments.append(Segment(row["id"], row["request"], sql, target_de(sql) or row["id"], find_base(sql)))
+    return segments
+
+
+def _rows(n):
+    return f"{n / 1e6:.1f}M" if n >= 1e6 else f"{n:,.0f}"
+
+
+def format_plan(plan):
+    e = plan.estimate
+    lines = [f"{e['queries']} queries · {e['stages']} shared bases · "
+             f"{e['staged_queries']} queries read a staging DE"]
+    for step in plan.steps:
+        lines.append(f"Step {step['step']} (parallel): " + ", ".join(a["name"] for a in step["parallel"]))
+    for stage in plan.stages:
+        lines.append(f"  {stage.name}: {' + '.join(base_views(stage.base))}"
+                     f" ≈ {_rows(stage.rows)} rows → {', '.join(seg.id for seg in stage.members)}")
+    (b_scans, a_scans), (b_rows, a_rows) = e["data_view_scans"], e["data_view_rows"]
+    lines.append(f"data-view scans   {b_scans} → {a_scans}")
+    lines.append(f"data-view rows    {_rows(b_rows)} → {_rows(a_rows)} (−{e['reduction']:.0%})")
+    lines.append(f"staging DEs       {_rows(e['staging_rows_written'])} rows written, "
+                 f"{_rows(e['staging_rows_read'])} read back in step 2")
+    return "\n".join(lines)
+
+
+def write_plan(plan, out_dir, verified=None):
+    os.makedirs(out_dir, exist_ok=True)
+    files = {}
+    for stage in plan.stages:
+        files[stage.name] = f"step1_{safe_id(stage.name)}.sql"
+        write_atomic(os.path.join(out_dir, files[stage.name]), stage.sql + "\n")
+    staged = {seg.id for stage in plan.stages for seg in stage.members}
+    for seg_id, sql in plan.sql.items():
+        files[seg_id] = f"step{2 if seg_id in staged else 1}_{safe_id(seg_id)}.sql"
+        write_atomic(os.path.join(out_dir, files[seg_id]), sql + "\n")
+    steps = [dict(step, parallel=[dict(a, file=files[a["name"]]) for a in step["parallel"]])
+             for step in plan.steps]
+    report = {"steps": steps, "estimate": plan.estimate}
+    if verified is not None:
+        report["verified"] = verified
+    write_atomic(os.path.join(out_dir, "plan.json"), json.dumps(report, indent=2) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan a campaign's queries as one staged automation.")
+    parser.add_argument("input", help="JSONL or CSV with request / de_names / id and optional sql columns")
+    parser.add_argument("--out", default="ampify_plan", help="output directory")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--verify", action="store_true",
+                        help="run each segment before and after on the synthetic data views")
+    args = parser.parse_args(argv)
+
+    segments = load_segments(read_rows(args.input), args.concurrency)
+    plan = build_plan(segments)
+    print(format_plan(plan))
+    verified = None
+    if args.verify and plan.stages:
+        verified = verify(plan)
+        for result in verified:
+            print(f"{'ok  ' if result['ok'] else 'FAIL'} {result['id']} via {result['stage']}: {result['detail']}")
+    write_plan(plan, args.out, verified)
+    print(f"plan written to {args.out}/")
+    return 1 if verified and not all(r["ok"] for r in verified) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+import os
+import sys
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import groq
+
+# ─────────────────────────────────────────
+# RESILIENT GROQ CLIENT
+# Every chat completion goes through one wrapper that adds:
+#   - a per-call deadline (AMPIFY_DEADLINE seconds)
+#   - exponential backoff with full jitter on 429/5xx/timeouts, honoring retry-after
+#   - a process-wide concurrency limit (AMPIFY_MAX_CONCURRENCY)
+#   - a hedged second attempt when the first has not answered by the p95
+#   - an ordered fallback chain of models (AMPIFY_FALLBACK_MODELS)
+# For streams "answered" means the first chunk arrived; once tokens are flowing
+# the stream is never switched.
+# ─────────────────────────────────────────
+DEADLINE = float(os.getenv("AMPIFY_DEADLINE", "60"))
+RETRIES = int(os.getenv("AMPIFY_RETRIES", "2"))                 # per model, after the first try
+BACKOFF_BASE = float(os.getenv("AMPIFY_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("AMPIFY_BACKOFF_MAX", "8"))
+MAX_CONCURRENCY = int(os.getenv("AMPIFY_MAX_CONCURRENCY", "8"))
+HEDGE = os.getenv("AMPIFY_HEDGE", "1") == "1"
+# Fixed hedge delay in seconds; empty = rolling p95 of recent first-answer times
+HEDGE_AFTER = os.getenv("AMPIFY_HEDGE_AFTER", "")
+HEDGE_DEFAULT = 6.0             # until HEDGE_MIN_SAMPLES latencies are known
+HEDGE_MIN_SAMPLES = 20
+FALLBACK_MODELS = [m.strip() for m in os.getenv(
+    "AMPIFY_FALLBACK_MODELS", "llama-3.1-8b-instant").split(",") if m.strip()]
+
+RETRYABLE = (groq.RateLimitError, groq.InternalServerError, groq.APITimeoutError,
+             groq.APIConnectionError)
+# The model itself is unusable (decommissioned, unknown) — go to the next one
+MODEL_ERRORS = (groq.NotFoundError, groq.BadRequestError)
+
+
+class GroqUnavailable(Exception):
+    # Raised when every model and retry failed or the deadline passed
+    pass
+
+
+def retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff(attempt, error=None):
+    # Full jitter, but never sooner than the server asked for
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    hinted = retry_after(error) if error is not None else None
+    return max(delay, hinted) if hinted is not None else delay
+
+
+class ResilientClient:
+
+    def __init__(self, client, models, deadline=DEADLINE, retries=RETRIES,
+                 max_concurrency=MAX_CONCURRENCY, hedge=HEDGE, hedge_after=HEDGE_AFTER):
+        self.client = client
+        self.models = list(dict.fromkeys(models))
+        self.deadline = deadline
+        self.retries = retries
+        self.hedge = hedge
+        self.hedge_after = float(hedge_after) if hedge_after else None
+        self.limiter = threading.BoundedSemaphore(max_concurrency)
+        self.latencies = {False: deque(maxlen=200), True: deque(maxlen=200)}   # by stream
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix="ampify-groq")
+
+    # ── hedging threshold ──
+    def hedge_delay(self, stream):
+        if self.hedge_after is not None:
+            return self.hedge_after
+        if len(self.latencies[stream]) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT
+        ordered = sorted(self.latencies[stream])
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    # ── one attempt ──
+    def _open(self, model, messages, stream, end, kwargs):
+        # -> response, or (first_chunk, stream) for streams; an open stream
+        # keeps its concurrency slot until it is closed
+        remaining = end - time.monotonic()
+        if remaining <= 0 or not self.limiter.acquire(timeout=remaining):
+            raise GroqUnavailable("too many requests in flight")
+        held = False
+        try:
+            started = time.monotonic()
+            resp = self.client.chat.completions.create(
+                model=model, messages=messages, stream=stream,
+                timeout=max(end - time.monotonic(), 0.1), **kwargs
+            )
+            if stream:
+                first = next(iter(resp), None)
+                resp = (first, Held(resp, self.limiter))
+                held = True
+            self.latencies[stream].append(time.monotonic() - started)
+            return resp
+        finally:
+            if not held:
+                self.limiter.release()
+
+    def _race(self, model, messages, stream, end, kwargs, path):
+        # Primary attempt, plus a hedge if it is slower than the threshold
+        futures = {self.pool.submit(self._open, model, messages, stream, end, kwargs): "primary"}
+        delay = self.hedge_delay(stream)
+        done, _ = wait(futures, timeout=min(delay, max(end - time.monotonic(), 0)))
+        if not done and self.hedge and time.monotonic() + 0.1 < end:
+            futures[self.pool.submit(self._open, model, messages, stream, end, kwargs)] = "hedge"
+            path["hedged"] = True
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(end - time.monotonic(), 0),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    path["winner"] = futures[future]
+                    for other in pending:
+                        other.add_done_callback(_discard)
+                    return future.result()
+                error = future.exception()
+        for other in pending:
+            other.add_done_callback(_discard)
+        if error is None:
+            raise GroqUnavailable(f"no answer within {self.deadline:g}s")
+        raise error
+
+    # ── retry + fallback chain ──
+    def _call(self, messages, stream, info, kwargs, end):
+        path = {"model": None, "attempts": 0, "retries": 0, "hedged": False,
+                "winner": None, "fallback": False, "errors": []}
+        if info is not None:
+            info["path"] = path
+        for n, model in enumerate(self.models):
+            for attempt in range(self.retries + 1):
+                if time.monotonic() >= end:
+                    raise GroqUnavailable(f"no answer within {self.deadline:g}s "
+                                          f"({'; '.join(path['errors']) or 'timeout'})")
+                path["attempts"] += 1
+                try:
+                    result = self._race(model, messages, stream, end, kwargs, path)
+                except groq.AuthenticationError:
+                    raise
+                except MODEL_ERRORS as e:
+                    path["errors"].append(f"{model}: {type(e).__name__}")
+                    break
+                except RETRYABLE as e:
+                    path["errors"].append(f"{model}: {type(e).__name__}")
+                    if attempt == self.retries:
+                        break
+                    path["retries"] += 1
+                    time.sleep(max(min(backoff(attempt, e), end - time.monotonic()), 0))
+                    continue
+                path["model"] = model
+                path["fallback"] = n > 0
+                return result
+        raise GroqUnavailable("Groq is unavailable right now — " + "; ".join(path["errors"]))
+
+    def create(self, messages, info=None, **kwargs):
+        return self._call(messages, False, info, kwargs, time.monotonic() + self.deadline)
+
+    def stream(self, messages, info=None, **kwargs):
+        # Generator of chunks; the deadline also bounds the rest of the stream
+        end = time.monotonic() + self.deadline
+        first, rest = self._call(messages, True, info, kwargs, end)
+        # Closed at the first chunk too: a response left to the garbage collector
+        # is closed in whichever thread runs it, possibly one holding the pool lock
+        try:
+            if first is not None:
+                yield first
+            for chunk in rest:
+                if time.monotonic() > end:
+                    raise GroqUnavailable(f"answer still streaming after {self.deadline:g}s")
+                yield chunk
+        finally:
+            rest.close()
+
+
+class Held:
+    # A stream and the concurrency slot it occupies; close() gives both back
+
+    def __init__(self, stream, limiter):
+        self.stream = stream
+        self._limiter = limiter
+        self._lock = threading.Lock()
+        self._held = True
+
+    def __iter__(self):
+        return iter(self.stream)
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            with self._lock:
+                held, self._held = self._held, False
+            if held:
+                self._limiter.release()
+
+
+def describe_path(path):
+    # Short label for logs and metrics: primary / retry / hedge / fallback
+    if not path or not path.get("model"):
+        return "failed"
+    if path["fallback"]:
+        return "fallback"
+    if path["winner"] == "hedge":
+        return "hedge"
+    return "retry" if path["retries"] else "primary"
+
+
+def _discard(future):
+    # Close the losing side of a hedge once it finishes
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    if isinstance(result, tuple):
+        result[1].close()
+
+
+# ─────────────────────────────────────────
+# FAULT SCENARIOS — each one runs against a fresh fault-injecting mock
+#   python -m ampify.resilient
+# ─────────────────────────────────────────
+PRIMARY = "llama-3.3-70b-versatile"
+SCENARIOS = [
+    # name, mock faults, client options, expected path
+    ("clean", {}, {}, "primary"),
+    ("429 with retry-after", {"fail_first": 2, "status": 429, "retry_after": 0.2}, {}, "retry"),
+    ("503 burst", {"fail_first": 1, "status": 503}, {}, "retry"),
+    ("slow first attempt", {"slow_first": 1, "slow": 3.0}, {"hedge_after": 0.3}, "hedge"),
+    ("primary model down", {"down_models": [PRIMARY]}, {}, "fallback"),
+    ("everything stalls", {"slow_rate": 1.0, "slow": 5.0}, {"deadline": 1.0, "hedge": False}, "failed"),
+]
+
+
+def run_scenarios(stream=False, log=print):
+    # -> number of scenarios whose serving path differed from the expected one
+    from ampify.benchmark import CORPUS_PATH
+    from ampify.mock_groq import load_corpus, start_server
+
+    corpus = load_corpus(CORPUS_PATH)
+    messages = [{"role": "user", "content": f"User Request: {corpus[0]['request']}"}]
+    mismatches = 0
+    for name, faults, options, expected in SCENARIOS:
+        server, url = start_server(corpus, latency=0.02, tps=5000, faults=faults)
+        client = ResilientClient(groq.Groq(api_key="mock", base_url=url, max_retries=0),
+                                 [PRIMARY] + FALLBACK_MODELS,
+                                 **dict({"retries": 2, "hedge_after": 2.0}, **options))
+        info = {}
+        started = time.monotonic()
+        try:
+            if stream:
+                text = "".join(c.choices[0].delta.content or "" for c in client.stream(messages, info)
+                               if c.choices)
+            else:
+                text = client.create(messages, info).choices[0].message.content
+            error = "" if "---AS_START---" in text else "empty answer"
+        except GroqUnavailable as e:
+            error = str(e)
+        finally:
+            server.shutdown()
+        got = describe_path(info.get("path"))
+        ok = got == expected
+        mismatches += not ok
+        path = info.get("path", {})
+        log(f"{'ok  ' if ok else 'FAIL'} {name:<22} {got:<9} expected {expected:<9}"
+            f"{time.monotonic() - started:6.2f}s  attempts={path.get('attempts')}"
+            + (f"  ({error})" if error else ""))
+    return mismatches
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the resilient client against injected faults.")
+    parser.add_argument("--stream", action="store_true", help="use streaming calls")
+    args = parser.parse_args(argv)
+    return 1 if run_scenarios(args.stream) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,435 @@
+import argparse
+import difflib
+import glob
+import os
+import sys
+from collections import namedtuple
+
+from ampify.dataviews import JOIN_KEYS, dataview
+from ampify.tokenizer import (
+    column_refs, conjuncts, depths, name, splice, table_refs, tokenize, where_end, word,
+)
+
+# ─────────────────────────────────────────
+# AUTOMATION STUDIO REWRITER
+# Rule-based rewrites that keep the result set identical but read less:
+#   anti-join      LEFT JOIN x ... WHERE x.key IS NULL  ->  NOT EXISTS
+#   date-push      _Sent's EventDate lower bound copied into joined event views
+#   collapse       repeated correlated aggregates over one view -> one CTE
+#   distinct       DISTINCT dropped when the join keys already make rows unique
+# Golden files in ampify/golden/rewrites prove every rule:
+#   python -m ampify.rewriter --verify
+# ─────────────────────────────────────────
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), "golden", "rewrites")
+
+Rewrite = namedtuple("Rewrite", "rule note")
+
+# Views whose events always come after the send they belong to
+AFTER_SEND = {"_Open", "_Click", "_Bounce", "_Unsubscribe", "_Complaint"}
+# Column sets that identify one row of a view
+UNIQUE_KEYS = {
+    "_Subscribers": [("SubscriberKey",), ("SubscriberID",)],
+    "_EnterpriseAttribute": [("_SubscriberID",)],
+    "_Job": [("JobID",)],
+    "_Sent": [JOIN_KEYS],
+}
+# IsUnique = 1 leaves at most one row per send in these views
+ONE_PER_SEND = {"_Open", "_Bounce", "_Unsubscribe"}
+AGGREGATES = {"COUNT", "MAX", "MIN", "SUM"}
+
+
+class Query:
+    # The tokenized statement plus the outer SELECT's clause positions
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.tokens = tokenize(sql)
+        self.levels = depths(self.tokens)
+        self.words = [word(tok) for tok in self.tokens]
+        self.refs = table_refs(self.tokens, self.levels)
+        self.views = {r.alias: dataview(r.table) for r in self.refs if r.alias}
+        top = [i for i, w in enumerate(self.words) if self.levels[i] == 0]
+        self.select = next((i for i in top if self.words[i] == "SELECT"), None)
+        self.union = any(self.words[i] in ("UNION", "EXCEPT", "INTERSECT") for i in top)
+        self.where = next((i for i in top if self.words[i] == "WHERE"), None)
+        self.group = any(self.words[i] == "GROUP" for i in top)
+        self.outer = [r for r in self.refs if r.depth == 0]
+        self.driver = next((r for r in self.outer if r.join == "FROM"), None)
+
+    def ok(self):
+        # Rules only touch a single plain SELECT
+        return self.select is not None and not self.union and self.driver is not None
+
+    def text(self, a, b):
+        return self.sql[self.tokens[a].start:self.tokens[b - 1].end]
+
+    def where_parts(self):
+        if self.where is None:
+            return []
+        end = where_end(self.tokens, self.levels, self.words, self.where)
+        return conjuncts(self.tokens, self.levels, self.words, self.where + 1, end)
+
+    def on_parts(self, ref):
+        return conjuncts(self.tokens, self.levels, self.words, ref.on_start, ref.on_end)
+
+    def aliases(self, a, b):
+        return {alias for alias, _, _ in column_refs(self.tokens, a, b)}
+
+    def is_null_check(self, a, b):
+        # alias.col IS NULL -> (alias, col)
+        t = self.tokens
+        if b - a == 5 and t[a + 1].text == "." and self.words[a + 3] == "IS" \
+                and self.words[a + 4] == "NULL":
+            return name(t[a]), name(t[a + 2])
+        return None
+
+    def equality(self, a, b):
+        # x.c = y.d -> ((x, c), (y, d))
+        t = self.tokens
+        if b - a == 7 and t[a + 3].text == "=" and t[a + 1].text == "." \
+                and t[a + 5].text == ".":
+            return (name(t[a]), name(t[a + 2])), (name(t[a + 4]), name(t[a + 6]))
+        return None
+
+
+# ─────────────────────────────────────────
+# RULES — each returns (sql, notes)
+# ─────────────────────────────────────────
+def anti_join(sql):
+    # Equivalent when x is used nowhere else and the NULL-checked column is
+    # matched with = in the ON (so it can only be NULL when nothing matched)
+    q = Query(sql)
+    if not q.ok():
+        return sql, []
+    edits, notes = [], []
+    for ref in q.outer:
+        if ref.join != "LEFT" or ref.table is None or ref.on_end <= ref.on_start:
+            continue
+        on_parts = q.on_parts(ref)
+        keyed = set()
+        for a, b in on_parts:
+            pair = q.equality(a, b)
+            if pair:
+                keyed |= {col.lower() for alias, col in pair if alias == ref.alias}
+        checks = [(n, part) for n, part in enumerate(q.where_parts())
+                  if (q.is_null_check(*part) or ("", ""))[0] == ref.alias]
+        if len(checks) != 1 or q.is_null_check(*checks[0][1])[1].lower() not in keyed:
+            continue
+        n, (a, b) = checks[0]
+        used = [k for alias, _, k in column_refs(q.tokens)
+                if alias == ref.alias and not (ref.on_start <= k < ref.on_end) and not (a <= k < b)]
+        later = [r for r in q.refs if r.start > ref.start and ref.alias in q.aliases(r.on_start, r.on_end)]
+        if used or later:
+            continue
+        on_text = q.text(ref.on_start, ref.on_end)
+        edits.append((q.tokens[ref.start - 1].end, q.tokens[ref.on_end - 1].end, ""))
+        edits.append((q.tokens[a].start, q.tokens[b - 1].end,
+                      f"NOT EXISTS (SELECT 1 FROM {ref.table} {ref.alias} WHERE {on_text})"))
+        notes.append(f"LEFT JOIN {ref.table} {ref.alias} … IS NULL → NOT EXISTS")
+    return splice(sql, edits), notes
+
+
+def push_event_date(sql):
+    # Events follow their send, so a lower bound on _Sent.EventDate also
+    # bounds every view joined to it on the send keys
+    q = Query(sql)
+    if not q.ok() or q.views.get(q.driver.alias) != "_Sent":
+        return sql, []
+    d = q.driver.alias
+    bounds = []
+    for a, b in q.where_parts():
+        t = q.tokens
+        if b - a > 4 and name(t[a]) == d and t[a + 1].text == "." \
+                and name(t[a + 2]).lower() == "eventdate" and t[a + 3].text in (">=", ">") \
+                and not q.aliases(a + 4, b) and "SELECT" not in q.words[a + 4:b]:
+            bounds.append((t[a + 3].text, q.text(a + 4, b)))
+    if not bounds:
+        return sql, []
+    edits, notes = [], []
+    for ref in q.outer:
+        if ref.join not in ("LEFT", "INNER") or q.views.get(ref.alias) not in AFTER_SEND:
+            continue
+        on = column_refs(q.tokens, ref.on_start, ref.on_end)
+        mine = {c.lower() for alias, c, _ in on if alias == ref.alias}
+        theirs = {c.lower() for alias, c, _ in on if alias == d}
+        if not all(k.lower() in mine and k.lower() in theirs for k in JOIN_KEYS):
+            continue
+        conditions = column_refs(q.tokens, ref.on_start, ref.on_end) + [
+            col for a, b in q.where_parts() for col in column_refs(q.tokens, a, b)]
+        if any(alias == ref.alias and c.lower() == "eventdate" for alias, c, _ in conditions):
+            continue
+        added = "".join(f" AND {ref.alias}.EventDate {op} {expr}" for op, expr in bounds)
+        edits.append((q.tokens[ref.on_end - 1].end, q.tokens[ref.on_end - 1].end, added))
+        notes.append(f"{ref.table} {ref.alias}: EventDate bound from {d} pushed into ON")
+    return splice(sql, edits), notes
+
+
+def _scalar_aggregate(q, a, b):
+    # (SELECT AGG(args) FROM view x WHERE ...) AS name -> parts, or None
+    t, w = q.tokens, q.words
+    if t[a].text != "(" or w[a + 1] != "SELECT" or w[a + 2] not in AGGREGATES \
+            or t[a + 3].text != "(":
+        return None
+    close = a + 3
+    while not (t[close].text == ")" and q.levels[close] == q.levels[a + 3]):
+        close += 1
+    end = a + 1
+    while not (t[end].text == ")" and q.levels[end] == q.levels[a]):
+        end += 1
+    k = end + 1
+    if k < b and w[k] == "AS":
+        k += 1
+    if k != b - 1 or t[k].kind != "ident":
+        return None
+    i = close + 1
+    if w[i] != "FROM" or t[i + 1].kind != "ident":
+        return None
+    table = name(t[i + 1])
+    i += 2
+    if w[i] == "AS":
+        i += 1
+    alias = table
+    if t[i].kind == "ident" and w[i] != "WHERE":
+        alias = name(t[i])
+        i += 1
+    if w[i] != "WHERE" or dataview(table) is None:
+        return None
+    correlation, filters = None, []
+    for ca, cb in conjuncts(t, q.levels, w, i + 1, end):
+        pair = q.equality(ca, cb)
+        outside = q.aliases(ca, cb) - {alias}
+        if pair and outside and correlation is None:
+            inner, outer = pair if pair[0][0] == alias else (pair[1], pair[0])
+            if inner[0] != alias or outer[0] not in {r.alias for r in q.outer}:
+                return None
+            correlation = (inner[1], f"{outer[0]}.{outer[1]}")
+        elif outside or "SELECT" in w[ca:cb]:
+            return None
+        else:
+            filters.append((ca, cb))
+    if correlation is None:
+        return None
+    return {
+        "table": table, "alias": alias, "agg": w[a + 2], "args": (a + 3, close + 1),
+        "name": name(t[b - 1]), "correlation": correlation, "filters": filters,
+        "span": (t[a].start, t[b - 1].end),
+    }
+
+
+def _retext(q, a, b, old, new):
+    # Source text of tokens[a:b] with alias `old` renamed to `new`
+    out = []
+    for k in range(a, b):
+        tok = q.tokens[k]
+        if k > a:
+            out.append(q.sql[q.tokens[k - 1].end:tok.start])
+        renamed = tok.kind == "ident" and name(tok) == old and k + 1 < b \
+            and q.tokens[k + 1].text == "."
+        out.append(new if renamed else tok.text)
+    return "".join(out)
+
+
+def collapse_scans(sql):
+    # Several correlated aggregates over the same view and filter become one
+    # grouped CTE, read once and LEFT JOINed back
+    q = Query(sql)
+    if not q.ok():
+        return sql, []
+    start = q.select + 1
+    if q.words[start] == "DISTINCT":
+        start += 1
+    end = next(i for i, w in enumerate(q.words) if q.levels[i] == 0 and w == "FROM")
+    items, begin = [], start
+    for k in range(start, end + 1):
+        if k == end or (q.tokens[k].text == "," and q.levels[k] == 0):
+            items.append((begin, k))
+            begin = k + 1
+
+    groups = {}
+    for a, b in items:
+        found = _scalar_aggregate(q, a, b)
+        if found is None:
+            continue
+        filters = tuple(
+            "@" if k + 1 < fb and name(q.tokens[k]) == found["alias"]
+            and q.tokens[k + 1].text == "." else q.tokens[k].text.lower()
+            for fa, fb in found["filters"] for k in range(fa, fb))
+        key = (dataview(found["table"]), found["correlation"], filters)
+        groups.setdefault(key, []).append(found)
+
+    edits, notes, ctes = [], [], []
+    taken = {r.alias.lower() for r in q.refs if r.alias}
+    for (view, (inner_col, outer_expr), _), found in groups.items():
+        if len(found) < 2:
+            continue
+        cte = f"{view.strip('_')}Agg"
+        while cte.lower() in taken:
+            cte += "_"
+        taken.add(cte.lower())
+        first = found[0]
+        alias = first["alias"]
+        columns = [f"{alias}.{inner_col}"]
+        for item in found:
+            args = _retext(q, *item["args"], item["alias"], alias)
+            columns.append(f"{item['agg']}{args} AS {item['name']}")
+            value = f"{cte}.{item['name']}"
+            if item["agg"] == "COUNT":
+                value = f"ISNULL({value}, 0)"
+            edits.append((*item["span"], f"{value} AS {item['name']}"))
+        where = " AND ".join(_retext(q, fa, fb, first["alias"], alias)
+                             for fa, fb in first["filters"])
+        ctes.append(
+            f"{cte} AS (\n"
+            f"    SELECT {', '.join(columns)}\n"
+            f"    FROM {first['table']} {alias}\n"
+            + (f"    WHERE {where}\n" if where else "")
+            + f"    GROUP BY {alias}.{inner_col}\n)"
+        )
+        join = f"\nLEFT JOIN {cte} ON {cte}.{inner_col} = {outer_expr}"
+        last = max(r.on_end if r.on_end > r.on_start else r.table_end for r in q.outer)
+        edits.append((q.tokens[last - 1].end, q.tokens[last - 1].end, join))
+        notes.append(f"{len(found)} scans of {view} merged into {cte}")
+    if not ctes:
+        return sql, []
+    if q.words[0] == "WITH":
+        edits.append((q.tokens[0].end, q.tokens[0].end, " " + ",\n".join(ctes) + ","))
+    else:
+        at = q.tokens[q.select].start
+        edits.append((at, at, "WITH " + ",\n".join(ctes) + "\n"))
+    return splice(sql, edits), notes
+
+
+def redundant_distinct(sql):
+    # DISTINCT is a no-op when the driver's unique key is selected and every
+    # join matches at most one row
+    q = Query(sql)
+    if not q.ok() or q.words[q.select + 1] != "DISTINCT" or q.group:
+        return sql, []
+    d = q.driver
+    view = q.views.get(d.alias)
+    if view not in UNIQUE_KEYS:
+        return sql, []
+    end = next(i for i, w in enumerate(q.words) if q.levels[i] == 0 and w == "FROM")
+    # Bare driver columns in the select list — not inside expressions
+    selected = {c.lower() for alias, c, k in column_refs(q.tokens, q.select + 2, end)
+                if alias == d.alias and q.levels[k] == 0
+                and (q.tokens[k - 1].text == "," or q.words[k - 1] == "DISTINCT")
+                and (q.tokens[k + 3].text == "," or k + 3 == end or q.words[k + 3] == "AS")}
+    if not any(all(c.lower() in selected for c in key) for key in UNIQUE_KEYS[view]):
+        return sql, []
+
+    for ref in q.outer:
+        if ref is d:
+            continue
+        joined = q.views.get(ref.alias)
+        if joined is None or ref.join not in ("LEFT", "INNER"):
+            return sql, []
+        on = [q.equality(a, b) for a, b in q.on_parts(ref)]
+        mine = {col.lower() for pair in on if pair for alias, col in pair if alias == ref.alias}
+        unique_on = any(all(c.lower() in mine for c in key) for key in UNIQUE_KEYS.get(joined, []))
+        one_per_send = (joined in ONE_PER_SEND and view == "_Sent"
+                        and all(k.lower() in mine for k in JOIN_KEYS)
+                        and "isunique" in {c.lower() for a, c, _ in
+                                           column_refs(q.tokens, ref.on_start, ref.on_end)
+                                           if a == ref.alias})
+        if not (unique_on or one_per_send):
+            return sql, []
+    t = q.tokens
+    return splice(sql, [(t[q.select + 1].start, t[q.select + 2].start, "")]), [
+        f"DISTINCT removed — {view} key selected and every join is one-to-one"]
+
+
+RULES = [
+    ("anti-join", anti_join),
+    ("date-push", push_event_date),
+    ("collapse", collapse_scans),
+    ("distinct", redundant_distinct),
+]
+
+
+def optimize(sql):
+    # -> (sql, [Rewrite]); a rule that fails to parse the query is skipped
+    applied = []
+    for rule, fn in RULES:
+        try:
+            out, notes = fn(sql)
+        except (IndexError, StopIteration):
+            continue
+        if notes:
+            sql = out
+            applied += [Rewrite(rule, note) for note in notes]
+    return sql, applied
+
+
+def diff(original, optimized):
+    return "".join(difflib.unified_diff(
+        original.splitlines(keepends=True), optimized.splitlines(keepends=True),
+        fromfile="generated.sql", tofile="optimized.sql"))
+
+
+# ─────────────────────────────────────────
+# GOLDEN FILES — <case>.in.sql and the expected <case>.out.sql
+# ─────────────────────────────────────────
+def golden_cases(directory=GOLDEN_DIR):
+    for path in sorted(glob.glob(os.path.join(directory, "*.in.sql"))):
+        case = os.path.basename(path)[:-len(".in.sql")]
+        yield case, path, path[:-len(".in.sql")] + ".out.sql"
+
+
+def verify(directory=GOLDEN_DIR, simulate=True, update=False, log=print):
+    # Rewrites must match the golden output exactly and, on the simulator,
+    # return the same rows as the original query
+    failures = 0
+    sim = None
+    if simulate:
+        from ampify.simulator import get_simulator
+        sim = get_simulator()
+    for case, src, dst in golden_cases(directory):
+        with open(src, encoding="utf-8") as f:
+            original = f.read()
+        optimized, applied = optimize(original)
+        if update:
+            with open(dst, "w", encoding="utf-8") as f:
+                f.write(optimized)
+        with open(dst, encoding="utf-8") as f:
+            expected = f.read()
+        problems = []
+        if optimized != expected:
+            problems.append("output differs from golden file\n" + diff(expected, optimized))
+        if sim is not None:
+            before, after = sim.run(original), sim.run(optimized)
+            if before["error"] or after["error"]:
+                problems.append(f"simulator error: {before['error'] or after['error']}")
+            elif sorted(map(repr, before["rows"])) != sorted(map(repr, after["rows"])):
+                problems.append(f"results differ: {before['count']} rows vs {after['count']}")
+        rules = ", ".join(sorted({r.rule for r in applied})) or "no rewrite"
+        log(f"{'FAIL' if problems else 'ok  '} {case} ({rules})")
+        for problem in problems:
+            log("     " + problem.replace("\n", "\n     "))
+        failures += bool(problems)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Optimize Automation Studio SQL.")
+    parser.add_argument("sql", nargs="?", help="file to optimize (prints the diff)")
+    parser.add_argument("--verify", action="store_true", help="check the golden files")
+    parser.add_argument("--update", action="store_true", help="rewrite the golden outputs")
+    parser.add_argument("--no-simulate", action="store_true",
+                        help="skip the result comparison on synthetic data")
+    args = parser.parse_args(argv)
+    if args.verify or args.update:
+        return 1 if verify(simulate=not args.no_simulate, update=args.update) else 0
+    if not args.sql:
+        parser.error("give a SQL file or --verify")
+    with open(args.sql, encoding="utf-8") as f:
+        original = f.read()
+    optimized, applied = optimize(original)
+    for r in applied:
+        print(f"-- {r.rule}: {r.note}")
+    print(diff(original, optimized) or "-- nothing to rewrite")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
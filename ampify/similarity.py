@@ -0,0 +1,564 @@
+import functools
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+
+from ampify.cache import CACHE_MAX_ROWS, CACHE_PATH, CACHE_TTL, normalize_de_names, normalize_request
+from ampify.patterns import COMMON_WORDS, extract_threshold, extract_window
+
+# ─────────────────────────────────────────
+# SIMILARITY CACHE
+# Paraphrases of an earlier request reuse its answer:
+#   "openers last 30 days who never clicked"
+#   "subscribers that opened in the past month but didn't click"
+# Each request is split into a canonical template (stemmed content words)
+# and slots — the time window, a count threshold, comparison operators,
+# other numbers, proper names and the DE names. Templates are matched with MinHash-LSH over
+# character 3-grams and verified with the exact Jaccard similarity. The
+# window, threshold and DE names of the cached answer are then rewritten to
+# the new request's values; operators, other numbers and names must match
+# exactly.
+# When a slot cannot be located in the cached SQL the answer is not reused.
+# ─────────────────────────────────────────
+SIMILAR = os.getenv("AMPIFY_SIMILAR", "1") == "1"
+THRESHOLD = float(os.getenv("AMPIFY_SIMILAR_THRESHOLD", "0.8"))     # Jaccard of template 3-grams
+MAX_ENTRIES = int(os.getenv("AMPIFY_SIMILAR_MAX", str(CACHE_MAX_ROWS)))
+
+NGRAM = 3
+HASHES = 40
+BANDS = 8                   # 8 bands x 5 rows — 96% recall at 0.8 Jaccard, 2% at 0.3
+ROWS = HASHES // BANDS
+
+# Treated as the same word before stemming
+SYNONYMS = {
+    "never": "not", "no": "not", "without": "not", "didn": "not", "don": "not", "doesn": "not",
+    "haven": "not", "hasn": "not", "wasn": "not", "weren": "not", "nor": "not",
+    "got": "receive", "sent": "send", "each": "per", "every": "per",
+}
+STOP_WORDS = COMMON_WORDS | set("""
+along also ago but did do does during had has have including include includes just over plus
+s since t the then when where whose
+""".split())
+# A difference in any of these is never a paraphrase
+GUARD_WORDS = {"not", "activ", "inactiv", "hard", "soft"}
+# "> 500", "over 500" and "more than 500" are one comparison; "< 500" is not
+COMPARISON = re.compile(
+    r"(?<!\S)(<=|>=|!=|<|>|=)(?!\S)|\b(no more than|at most|up to|less than|fewer than|under|below|"
+    r"more than|greater than|over|above|at least|not equal to|equal to|equals|exactly)\s+(?=-?\d)"
+)
+WORDED = {
+    "no more than": "<=", "at most": "<=", "up to": "<=",
+    "less than": "<", "fewer than": "<", "under": "<", "below": "<",
+    "more than": ">", "greater than": ">", "over": ">", "above": ">",
+    "at least": ">=", "not equal to": "!=", "equal to": "=", "equals": "=", "exactly": "=",
+}
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+Slots = namedtuple("Slots", "window threshold ops numbers names des")
+Entry = namedtuple("Entry", "key template slots shape shingles value version created")
+
+
+# ─────────────────────────────────────────
+# TEMPLATES + SLOTS
+# ─────────────────────────────────────────
+def stem(word):
+    for suffix in ("ers", "ing", "ed", "er", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    return word[:-1] if word.endswith("e") and len(word) > 4 else word
+
+
+def proper_names(user_request, de_names):
+    # Capitalized words after the first one — email names, journeys, campaigns
+    words = re.findall(r"[A-Za-z][\w-]*", user_request)
+    skip = {n.lower() for n in de_names}
+    return tuple(w for w in words[1:]
+                 if w[0].isupper() and not w.isupper() and w.lower() not in STOP_WORDS | skip)
+
+
+def de_roles(de_names):
+    # (role, name) with suppression-style DEs tagged so they never swap roles;
+    # grouped by role so the order the user typed them in does not matter
+    return tuple(sorted(
+        (("suppression" if re.search(r"suppress|exclu|unsub|opt.?out|block", n, re.I) else "data", n)
+         for n in de_names),
+        key=lambda pair: pair[0]
+    ))
+
+
+def comparisons(text, threshold_words):
+    # -> (operators in the order they appear, their words), less the count
+    # threshold's own, which is rewritten rather than matched
+    if threshold_words:
+        text = text.replace(" ".join(threshold_words), " ", 1)
+    found = list(COMPARISON.finditer(text))
+    return (tuple(m.group(1) or WORDED[m.group(2)] for m in found),
+            [w for m in found for w in m.group(0).split()])
+
+
+def extract_slots(user_request, custom_de_names=""):
+    # -> (template, Slots)
+    text = normalize_request(user_request)
+    de_names = normalize_de_names(custom_de_names)
+    days, _, window_words = extract_window(text)
+    threshold, threshold_words = extract_threshold(text)
+    ops, op_words = comparisons(text, threshold_words)
+    drop = (set(window_words) | set(threshold_words) | set(op_words)
+            | {normalize_request(n) for n in de_names})
+    tokens, numbers = [], []
+    for word in text.split():
+        if NUMBER.fullmatch(word):
+            if word not in drop:
+                numbers.append(float(word) if "." in word else int(word))
+            continue
+        if word in drop:
+            continue
+        word = SYNONYMS.get(word, word)
+        if word in STOP_WORDS:
+            continue
+        word = stem(word)
+        if word not in STOP_WORDS:
+            tokens.append(word)
+    slots = Slots(
+        window=("mtd" if days is None else days) if window_words else None,
+        threshold=threshold,
+        ops=ops,
+        numbers=tuple(numbers),
+        names=proper_names(user_request, de_names),
+        des=de_roles(de_names),
+    )
+    return " ".join(tokens), slots
+
+
+def shape(slots):
+    # Entries only compete when the slots that are substituted have the same
+    # kinds and the exact-match slots are equal
+    return ("mtd" if slots.window == "mtd" else slots.window is not None,
+            slots.threshold is not None, slots.ops, slots.numbers, slots.names,
+            tuple(role for role, _ in slots.des))
+
+
+def shingles(template):
+    padded = f" {template} "
+    return frozenset(zlib.crc32(padded[i:i + NGRAM].encode("utf-8"))
+                     for i in range(max(len(padded) - NGRAM + 1, 1)))
+
+
+# Fixed random order in which an empty bin borrows from the other bins
+_probes = [random.Random(i).sample(range(HASHES), HASHES) for i in range(HASHES)]
+
+
+@functools.lru_cache(maxsize=1 << 15)
+def gram_hash(gram):
+    return int.from_bytes(hashlib.blake2b(gram.to_bytes(4, "little"), digest_size=8).digest(), "little")
+
+
+def minhash(grams):
+    # One-permutation MinHash: each 3-gram lands in one of HASHES bins and
+    # every bin keeps its minimum, one pass instead of one per hash function.
+    # Empty bins take the value of the first filled bin in their own random
+    # probe order (optimal densification), which keeps the chance of two
+    # signatures agreeing on a bin equal to the Jaccard similarity.
+    bins = [None] * HASHES
+    for g in grams:
+        h = gram_hash(g)
+        i, v = h % HASHES, h // HASHES
+        if bins[i] is None or v < bins[i]:
+            bins[i] = v
+    if None in bins:
+        filled = list(bins)
+        for i, v in enumerate(filled):
+            if v is None:
+                bins[i] = next((filled[j] for j in _probes[i] if filled[j] is not None), 0)
+    return tuple(bins)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def guard(template):
+    return GUARD_WORDS.intersection(template.split())
+
+
+# ─────────────────────────────────────────
+# SLOT SUBSTITUTION — None when a slot cannot be placed safely
+# ─────────────────────────────────────────
+UNIT_DAYS = {"d": 1, "day": 1, "w": 7, "week": 7, "m": 30, "month": 30}
+DATEADD = re.compile(r"DATEADD\(\s*(day|week|month)\s*,\s*-\s*(\d+)\s*,", re.I)
+SUFFIX = re.compile(r"(?<=_)(\d+)([dwm])\b")
+PROSE = re.compile(r"\b(\d+)(\s+)(days?|weeks?|months?)\b", re.I)
+
+
+def _substitute_window(value, old, new):
+    hits = [0]
+
+    def dateadd(m):
+        if int(m.group(2)) * UNIT_DAYS[m.group(1).lower()] != old:
+            return m.group(0)
+        hits[0] += 1
+        return f"DATEADD(day, -{new},"
+
+    def suffix(m):
+        if int(m.group(1)) * UNIT_DAYS[m.group(2)] != old:
+            return m.group(0)
+        return f"{new}d"
+
+    def prose(m):
+        if int(m.group(1)) * UNIT_DAYS[m.group(3).lower().rstrip("s")] != old:
+            return m.group(0)
+        return f"{new}{m.group(2)}days"
+
+    value = DATEADD.sub(dateadd, value)
+    if not hits[0]:
+        return None             # the window is written some other way
+    return PROSE.sub(prose, SUFFIX.sub(suffix, value))
+
+
+def _substitute_threshold(value, old, new):
+    # old/new are minimum counts; "> 8" and ">= 9" both mean at least 9
+    hits = [0]
+
+    def compare(m):
+        op, n = m.group(1), int(m.group(2))
+        if (op == ">" and n == old - 1) or (op == ">=" and n == old):
+            hits[0] += 1
+            return f"{op} {new - 1 if op == '>' else new}"
+        return m.group(0)
+
+    value = re.sub(r"(>=|>)\s*(\d+)", compare, value)
+    if not hits[0]:
+        return None
+    # The explanation usually repeats the number as written in the SQL
+    head, sep, explanation = value.partition("---EXP_START---")
+    numbers = {str(old - 1): str(new - 1), str(old): str(new)}
+    explanation = re.sub(r"(?<![\d.])\d+(?!\.?\d)", lambda m: numbers.get(m.group(0), m.group(0)),
+                         explanation)
+    return head + sep + explanation
+
+
+def _substitute_des(value, renames):
+    # Two passes through placeholders so swapped names cannot collide
+    for i, (before, _) in enumerate(renames):
+        pattern = rf"(?<![\w.]){re.escape(before)}(?![A-Za-z0-9])"
+        if not re.search(pattern, value):
+            return None
+        value = re.sub(pattern, f"\x00{i}\x00", value)
+    for i, (_, after) in enumerate(renames):
+        value = value.replace(f"\x00{i}\x00", after)
+    return value
+
+
+def substitute(value, old, new):
+    if old.window != new.window:
+        if "mtd" in (old.window, new.window):
+            return None
+        value = _substitute_window(value, old.window, new.window)
+        if value is None:
+            return None
+    if old.threshold != new.threshold:
+        value = _substitute_threshold(value, old.threshold, new.threshold)
+        if value is None:
+            return None
+    renames = [(before, after) for (_, before), (_, after) in zip(old.des, new.des) if before != after]
+    if renames:
+        value = _substitute_des(value, renames)
+    return value
+
+
+# ─────────────────────────────────────────
+# MINHASH-LSH INDEX — in memory, one entry per template shape
+# ─────────────────────────────────────────
+class SimilarityIndex:
+
+    def __init__(self, threshold=THRESHOLD, max_entries=MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.entries = OrderedDict()        # key -> Entry, oldest first
+        self.buckets = {}                   # (band, hashes) -> set of keys
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _bands(self, signature, kind):
+        # The slot shape is part of every bucket key, so only compatible
+        # entries ever become candidates
+        return [(b, kind, signature[b * ROWS:(b + 1) * ROWS]) for b in range(BANDS)]
+
+    def add(self, entry):
+        # -> keys evicted to stay within max_entries
+        self.remove(entry.key)
+        self.entries[entry.key] = entry
+        for band in self._bands(minhash(entry.shingles), entry.shape):
+            self.buckets.setdefault(band, set()).add(entry.key)
+        evicted = []
+        while len(self.entries) > self.max_entries:
+            key = next(iter(self.entries))
+            self.remove(key)
+            evicted.append(key)
+        return evicted
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for band in self._bands(minhash(entry.shingles), entry.shape):
+            keys = self.buckets.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.buckets[band]
+
+    def search(self, template, slots, version=None):
+        # -> (entry, score) of the best compatible entry above the threshold
+        grams = shingles(template)
+        guarded = guard(template)
+        best, best_score = None, self.threshold
+        seen = set()
+        for band in self._bands(minhash(grams), shape(slots)):
+            for key in self.buckets.get(band, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                entry = self.entries[key]
+                if version is not None and entry.version != version:
+                    continue
+                if guard(entry.template) != guarded:
+                    continue
+                score = jaccard(grams, entry.shingles)
+                if score >= best_score:
+                    best, best_score = entry, score
+        return (best, best_score) if best is not None else (None, 0.0)
+
+
+# ─────────────────────────────────────────
+# PERSISTENT CACHE — SQLite next to the response cache, loaded on first use
+# ─────────────────────────────────────────
+class SimilarCache:
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, threshold=THRESHOLD, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.index = SimilarityIndex(threshold, max_entries)
+        self.stats = {"hits": 0, "misses": 0, "unsafe": 0, "writes": 0}
+        self._lock = threading.Lock()
+        self._db = None
+        self._loaded = False
+
+    def _load(self):
+        self._loaded = True
+        if not self.path:
+            return
+        try:
+            self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS similar ("
+                "key TEXT PRIMARY KEY, version TEXT NOT NULL, request TEXT NOT NULL, "
+                "de_names TEXT NOT NULL, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM similar WHERE created < ?", (time.time() - self.ttl,))
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT version, request, de_names, value, created FROM similar "
+                "ORDER BY created DESC LIMIT ?", (self.index.max_entries,)
+            ).fetchall()
+        except sqlite3.Error:
+            # Read-only or locked filesystem — keep the index in memory only
+            self._db = None
+            return
+        for version, request, de_names, value, created in reversed(rows):
+            self.index.add(make_entry(request, de_names, value, version, created))
+
+    def lookup(self, user_request, custom_de_names="", version=None):
+        # -> (answer with slots substituted, score) or None
+        template, slots = extract_slots(user_request, custom_de_names)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            entry, score = self.index.search(template, slots, version)
+            if entry is not None and time.time() - entry.created > self.ttl:
+                self.index.remove(entry.key)
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            value = substitute(entry.value, entry.slots, slots)
+            if value is None:
+                self.stats["unsafe"] += 1
+                return None
+            self.stats["hits"] += 1
+            return value, score
+
+    def remember(self, user_request, custom_de_names, value, version=None):
+        entry = make_entry(user_request, custom_de_names, value, version or "", time.time())
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            evicted = self.index.add(entry)
+            self.stats["writes"] += 1
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO similar (key, version, request, de_names, value, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (entry.key, entry.version, user_request, custom_de_names or "", value, entry.created)
+                )
+                self._db.executemany("DELETE FROM similar WHERE key = ?", [(k,) for k in evicted])
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+
+def make_entry(user_request, custom_de_names, value, version, created):
+    template, slots = extract_slots(user_request, custom_de_names)
+    kind = shape(slots)
+    key = json.dumps([template, kind])
+    return Entry(key, template, slots, kind, shingles(template), value, version, created)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_similar_cache():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = SimilarCache()
+        return _default
+
+
+def use_similar_cache(cache):
+    global _default
+    with _default_lock:
+        _default = cache
+
+
+# ─────────────────────────────────────────
+# EVALUATION — hit rate and false reuse on paraphrases of the benchmark
+# corpus, and lookup latency at scale
+#   python -m ampify.similarity --eval
+#   python -m ampify.similarity --scale 100000
+# ─────────────────────────────────────────
+EVAL_PATH = os.path.join(os.path.dirname(__file__), "golden", "similarity.jsonl")
+
+
+def evaluate(cases, corpus, threshold=THRESHOLD, log=print):
+    # A hit is false reuse when a miss was expected or the substituted answer
+    # lacks the values the request asked for
+    # Cases that carry a completion are earlier answers, remembered like the corpus
+    cache = SimilarCache(path="", threshold=threshold)
+    seeds = [case for case in cases if "completion" in case]
+    cases = [case for case in cases if "completion" not in case]
+    for row in list(corpus) + seeds:
+        if "---AS_END---" in row["completion"]:
+            cache.remember(row["request"], row.get("de_names", ""), row["completion"])
+    counts = {"expected_hits": 0, "hits": 0, "expected_misses": 0, "false_reuse": 0}
+    for case in cases:
+        found = cache.lookup(case["request"], case.get("de_names", ""))
+        expected = case["expect"] == "hit"
+        wrong = [s for s in case.get("contains", []) if found and s not in found[0]]
+        counts["expected_hits" if expected else "expected_misses"] += 1
+        if found and expected and not wrong:
+            counts["hits"] += 1
+        if found and (not expected or wrong):
+            counts["false_reuse"] += 1
+        status = "hit " if found else "miss"
+        ok = (bool(found) == expected) and not wrong
+        log(f"{'ok  ' if ok else 'FAIL'} {status} {found[1] if found else 0:4.2f}  {case['request']}"
+            + (f"  (missing {', '.join(wrong)})" if wrong else ""))
+    return {
+        "hit_rate": round(counts["hits"] / max(counts["expected_hits"], 1), 3),
+        "false_reuse_rate": round(counts["false_reuse"] / max(len(cases), 1), 3),
+        "cases": len(cases),
+        **counts,
+    }
+
+
+def synthetic_requests(n, seed=7):
+    # Random requests over the SFMC vocabulary, for sizing the index
+    rng = random.Random(seed)
+    vocab = sorted(set(
+        "open click bounce unsubscribe complaint send job journey activity subscriber status "
+        "email name domain url link country city first last region segment campaign sale "
+        "winter summer spring welcome renewal loyalty vip tier points purchase order product "
+        "category revenue store web mobile app push sms preference consent language device "
+        "browser bot hard soft block spam held active inactive new returning lapsed churn "
+        "anniversary birthday signup source referral coupon cart abandoned browse wishlist".split()
+    ))
+    # Campaign, product and field names make up most of a real request's
+    # vocabulary — without them every 3-gram is common to the whole index
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocab += sorted({"".join(rng.choices(letters, k=rng.randint(5, 9))) for _ in range(4000)})
+    out = []
+    for _ in range(n):
+        words = rng.sample(vocab[:100], rng.randint(3, 6)) + rng.sample(vocab[100:], rng.randint(1, 3))
+        rng.shuffle(words)
+        window = rng.choice(["", f" in the last {rng.choice([7, 14, 30, 60, 90])} days"])
+        out.append(f"Subscribers {' '.join(words)}{window}")
+    return out
+
+
+def bench_lookups(n, queries=2000, log=print):
+    # -> p50/p99 lookup time in microseconds with n entries in the index
+    index = SimilarityIndex(max_entries=n)
+    started = time.perf_counter()
+    requests = synthetic_requests(n)
+    for request in requests:
+        index.add(make_entry(request, "", "", "", 0.0))
+    log(f"indexed {n:,} entries in {time.perf_counter() - started:.1f}s")
+    rng = random.Random(11)
+    probes = [rng.choice(requests).replace("Subscribers", "Contacts who are") for _ in range(queries // 2)]
+    probes += synthetic_requests(queries - len(probes), seed=99)
+    timings = []
+    hits = 0
+    for request in probes:
+        start = time.perf_counter()
+        template, slots = extract_slots(request)
+        entry, _ = index.search(template, slots)
+        timings.append((time.perf_counter() - start) * 1e6)
+        hits += entry is not None
+    timings.sort()
+    return {"entries": n, "p50_us": round(timings[len(timings) // 2], 1),
+            "p99_us": round(timings[int(len(timings) * 0.99) - 1], 1), "hits": hits, "queries": queries}
+
+
+def main(argv=None):
+    import argparse
+
+    from ampify.benchmark import CORPUS_PATH
+    from ampify.mock_groq import load_corpus
+
+    parser = argparse.ArgumentParser(description="Evaluate the similarity cache.")
+    parser.add_argument("--eval", action="store_true", help="hit and false-reuse rate on the paraphrase set")
+    parser.add_argument("--scale", type=int, default=0, help="lookup latency with this many entries")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+
+    failed = False
+    if args.eval or not args.scale:
+        with open(EVAL_PATH, encoding="utf-8") as f:
+            cases = [json.loads(line) for line in f if line.strip()]
+        report = evaluate(cases, load_corpus(CORPUS_PATH), args.threshold)
+        print(f"hit rate {report['hit_rate']:.0%} ({report['hits']}/{report['expected_hits']}) · "
+              f"false reuse {report['false_reuse_rate']:.0%} ({report['false_reuse']}/{report['cases']})")
+        failed = report["false_reuse"] > 0
+    if args.scale:
+        report = bench_lookups(args.scale)
+        print(f"lookup at {report['entries']:,} entries: p50 {report['p50_us']:.0f} µs · "
+              f"p99 {report['p99_us']:.0f} µs · {report['hits']}/{report['queries']} hits")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
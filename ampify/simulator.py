@@ -0,0 +1,686 @@
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+
+from ampify.dataviews import DATA_VIEWS, TRACKING_VIEWS, dataview
+from ampify.tokenizer import column_refs, depths, splice, table_refs, tokenize, word
+
+# ─────────────────────────────────────────
+# SFMC DATA VIEW SIMULATOR
+# The data views from SFMC_RULES as SQLite tables filled with synthetic
+# events, plus a T-SQL → SQLite shim, so generated SQL can be dry-run
+# without touching a live account.
+#   python -m ampify.simulator --subscribers 200000 --jobs 90   (rebuild)
+#   python -m ampify.simulator --sql query.sql                  (run a file)
+# ─────────────────────────────────────────
+SIM_PATH = os.getenv("AMPIFY_SIM_PATH", ".ampify_sim.sqlite3")
+SIM_TIMEOUT = float(os.getenv("AMPIFY_SIM_TIMEOUT", "20"))         # seconds per query
+DE_SAMPLE = 40      # % of subscribers placed in each simulated DE — independent per DE
+QS_ROWS = 100
+DATA_VERSION = 2       # bump when generate() changes so stale databases are rebuilt
+
+# Synthetic data profile — every knob can be set with AMPIFY_SIM_<NAME>
+PROFILE = {
+    "subscribers": 10000,
+    "jobs": 60,            # sends spread over the retention window
+    "days": 180,           # data views keep ~6 months
+    "send_rate": 0.5,      # share of subscribers in each send
+    "open_rate": 0.22,     # of sends
+    "click_rate": 0.12,    # of opens
+    "bounce_rate": 0.015,  # of sends
+    "unsub_rate": 0.01,    # of opens
+    "complaint_rate": 0.001,
+    "seed": 7,
+}
+for _k, _v in PROFILE.items():
+    PROFILE[_k] = type(_v)(os.getenv(f"AMPIFY_SIM_{_k.upper()}", _v))
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATE_COLUMNS = {"EventDate", "DeliveredTime", "SchedTime", "CreatedDate",
+                "DateCreated", "DateUnsubscribed"}
+TEXT_COLUMNS = {"SubscriberKey", "EmailAddress", "Status", "Domain", "URL", "LinkName",
+                "BounceCategory", "BounceSubcategory", "SMTPBounceReason", "EmailName",
+                "EmailSubject", "FromName", "FromEmail", "VersionID", "ActivityID",
+                "ActivityName", "ActivityType"}
+PROFILE_ATTRIBUTES = ["FirstName", "LastName", "Country"]
+
+
+def _schema():
+    columns = dict(DATA_VIEWS)
+    columns["_EnterpriseAttribute"] = columns["_EnterpriseAttribute"] + PROFILE_ATTRIBUTES
+    return columns
+
+
+def _column_ddl(col):
+    # SFMC compares strings case-insensitively — NOCASE mirrors its collation
+    if col in DATE_COLUMNS:
+        return f"{col} TEXT"
+    if col in TEXT_COLUMNS or col in PROFILE_ATTRIBUTES:
+        return f"{col} TEXT COLLATE NOCASE"
+    return f"{col} INTEGER"
+
+
+# ─────────────────────────────────────────
+# T-SQL FUNCTIONS — registered on every connection
+# ─────────────────────────────────────────
+DATE_PARTS = {
+    "year": "year", "yy": "year", "yyyy": "year",
+    "quarter": "quarter", "qq": "quarter", "q": "quarter",
+    "month": "month", "mm": "month", "m": "month",
+    "week": "week", "wk": "week", "ww": "week",
+    "day": "day", "dd": "day", "d": "day", "dayofyear": "day", "dy": "day", "y": "day",
+    "weekday": "weekday", "dw": "weekday",
+    "hour": "hour", "hh": "hour",
+    "minute": "minute", "mi": "minute", "n": "minute",
+    "second": "second", "ss": "second", "s": "second",
+}
+SQL_EPOCH = datetime(1900, 1, 1)
+SECONDS = {"week": 604800, "day": 86400, "hour": 3600, "minute": 60, "second": 1}
+
+
+def _to_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)):
+        # Numbers are days since 1900-01-01, as in SQL Server, so
+        # DATEADD(month, DATEDIFF(month, 0, GETDATE()), 0) is the 1st of the month
+        return SQL_EPOCH + timedelta(days=value)
+    text = str(value).strip()
+    for fmt in ("%m/%d/%Y", "%Y%m%d"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(text.replace("T", " ")[:26])
+    except ValueError:
+        return None
+
+
+def _add_months(d, months):
+    month = d.month - 1 + months
+    year = d.year + month // 12
+    month = month % 12 + 1
+    leap = year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+    last = [31, 29 if leap else 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31][month - 1]
+    return d.replace(year=year, month=month, day=min(d.day, last))
+
+
+def dateadd(part, number, value):
+    d = _to_datetime(value)
+    part = DATE_PARTS.get(str(part).lower())
+    if d is None or part is None or number is None:
+        return None
+    number = int(number)
+    if part == "year":
+        d = _add_months(d, 12 * number)
+    elif part in ("quarter", "month"):
+        d = _add_months(d, number * (3 if part == "quarter" else 1))
+    else:
+        d = d + timedelta(seconds=SECONDS.get(part, 86400) * number)
+    return d.strftime(DATE_FORMAT)
+
+
+def datediff(part, start, end):
+    # Counts boundaries crossed, like SQL Server
+    a, b = _to_datetime(start), _to_datetime(end)
+    part = DATE_PARTS.get(str(part).lower())
+    if a is None or b is None or part is None:
+        return None
+    if part == "year":
+        return b.year - a.year
+    if part == "quarter":
+        return (b.year - a.year) * 4 + (b.month - 1) // 3 - (a.month - 1) // 3
+    if part == "month":
+        return (b.year - a.year) * 12 + b.month - a.month
+    if part in ("day", "weekday"):
+        return (b.date() - a.date()).days
+    if part == "week":
+        # weeks start on Sunday
+        return ((b.date() - timedelta(days=(b.weekday() + 1) % 7))
+                - (a.date() - timedelta(days=(a.weekday() + 1) % 7))).days // 7
+    unit = SECONDS[part]
+    return int(b.timestamp() // unit - a.timestamp() // unit)
+
+
+def datepart(part, value):
+    d = _to_datetime(value)
+    part = DATE_PARTS.get(str(part).lower())
+    if d is None or part is None:
+        return None
+    if part == "quarter":
+        return (d.month - 1) // 3 + 1
+    if part == "weekday":
+        return (d.weekday() + 1) % 7 + 1
+    if part == "week":
+        return int(d.strftime("%U")) + 1
+    return getattr(d, part)
+
+
+def convert(target, value, style=None):
+    # CONVERT(type, value[, style]) and CAST(value AS type)
+    if value is None:
+        return None
+    target = str(target).upper().split("(")[0].strip()
+    if target in ("DATE", "DATETIME", "DATETIME2", "SMALLDATETIME"):
+        d = _to_datetime(value)
+        if d is None:
+            return None
+        return d.strftime("%Y-%m-%d" if target == "DATE" else DATE_FORMAT)
+    if target in ("INT", "BIGINT", "SMALLINT", "TINYINT", "BIT"):
+        try:
+            return int(float(value))
+        except ValueError:
+            return None
+    if target in ("DECIMAL", "NUMERIC", "FLOAT", "REAL", "MONEY"):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    d = _to_datetime(value) if style is not None else None
+    if d is not None:
+        formats = {101: "%m/%d/%Y", 103: "%d/%m/%Y", 112: "%Y%m%d",
+                   23: "%Y-%m-%d", 120: DATE_FORMAT, 121: DATE_FORMAT}
+        return d.strftime(formats.get(int(style), DATE_FORMAT))
+    return str(value)
+
+
+def register_functions(conn, now):
+    now_text = now.strftime(DATE_FORMAT)
+    conn.create_function("GETDATE", 0, lambda: now_text, deterministic=True)
+    conn.create_function("DATEADD", 3, dateadd, deterministic=True)
+    conn.create_function("DATEDIFF", 3, datediff, deterministic=True)
+    conn.create_function("DATEPART", 2, datepart, deterministic=True)
+    conn.create_function("CONVERT", 2, convert, deterministic=True)
+    conn.create_function("CONVERT", 3, convert, deterministic=True)
+    for part in ("YEAR", "MONTH", "DAY"):
+        conn.create_function(part, 1, lambda v, p=part.lower(): datepart(p, v),
+                             deterministic=True)
+    conn.create_function("SIM_SAMPLE", 2,
+                         lambda sid, salt: zlib.crc32(f"{salt}:{sid}".encode()) % 100 < DE_SAMPLE,
+                         deterministic=True)
+    # T-SQL CHECKSUM is a signed 32-bit hash; any stable one will do for shard checks
+    conn.create_function("CHECKSUM", 1,
+                         lambda v: None if v is None else
+                         (zlib.crc32(str(v).encode()) ^ 0x80000000) - 0x80000000,
+                         deterministic=True)
+    conn.create_function("LEN", 1, lambda v: None if v is None else len(str(v).rstrip()),
+                         deterministic=True)
+
+
+# ─────────────────────────────────────────
+# DIALECT SHIM — rewrites T-SQL text so SQLite can run it
+# ─────────────────────────────────────────
+RENAMES = {"ISNULL": "IFNULL", "GETUTCDATE": "GETDATE", "SYSDATETIME": "GETDATE",
+           "TRY_CONVERT": "CONVERT", "CHARINDEX": "INSTR"}
+PART_ARG = {"DATEADD", "DATEDIFF", "DATEPART"}
+
+
+def _close_paren(tokens, levels, i):
+    # index of the ")" matching the "(" at tokens[i]
+    k = i + 1
+    while k < len(tokens) and not (tokens[k].text == ")" and levels[k] == levels[i]):
+        k += 1
+    return k
+
+
+def _scope_end(tokens, levels, i):
+    # where the SELECT at tokens[i] ends: its closing paren, a set operator, or the end
+    k = i + 1
+    while k < len(tokens):
+        if levels[k] < levels[i] or (levels[k] == levels[i] and (
+                tokens[k].text == ";" or word(tokens[k]) in ("UNION", "EXCEPT", "INTERSECT"))):
+            break
+        k += 1
+    return k
+
+
+def translate(sql):
+    tokens = tokenize(sql)
+    levels = depths(tokens)
+    edits = []
+    for i, tok in enumerate(tokens):
+        w = word(tok)
+        nxt = tokens[i + 1].text if i + 1 < len(tokens) else ""
+        if tok.kind == "string" and tok.text[:1] in "Nn":
+            edits.append((tok.start, tok.start + 1, ""))
+        elif w == "ENT" and nxt == ".":
+            edits.append((tok.start, tokens[i + 1].end, ""))
+        elif w in RENAMES and nxt == "(":
+            edits.append((tok.start, tok.end, RENAMES[w]))
+        elif w in PART_ARG and nxt == "(" and i + 2 < len(tokens):
+            part = tokens[i + 2]
+            edits.append((part.start, part.end, f"'{part.text.lower()}'"))
+        elif w in ("CONVERT", "TRY_CONVERT") and nxt == "(":
+            # CONVERT(VARCHAR(10), x, 101) -> CONVERT('VARCHAR(10)', x, 101)
+            k = i + 2
+            while k < len(tokens) and not (tokens[k].text == "," and levels[k] == levels[i] + 1):
+                k += 1
+            if k < len(tokens):
+                target = sql[tokens[i + 2].start:tokens[k - 1].end]
+                edits.append((tokens[i + 2].start, tokens[k - 1].end, f"'{target}'"))
+        elif w in ("CAST", "TRY_CAST") and nxt == "(":
+            # CAST(x AS DATE) -> CONVERT('DATE', x)
+            close = _close_paren(tokens, levels, i + 1)
+            k = close - 1
+            while k > i and not (word(tokens[k]) == "AS" and levels[k] == levels[i] + 1):
+                k -= 1
+            if k > i + 1 and close < len(tokens):
+                target = sql[tokens[k + 1].start:tokens[close - 1].end]
+                edits.append((tok.start, tokens[i + 1].end, f"CONVERT('{target}', "))
+                edits.append((tokens[k - 1].end, tokens[close].start, ""))
+        elif w == "TOP":
+            # TOP n / TOP (n) -> LIMIT n at the end of that SELECT
+            k = i + 1
+            paren = k < len(tokens) and tokens[k].text == "("
+            if paren:
+                k += 1
+            if k < len(tokens) and tokens[k].kind == "number":
+                last = k + 1 if paren else k
+                n = tokens[k].text
+                if last + 1 < len(tokens) and word(tokens[last + 1]) == "PERCENT":
+                    last += 1
+                    n = "-1"
+                edits.append((tok.start, tokens[last].end, ""))
+                select = i - 1
+                while select > 0 and word(tokens[select]) != "SELECT":
+                    select -= 1
+                end = _scope_end(tokens, levels, select)
+                at = tokens[end].start if end < len(tokens) else len(sql.rstrip())
+                edits.append((at, at, f" LIMIT {n} "))
+        elif tok.text == "+" and (tokens[i - 1].kind == "string" or
+                                  (i + 1 < len(tokens) and tokens[i + 1].kind == "string")):
+            edits.append((tok.start, tok.end, "||"))
+        elif w == "WITH" and nxt == "(" and i + 2 < len(tokens) and word(tokens[i + 2]) == "NOLOCK":
+            edits.append((tok.start, tokens[_close_paren(tokens, levels, i + 1)].end, ""))
+    return splice(sql, edits)
+
+
+# ─────────────────────────────────────────
+# SYNTHETIC DATA
+# ─────────────────────────────────────────
+CAMPAIGNS = ["Winter Sale", "Monthly Newsletter", "Welcome Series", "Renewal Reminder",
+             "Product Launch", "Abandoned Cart", "Loyalty Rewards", "Event Invite"]
+DOMAINS = ["gmail.com", "yahoo.com", "outlook.com", "example.com", "icloud.com"]
+STATUSES = ["Active"] * 90 + ["Unsubscribed"] * 5 + ["Held"] * 3 + ["Bounced"] * 2
+BOUNCES = [("Hard bounce", "User Unknown", "550 5.1.1 user unknown"),
+           ("Soft bounce", "Mailbox Full", "452 4.2.2 mailbox full"),
+           ("Block bounce", "Blocked", "554 5.7.1 message rejected")]
+FIRST = ["Alex", "Sam", "Priya", "Chen", "Maria", "Omar", "Lena", "Tom"]
+LAST = ["Smith", "Garcia", "Patel", "Kim", "Muller", "Rossi", "Brown", "Nakamura"]
+COUNTRIES = ["US", "GB", "IN", "DE", "FR", "AU"]
+
+
+def generate(conn, profile, now):
+    rng = random.Random(profile["seed"])
+    # Events after the last send would land in the future — clamp them to now
+    fmt = lambda d: min(d, now).strftime(DATE_FORMAT)  # noqa: E731
+    start = now - timedelta(days=profile["days"])
+    subscribers = profile["subscribers"]
+
+    def insert(table, rows):
+        cols = _schema()[table]
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+            rows)
+
+    key = lambda sid: f"SK{sid:08d}"  # noqa: E731
+    email = lambda sid: f"sub{sid}@{DOMAINS[sid % len(DOMAINS)]}"  # noqa: E731
+    subs = []
+    for sid in range(1, subscribers + 1):
+        status = rng.choice(STATUSES)
+        created = start - timedelta(days=rng.randint(0, 900))
+        unsub = fmt(now - timedelta(days=rng.randint(0, profile["days"]))) \
+            if status == "Unsubscribed" else None
+        subs.append((key(sid), sid, email(sid), status, fmt(created), unsub))
+    insert("_Subscribers", subs)
+    insert("_EnterpriseAttribute", ((sid, rng.choice(FIRST), rng.choice(LAST),
+                                     rng.choice(COUNTRIES)) for sid in range(1, subscribers + 1)))
+    insert("_ListSubscribers", ((key(sid), sid, list_id, "Active", None)
+                                for sid in range(1, subscribers + 1)
+                                for list_id in (1, 2, 3) if list_id == 1 or sid % list_id == 0))
+
+    jobs = []
+    for job in range(1, profile["jobs"] + 1):
+        sent = start + timedelta(days=profile["days"] * (job - 0.5) / profile["jobs"],
+                                 hours=rng.randint(6, 18))
+        name = f"{CAMPAIGNS[job % len(CAMPAIGNS)]} {job:03d}"
+        jobs.append((job, 1000 + job, name, f"{name} — subject", "AMPify Demo",
+                     "news@example.com", fmt(sent), fmt(sent), fmt(sent - timedelta(days=2))))
+    insert("_Job", jobs)
+
+    ids = list(range(1, subscribers + 1))
+    account = 100
+    per_job = max(1, int(subscribers * profile["send_rate"]))
+    for job, _, name, _, _, _, delivered, _, _ in jobs:
+        sent_at = datetime.strptime(delivered, DATE_FORMAT)
+        list_id, batch = job % 3 + 1, 1
+        sent, opens, clicks, bounces, unsubs, complaints = [], [], [], [], [], []
+        for sid in rng.sample(ids, min(per_job, subscribers)):
+            base = (account, key(sid), sid, job, list_id, batch)
+            # Every event comes after its own send
+            at = sent_at + timedelta(minutes=rng.randint(0, 90))
+            sent.append(base + (fmt(at),))
+            if rng.random() < profile["bounce_rate"]:
+                category, sub, reason = rng.choice(BOUNCES)
+                bounces.append(base + (fmt(at + timedelta(minutes=rng.randint(1, 120))),
+                                       category, sub, reason, DOMAINS[sid % len(DOMAINS)], 1))
+                continue
+            if rng.random() >= profile["open_rate"]:
+                continue
+            opened = at + timedelta(hours=rng.expovariate(1 / 20))
+            opens.append(base + (fmt(opened), DOMAINS[sid % len(DOMAINS)], 1))
+            if rng.random() < 0.3:      # re-opens are extra non-unique rows
+                opens.append(base + (fmt(opened + timedelta(hours=rng.randint(1, 72))),
+                                     DOMAINS[sid % len(DOMAINS)], 0))
+            if rng.random() < profile["click_rate"]:
+                link = rng.randint(1, 4)
+                clicked = opened + timedelta(minutes=rng.randint(1, 600))
+                clicks.append(base + (fmt(clicked), f"https://example.com/{job}/link{link}",
+                                      f"Link {link}", 1))
+            if rng.random() < profile["unsub_rate"]:
+                unsubs.append(base + (fmt(opened + timedelta(minutes=5)), 1))
+            if rng.random() < profile["complaint_rate"]:
+                complaints.append(base + (fmt(opened + timedelta(minutes=10)),))
+        insert("_Sent", sent)
+        insert("_Open", opens)
+        insert("_Click", clicks)
+        insert("_Bounce", bounces)
+        insert("_Unsubscribe", unsubs)
+        insert("_Complaint", complaints)
+        insert("_BusinessUnitUnsubscribes", ((row[1], row[6], 1) for row in unsubs))
+        insert("_JourneyActivity", (
+            ("v1", f"act{job % 5}", f"{name} email", "EMAILV2", row[1], row[6])
+            for row in sent[:len(sent) // 10]))
+
+    for view in TRACKING_VIEWS:
+        conn.execute(f"CREATE INDEX ix{view}_keys ON {view} (JobID, ListID, BatchID, SubscriberID)")
+        conn.execute(f"CREATE INDEX ix{view}_date ON {view} (EventDate)")
+        conn.execute(f"CREATE INDEX ix{view}_key ON {view} (SubscriberKey)")
+    conn.execute("CREATE INDEX ix_Subscribers_key ON _Subscribers (SubscriberKey)")
+    conn.execute("CREATE INDEX ix_Subscribers_id ON _Subscribers (SubscriberID)")
+    conn.execute("CREATE INDEX ix_EnterpriseAttribute_id ON _EnterpriseAttribute (_SubscriberID)")
+    conn.execute("ANALYZE")
+
+
+# ─────────────────────────────────────────
+# SIMULATOR
+# ─────────────────────────────────────────
+class Simulator:
+
+    def __init__(self, path=SIM_PATH, profile=None, timeout=SIM_TIMEOUT):
+        self.path = path
+        self.profile = dict(PROFILE, **(profile or {}))
+        self.timeout = timeout
+        self.now = None
+        self._ensure()
+
+    def _ensure(self):
+        # (Re)build the database when it is missing or was built with another profile
+        if os.path.exists(self.path):
+            try:
+                conn = sqlite3.connect(self.path)
+                meta = dict(conn.execute("SELECT key, value FROM _meta"))
+                conn.close()
+                if json.loads(meta["profile"]) == dict(self.profile, version=DATA_VERSION):
+                    self.now = datetime.strptime(meta["now"], DATE_FORMAT)
+                    return
+            except (sqlite3.Error, KeyError, ValueError):
+                pass
+        self.build()
+
+    def build(self):
+        # Each build writes its own file, so builds in other threads or
+        # processes never clash; the last one to finish replaces the rest
+        self._clear_stale()
+        tmp = f"{self.path}.{os.getpid()}-{uuid.uuid4().hex[:8]}.building"
+        now = datetime.now().replace(microsecond=0)
+        conn = sqlite3.connect(tmp)
+        try:
+            for table, cols in _schema().items():
+                conn.execute(f"CREATE TABLE {table} ({', '.join(_column_ddl(c) for c in cols)})")
+            generate(conn, self.profile, now)
+            conn.execute("CREATE TABLE _meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.executemany("INSERT INTO _meta VALUES (?, ?)", [
+                ("profile", json.dumps(dict(self.profile, version=DATA_VERSION))), ("now", now.strftime(DATE_FORMAT))])
+            conn.commit()
+            conn.close()
+            os.replace(tmp, self.path)
+        except BaseException:
+            conn.close()
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.now = now
+
+    def _clear_stale(self):
+        # A process that exits mid-build (the background warm-up is a daemon
+        # thread) leaves its temp file behind
+        directory = os.path.dirname(os.path.abspath(self.path))
+        prefix = os.path.basename(self.path) + "."
+        for name in os.listdir(directory):
+            if not name.startswith(prefix) or not name.endswith((".building", ".building-journal")):
+                continue
+            pid = name[len(prefix):].split("-")[0]
+            if pid.isdigit() and not _alive(int(pid)):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+    def connect(self):
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        register_functions(conn, self.now)
+        return conn
+
+    def counts(self):
+        conn = self.connect()
+        try:
+            return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in _schema()}
+        finally:
+            conn.close()
+
+    def _stage_des(self, conn, sql, skip=()):
+        # Tables that are not data views are the user's DEs — stand them in with
+        # a temp table sampled from _Subscribers, holding the columns the query uses
+        tokens = tokenize(sql)
+        levels = depths(tokens)
+        ctes = {tokens[i - 1].text.lower() for i, tok in enumerate(tokens)
+                if i and word(tok) == "AS" and i + 1 < len(tokens) and tokens[i + 1].text == "("
+                and (i < 2 or word(tokens[i - 2]) == "WITH" or tokens[i - 2].text == ",")}
+        refs = [r for r in table_refs(tokens, levels)
+                if r.table and dataview(r.table) is None and r.table.lower() not in ctes
+                and r.table.lower() not in skip]
+        staged = []
+        subscriber_cols = {c.lower(): c for c in DATA_VIEWS["_Subscribers"]}
+        for table in sorted({r.table for r in refs}):
+            aliases = {r.alias or r.table for r in refs if r.table == table} | {table}
+            cols = {col for alias, col, _ in column_refs(tokens) if alias in aliases}
+            cols = sorted(cols or {"SubscriberKey", "EmailAddress"}, key=str.lower)
+            select = ", ".join(subscriber_cols.get(c.lower(), "NULL") + f' AS "{c}"' for c in cols)
+            conn.execute(f'CREATE TEMP TABLE "{table}" AS SELECT {select} '
+                         f"FROM _Subscribers WHERE SIM_SAMPLE(SubscriberID, ?)", (table.lower(),))
+            staged.append(table)
+        return staged
+
+    def run(self, sql, limit=None, tables=None):
+        # -> {"rows", "columns", "count", "seconds", "error", "staged"}
+        # tables: {name: SELECT} materialised first, e.g. staging DEs of a plan
+        tables = tables or {}
+        conn = self.connect()
+        deadline = time.perf_counter() + self.timeout
+        conn.set_progress_handler(lambda: time.perf_counter() > deadline, 10000)
+        result = {"rows": [], "columns": [], "count": 0, "seconds": 0.0, "error": None,
+                  "staged": []}
+        try:
+            skip = {t.lower() for t in tables}
+            for table, select in tables.items():
+                staged = self._stage_des(conn, select, skip)
+                skip |= {t.lower() for t in staged}
+                result["staged"] += staged
+                conn.execute(f'CREATE TEMP TABLE "{table}" AS {translate(select).strip().rstrip(";")}')
+            result["staged"] += self._stage_des(conn, sql, skip)
+            started = time.perf_counter()
+            cursor = conn.execute(translate(sql).strip().rstrip(";"))
+            result["columns"] = [d[0] for d in cursor.description or []]
+            for row in cursor:
+                result["count"] += 1
+                if limit is None or len(result["rows"]) < limit:
+                    result["rows"].append(row)
+            result["seconds"] = time.perf_counter() - started
+        except sqlite3.OperationalError as e:
+            timed_out = "interrupted" in str(e)
+            result["error"] = f"timed out after {self.timeout:.0f}s" if timed_out else str(e)
+        except sqlite3.Error as e:
+            result["error"] = str(e)
+        finally:
+            conn.close()
+        return result
+
+
+def dry_run(qs, as_, simulator=None):
+    # Run both versions; QS agrees with AS when its rows are a sample of the AS rows
+    sim = simulator or get_simulator()
+    qs_run = sim.run(qs) if qs else None
+    as_run = sim.run(as_) if as_ else None
+    report = {"qs": qs_run, "as": as_run, "agree": None, "detail": ""}
+    if not qs_run or not as_run or qs_run["error"] or as_run["error"]:
+        return report
+    if [c.lower() for c in qs_run["columns"]] != [c.lower() for c in as_run["columns"]]:
+        report["agree"] = False
+        report["detail"] = "column lists differ"
+        return report
+    expected = min(QS_ROWS, as_run["count"])
+    as_rows = set(as_run["rows"])
+    missing = sum(row not in as_rows for row in qs_run["rows"])
+    report["agree"] = qs_run["count"] == expected and not missing
+    if qs_run["count"] != expected:
+        report["detail"] = f"QS returned {qs_run['count']} rows, expected {expected}"
+    elif missing:
+        report["detail"] = f"{missing} QS rows are not in the AS result"
+    return report
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_simulator = None
+_simulator_path = SIM_PATH
+_simulator_lock = threading.Lock()
+_warming = None
+
+
+def get_simulator():
+    # One database per process; building it is the slow part, so callers
+    # that arrive during a build wait for it instead of starting another
+    global _simulator
+    with _simulator_lock:
+        if _simulator is None:
+            _simulator = Simulator(_simulator_path)
+        return _simulator
+
+
+def use_simulator(path):
+    # Point the process at another database, built on first use — e.g. so
+    # benchmark runs never build one in the working directory
+    global _simulator, _simulator_path
+    with _simulator_lock:
+        _simulator, _simulator_path = None, path
+
+
+def warm_simulator():
+    # Build (or open) the database in the background at startup, so the
+    # first dry run does not pay for it inside a user's job. Idempotent.
+    global _warming
+    with _simulator_lock:
+        if _simulator is not None or _warming is not None:
+            return
+
+        def warm():
+            try:
+                get_simulator()
+            except (OSError, sqlite3.Error):
+                pass            # the first dry run will try again and report it
+
+        _warming = threading.Thread(target=warm, daemon=True, name="ampify-simulator-warm")
+    _warming.start()
+
+
+# Local templates every build of the data views must answer: no error,
+# some rows, and the Query Studio sample inside the Automation Studio result
+CHECKS = [
+    ("Active subscribers who opened in last 30 days but never clicked", ""),
+    ("Subscribers sent an email in the last 60 days who did not open or click", ""),
+    ("Unique hard bouncers from last 90 days — build suppression list", ""),
+    ("Subscribers who got 5+ emails this month — fatigue check", ""),
+    ("Subscribers who received 3+ emails in the last 7 days", ""),
+    ("Full tracking report: sent, opens, clicks, bounces, unsubs", ""),
+    ("Customers in CustomerMaster not in GlobalSuppression", "CustomerMaster\nGlobalSuppression"),
+]
+
+
+def self_check(sim, log=print):
+    from ampify.patterns import local_answer
+
+    failures = 0
+    for request, de_names in CHECKS:
+        qs, as_, _, match = local_answer(request, de_names)
+        report = dry_run(qs, as_, sim)
+        problem = (report["as"]["error"] or report["qs"]["error"]
+                   or ("no rows" if not report["as"]["count"] else "")
+                   or ("" if report["agree"] else f"QS disagrees — {report['detail']}"))
+        failures += bool(problem)
+        log(f"{'FAIL' if problem else 'ok  '} {match.intent:<22} {report['as']['count']:>8,} rows  {request}"
+            + (f"  — {problem}" if problem else ""))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the synthetic data views or dry-run SQL.")
+    parser.add_argument("--sql", help="file with one query to run")
+    parser.add_argument("--check", action="store_true", help="dry-run the local templates")
+    parser.add_argument("--path", default=SIM_PATH)
+    for k, v in PROFILE.items():
+        parser.add_argument(f"--{k.replace('_', '-')}", type=type(v), default=v)
+    args = parser.parse_args(argv)
+    profile = {k: getattr(args, k) for k in PROFILE}
+
+    started = time.perf_counter()
+    sim = Simulator(args.path, profile)
+    print(f"data views ready in {time.perf_counter() - started:.1f}s (GETDATE() = {sim.now})")
+    if args.check:
+        return 1 if self_check(sim) else 0
+    if not args.sql:
+        for table, n in sim.counts().items():
+            print(f"  {table:<28}{n:>12,}")
+        return 0
+    with open(args.sql, encoding="utf-8") as f:
+        result = sim.run(f.read(), limit=20)
+    if result["error"]:
+        print(f"error: {result['error']}")
+        return 1
+    print("\t".join(result["columns"]))
+    for row in result["rows"]:
+        print("\t".join("" if v is None else str(v) for v in row))
+    print(f"{result['count']:,} rows in {result['seconds'] * 1000:.0f} ms"
+          + (f" — simulated DEs: {', '.join(result['staged'])}" if result["staged"] else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# ─────────────────────────────────────────
+# SINGLE-FLIGHT GENERATION
+# Identical requests that are in flight at the same time (same cache key, so
+# same normalized text, DE names, model and prompt) share one upstream call;
+# every waiting session replays the same stream of chunks.
+# New upstream calls go through a bounded queue served round-robin across
+# sessions by a fixed pool of workers, with a per-session rate limit.
+# Calls without a session (batch runs, CLIs) skip the pool and run on their
+# own thread — ampify.batch --concurrency already bounds them.
+# ─────────────────────────────────────────
+WORKERS = int(os.getenv("AMPIFY_WORKERS", "4"))                 # concurrent upstream calls
+QUEUE_MAX = int(os.getenv("AMPIFY_QUEUE_MAX", "32"))            # waiting upstream calls
+SESSION_PENDING = int(os.getenv("AMPIFY_SESSION_PENDING", "2")) # per session, queued + running
+SESSION_RATE = int(os.getenv("AMPIFY_SESSION_RATE", "6"))       # new calls per window
+SESSION_WINDOW = float(os.getenv("AMPIFY_SESSION_WINDOW", "60"))
+
+
+class Overloaded(Exception):
+    # Rejected before reaching Groq — queue full or session over its limit
+    def __init__(self, message, retry_in=None):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+class Flight:
+    # One upstream call; chunks are kept so late joiners replay from the start
+
+    def __init__(self, key, session, work):
+        self.key = key
+        self.session = session
+        self.work = work
+        self.meta = {}              # call metadata filled in by work (path, usage...)
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.followers = 1
+        self.abandoned = False      # every follower left before it finished
+        self.released = False       # its session slot has been given back
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self._cond = threading.Condition()
+
+    def push(self, text):
+        with self._cond:
+            self.chunks.append(text)
+            self._cond.notify_all()
+
+    def leave(self):
+        # A follower stopped reading; with nobody left the upstream call stops
+        with self._cond:
+            self.followers -= 1
+            if self.followers <= 0 and not self.done:
+                self.abandoned = True
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def follow(self, cancel=None):
+        # Generator over every chunk, blocking until the flight finishes or
+        # the `cancel` event is set
+        i = 0
+        while True:
+            with self._cond:
+                while True:
+                    if cancel is not None and cancel.is_set():
+                        return
+                    if i < len(self.chunks) or self.done:
+                        break
+                    self._cond.wait(0.05 if cancel is not None else None)
+                new = self.chunks[i:]
+                done, error = self.done, self.error
+            i += len(new)
+            for text in new:
+                yield text
+            if done and i == len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class Dispatcher:
+
+    def __init__(self, workers=WORKERS, queue_max=QUEUE_MAX, session_pending=SESSION_PENDING,
+                 session_rate=SESSION_RATE, session_window=SESSION_WINDOW):
+        self.workers = workers
+        self.queue_max = queue_max
+        self.session_pending = session_pending
+        self.session_rate = session_rate
+        self.session_window = session_window
+        self.flights = {}                   # key -> Flight, queued or running
+        self.queues = OrderedDict()         # session -> deque of queued flights
+        self.queued = 0
+        self.pending = {}                   # session -> queued + running count
+        self.history = {}                   # session -> deque of submit times
+        self.stats = {"submitted": 0, "coalesced": 0, "rejected": 0}
+        self._threads = []
+        self._cond = threading.Condition()
+
+    # ── admission ──
+    def _admit(self, session):
+        if self.queued >= self.queue_max:
+            raise Overloaded("The generation queue is full — please try again in a few seconds", 5)
+        if self.pending.get(session, 0) >= self.session_pending:
+            raise Overloaded("You already have generations running — wait for them to finish")
+        now = time.monotonic()
+        times = self.history.setdefault(session, deque())
+        while times and now - times[0] > self.session_window:
+            times.popleft()
+        if len(times) >= self.session_rate:
+            retry_in = self.session_window - (now - times[0])
+            raise Overloaded(f"Rate limit reached — {self.session_rate} generations per "
+                             f"{self.session_window:g}s, try again in {retry_in:.0f}s", retry_in)
+        times.append(now)
+
+    def submit(self, key, session, work):
+        # -> (flight, joined); joined means an identical call was already in flight
+        with self._cond:
+            flight = self.flights.get(key)
+            # An abandoned flight stops at its next chunk (or never starts),
+            # so a new request gets a call of its own
+            if flight is not None and not flight.abandoned:
+                flight.followers += 1
+                self.stats["coalesced"] += 1
+                return flight, True
+            flight = Flight(key, session, work)
+            if session is None:
+                # Batch runs and CLIs bound their own concurrency: they skip
+                # the pool, the queue and the session limits
+                self.flights[key] = flight
+                self.stats["submitted"] += 1
+                flight.started_at = time.monotonic()
+                threading.Thread(target=self._run, args=(flight,), daemon=True, name="ampify-flight-batch").start()
+                return flight, False
+            try:
+                self._admit(session)
+            except Overloaded:
+                self.stats["rejected"] += 1
+                raise
+            self.flights[key] = flight
+            self.queues.setdefault(session, deque()).append(flight)
+            self.queued += 1
+            self.pending[session] = self.pending.get(session, 0) + 1
+            self.stats["submitted"] += 1
+            self._ensure_workers()
+            self._cond.notify()
+            return flight, False
+
+    def leave(self, flight):
+        # A follower stopped reading. With nobody left the flight is
+        # abandoned: its session slot is freed at once, and a flight still in
+        # the queue is dropped without calling upstream
+        with self._cond:
+            flight.leave()
+            if not flight.abandoned or flight.released:
+                return
+            queue = self.queues.get(flight.session)
+            if flight.started_at is None and queue is not None and flight in queue:
+                queue.remove(flight)
+                if not queue:
+                    del self.queues[flight.session]
+                self.queued -= 1
+                flight.finish()
+            self._release(flight)
+
+    def _release(self, flight):
+        # Under self._cond; once per flight
+        if flight.released:
+            return
+        flight.released = True
+        if self.flights.get(flight.key) is flight:
+            del self.flights[flight.key]
+        if flight.session is not None:
+            self.pending[flight.session] -= 1
+            if not self.pending[flight.session]:
+                del self.pending[flight.session]
+
+    def position(self, flight):
+        # Queued flights ahead of this one (0 once it is running)
+        with self._cond:
+            if flight.started_at is not None:
+                return 0
+            return sum(f.queued_at < flight.queued_at for q in self.queues.values() for f in q)
+
+    # ── workers ──
+    def _ensure_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, daemon=True,
+                                      name=f"ampify-flight-{len(self._threads)}")
+            self._threads.append(thread)
+            thread.start()
+
+    def _next(self):
+        # Round-robin across sessions: take one flight, send the session to the back
+        session, queue = next(iter(self.queues.items()))
+        flight = queue.popleft()
+        del self.queues[session]
+        if queue:
+            self.queues[session] = queue
+        self.queued -= 1
+        return flight
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self.queued:
+                    self._cond.wait()
+                flight = self._next()
+                flight.started_at = time.monotonic()
+            self._run(flight)
+
+    def _run(self, flight):
+        error = None
+        try:
+            if not flight.abandoned:
+                flight.work(flight)
+        except Exception as e:          # handed to every follower
+            error = e
+        with self._cond:
+            self._release(flight)
+        flight.finish(error)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = Dispatcher()
+        return _dispatcher
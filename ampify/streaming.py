@@ -0,0 +1,79 @@
+import time
+
+# ─────────────────────────────────────────
+# INCREMENTAL MARKER PARSER
+# Recognises ---QS_START--- / ---AS_END--- etc. as tokens arrive,
+# in a single pass over the stream (each character is scanned once).
+# ─────────────────────────────────────────
+SECTIONS = ("qs", "as", "exp")
+MARKERS = {
+    "QS_START": ("start", "qs"), "QS_END": ("end", "qs"),
+    "AS_START": ("start", "as"), "AS_END": ("end", "as"),
+    "EXP_START": ("start", "exp"), "EXP_END": ("end", "exp"),
+}
+MAX_MARKER_LEN = max(len(m) for m in MARKERS) + 6
+
+
+class MarkerStreamParser:
+
+    def __init__(self):
+        self.sections = {name: "" for name in SECTIONS}
+        self.started = set()
+        self.finished = set()
+        self.current = None
+        self.started_at = time.perf_counter()
+        self.finished_at = {}
+        self._pending = ""
+
+    def feed(self, chunk):
+        # Returns a list of ("start" | "text" | "end", section, text) events
+        events = []
+        buf = self._pending + chunk
+        pos = 0
+        while True:
+            i = buf.find("---", pos)
+            if i < 0:
+                # Hold back trailing dashes that may open the next marker
+                keep = min(len(buf) - len(buf.rstrip("-")), len(buf) - pos)
+                self._emit(buf[pos:len(buf) - keep], events)
+                self._pending = buf[len(buf) - keep:]
+                return events
+            j = buf.find("---", i + 3)
+            if j < 0:
+                if len(buf) - i < MAX_MARKER_LEN:
+                    self._emit(buf[pos:i], events)
+                    self._pending = buf[i:]
+                    return events
+                self._emit(buf[pos:i + 3], events)
+                pos = i + 3
+                continue
+            marker = MARKERS.get(buf[i + 3:j].strip(" -"))
+            if marker is None:
+                self._emit(buf[pos:i + 3], events)
+                pos = i + 3
+                continue
+            self._emit(buf[pos:i], events)
+            kind, section = marker
+            if kind == "start":
+                self.current = section
+                self.started.add(section)
+            elif self.current == section:
+                self.current = None
+                self.finished.add(section)
+                self.finished_at[section] = time.perf_counter() - self.started_at
+            events.append((kind, section, ""))
+            pos = j + 3
+
+    def close(self):
+        events = []
+        self._emit(self._pending, events)
+        self._pending = ""
+        return events
+
+    def result(self):
+        return tuple(self.sections[name].strip() for name in SECTIONS)
+
+    def _emit(self, text, events):
+        if text and self.current is not None:
+            self.sections[self.current] += text
+            events.append(("text", self.current, text))
@@ -0,0 +1,219 @@
+import re
+from collections import namedtuple
+
+# ─────────────────────────────────────────
+# T-SQL TOKENIZER — just enough of the SFMC dialect
+# for linting, analysis and rewriting
+# ─────────────────────────────────────────
+Token = namedtuple("Token", "kind text start end")
+
+_TOKEN_PATTERN = r"""
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>N'(?:[^']|'')*'|'(?:[^']|'')*')
+  | (?P<ident>\[[^\]]*\]|[A-Za-z_][\w$]*)
+  | (?P<op><>|!=|>=|<=|[-+*/%=<>(),.;])
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<var>@@?\w+)
+  | (?P<temp>\#\#?\w+)
+  | (?P<other>\S)
+"""
+# Whitespace is only materialised when the caller wants the full stream
+TOKEN_RE = re.compile(r"(?P<ws>\s+)" + _TOKEN_PATTERN, re.X | re.S)
+SIGNIFICANT_RE = re.compile(r"(?!)" + _TOKEN_PATTERN, re.X | re.S)
+
+# Words that end a FROM/JOIN item or an ON condition
+CLAUSE_WORDS = {
+    "SELECT", "FROM", "WHERE", "GROUP", "HAVING", "ORDER", "UNION", "EXCEPT",
+    "INTERSECT", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "OUTER",
+    "ON", "WITH",
+}
+
+
+def tokenize(sql, significant=True):
+    tokens = []
+    pattern = SIGNIFICANT_RE if significant else TOKEN_RE
+    for m in pattern.finditer(sql):
+        kind = m.lastgroup
+        if significant and kind == "comment":
+            continue
+        start, end = m.span()
+        tokens.append(Token(kind, sql[start:end], start, end))
+    return tokens
+
+
+def word(token):
+    # Upper-cased identifier text, "" for anything else
+    if token.kind != "ident":
+        return ""
+    return token.text.upper()
+
+
+def name(token):
+    # Identifier without [brackets], case preserved
+    text = token.text
+    if text.startswith("[") and text.endswith("]"):
+        return text[1:-1]
+    return text
+
+
+def depths(tokens):
+    # Parenthesis depth of every token (the "(" itself sits at the outer depth)
+    out = []
+    depth = 0
+    for tok in tokens:
+        if tok.text == ")":
+            depth = max(depth - 1, 0)
+        out.append(depth)
+        if tok.text == "(":
+            depth += 1
+    return out
+
+
+def line_of(sql, offset):
+    return sql.count("\n", 0, offset) + 1
+
+
+def splice(sql, edits):
+    # edits: (start, end, replacement) on non-overlapping character ranges
+    for start, end, text in sorted(edits, key=lambda e: (e[0], e[1]), reverse=True):
+        sql = sql[:start] + text + sql[end:]
+    return sql
+
+
+# ─────────────────────────────────────────
+# CONDITIONS
+# ─────────────────────────────────────────
+def where_end(tokens, levels, words, i):
+    # One past the last token of the WHERE clause at tokens[i]
+    depth = levels[i]
+    k = i + 1
+    while k < len(tokens) and levels[k] >= depth and not (
+            levels[k] == depth and (tokens[k].text == ";" or words[k] in
+                                    ("GROUP", "HAVING", "ORDER", "UNION", "EXCEPT", "INTERSECT"))):
+        k += 1
+    return k
+
+
+def conjuncts(tokens, levels, words, start, end):
+    # Split a condition on its top-level ANDs (BETWEEN x AND y stays whole)
+    if start >= end:
+        return []
+    depth = min(levels[start:end])
+    parts = []
+    begin = start
+    between = False
+    for k in range(start, end):
+        if levels[k] != depth:
+            continue
+        if words[k] == "BETWEEN":
+            between = True
+        elif words[k] == "AND":
+            if between:
+                between = False
+            else:
+                parts.append((begin, k))
+                begin = k + 1
+    parts.append((begin, end))
+    return [(a, b) for a, b in parts if a < b]
+
+
+# ─────────────────────────────────────────
+# FROM / JOIN ITEMS
+# ─────────────────────────────────────────
+# token indices: start = FROM/JOIN keyword (or comma), table_end = one past
+# the alias, on_start/on_end = the ON condition (equal when there is none)
+TableRef = namedtuple("TableRef", "table alias join depth start table_end on_start on_end")
+
+JOIN_TYPES = ("INNER", "LEFT", "RIGHT", "FULL", "CROSS")
+NOT_ALIAS = CLAUSE_WORDS | {"AS", "AND", "OR", "NOT", "WHEN", "THEN", "OPTION"}
+
+
+def table_refs(tokens, levels=None):
+    levels = levels if levels is not None else depths(tokens)
+    refs = []
+    in_from = {}          # depth -> True while inside a FROM list
+    i = 0
+    n = len(tokens)
+    while i < n:
+        w = word(tokens[i])
+        depth = levels[i]
+        start = i
+        if w == "FROM":
+            join = "FROM"
+            in_from[depth] = True
+        elif w == "JOIN":
+            join = "INNER"
+            j = i - 1
+            while j >= 0 and word(tokens[j]) in JOIN_TYPES + ("OUTER",):
+                if word(tokens[j]) in JOIN_TYPES:
+                    join = word(tokens[j])
+                start = j
+                j -= 1
+        elif tokens[i].text == "," and in_from.get(depth):
+            join = "CROSS"
+        else:
+            if w in CLAUSE_WORDS - {"JOIN", "ON"} or w in JOIN_TYPES:
+                in_from[depth] = w in JOIN_TYPES
+            i += 1
+            continue
+
+        i += 1
+        if i >= n:
+            break
+        table = None
+        resume = None
+        if tokens[i].text == "(":
+            # Derived table — alias follows the matching parenthesis, then
+            # come back and scan the subquery's own FROM/JOIN items
+            resume = i + 1
+            k = i + 1
+            while k < n and not (tokens[k].text == ")" and levels[k] == depth):
+                k += 1
+            i = k + 1
+        elif tokens[i].kind in ("ident", "temp"):
+            parts = [name(tokens[i])]
+            i += 1
+            while i + 1 < n and tokens[i].text == "." and tokens[i + 1].kind == "ident":
+                parts.append(name(tokens[i + 1]))
+                i += 2
+            table = ".".join(parts)
+        alias = None
+        if i < n and word(tokens[i]) == "AS":
+            i += 1
+        if i < n and tokens[i].kind == "ident" and word(tokens[i]) not in NOT_ALIAS:
+            alias = name(tokens[i])
+            i += 1
+        table_end = i
+        on_start = on_end = i
+        if i < n and word(tokens[i]) == "ON":
+            on_start = i + 1
+            k = on_start
+            while k < n:
+                if levels[k] < depth or tokens[k].text == ";":
+                    break
+                if levels[k] == depth and (
+                    (word(tokens[k]) in CLAUSE_WORDS and word(tokens[k]) != "ON")
+                    or (tokens[k].text == "," and in_from.get(depth))
+                ):
+                    break
+                k += 1
+            on_end = k
+            i = k
+        refs.append(TableRef(table, alias or (table.split(".")[-1] if table else None),
+                             join, depth, start, table_end, on_start, on_end))
+        if resume is not None:
+            i = resume
+    return refs
+
+
+def column_refs(tokens, start=0, end=None):
+    # (alias, column, token index) for every alias.column in tokens[start:end]
+    end = len(tokens) if end is None else end
+    out = []
+    for k in range(start, min(end, len(tokens)) - 2):
+        if (tokens[k].kind == "ident" and tokens[k + 1].text == "."
+                and tokens[k + 2].kind == "ident"
+                and (k + 3 >= len(tokens) or tokens[k + 3].text != ".")
+                and (k == 0 or tokens[k - 1].text != ".")):
+            out.append((name(tokens[k]), name(tokens[k + 2]), k))
+    return out
@@ -0,0 +1,112 @@
+import re
+
+from ampify.patterns import QS_HEADER
+from ampify.tokenizer import depths, splice, tokenize, word
+
+# ─────────────────────────────────────────
+# AUTOMATION STUDIO → QUERY STUDIO
+# Derives the Query Studio preview from the production SQL locally, so the
+# model only has to write the query once.
+# ─────────────────────────────────────────
+QS_ROWS = 100
+
+HEADER_RE = re.compile(r"^\s*--\s*(?:🚀|AUTOMATION STUDIO|Target DE\b|Action\b).*$\n?",
+                       re.I | re.M)
+
+
+def _first_union(tokens, levels):
+    for i, tok in enumerate(tokens):
+        if levels[i] == 0 and word(tok) in ("UNION", "EXCEPT", "INTERSECT"):
+            return i
+    return None
+
+
+def _trailing_order_by(tokens, levels):
+    for i in range(len(tokens) - 1, 0, -1):
+        if levels[i] == 0 and word(tokens[i]) == "BY" and word(tokens[i - 1]) == "ORDER":
+            return i - 1
+    return None
+
+
+def _strip_subquery_order_by(sql):
+    # ORDER BY is only legal inside a subquery when that SELECT has TOP
+    tokens = tokenize(sql)
+    levels = depths(tokens)
+    edits = []
+    select_top = {}
+    openers = []
+    for i, tok in enumerate(tokens):
+        if tok.text == "(":
+            openers.append(word(tokens[i - 1]) if i else "")
+        elif tok.text == ")" and openers:
+            openers.pop()
+        w = word(tok)
+        if w == "SELECT":
+            nxt = [word(t) for t in tokens[i + 1:i + 3]]
+            select_top[levels[i]] = "TOP" in nxt
+        elif (w == "ORDER" and levels[i] > 0 and i + 1 < len(tokens)
+              and word(tokens[i + 1]) == "BY" and not select_top.get(levels[i])
+              and not (openers and openers[-1] == "OVER")):
+            k = i + 1
+            while k < len(tokens) and levels[k] >= levels[i] and tokens[k].text != ")":
+                k += 1
+            end = tokens[k].start if k < len(tokens) else len(sql)
+            edits.append((tokens[i - 1].end, end, ""))
+    return splice(sql, edits), bool(edits)
+
+
+def _inject_top(sql):
+    tokens = tokenize(sql)
+    levels = depths(tokens)
+    for i, tok in enumerate(tokens):
+        if levels[i] != 0 or word(tok) != "SELECT":
+            continue
+        j = i + 1
+        if j < len(tokens) and word(tokens[j]) in ("DISTINCT", "ALL"):
+            j += 1
+        if j < len(tokens) and word(tokens[j]) == "TOP":
+            # Existing TOP n / TOP (n) — cap it at 100
+            k = j + 1
+            if k < len(tokens) and tokens[k].text == "(":
+                k += 1
+            if k < len(tokens) and tokens[k].kind == "number" and float(tokens[k].text) > QS_ROWS:
+                return splice(sql, [(tokens[k].start, tokens[k].end, str(QS_ROWS))])
+            return sql
+        at = tokens[j].start if j < len(tokens) else len(sql)
+        return splice(sql, [(at, at, f"TOP {QS_ROWS} ")])
+    return sql
+
+
+def derive_query_studio(as_sql):
+    # -> (qs_sql, notes); notes describe anything that could not be kept as-is
+    notes = []
+    body = HEADER_RE.sub("", as_sql).strip()
+
+    tokens = tokenize(body)
+    levels = depths(tokens)
+    union = _first_union(tokens, levels)
+    if union is not None:
+        order = _trailing_order_by(tokens, levels)
+        kept = body[:tokens[union].start].rstrip()
+        if order is not None and order > union:
+            kept += "\n" + body[tokens[order].start:].strip()
+        body = kept
+        notes.append("Preview shows the first UNION branch only — Query Studio does not support UNION")
+
+    body, dropped = _strip_subquery_order_by(body)
+    if dropped:
+        notes.append("Removed ORDER BY from a subquery without TOP")
+    body = _inject_top(body)
+
+    header = [QS_HEADER] + [f"-- Note: {note}" for note in notes]
+    return "\n".join(header) + "\n" + body, notes
+
+
+def add_query_studio(raw):
+    # Insert a derived QS section into a marker-format answer that has none
+    if "---QS_START---" in raw or "---AS_END---" not in raw:
+        return raw
+    as_sql = raw.split("---AS_START---", 1)[-1].split("---AS_END---", 1)[0].strip()
+    qs, _ = derive_query_studio(as_sql)
+    pos = raw.index("---AS_END---") + len("---AS_END---")
+    return raw[:pos] + f"\n---QS_START---\n{qs}\n---QS_END---" + raw[pos:]
@@ -1,7 +1,34 @@
 import os
-from groq import Groq
+import time
+import uuid
+from html import escape
+
 import streamlit as st
 
+from ampify.cache import get_cache, normalize_de_names
+from ampify.catalog import get_catalog
+from ampify.core import configure, lint_sql, validate
+from ampify.cost import VOLUME, analyze
+from ampify.cost import describe as describe_finding
+from ampify.history import PAGE_SIZE, get_history
+from ampify.incremental import incremental_queries, steps
+from ampify.jobs import CANCELLED, QUEUED, generation, get_jobs
+from ampify.linter import ERROR, WARNING, describe
+from ampify.partition import ACTIONS, format_partition, partition_queries
+from ampify.metrics import (
+    ScriptProfile, observe_overload, observe_reject, observe_reuse, start_metrics_server,
+)
+from ampify.page import (
+    AS_BANNER, CSS, DE_HINT, DIVIDER, EMPTY_STATE, FOOTER, HERO, QS_BANNER, REFERENCE,
+    label_html, render_items, spacer, title_html,
+)
+from ampify.similarity import get_similar_cache
+from ampify.singleflight import Overloaded
+from ampify.rewriter import diff
+from ampify.simulator import dry_run, warm_simulator
+
+profile = ScriptProfile()
+
 # Works on both local (.env) and Streamlit Cloud (st.secrets)
 try:
     from dotenv import load_dotenv
@@ -19,340 +46,450 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Minimal CSS — only target what Streamlit reliably allows
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=DM+Sans:wght@400;500;600;700;800&family=JetBrains+Mono:wght@400;600&display=swap');
-
-.stApp { background: #F4FBFF !important; }
-#MainMenu, footer, header { visibility: hidden; }
-.block-container { padding-top: 0 !important; max-width: 100% !important; }
-
-/* Text area input styling */
-textarea {
-    background: #ffffff !important;
-    border: 1.5px solid #C8E6F5 !important;
-    border-radius: 10px !important;
-    color: #0D2B45 !important;
-    font-size: 0.88rem !important;
-    line-height: 1.65 !important;
-}
-textarea:focus {
-    border-color: #00B5E2 !important;
-    box-shadow: 0 0 0 3px rgba(0,181,226,0.1) !important;
-}
-
-/* Primary generate button */
-.stButton > button {
-    background: linear-gradient(135deg, #00B5E2, #007FAA) !important;
-    color: white !important;
-    border: none !important;
-    border-radius: 10px !important;
-    font-weight: 700 !important;
-    font-size: 0.92rem !important;
-    padding: 0.7rem 1.5rem !important;
-    box-shadow: 0 4px 14px rgba(0,181,226,0.35) !important;
-    width: 100% !important;
-    transition: transform 0.15s, box-shadow 0.15s !important;
-}
-.stButton > button:hover {
-    transform: translateY(-1px) !important;
-    box-shadow: 0 6px 20px rgba(0,181,226,0.45) !important;
-}
-
-/* Download button — secondary style */
-.stDownloadButton > button {
-    background: white !important;
-    color: #0D2B45 !important;
-    border: 1.5px solid #C8E6F5 !important;
-    border-radius: 10px !important;
-    font-weight: 600 !important;
-    font-size: 0.84rem !important;
-    width: 100% !important;
-    box-shadow: none !important;
-}
-.stDownloadButton > button:hover {
-    border-color: #00B5E2 !important;
-    background: #EEF9FF !important;
-    transform: none !important;
-    box-shadow: none !important;
-}
-
-/* Tab strip */
-.stTabs [data-baseweb="tab-list"] {
-    background: #E4F2F9 !important;
-    border-radius: 10px !important;
-    padding: 4px !important;
-    border: none !important;
-}
-.stTabs [data-baseweb="tab"] {
-    background: transparent !important;
-    border-radius: 7px !important;
-    color: #5B7A90 !important;
-    font-weight: 600 !important;
-    font-size: 0.84rem !important;
-    padding: 7px 18px !important;
-    border: none !important;
-}
-.stTabs [aria-selected="true"] {
-    background: white !important;
-    color: #0D2B45 !important;
-    box-shadow: 0 1px 5px rgba(0,0,0,0.08) !important;
-}
-.stTabs [data-baseweb="tab-panel"] { padding: 0 !important; }
-
-/* Hide all textarea labels Streamlit adds */
-.stTextArea label { display: none !important; }
-</style>
-""", unsafe_allow_html=True)
+# Static HTML comes prebuilt from ampify.page — see the fragments below for
+# what reruns on each interaction
+st.markdown(CSS, unsafe_allow_html=True)
 
 # ─────────────────────────────────────────
 # GROQ CLIENT
 # ─────────────────────────────────────────
-client = Groq(api_key=GROQ_API_KEY)
+configure(GROQ_API_KEY)
+# Stream tokens and show Query Studio SQL as soon as its section is complete
+STREAMING = os.getenv("AMPIFY_STREAMING", "1") == "1"
+# Dry-run both versions against the synthetic data views after each generation;
+# the data views are built in the background while the page loads
+SIMULATE = os.getenv("AMPIFY_SIMULATOR", "1") == "1"
+if SIMULATE:
+    warm_simulator()
+# Seconds between looks at a running generation job
+JOB_POLL = float(os.getenv("AMPIFY_JOB_POLL", "0.5"))
+# Prometheus endpoint when AMPIFY_METRICS_PORT is set — one per process
+start_metrics_server()
 
 # ─────────────────────────────────────────
-# SFMC KNOWLEDGE BASE
+# HELPERS
 # ─────────────────────────────────────────
-SFMC_RULES = """
-You are an expert Salesforce Marketing Cloud (SFMC) SQL specialist.
-ONLY answer SFMC SQL queries. For anything else say:
-"AMPify only handles SFMC SQL queries."
-
-UNIVERSAL RULES — never break these:
-- NEVER SELECT * — always name every column
-- NEVER use #temp tables, @variables, stored procedures
-- NEVER use DDL (CREATE, DROP, ALTER, TRUNCATE)
-- NEVER write INSERT INTO, UPDATE, DELETE
-- NEVER use LIMIT — use TOP N
-- NEVER use NOW() or CURRENT_DATE — use GETDATE()
-- NEVER use TRUE/FALSE — use 1 or 0
-- Field names are case-sensitive — match exactly
-- Data views hold ONLY last 6 months of data
-
-QUERY STUDIO:
-- Always add TOP 100 — read-only preview, nothing saved to DE
-- No UNION/UNION ALL, no correlated subqueries, no ORDER BY without TOP
-
-AUTOMATION STUDIO:
-- No row limit — results auto-written to target DE
-- Just SELECT — no INSERT INTO needed
-- Supports CTEs, subqueries, UNION ALL
-- Comment: -- Target DE: [name]
-- Actions: Append | Update | Overwrite
-
-ENT. PREFIX: Required from child BU only. _Job is BU-specific (no subscriber data).
-
-CRITICAL JOIN PATTERN — always use all 4 keys:
-    ON  a.JobID = b.JobID AND a.ListID = b.ListID
-    AND a.BatchID = b.BatchID AND a.SubscriberID = b.SubscriberID
-    AND b.IsUnique = 1   ← always in JOIN, NEVER in WHERE
-
-DATA VIEWS:
-_Sent           : SubscriberKey, SubscriberID, JobID, ListID, BatchID, EventDate
-_Open           : AccountID, SubscriberKey, SubscriberID, JobID, ListID, BatchID, EventDate, Domain, IsUnique
-_Click          : AccountID, SubscriberKey, SubscriberID, JobID, ListID, BatchID, EventDate, URL, LinkName, IsUnique
-_Bounce         : AccountID, SubscriberKey, SubscriberID, JobID, ListID, BatchID, EventDate, BounceCategory, BounceSubcategory, SMTPBounceReason, Domain, IsUnique
-_Unsubscribe    : AccountID, SubscriberKey, SubscriberID, JobID, ListID, BatchID, EventDate, IsUnique
-_Complaint      : AccountID, SubscriberKey, SubscriberID, JobID, ListID, BatchID, EventDate
-_Job            : JobID, EmailID, EmailName, EmailSubject, FromName, FromEmail, DeliveredTime, SchedTime, CreatedDate
-_Subscribers    : SubscriberKey, SubscriberID, EmailAddress, Status, DateCreated, DateUnsubscribed
-ENT._EnterpriseAttribute : _SubscriberID + profile attributes — join on SubscriberID = _SubscriberID
-_ListSubscribers : SubscriberKey, SubscriberID, ListID, Status, DateUnsubscribed
-_JourneyActivity : VersionID, ActivityID, ActivityName, ActivityType, SubscriberKey, EventDate
-_BusinessUnitUnsubscribes : SubscriberKey, DateUnsubscribed, BusinessUnitID
-
-DATE: GETDATE() | DATEADD(day,-30,GETDATE()) | DATEDIFF(day,Field,GETDATE()) | CONVERT(DATE,Field) | CONVERT(VARCHAR,Field,101)
-STRING: Field1+' '+Field2 | LEN() | UPPER() | LOWER() | SUBSTRING() | REPLACE() | ISNULL() | COALESCE()
-
-PROVEN PATTERNS TO REUSE:
-1. Unengaged (no opens or clicks):
-SELECT DISTINCT s.SubscriberKey, j.EmailName
-FROM _Sent s INNER JOIN _Job j ON s.JobID=j.JobID
-LEFT JOIN _Open o ON s.JobID=o.JobID AND s.ListID=o.ListID AND s.BatchID=o.BatchID AND s.SubscriberID=o.SubscriberID AND o.IsUnique=1
-LEFT JOIN _Click c ON s.JobID=c.JobID AND s.ListID=c.ListID AND s.BatchID=c.BatchID AND s.SubscriberID=c.SubscriberID AND c.IsUnique=1
-WHERE s.EventDate>=DATEADD(day,-30,GETDATE()) AND o.SubscriberID IS NULL AND c.SubscriberID IS NULL
-
-2. Full tracking:
-SELECT s.SubscriberKey,j.EmailName,s.EventDate AS SentDate,o.EventDate AS OpenDate,
-c.EventDate AS ClickDate,b.EventDate AS BounceDate,b.BounceCategory,u.EventDate AS UnsubscribeDate
-FROM _Sent s INNER JOIN _Job j ON s.JobID=j.JobID
-LEFT JOIN _Open o ON s.JobID=o.JobID AND s.ListID=o.ListID AND s.BatchID=o.BatchID AND s.SubscriberID=o.SubscriberID AND o.IsUnique=1
-LEFT JOIN _Click c ON s.JobID=c.JobID AND s.ListID=c.ListID AND s.BatchID=c.BatchID AND s.SubscriberID=c.SubscriberID AND c.IsUnique=1
-LEFT JOIN _Bounce b ON s.JobID=b.JobID AND s.ListID=b.ListID AND s.BatchID=b.BatchID AND s.SubscriberID=b.SubscriberID AND b.IsUnique=1
-LEFT JOIN _Unsubscribe u ON s.JobID=u.JobID AND s.ListID=u.ListID AND s.BatchID=u.BatchID AND s.SubscriberID=u.SubscriberID AND u.IsUnique=1
-
-3. Suppression: SELECT m.SubscriberKey,m.EmailAddress FROM MasterDE m LEFT JOIN SuppressionDE s ON m.EmailAddress=s.EmailAddress WHERE s.EmailAddress IS NULL
-4. Active openers never clicked: SELECT DISTINCT o.SubscriberKey FROM _Open o INNER JOIN _Subscribers sub ON o.SubscriberKey=sub.SubscriberKey LEFT JOIN _Click c ON o.JobID=c.JobID AND o.ListID=c.ListID AND o.BatchID=c.BatchID AND o.SubscriberID=c.SubscriberID AND c.IsUnique=1 WHERE o.EventDate>=DATEADD(day,-30,GETDATE()) AND o.IsUnique=1 AND c.SubscriberID IS NULL AND sub.Status='Active'
-
-PLACEHOLDER DE NAMES: CustomerMaster | EmailEngagement | GlobalSuppression | RenewalCandidates | TrackingLog | JourneyEntrants
-"""
+def render_violations(sql, violations):
+    if not violations:
+        return
+    colors = {
+        ERROR: ("#FFF4EF", "#FF6B35", "#7A2800"),
+        WARNING: ("#FFFBEA", "#F5B300", "#6B4E00"),
+    }
+    html = ""
+    for v in violations:
+        bg, border, text = colors.get(v.severity, ("#EEF6FF", "#00B5E2", "#0D2B45"))
+        html += render_items([describe(sql, v)], bg, border, text, mono=True)
+    st.markdown(html, unsafe_allow_html=True)
 
 
-# ─────────────────────────────────────────
-# FUNCTIONS
-# ─────────────────────────────────────────
-def generate_sfmc_sql(user_request, custom_de_names=""):
-    de_context = (
-        f"User's Data Extension names:\n{custom_de_names}"
-        if custom_de_names.strip()
-        else "No DE names given — suggest appropriate placeholder names."
+def section_label(text):
+    st.markdown(label_html(text), unsafe_allow_html=True)
+
+
+def section_title(text):
+    st.markdown(title_html(text), unsafe_allow_html=True)
+
+
+def render_run(run):
+    # One line per version: rows and runtime on synthetic data, or the error
+    if not run:
+        return
+    if run["error"]:
+        st.caption(f"🧪 Dry run failed: {run['error']}")
+        return
+    text = f"🧪 Dry run on synthetic data — {run['count']:,} rows in {run['seconds'] * 1000:,.0f} ms"
+    if run["staged"]:
+        text += f" · simulated DEs: {', '.join(run['staged'])}"
+    st.caption(text)
+
+
+@st.fragment
+def render_cost(sql):
+    # Timeout risk for the Automation Studio query under the volume profile;
+    # a fragment, so changing the volume only recomputes this panel
+    with st.expander("⏱  Timeout risk — volume profile"):
+        c1, c2 = st.columns(2)
+        sends = c1.number_input("Sends per day", min_value=0, step=10000,
+                                value=VOLUME["sends_per_day"], key="vol_sends")
+        subscribers = c2.number_input("Subscribers", min_value=0, step=100000,
+                                      value=VOLUME["subscribers"], key="vol_subscribers")
+    report = analyze(sql, {"sends_per_day": sends, "subscribers": subscribers})
+    colors = {
+        "high": ("#FFF4EF", "#FF6B35", "#7A2800"),
+        "medium": ("#FFFBEA", "#F5B300", "#6B4E00"),
+        "low": ("#EDFAF5", "#00D4AA", "#004D3A"),
+    }
+    bg, border, text = colors[report.level]
+    summary = (
+        f"Timeout risk {report.score}/100 ({report.level}) — "
+        f"~{report.rows:,.0f} rows, est. {report.minutes:.1f} of 30 min"
     )
-    prompt = f"""
-User Request: {user_request}
-{de_context}
-
-Generate TWO SQL versions. Use EXACTLY this format — nothing outside the markers:
-
----QS_START---
--- ⚡ QUERY STUDIO VERSION | Test Only | Max 100 Rows
-[clean sql with TOP 100, all Query Studio rules applied]
----QS_END---
----AS_START---
--- 🚀 AUTOMATION STUDIO VERSION | Production | Full Dataset
--- Target DE: [suggest name]
-[full production sql, correct 4-key joins, IsUnique=1 in JOIN not WHERE]
----AS_END---
----EXP_START---
-[2-3 plain English sentences: what it does, key logic, any warnings]
----EXP_END---
-"""
-    resp = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[
-            {"role": "system", "content": SFMC_RULES},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.1
+    scans = [
+        f"{s.view} {s.alias}: ~{s.rows:,.0f} rows"
+        + (f" ({s.days:g} days, bounded by {s.bound})" if s.bound else
+           " (full retention)" if s.days else "")
+        for s in report.scans
+    ]
+    out = render_items([summary], bg, border, text)
+    out += render_items(scans, "#F0F9FF", "#C8E6F5", "#0D2B45", mono=True)
+    out += render_items([escape(describe_finding(sql, f)) for f in report.findings],
+                        bg, border, text, mono=True)
+    st.markdown(out, unsafe_allow_html=True)
+
+
+def render_incremental(sql):
+    # The watermark-based daily load for the Automation Studio query, or why
+    # it has to keep recomputing the whole window
+    inc, reason = incremental_queries(sql)
+    if inc is None:
+        st.caption(f"🔁 Needs a full recompute — {reason}")
+        return
+    st.markdown(render_items([escape(note) for note in inc.notes], "#F0F9FF", "#C8E6F5", "#0D2B45"),
+                unsafe_allow_html=True)
+    for _, label, text in steps(inc):
+        st.caption(label)
+        st.code(text, language="sql")
+    st.download_button(
+        "⬇️  Download incremental.sql",
+        data="\n\n".join(text for _, _, text in steps(inc)) + "\n",
+        file_name="incremental.sql",
+        mime="text/plain",
+        use_container_width=True,
+        on_click="ignore",
+        key="dl_incremental"
     )
-    return resp.choices[0].message.content
 
 
-def parse_response(raw):
-    qs = as_ = exp = ""
-    try:
-        if "---QS_START---" in raw:
-            qs = raw.split("---QS_START---")[1].split("---QS_END---")[0].strip()
-        if "---AS_START---" in raw:
-            as_ = raw.split("---AS_START---")[1].split("---AS_END---")[0].strip()
-        if "---EXP_START---" in raw:
-            exp = raw.split("---EXP_START---")[1].split("---EXP_END---")[0].strip()
-    except Exception:
-        qs = as_ = raw
-        exp = "Could not parse explanation."
-    return qs, as_, exp
-
-
-def validate(req):
-    if len(req.strip()) < 15:
-        return False, "Please describe your query in more detail."
-    off = ["python", "javascript", "react", "recipe",
-           "weather", "movie", "java ", "c++", "write a story"]
-    if any(k in req.lower() for k in off):
-        return False, "AMPify only handles SFMC SQL queries."
-    return True, ""
+@st.fragment
+def render_partition(sql):
+    # Shards of the Automation Studio query for very large DEs; a fragment,
+    # so the inputs only rerun this panel
+    c1, c2, c3 = st.columns(3)
+    rows = c1.number_input("Rows in the largest DE", min_value=0, step=1000000,
+                           value=VOLUME["de_rows"], key="shard_rows")
+    shards = c2.number_input("Shards (0 = from the row count)", min_value=0, max_value=64,
+                             value=0, key="shard_count")
+    action = c3.selectbox("Data action", ACTIONS, key="shard_action")
+    part, reason = partition_queries(sql, shards or None, rows, action=action)
+    if part is None:
+        st.caption(f"🧩 Not split — {reason}")
+        return
+    st.code(format_partition(part), language="text")
+    shown = ([part.clear] if part.clear else []) + part.queries[:1]
+    for shard in shown:
+        st.code(shard.sql, language="sql")
+    if len(part.queries) > 1:
+        st.caption(f"The other {len(part.queries) - 1} shards differ only in the CHECKSUM remainder.")
+    st.download_button(
+        "⬇️  Download shards.sql",
+        data="\n\n".join(shard.sql for shard in ([part.clear] if part.clear else []) + part.queries) + "\n",
+        file_name="shards.sql",
+        mime="text/plain",
+        use_container_width=True,
+        on_click="ignore",
+        key="dl_shards"
+    )
 
 
-# ─────────────────────────────────────────
-# HELPER — render a list of items as HTML
-# ─────────────────────────────────────────
-def render_items(items, bg, border_color, text_color, mono=False):
-    ff = "font-family:'JetBrains Mono',monospace;" if mono else ""
-    html = ""
-    for item in items:
-        if isinstance(item, tuple):
-            name, desc = item
-            html += (
-                f'<div style="background:{bg};border-left:3px solid {border_color};'
-                f'border-radius:0 7px 7px 0;padding:7px 12px;margin:3px 0;{ff}">'
-                f'<span style="font-weight:600;color:{text_color};font-size:0.78rem;">{name}</span>'
-                f'<span style="display:block;color:#5B7A90;font-size:0.71rem;margin-top:1px;">{desc}</span>'
-                f'</div>'
-            )
-        else:
-            html += (
-                f'<div style="background:{bg};border-left:3px solid {border_color};'
-                f'border-radius:0 7px 7px 0;padding:7px 12px;margin:3px 0;'
-                f'color:{text_color};font-size:0.78rem;font-weight:500;{ff}">{item}</div>'
-            )
-    return html
+def render_catalog(custom_des):
+    # Which Step 2 DEs have known fields, and the schema import
+    catalog = get_catalog()
+    names = normalize_de_names(custom_des)
+    if names:
+        known = [n for n in names if catalog.get(n) is not None]
+        missing = [n for n in names if n not in known]
+        st.caption(" · ".join(part for part in (
+            f"📚 Fields known for {', '.join(known)}" if known else "",
+            f"not in the catalog: {', '.join(missing)}" if missing else "",
+        ) if part))
+    with st.expander("📚  Import DE schemas — CSV or JSON exports"):
+        files = st.file_uploader("schemas", type=["csv", "json"], accept_multiple_files=True,
+                                 key="de_schemas", label_visibility="collapsed")
+        done = st.session_state.setdefault('catalog_imported', {})
+        for f in files or []:
+            if f.file_id not in done:
+                imported, reason = catalog.import_text(f.getvalue().decode("utf-8-sig"), f.name)
+                done[f.file_id] = (
+                    f"{f.name}: " + ", ".join(f"{de} ({count} fields)" for de, count in imported)
+                    if imported else f"{f.name}: not imported — {reason}")
+        for line in done.values():
+            st.caption(line)
+        stats = catalog.stats()
+        st.caption(f"Catalog: {stats['des']:,} DEs · {stats['fields']:,} fields")
 
 
-def section_label(text):
-    st.markdown(
-        f'<div style="font-size:0.62rem;font-weight:800;letter-spacing:2.5px;'
-        f'text-transform:uppercase;color:#00B5E2;margin-bottom:4px;">{text}</div>',
-        unsafe_allow_html=True
-    )
+def divider():
+    st.markdown(DIVIDER, unsafe_allow_html=True)
 
 
-def section_title(text):
-    st.markdown(
-        f'<div style="font-size:0.94rem;font-weight:700;color:#0D2B45;margin-bottom:12px;">{text}</div>',
-        unsafe_allow_html=True
-    )
+def error_card(title, detail):
+    st.markdown(f"""
+    <div style="background:#FFF4EF;border:1.5px solid rgba(255,107,53,0.3);
+                border-radius:10px;padding:14px 18px;">
+        <div style="color:#C04000;font-weight:700;font-size:0.88rem;">{title}</div>
+        <div style="color:#7A2800;font-size:0.83rem;margin-top:4px;">{detail}</div>
+    </div>
+    """, unsafe_allow_html=True)
 
 
-def divider():
-    st.markdown(
-        '<div style="height:1.5px;background:#E2EFF5;margin:20px 0;"></div>',
-        unsafe_allow_html=True
+# ─────────────────────────────────────────
+# GENERATION
+# ─────────────────────────────────────────
+def generate(user_request, custom_des):
+    if not user_request.strip():
+        error_card("⚠️ Nothing to generate", "Please describe what you want the query to do in Step 1.")
+        return
+
+    ok, msg = validate(user_request, custom_des)
+    if not ok:
+        observe_reject(user_request, msg)
+        error_card("❌ Invalid request", msg)
+        return
+
+    # The session id scopes queue fairness and rate limits; the job runs on
+    # a worker and the output panel polls it
+    session = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    try:
+        job = get_jobs().submit(session, generation(SIMULATE, STREAMING), user_request, custom_des)
+    except Overloaded as e:
+        observe_overload(e)
+        error_card("🚦 Too many requests", escape(str(e)))
+        return
+    st.session_state['job_id'] = job.id
+    # In the URL too, so a refresh finds the job again
+    st.query_params["job"] = job.id
+
+
+def cancel_job():
+    get_jobs().cancel(st.session_state.get('job_id'))
+
+
+def current_job():
+    job_id = st.session_state.get('job_id') or st.query_params.get("job")
+    if not job_id:
+        return None
+    job = get_jobs().get(job_id)
+    if job is None:
+        # Expired, or started on a server that has since restarted
+        forget_job()
+        return None
+    st.session_state['job_id'] = job.id
+    return job
+
+
+def forget_job():
+    st.session_state.pop('job_id', None)
+    st.query_params.pop("job", None)
+
+
+def collect(job):
+    # A finished job's result into the output panel, once
+    forget_job()
+    if job.state == CANCELLED:
+        st.caption("⏹ Generation cancelled.")
+        return
+    if job.error:
+        error_card(*map(escape, job.error))
+        return
+    new_query()
+    st.session_state.pop('history_rows', None)
+    result = job.result
+    for key in ['qs', 'asm', 'exp', 'lint_qs', 'lint_as', 'prompt_stats', 'rewrites',
+                'original_as', 'dry_run']:
+        if key in result:
+            st.session_state[key] = result[key]
+    announce(result["info"])
+
+
+def announce(info):
+    if info.get("partial", {}).get("sections"):
+        names = {"qs": "Query Studio", "as": "Automation Studio", "exp": "explanation"}
+        st.toast("Completed a cut-off answer: " + ", ".join(names[s] for s in info["partial"]["sections"]),
+                 icon="🧩")
+    race = info.get("candidates")
+    if race and race["k"] > 1 and race["valid"]:
+        st.toast(f"Candidate {race['winner'] + 1} of {race['k']} passed the checks first", icon="🏁")
+    if info.get("repaired"):
+        st.toast("Fixed SFMC rule violations", icon="🛠")
+    if info.get("source") == "local":
+        st.toast("Answered instantly from a proven pattern", icon="⚡")
+    elif info.get("cache") == "hit":
+        st.toast("Served from cache", icon="⚡")
+    elif info.get("cache") == "similar":
+        st.toast(f"Adapted a similar earlier answer ({info['similarity']:.0%} match)", icon="⚡")
+    elif info.get("coalesced"):
+        st.toast("Shared an identical request already in progress", icon="⚡")
+    elif info.get("path", {}).get("fallback"):
+        st.toast(f"Primary model busy — answered by {info['path']['model']}", icon="↩️")
+    elif info.get("qs_ready_s") is not None:
+        st.toast(f"SQL generated! Query Studio ready in {info['qs_ready_s']:.1f}s", icon="⚡")
+    else:
+        st.toast("SQL generated!", icon="⚡")
+
+
+@st.fragment(run_every=JOB_POLL)
+def job_panel():
+    # Polls the running job: its stage, the queue ahead of it and the
+    # sections streamed so far; a full rerun shows the result when it ends
+    job = current_job()
+    if job is None or job.done:
+        st.rerun()
+    jobs = get_jobs()
+    elapsed = time.monotonic() - job.created
+    if job.cancel.is_set():
+        status = "⏹ Cancelling..."
+    elif job.state == QUEUED:
+        status = f"⏳ Waiting for a worker — {jobs.position(job)} in line"
+    else:
+        status = f"⏳ {job.stage}..."
+    c1, c2 = st.columns([4, 1])
+    c1.caption(f"{status} ({elapsed:.0f}s)")
+    c2.button("⏹ Cancel", key="cancel_job", on_click=cancel_job, disabled=job.cancel.is_set())
+    sections = job.sections
+    if sections.get("qs", "").strip() or sections.get("as", "").strip():
+        tab1, tab2 = st.tabs(["🧪  Query Studio — Test", "🚀  Automation Studio — Production"])
+        tab1.code(sections.get("qs", "").strip(), language="sql")
+        tab2.code(sections.get("as", "").strip(), language="sql")
+        if sections.get("exp", "").strip():
+            st.markdown(sections["exp"].strip())
+
+
+def new_query():
+    for k in ['qs', 'asm', 'exp', 'lint_qs', 'lint_as', 'prompt_stats', 'dry_run',
+              'rewrites', 'original_as', 'reused']:
+        st.session_state.pop(k, None)
+
+
+def reuse(entry_id):
+    # A saved generation back in the output panel — no model call
+    entry = get_history().get(entry_id)
+    if entry is None:
+        return
+    new_query()
+    st.session_state['qs'] = entry.qs
+    st.session_state['asm'] = entry.asm
+    st.session_state['exp'] = entry.exp
+    st.session_state['lint_qs'] = lint_sql(entry.qs, "qs") if entry.qs else []
+    st.session_state['lint_as'] = lint_sql(entry.asm, "as")
+    st.session_state['reused'] = entry.request
+    if SIMULATE and entry.qs:
+        st.session_state['dry_run'] = dry_run(entry.qs, entry.asm)
+    get_history().touch(entry_id)
+    observe_reuse(entry)
+
+
+def render_results():
+    if st.session_state.get('reused'):
+        st.caption(f"♻️ Reused from history — {st.session_state['reused']}")
+    tab1, tab2 = st.tabs(["🧪  Query Studio — Test", "🚀  Automation Studio — Production"])
+
+    with tab1:
+        st.markdown(QS_BANNER, unsafe_allow_html=True)
+
+        st.code(st.session_state['qs'], language="sql")
+        render_violations(st.session_state['qs'], st.session_state.get('lint_qs', []))
+        report = st.session_state.get('dry_run')
+        if report:
+            render_run(report["qs"])
+            if report["agree"] is not None:
+                st.caption(
+                    "✅ Matches the Automation Studio result on its first 100 rows"
+                    if report["agree"] else
+                    f"⚠️ Differs from the Automation Studio result — {report['detail']}"
+                )
+
+        # Downloads are served by the browser, no rerun needed
+        st.download_button(
+            "⬇️  Download query_studio.sql",
+            data=st.session_state['qs'],
+            file_name="query_studio.sql",
+            mime="text/plain",
+            use_container_width=True,
+            on_click="ignore",
+            key="dl_qs"
+        )
+
+    with tab2:
+        st.markdown(AS_BANNER, unsafe_allow_html=True)
+
+        st.code(st.session_state['asm'], language="sql")
+        render_violations(st.session_state['asm'], st.session_state.get('lint_as', []))
+        if st.session_state.get('dry_run'):
+            render_run(st.session_state['dry_run']["as"])
+        if st.session_state.get('rewrites'):
+            with st.expander(f"🛠  Optimized — {len(st.session_state['rewrites'])} rewrite(s)"):
+                st.markdown(
+                    render_items([escape(r.note) for r in st.session_state['rewrites']],
+                                 "#EDFAF5", "#00D4AA", "#004D3A"),
+                    unsafe_allow_html=True
+                )
+                st.code(diff(st.session_state['original_as'], st.session_state['asm']),
+                        language="diff")
+        render_cost(st.session_state['asm'])
+        if st.toggle("🔁  Incremental daily version", key="incremental",
+                     help="Backfill once, then load only new events with the Update action"):
+            render_incremental(st.session_state['asm'])
+        if st.toggle("🧩  Split into parallel shards", key="partition",
+                     help="For very large DEs: N queries on a hash of SubscriberKey, run in one step"):
+            render_partition(st.session_state['asm'])
+
+        st.download_button(
+            "⬇️  Download automation_studio.sql",
+            data=st.session_state['asm'],
+            file_name="automation_studio.sql",
+            mime="text/plain",
+            use_container_width=True,
+            on_click="ignore",
+            key="dl_asm"
+        )
+
+    # Explanation
+    if st.session_state.get('exp'):
+        divider()
+        section_label("Query Explanation")
+        st.markdown(
+            f'<div style="background:white;border:1.5px solid #D1E8F5;border-radius:10px;'
+            f'padding:16px 18px;font-size:0.86rem;color:#0D2B45;line-height:1.8;">'
+            f'{st.session_state["exp"]}'
+            f'</div>',
+            unsafe_allow_html=True
+        )
+
+    stats = get_cache().stats
+    caption = (
+        f"Cache — {stats['memory_hits'] + stats['disk_hits']} hits · "
+        f"{get_similar_cache().stats['hits']} similar · {stats['misses']} misses"
     )
+    prompt_stats = st.session_state.get('prompt_stats')
+    if prompt_stats:
+        saved = prompt_stats['saved_tokens'] / max(prompt_stats['full_tokens'], 1)
+        caption += (
+            f" · Prompt {prompt_stats['prompt_tokens']:,} of "
+            f"{prompt_stats['full_tokens']:,} tokens (−{saved:.0%})"
+        )
+    st.caption(caption)
+
+    st.markdown(spacer(14), unsafe_allow_html=True)
+    st.button("🔄  New Query", key="new_query", on_click=new_query)
 
 
 # ═════════════════════════════════════════
-# PAGE LAYOUT
+# FRAGMENTS
+# Typing reruns only the input panel, Generate and New Query only the output
+# panel, and the volume inputs only the timeout-risk panel. The hero, CSS and
+# reference lists are sent once, on the full run when the page loads.
 # ═════════════════════════════════════════
-
-# ── HERO ──
-st.markdown("""
-<div style="background:linear-gradient(135deg,#032D60 0%,#0A4080 55%,#0090B8 100%);
-            padding:44px 48px 40px;margin-bottom:28px;position:relative;overflow:hidden;">
-    <div style="position:absolute;right:48px;top:24px;font-size:8rem;
-                opacity:0.06;line-height:1;pointer-events:none;">☁</div>
-    <div style="font-size:0.63rem;font-weight:800;letter-spacing:3px;
-                text-transform:uppercase;color:#7DD3F0;margin-bottom:10px;">
-        Salesforce Marketing Cloud Developer Tool
-    </div>
-    <div style="font-size:2.8rem;font-weight:800;color:#fff;
-                letter-spacing:-1px;line-height:1.1;margin-bottom:10px;">
-        ⚡ AMP<span style="color:#00D4AA;">ify</span>
-    </div>
-    <div style="font-size:0.94rem;color:rgba(255,255,255,0.6);
-                font-weight:500;margin-bottom:22px;">
-        Describe your query in plain English. Get production-ready SFMC SQL instantly.
-    </div>
-    <div style="display:flex;flex-wrap:wrap;gap:8px;">
-        <span style="background:rgba(255,255,255,0.1);border:1px solid rgba(255,255,255,0.2);
-                     border-radius:100px;padding:4px 14px;font-size:0.73rem;
-                     font-weight:600;color:rgba(255,255,255,0.85);">☁️ All Data Views</span>
-        <span style="background:rgba(0,212,170,0.15);border:1px solid rgba(0,212,170,0.4);
-                     border-radius:100px;padding:4px 14px;font-size:0.73rem;
-                     font-weight:600;color:#00D4AA;">✅ Query Studio Safe</span>
-        <span style="background:rgba(255,107,53,0.15);border:1px solid rgba(255,107,53,0.4);
-                     border-radius:100px;padding:4px 14px;font-size:0.73rem;
-                     font-weight:600;color:#FF8057;">🚀 Automation Studio Ready</span>
-        <span style="background:rgba(255,255,255,0.1);border:1px solid rgba(255,255,255,0.2);
-                     border-radius:100px;padding:4px 14px;font-size:0.73rem;
-                     font-weight:600;color:rgba(255,255,255,0.85);">🌐 Any Industry</span>
-    </div>
-</div>
-""", unsafe_allow_html=True)
-
-# ── TWO COLUMNS ──
-left, right = st.columns([1, 1.1], gap="large")
-
-# ════════════════════════
-# LEFT — INPUT PANEL
-# ════════════════════════
-with left:
+@st.fragment(key="input")
+def input_panel():
 
     # Step 1
     section_label("Step 1")
     section_title("Describe what you want the query to do")
 
-    user_request = st.text_area(
+    st.text_area(
         "req",
+        key="user_request",
         height=165,
         placeholder=(
             "Examples:\n"
@@ -371,16 +508,11 @@ with left:
     # Step 2
     section_label("Step 2 — Optional")
     section_title("Your Data Extension names")
-    st.markdown(
-        '<div style="font-size:0.8rem;color:#5B7A90;margin-bottom:8px;line-height:1.5;">'
-        'Leave blank — AMPify suggests placeholder DE names based on your query.<br>'
-        'Or enter your actual DE names, one per line.'
-        '</div>',
-        unsafe_allow_html=True
-    )
+    st.markdown(DE_HINT, unsafe_allow_html=True)
 
-    custom_des = st.text_area(
+    st.text_area(
         "des",
+        key="custom_des",
         height=100,
         placeholder=(
             "CustomerMaster\n"
@@ -390,238 +522,112 @@ with left:
         ),
         label_visibility="collapsed"
     )
+    render_catalog(st.session_state.get('custom_des', ""))
+
+
+def load_more_history():
+    rows = st.session_state['history_rows']
+    more = get_history().search(*st.session_state['history_filter'], before=rows[-1].id)
+    st.session_state['history_rows'] = rows + more
+    st.session_state['history_end'] = len(more) < PAGE_SIZE
+
+
+@st.fragment(key="history")
+def history_panel():
+    # Saved generations, newest first, a page at a time; nothing is read
+    # until the panel is opened
+    history = get_history()
+    if not history.enabled or not st.toggle("🕘  Query history", key="history_open"):
+        return
+    c1, c2 = st.columns([1.6, 1])
+    text = c1.text_input("Search", key="history_search", placeholder="Search requests, SQL, explanations")
+    obj = c2.text_input("Data view / DE", key="history_object", placeholder="_Bounce")
+    if st.session_state.get('history_filter') != (text, obj):
+        st.session_state['history_filter'] = (text, obj)
+        st.session_state.pop('history_rows', None)
+    if 'history_rows' not in st.session_state:
+        st.session_state['history_rows'] = history.search(text, obj)
+        st.session_state['history_end'] = len(st.session_state['history_rows']) < PAGE_SIZE
+    rows = st.session_state['history_rows']
+    if not rows:
+        st.caption("No saved generations match." if text or obj else "Nothing saved yet.")
+        return
+    for s in rows:
+        c1, c2 = st.columns([5, 1])
+        when = time.strftime("%b %d %H:%M", time.localtime(s.created))
+        c1.markdown(f"**{escape(s.request[:120])}**  \n"
+                    f"<span style='font-size:0.75rem;color:#5A7A95;'>{when} · {escape(s.objects)}"
+                    f"{f' · reused {s.uses}×' if s.uses else ''}</span>", unsafe_allow_html=True)
+        if c2.button("♻️ Reuse", key=f"reuse_{s.id}"):
+            reuse(s.id)
+            st.rerun()
+    if not st.session_state['history_end']:
+        st.button("Load more", key="history_more", on_click=load_more_history)
 
-    st.markdown('<div style="height:14px;"></div>', unsafe_allow_html=True)
-    gen_btn = st.button("⚡ Generate SFMC SQL")
 
-    divider()
+@st.fragment(key="output")
+def output_panel(actions):
+    # Own profile so fragment-only reruns are measured too
+    panel = ScriptProfile(scope="output")
 
-    # ── REFERENCE ──
-    section_label("SFMC SQL Quick Reference")
-    st.markdown('<div style="height:4px;"></div>', unsafe_allow_html=True)
+    # The Generate button sits under the inputs but belongs to this fragment,
+    # so a click reruns the output panel alone
+    with actions:
+        st.markdown(spacer(14), unsafe_allow_html=True)
+        gen_btn = st.button("⚡ Generate SFMC SQL", key="generate_btn")
 
-    # Don't use — rules
-    st.markdown(
-        '<div style="font-size:0.78rem;font-weight:700;color:#0D2B45;margin:10px 0 6px;">❌ Never use in SFMC</div>',
-        unsafe_allow_html=True
-    )
-    rules = [
-        "No SELECT * — name all columns explicitly",
-        "No LIMIT — use TOP N instead",
-        "No NOW() — use GETDATE()",
-        "No TRUE/FALSE — use 1 or 0",
-        "No #temp tables or @variables",
-        "No stored procedures or DDL",
-        "No UNION / UNION ALL in Query Studio",
-        "No INSERT INTO in query activity — just SELECT",
-    ]
-    st.markdown(
-        render_items(rules, "#FFF4EF", "#FF6B35", "#7A2800"),
-        unsafe_allow_html=True
-    )
+    section_label("Output")
+    section_title("Generated SQL")
 
-    # 4-key join pattern
-    st.markdown(
-        '<div style="font-size:0.78rem;font-weight:700;color:#0D2B45;margin:14px 0 6px;">🔗 Critical — 4-key join pattern</div>',
-        unsafe_allow_html=True
-    )
-    st.markdown("""
-    <div style="background:#F0F9FF;border:1.5px solid #C8E6F5;border-radius:10px;padding:14px 16px;">
-        <div style="font-size:0.68rem;color:#5B7A90;font-weight:600;margin-bottom:8px;">
-            Always join data views on ALL FOUR keys — never SubscriberKey alone:
-        </div>
-    """ + render_items(
-        [
-            "ON  a.JobID        = b.JobID",
-            "AND a.ListID       = b.ListID",
-            "AND a.BatchID      = b.BatchID",
-            "AND a.SubscriberID = b.SubscriberID",
-            "AND b.IsUnique     = 1  ← in JOIN, not WHERE",
-        ],
-        "#EDFAF5", "#00D4AA", "#004D3A", mono=True
-    ) + "</div>", unsafe_allow_html=True)
-
-    # Functions
-    st.markdown(
-        '<div style="font-size:0.78rem;font-weight:700;color:#0D2B45;margin:14px 0 6px;">✅ Key SFMC functions</div>',
-        unsafe_allow_html=True
-    )
-    st.markdown(
-        render_items([
-            "GETDATE()  →  current datetime",
-            "DATEADD(day, -30, GETDATE())",
-            "DATEDIFF(day, DateField, GETDATE())",
-            "ISNULL(Field, 'default')",
-            "CONVERT(DATE, DateField)",
-            "CONVERT(VARCHAR, DateField, 101)  →  MM/DD/YYYY",
-            "Field1 + ' ' + Field2  →  concatenation",
-            "LEN() | UPPER() | LOWER() | SUBSTRING()",
-        ], "#EDFAF5", "#00D4AA", "#004D3A", mono=True),
-        unsafe_allow_html=True
-    )
+    if gen_btn:
+        generate(st.session_state.get('user_request', ""), st.session_state.get('custom_des', ""))
 
-    # Data views
-    st.markdown(
-        '<div style="font-size:0.78rem;font-weight:700;color:#0D2B45;margin:14px 0 6px;">☁️ System data views</div>',
-        unsafe_allow_html=True
-    )
-    st.markdown(
-        render_items([
-            ("_Sent", "SubscriberKey, JobID, EventDate, ListID, BatchID"),
-            ("_Open", "IsUnique, Domain, EventDate — multiple rows per open"),
-            ("_Click", "URL, LinkName, IsUnique — multiple rows per click"),
-            ("_Bounce", "BounceCategory, SMTPBounceReason, Domain"),
-            ("_Unsubscribe", "EventDate, IsUnique"),
-            ("_Complaint", "Spam complaints — join _Job for email name"),
-            ("_Job", "EmailName, FromEmail, DeliveredTime — BU-specific"),
-            ("_Subscribers", "Status: Active / Bounced / Unsubscribed / Held"),
-            ("ENT._EnterpriseAttribute", "Profile attributes — join on _SubscriberID"),
-            ("_JourneyActivity", "ActivityName, ActivityType, EventDate"),
-            ("_BusinessUnitUnsubscribes", "BU-level unsubs — BusinessUnitID"),
-        ], "#EEF6FF", "#00B5E2", "#0D2B45"),
-        unsafe_allow_html=True
-    )
+    job = current_job()
+    if job is not None and not job.done:
+        job_panel()
+        panel.finish()
+        return
+    if job is not None:
+        collect(job)
 
+    panel.lap("generate")
 
-# ════════════════════════
-# RIGHT — OUTPUT PANEL
-# ════════════════════════
-with right:
+    if st.session_state.get('qs'):
+        render_results()
+    else:
+        st.markdown(EMPTY_STATE, unsafe_allow_html=True)
 
-    section_label("Output")
-    section_title("Generated SQL")
+    panel.lap("results")
+    panel.finish()
 
-    # Handle button press
-    if gen_btn:
-        if not user_request.strip():
-            st.markdown("""
-            <div style="background:#FFF4EF;border:1.5px solid rgba(255,107,53,0.3);
-                        border-radius:10px;padding:14px 18px;">
-                <div style="color:#C04000;font-weight:700;font-size:0.88rem;">⚠️ Nothing to generate</div>
-                <div style="color:#7A2800;font-size:0.83rem;margin-top:4px;">
-                    Please describe what you want the query to do in Step 1.
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-
-        else:
-            ok, msg = validate(user_request)
-            if not ok:
-                st.markdown(f"""
-                <div style="background:#FFF4EF;border:1.5px solid rgba(255,107,53,0.3);
-                            border-radius:10px;padding:14px 18px;">
-                    <div style="color:#C04000;font-weight:700;font-size:0.88rem;">❌ Invalid request</div>
-                    <div style="color:#7A2800;font-size:0.83rem;margin-top:4px;">{msg}</div>
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                with st.spinner("Generating SFMC SQL..."):
-                    raw = generate_sfmc_sql(user_request, custom_des)
-                    qs, asm, exp = parse_response(raw)
-                    st.session_state['qs'] = qs
-                    st.session_state['asm'] = asm
-                    st.session_state['exp'] = exp
-                st.toast("SQL generated!", icon="⚡")
-
-    # Show results
-    if st.session_state.get('qs'):
 
-        tab1, tab2 = st.tabs(["🧪  Query Studio — Test", "🚀  Automation Studio — Production"])
+# ═════════════════════════════════════════
+# PAGE LAYOUT — full runs only
+# ═════════════════════════════════════════
 
-        with tab1:
-            st.markdown("""
-            <div style="background:#EDFAF5;border:1px solid rgba(0,212,170,0.35);
-                        border-radius:8px;padding:9px 14px;margin-bottom:10px;
-                        font-size:0.8rem;font-weight:600;color:#004D3A;">
-                ✅ Safe to paste directly in Query Studio — Preview only, max 100 rows, no DE written
-            </div>
-            """, unsafe_allow_html=True)
-
-            st.code(st.session_state['qs'], language="sql")
-
-            st.download_button(
-                "⬇️  Download query_studio.sql",
-                data=st.session_state['qs'],
-                file_name="query_studio.sql",
-                mime="text/plain",
-                use_container_width=True,
-                key="dl_qs"
-            )
-
-        with tab2:
-            st.markdown("""
-            <div style="background:#FFF4EF;border:1px solid rgba(255,107,53,0.3);
-                        border-radius:8px;padding:9px 14px;margin-bottom:10px;
-                        font-size:0.8rem;font-weight:600;color:#C04000;">
-                ⚠️ Production query — verify target DE exists and action type is correct before scheduling
-            </div>
-            """, unsafe_allow_html=True)
-
-            st.code(st.session_state['asm'], language="sql")
-
-            st.download_button(
-                "⬇️  Download automation_studio.sql",
-                data=st.session_state['asm'],
-                file_name="automation_studio.sql",
-                mime="text/plain",
-                use_container_width=True,
-                key="dl_asm"
-            )
-
-        # Explanation
-        if st.session_state.get('exp'):
-            divider()
-            section_label("Query Explanation")
-            st.markdown(
-                f'<div style="background:white;border:1.5px solid #D1E8F5;border-radius:10px;'
-                f'padding:16px 18px;font-size:0.86rem;color:#0D2B45;line-height:1.8;">'
-                f'{st.session_state["exp"]}'
-                f'</div>',
-                unsafe_allow_html=True
-            )
-
-        st.markdown('<div style="height:14px;"></div>', unsafe_allow_html=True)
-        if st.button("🔄  New Query"):
-            for k in ['qs', 'asm', 'exp']:
-                st.session_state.pop(k, None)
-            st.rerun()
+# ── HERO ──
+st.markdown(HERO, unsafe_allow_html=True)
 
-    else:
-        # Empty state — clean, no noise
-        st.markdown("""
-        <div style="border:1.5px dashed #C8E6F5;border-radius:16px;
-                    padding:60px 24px;text-align:center;background:#FAFEFF;margin-top:4px;">
-            <div style="font-size:2.6rem;opacity:0.2;margin-bottom:16px;">⚡</div>
-            <div style="font-size:1rem;font-weight:700;color:#8AAFC0;margin-bottom:8px;">
-                Ready to generate
-            </div>
-            <div style="font-size:0.84rem;color:#A8C4D0;line-height:1.75;margin-bottom:24px;">
-                Describe your query on the left.<br>
-                AMPify writes both Query Studio and<br>
-                Automation Studio versions instantly.
-            </div>
-            <div style="display:flex;flex-wrap:wrap;gap:8px;justify-content:center;">
-                <span style="background:#EEF6FF;border:1px solid #C8E6F5;border-radius:8px;
-                             padding:5px 12px;font-size:0.74rem;font-weight:600;color:#1B4F8A;">🔍 Engagement</span>
-                <span style="background:#EDFAF5;border:1px solid rgba(0,212,170,0.25);border-radius:8px;
-                             padding:5px 12px;font-size:0.74rem;font-weight:600;color:#004D3A;">🚫 Suppression</span>
-                <span style="background:#FFF4EF;border:1px solid rgba(255,107,53,0.2);border-radius:8px;
-                             padding:5px 12px;font-size:0.74rem;font-weight:600;color:#7A2800;">📊 Segmentation</span>
-                <span style="background:#EEF6FF;border:1px solid #C8E6F5;border-radius:8px;
-                             padding:5px 12px;font-size:0.74rem;font-weight:600;color:#1B4F8A;">🔄 Re-engagement</span>
-                <span style="background:#EDFAF5;border:1px solid rgba(0,212,170,0.25);border-radius:8px;
-                             padding:5px 12px;font-size:0.74rem;font-weight:600;color:#004D3A;">😴 Fatigue Control</span>
-                <span style="background:#FFF4EF;border:1px solid rgba(255,107,53,0.2);border-radius:8px;
-                             padding:5px 12px;font-size:0.74rem;font-weight:600;color:#7A2800;">📋 Full Tracking</span>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+profile.lap("setup")
+
+# ── TWO COLUMNS ──
+left, right = st.columns([1, 1.1], gap="large")
+
+with left:
+    input_panel()
+    actions = st.container()       # filled by output_panel
+    divider()
+    history_panel()
+    # ── REFERENCE ──
+    st.markdown(REFERENCE, unsafe_allow_html=True)
+
+profile.lap("input")
+
+with right:
+    output_panel(actions)
 
 # ── FOOTER ──
-st.markdown("""
-<div style="text-align:center;color:#A8BFD0;font-size:0.74rem;padding:20px 24px 32px;">
-    ⚡ AMPify — Built for Salesforce Marketing Cloud Developers &nbsp;·&nbsp;
-    Always validate in Query Studio before production &nbsp;·&nbsp;
-    Not affiliated with Salesforce Inc.
-</div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+st.markdown(FOOTER, unsafe_allow_html=True)
+
+profile.lap("output")
+profile.finish()